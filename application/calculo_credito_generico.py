@@ -1,6 +1,7 @@
 import sys
 sys.path.append('src')
-from core.domain.tabelas import obter_parametros_simples, calcular_selic_acumulada
+from core.domain.tabelas import calcular_selic_acumulada
+from core.domain.simples_nacional import calcular_simples
 
 def calcular_credito_generico(rbt12, receita_nao_mono, pis_declarado, cofins_declarado, periodo, cliente_nome=None):
     """
@@ -13,10 +14,11 @@ def calcular_credito_generico(rbt12, receita_nao_mono, pis_declarado, cofins_dec
         periodo: string AAAA-MM
         cliente_nome: opcional, nome do cliente para exibir no print
     """
-    aliquota, valor_deduzir = obter_parametros_simples(rbt12)
-    aliquota_efetiva = (rbt12 * aliquota - valor_deduzir) / rbt12
-    pis_prop = 0.0276
-    cofins_prop = 0.1274
+    # Faixa, alíquota efetiva e repartição da tabela compilada do Anexo I
+    simples = calcular_simples(rbt12, anexo=1)
+    aliquota_efetiva = simples["aliquota_efetiva"]
+    pis_prop = simples["reparticao"]["pis"]
+    cofins_prop = simples["reparticao"]["cofins"]
     pis_efetivo = aliquota_efetiva * pis_prop
     cofins_efetivo = aliquota_efetiva * cofins_prop
     pis_devido = receita_nao_mono * pis_efetivo
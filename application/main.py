@@ -1,8 +1,13 @@
 import os
 import json
+from math import fsum
 from datetime import datetime
-from parser import processar_xmls, carregar_pgdas, calcular_creditos, atualizar_selic
-from core.domain.tabelas import consultar_selic, verificar_ncm_monofasico, calcular_selic_acumulada
+from parser import (processar_xmls, processar_xmls_tabela, processar_xmls_diretorios,
+                    carregar_pgdas, calcular_creditos, atualizar_selic)
+from core.domain.tabelas import (consultar_selic, verificar_ncm_monofasico, calcular_selic_acumulada,
+                                 calcular_fatores_selic, aquecer_tabelas)
+from core.domain.tabela_itens import TabelaItens
+from core.infrastructure.periodos import detectar_periodos as detectar_periodos_dados
 import argparse
 
 def processar_periodo(periodo, diretorio_base):
@@ -30,7 +35,9 @@ def processar_periodo(periodo, diretorio_base):
     
     # Processar XMLs
     print("Processando XMLs de notas fiscais...")
-    notas = processar_xmls(dir_xmls)
+    # Cache de parsing do diretório base: reexecuções só leem XMLs novos ou alterados
+    arquivo_cache = os.path.join(diretorio_base, "data/cache", "parse_xmls.sqlite")
+    notas = processar_xmls(dir_xmls, cache=arquivo_cache)
     if not notas:
         print("Nenhuma nota fiscal válida encontrada")
         return None
@@ -43,22 +50,160 @@ def processar_periodo(periodo, diretorio_base):
     fator_selic = calcular_selic_acumulada(periodo)
     print(f"Fator SELIC acumulado para {periodo} até hoje: {fator_selic:.4f}")
     
-    # Atualizar créditos com SELIC acumulada
+    # Atualizar créditos com SELIC acumulada e salvar
+    salvar_resultados_periodo(resultados, periodo, fator_selic, os.path.join(diretorio_base, "data/resultados"))
+    
+    return resultados
+
+# Função para atualizar os créditos pela SELIC e salvar o resultado do período
+def salvar_resultados_periodo(resultados, periodo, fator_selic, diretorio_saida):
     resultados["creditos"]["atualizado"] = resultados["creditos"]["total"] * fator_selic
     resultados["fator_selic_acumulado"] = fator_selic
     
-    # Salvar resultados
-    diretorio_saida = os.path.join(diretorio_base, "data/resultados")
     os.makedirs(diretorio_saida, exist_ok=True)
-    
     arquivo_saida = os.path.join(diretorio_saida, f"creditos_{periodo}.json")
     with open(arquivo_saida, 'w', encoding='utf-8') as f:
         json.dump(resultados, f, indent=2, ensure_ascii=False)
     
     print(f"Resultados salvos em: {arquivo_saida}")
-    
+    return arquivo_saida
+
+# Função para detectar os períodos disponíveis (pastas de XMLs e arquivos PGDAS)
+def detectar_periodos(diretorio_base):
+    return detectar_periodos_dados(os.path.join(diretorio_base, "data/xmls"),
+                                   os.path.join(diretorio_base, "data/pgdas"))
+
+# Função executada em cada processo worker: créditos de um período, já salvos
+# Cada período grava o próprio CSV de classificação no diretório de saída
+def calcular_creditos_periodo(tabela, dados_pgdas, periodo, fator_selic, diretorio_saida):
+    os.makedirs(diretorio_saida, exist_ok=True)
+    arquivo_relatorio = os.path.join(diretorio_saida, f"classificacao_itens_{periodo}.csv")
+    resultados = calcular_creditos(tabela, dados_pgdas, arquivo_relatorio)
+    salvar_resultados_periodo(resultados, periodo, fator_selic, diretorio_saida)
     return resultados
 
+# Função para calcular os créditos de vários períodos, um período por tarefa
+# Cada tarefa leva a TabelaItens do período (arrays vão aos workers muito mais
+# rápido que objetos por nota); o resultado volta na ordem das tarefas
+def _calcular_creditos_periodos(tarefas, workers=1):
+    if workers == 1 or len(tarefas) <= 1:
+        return [calcular_creditos_periodo(*tarefa) for tarefa in tarefas]
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    workers = workers if workers and workers > 0 else (os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=min(workers, len(tarefas)), initializer=aquecer_tabelas) as executor:
+        return list(executor.map(calcular_creditos_periodo, *zip(*tarefas)))
+
+# Função para processar vários períodos em um único job
+# Os XMLs de todos os períodos passam por um só pool de processos (workers
+# aquecidos uma vez, 0 = todos os núcleos) e uma só consulta ao cache; os
+# fatores SELIC saem de uma única chamada e os créditos dos períodos são
+# calculados em paralelo. Gera o razão consolidado de créditos.
+def processar_periodos(diretorio_base, periodos=None, workers=0, periodo_final=None, usar_cache=True):
+    periodos = periodos or detectar_periodos(diretorio_base)
+    print(f"\n=== Processando {len(periodos)} períodos ===\n")
+    
+    # Tabelas de referência carregadas uma vez para todo o job
+    aquecer_tabelas()
+    
+    pendencias = []
+    prontos = []
+    for periodo in periodos:
+        dir_xmls = os.path.join(diretorio_base, "data/xmls", periodo)
+        arquivo_pgdas = os.path.join(diretorio_base, "data/pgdas", f"{periodo}.json")
+        if not os.path.isdir(dir_xmls):
+            pendencias.append({"periodo": periodo, "motivo": "Diretório de XMLs não encontrado"})
+            continue
+        if not os.path.exists(arquivo_pgdas):
+            pendencias.append({"periodo": periodo, "motivo": "Arquivo PGDAS não encontrado"})
+            continue
+        
+        dados_pgdas = carregar_pgdas(arquivo_pgdas)
+        if not dados_pgdas:
+            pendencias.append({"periodo": periodo, "motivo": "Erro ao carregar PGDAS"})
+            continue
+        prontos.append((periodo, dir_xmls, dados_pgdas))
+    
+    print(f"Processando XMLs de {len(prontos)} períodos...")
+    arquivo_cache = os.path.join(diretorio_base, "data/cache", "parse_xmls.sqlite") if usar_cache else None
+    notas_periodos = processar_xmls_diretorios([dir_xmls for _, dir_xmls, _ in prontos],
+                                               workers=workers, cache=arquivo_cache)
+    
+    # Fatores SELIC de todos os períodos em uma chamada
+    fatores = calcular_fatores_selic([periodo for periodo, _, _ in prontos], periodo_final)
+    
+    diretorio_saida = os.path.join(diretorio_base, "data/resultados")
+    tarefas = []
+    for (periodo, _, dados_pgdas), notas, fator_selic in zip(prontos, notas_periodos, fatores):
+        if not notas:
+            pendencias.append({"periodo": periodo, "motivo": "Nenhuma nota fiscal válida encontrada"})
+            continue
+        tarefas.append((TabelaItens.de_notas(notas), dados_pgdas, periodo, fator_selic, diretorio_saida))
+    
+    print(f"Calculando créditos de {len(tarefas)} períodos...")
+    resultados_periodos = {
+        tarefa[2]: resultados
+        for tarefa, resultados in zip(tarefas, _calcular_creditos_periodos(tarefas, workers))
+    }
+    
+    razao = montar_razao_creditos(resultados_periodos, pendencias, periodo_final)
+    arquivo_razao = os.path.join(diretorio_saida, "razao_creditos.json")
+    os.makedirs(diretorio_saida, exist_ok=True)
+    with open(arquivo_razao, 'w', encoding='utf-8') as f:
+        json.dump(razao, f, indent=2, ensure_ascii=False)
+    print(f"Razão consolidado salvo em: {arquivo_razao}")
+    
+    return razao
+
+# Função para montar o razão consolidado de créditos (um lançamento por período)
+def montar_razao_creditos(resultados_periodos, pendencias=None, periodo_final=None):
+    lancamentos = []
+    for periodo in sorted(resultados_periodos):
+        resultados = resultados_periodos[periodo]
+        creditos = resultados["creditos"]
+        lancamentos.append({
+            "periodo": periodo,
+            "qtd_notas": resultados["estatisticas"]["qtd_notas"],
+            "total_monofasico": resultados["total_monofasico"],
+            "total_nao_monofasico": resultados["total_nao_monofasico"],
+            "credito_pis": creditos["pis"],
+            "credito_cofins": creditos["cofins"],
+            "credito_total": creditos["total"],
+            "fator_selic_acumulado": resultados["fator_selic_acumulado"],
+            "credito_atualizado": creditos["atualizado"]
+        })
+    
+    return {
+        "gerado_em": datetime.now().isoformat(),
+        "periodo_final": periodo_final or datetime.now().strftime("%Y-%m"),
+        "periodos": lancamentos,
+        "pendencias": sorted(pendencias or [], key=lambda pendencia: pendencia["periodo"]),
+        "totais": {
+            chave: fsum(lancamento[chave] for lancamento in lancamentos)
+            for chave in ("total_monofasico", "total_nao_monofasico", "credito_pis",
+                          "credito_cofins", "credito_total", "credito_atualizado")
+        }
+    }
+
+def exibir_razao(razao):
+    print("\n" + "="*78)
+    print("RAZÃO CONSOLIDADO DE CRÉDITOS")
+    print("="*78 + "\n")
+    
+    print(f"{'Período':<10}{'Notas':>8}{'Crédito PIS':>16}{'Crédito COFINS':>16}{'Fator SELIC':>12}{'Atualizado':>16}")
+    for lancamento in razao["periodos"]:
+        print(f"{lancamento['periodo']:<10}{lancamento['qtd_notas']:>8}"
+              f"{lancamento['credito_pis']:>16.2f}{lancamento['credito_cofins']:>16.2f}"
+              f"{lancamento['fator_selic_acumulado']:>12.4f}{lancamento['credito_atualizado']:>16.2f}")
+    
+    totais = razao["totais"]
+    print(f"\n{'Total':<18}{totais['credito_pis']:>16.2f}{totais['credito_cofins']:>16.2f}"
+          f"{'':>12}{totais['credito_atualizado']:>16.2f}")
+    
+    for pendencia in razao["pendencias"]:
+        print(f"Pendência {pendencia['periodo']}: {pendencia['motivo']}")
+
 def exibir_resultados(resultados, periodo):
     print("\n" + "="*50)
     print(f"RELATÓRIO DE CRÉDITOS TRIBUTÁRIOS - {periodo}")
@@ -96,12 +241,24 @@ def exibir_resultados(resultados, periodo):
 
 def main():
     parser = argparse.ArgumentParser(description="Processador de Notas Fiscais - Motor Notas Limpo")
-    parser.add_argument('--xmls', type=str, required=True, help='Diretório dos XMLs a serem analisados')
-    parser.add_argument('--pgdas', type=str, required=True, help='Arquivo PGDAS referente ao período')
-    parser.add_argument('--periodo', type=str, required=True, help='Período a processar (ex: 2025-03)')
+    parser.add_argument('--xmls', type=str, help='Diretório dos XMLs a serem analisados')
+    parser.add_argument('--pgdas', type=str, help='Arquivo PGDAS referente ao período')
+    parser.add_argument('--periodo', type=str, help='Período a processar (ex: 2025-03)')
     parser.add_argument('--saida', type=str, default=None, help='Diretório de saída dos resultados (opcional)')
+    parser.add_argument('--cache', type=str, default=None, help='Arquivo SQLite do cache de parsing dos XMLs (opcional)')
+    parser.add_argument('--todos', type=str, metavar='DIRETORIO_BASE', default=None,
+                        help='Processa todos os períodos de DIRETORIO_BASE/data (xmls/YYYY-MM e pgdas/YYYY-MM.json)')
+    parser.add_argument('--workers', type=int, default=0, help='Processos para o parsing e os créditos com --todos (0 = todos os núcleos)')
     args = parser.parse_args()
 
+    if args.todos:
+        razao = processar_periodos(args.todos, workers=args.workers)
+        exibir_razao(razao)
+        return
+
+    if not (args.xmls and args.pgdas and args.periodo):
+        parser.error("informe --xmls, --pgdas e --periodo, ou --todos DIRETORIO_BASE")
+
     dir_xmls = args.xmls
     arquivo_pgdas = args.pgdas
     periodo = args.periodo
@@ -117,7 +274,11 @@ def main():
 
     # Processar XMLs
     print("Processando XMLs de notas fiscais...")
-    notas = processar_xmls(dir_xmls)
+    # Sem cache, os itens vão direto para a tabela colunar (sem objetos por item)
+    if args.cache:
+        notas = processar_xmls(dir_xmls, cache=args.cache)
+    else:
+        notas = processar_xmls_tabela(dir_xmls)
     if not notas:
         print("Nenhuma nota fiscal válida encontrada")
         return
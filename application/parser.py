@@ -1,8 +1,14 @@
 import os
 import json
+import zipfile
+from itertools import compress
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from core.domain.tabelas import verificar_ncm_monofasico as verificar_ncm
+from core.domain.tabelas import classificar_ncms_monofasicos, aquecer_tabelas, obter_indice_ncm_monofasico
+from core.domain.tabela_itens import TabelaItens, CAMPOS_ITEM
+from core.domain.centavos import para_float
+from core.domain.motor_creditos import calcular_creditos_tabela
+from core.infrastructure.cache_parse import CacheParse, hash_conteudo
 
 # Classe para armazenar dados da nota fiscal
 class NotaFiscal:
@@ -141,8 +147,65 @@ def get_element_text(element, tag_name, default=""):
     found = find_element(element, tag_name)
     return found.text if found is not None and found.text else default
 
+# Função para extrair os campos de um item (det), na ordem de CAMPOS_ITEM
+def extrair_campos_item(det):
+    numero = int(det.attrib.get('nItem', '0'))
+    codigo = descricao = ncm = cfop = ""
+    quantidade = valor_unitario = valor_bruto = valor_desconto = valor_total = 0.0
+    pis_cst = cofins_cst = ""
+    pis_valor = cofins_valor = 0.0
+    
+    # Dados do produto
+    prod = find_element(det, 'prod')
+    if prod is not None:
+        codigo = get_element_text(prod, 'cProd')
+        descricao = get_element_text(prod, 'xProd')
+        ncm = get_element_text(prod, 'NCM')
+        cfop = get_element_text(prod, 'CFOP')
+        quantidade = to_float(get_element_text(prod, 'qCom', '0'))
+        valor_unitario = to_float(get_element_text(prod, 'vUnCom', '0'))
+        
+        # Armazenar valor bruto do produto
+        valor_bruto = to_float(get_element_text(prod, 'vProd', '0'))
+        
+        # Verificar se há descontos aplicados
+        valor_desconto = to_float(get_element_text(prod, 'vDesc', '0'))
+        
+        # Calcular o valor líquido (valor bruto - desconto)
+        valor_total = valor_bruto - valor_desconto
+    
+    # Dados de impostos
+    imposto = find_element(det, 'imposto')
+    if imposto is not None:
+        # PIS (grupos PISAliq, PISNT, PISOutr, etc.)
+        pis_grupo = _grupo_tributo(find_element(imposto, 'PIS'))
+        if pis_grupo is not None:
+            pis_cst = get_element_text(pis_grupo, 'CST')
+            pis_valor = to_float(get_element_text(pis_grupo, 'vPIS', '0'))
+        
+        # COFINS (grupos COFINSAliq, COFINSNT, COFINSOutr, etc.)
+        cofins_grupo = _grupo_tributo(find_element(imposto, 'COFINS'))
+        if cofins_grupo is not None:
+            cofins_cst = get_element_text(cofins_grupo, 'CST')
+            cofins_valor = to_float(get_element_text(cofins_grupo, 'vCOFINS', '0'))
+    
+    return (numero, codigo, descricao, ncm, cfop, quantidade, valor_unitario,
+            valor_bruto, valor_desconto, valor_total, pis_cst, pis_valor,
+            cofins_cst, cofins_valor)
+
+# Função para localizar o grupo de PIS/COFINS (Aliq, NT, Outr ou Qtde)
+def _grupo_tributo(tributo):
+    if tributo is None:
+        return None
+    for child in tributo:
+        if child.tag.endswith('Aliq') or child.tag.endswith('NT') or child.tag.endswith('Outr') or child.tag.endswith('Qtde'):
+            return child
+    return None
+
 # Função principal para fazer parsing do XML de NFe
-def parse_nfe(xml_content, tabela_ncm=None):
+# Com tabela_itens, os itens são gravados direto nas colunas da tabela
+# (sem objetos ItemNotaFiscal) e a nota retornada contém só o cabeçalho
+def parse_nfe(xml_content, tabela_ncm=None, tabela_itens=None):
     try:
         root = ET.fromstring(xml_content)
         nf = NotaFiscal()
@@ -196,73 +259,27 @@ def parse_nfe(xml_content, tabela_ncm=None):
             nf.valor_produtos = to_float(get_element_text(icms_tot, 'vProd', '0'))
         
         # Processar itens (det)
-        for det in find_all_elements(inf_nfe, 'det'):
+        campos_itens = [extrair_campos_item(det) for det in find_all_elements(inf_nfe, 'det')]
+        
+        # Estratégia de classificação:
+        # Classificar APENAS pelo NCM usando a tabela de referência (conforme Mecanismo V2)
+        # Todos os NCMs da nota são consultados em uma única chamada ao índice
+        monofasicos = classificar_ncms_monofasicos([campos[3] for campos in campos_itens])
+        
+        if tabela_itens is not None:
+            indice_nota = tabela_itens.adicionar_nota(
+                nf.chave_acesso, nf.numero, nf.serie, nf.data_emissao, nf.cnpj_emitente,
+                nf.nome_emitente, nf.valor_total, nf.valor_produtos
+            )
+            for campos, eh_monofasico in zip(campos_itens, monofasicos):
+                tabela_itens.adicionar_item(indice_nota, *campos, monofasico=eh_monofasico)
+            return nf
+        
+        for campos, eh_monofasico in zip(campos_itens, monofasicos):
             item = ItemNotaFiscal()
-            
-            # Número do item
-            item.numero = int(det.attrib.get('nItem', '0'))
-            
-            # Dados do produto
-            prod = find_element(det, 'prod')
-            if prod is not None:
-                item.codigo = get_element_text(prod, 'cProd')
-                item.descricao = get_element_text(prod, 'xProd')
-                item.ncm = get_element_text(prod, 'NCM')
-                item.cfop = get_element_text(prod, 'CFOP')
-                item.quantidade = to_float(get_element_text(prod, 'qCom', '0'))
-                item.valor_unitario = to_float(get_element_text(prod, 'vUnCom', '0'))
-                
-                # Armazenar valor bruto do produto
-                item.valor_bruto = to_float(get_element_text(prod, 'vProd', '0'))
-                
-                # Verificar se há descontos aplicados
-                item.valor_desconto = to_float(get_element_text(prod, 'vDesc', '0'))
-                
-                # Calcular o valor líquido (valor bruto - desconto)
-                item.valor_total = item.valor_bruto - item.valor_desconto
-            
-            # Dados de impostos
-            imposto = find_element(det, 'imposto')
-            if imposto is not None:
-                # PIS
-                pis = find_element(imposto, 'PIS')
-                if pis is not None:
-                    # Buscar CST em grupos de PIS (PISAliq, PISNT, PISOutr, etc.)
-                    pis_grupo = None
-                    for child in pis:
-                        # Detectar se é um grupo PIS
-                        if child.tag.endswith('Aliq') or child.tag.endswith('NT') or child.tag.endswith('Outr') or child.tag.endswith('Qtde'):
-                            pis_grupo = child
-                            break
-                    
-                    if pis_grupo is not None:
-                        item.pis_cst = get_element_text(pis_grupo, 'CST')
-                        item.pis_valor = to_float(get_element_text(pis_grupo, 'vPIS', '0'))
-                
-                # COFINS
-                cofins = find_element(imposto, 'COFINS')
-                if cofins is not None:
-                    # Buscar CST em grupos de COFINS (COFINSAliq, COFINSNT, COFINSOutr, etc.)
-                    cofins_grupo = None
-                    for child in cofins:
-                        # Detectar se é um grupo COFINS
-                        if child.tag.endswith('Aliq') or child.tag.endswith('NT') or child.tag.endswith('Outr') or child.tag.endswith('Qtde'):
-                            cofins_grupo = child
-                            break
-                    
-                    if cofins_grupo is not None:
-                        item.cofins_cst = get_element_text(cofins_grupo, 'CST')
-                        item.cofins_valor = to_float(get_element_text(cofins_grupo, 'vCOFINS', '0'))
-            
-            # Estratégia de classificação:
-            # Classificar APENAS pelo NCM usando a tabela de referência (conforme Mecanismo V2)
-            eh_monofasico = verificar_ncm(item.ncm)
-            if eh_monofasico:
-                item.tipo_tributario = "Monofasico"
-            else:
-                item.tipo_tributario = "NaoMonofasico"
-            
-            # Adicionar item à nota fiscal
+            for campo, valor in zip(CAMPOS_ITEM, campos):
+                setattr(item, campo, valor)
+            item.tipo_tributario = "Monofasico" if eh_monofasico else "NaoMonofasico"
             nf.itens.append(item)
         
         return nf
@@ -317,29 +334,239 @@ def carregar_pgdas(arquivo_json):
         print(f"Erro ao carregar PGDAS: {str(e)}")
         return None
 
-# Função para processar um diretório de XMLs
-def processar_xmls(diretorio, tabela_ncm=None):
-    notas = []
+# Função para processar um arquivo XML individual
+# metadados (dict opcional) recebe 'estado' (tamanho, mtime_ns) observado antes
+# da leitura e 'hash' dos bytes lidos, para o cache de parsing não reler o arquivo
+def processar_arquivo_xml(caminho_completo, tabela_ncm=None, tabela_itens=None, metadados=None):
+    arquivo = os.path.basename(caminho_completo)
+    try:
+        # Bytes: o parser respeita a declaração de encoding do documento
+        with open(caminho_completo, 'rb') as f:
+            estado = os.fstat(f.fileno())
+            conteudo_xml = f.read()
+    except Exception as e:
+        print(f"Erro ao processar {arquivo}: {str(e)}")
+        return None
     
-    for arquivo in os.listdir(diretorio):
-        if arquivo.endswith('.xml'):
-            caminho_completo = os.path.join(diretorio, arquivo)
+    if metadados is not None:
+        metadados['estado'] = (estado.st_size, estado.st_mtime_ns)
+        metadados['hash'] = hash_conteudo(conteudo_xml)
+    return processar_conteudo_xml(conteudo_xml, arquivo, tabela_ncm, tabela_itens)
+
+# Função para processar o conteúdo (bytes) de um XML já lido
+def processar_conteudo_xml(conteudo_xml, arquivo, tabela_ncm=None, tabela_itens=None):
+    try:
+        if validar_xml(conteudo_xml):
+            nota = parse_nfe(conteudo_xml, tabela_ncm, tabela_itens)
+            if nota:
+                print(f"Processado: {nota}")
+                return nota
+        else:
+            print(f"XML inválido: {arquivo}")
+    except Exception as e:
+        print(f"Erro ao processar {arquivo}: {str(e)}")
+    
+    return None
+
+# Função para verificar, só pelo nome, se um membro do ZIP é um XML a processar
+# (pastas, metadados do macOS e arquivos ocultos são ignorados sem descompactar)
+def eh_membro_xml(info):
+    if info.is_dir() or not info.filename.lower().endswith('.xml'):
+        return False
+    partes = info.filename.replace('\\', '/').split('/')
+    return '__MACOSX' not in partes and not partes[-1].startswith('.')
+
+# Função para listar os XMLs de um ZIP (inclusive em subpastas), em ordem alfabética
+# Retorna pares (caminho do ZIP, nome do membro), que servem de lote para os workers
+def listar_xmls_zip(caminho_zip):
+    caminho_zip = str(caminho_zip)
+    with zipfile.ZipFile(caminho_zip) as arquivo_zip:
+        membros = sorted(info.filename for info in arquivo_zip.infolist() if eh_membro_xml(info))
+    return [(caminho_zip, membro) for membro in membros]
+
+# Função executada em cada processo worker: processa membros de ZIP direto da
+# memória, sem extrair para o disco (cada worker abre o próprio handle do ZIP)
+def processar_lote_zip(membros, tabela_ncm=None, tabela_itens=None):
+    resultados = []
+    arquivo_zip = None
+    try:
+        for caminho_zip, membro in membros:
+            if arquivo_zip is None or arquivo_zip.filename != caminho_zip:
+                if arquivo_zip is not None:
+                    arquivo_zip.close()
+                arquivo_zip = zipfile.ZipFile(caminho_zip)
             try:
-                with open(caminho_completo, 'r', encoding='utf-8') as f:
-                    conteudo_xml = f.read()
-                
-                if validar_xml(conteudo_xml):
-                    nota = parse_nfe(conteudo_xml, tabela_ncm)
-                    if nota:
-                        notas.append(nota)
-                        print(f"Processado: {nota}")
-                else:
-                    print(f"XML inválido: {arquivo}")
+                conteudo_xml = arquivo_zip.read(membro)
             except Exception as e:
-                print(f"Erro ao processar {arquivo}: {str(e)}")
+                print(f"Erro ao processar {membro}: {str(e)}")
+                resultados.append(None)
+                continue
+            resultados.append(processar_conteudo_xml(conteudo_xml, membro, tabela_ncm, tabela_itens))
+    finally:
+        if arquivo_zip is not None:
+            arquivo_zip.close()
+    return resultados
+
+# Função executada em cada processo worker: processa um lote na ordem recebida
+def processar_lote_xmls(arquivos, tabela_ncm=None):
+    return [processar_arquivo_xml(arquivo, tabela_ncm) for arquivo in arquivos]
+
+# Função executada em cada processo worker: processa o lote devolvendo, por
+# arquivo, (nota, metadados) para o cache (metadados vazio = erro de leitura)
+def processar_lote_xmls_cache(arquivos, tabela_ncm=None):
+    resultados = []
+    for arquivo in arquivos:
+        metadados = {}
+        resultados.append((processar_arquivo_xml(arquivo, tabela_ncm, metadados=metadados), metadados))
+    return resultados
+
+# Função executada em cada processo worker: grava o lote em uma tabela colunar
+# (arrays são devolvidos ao processo principal muito mais rápido que objetos)
+def processar_lote_tabela(arquivos, tabela_ncm=None):
+    tabela_itens = TabelaItens()
+    for arquivo in arquivos:
+        processar_arquivo_xml(arquivo, tabela_ncm, tabela_itens)
+    return tabela_itens
+
+# Função para dividir lista de arquivos em lotes consecutivos
+def dividir_em_lotes(itens, tamanho_lote):
+    tamanho_lote = max(1, tamanho_lote)
+    return [itens[i:i + tamanho_lote] for i in range(0, len(itens), tamanho_lote)]
+
+# Função para calcular o SHA-256 de um arquivo (acerto por hash no cache de parsing)
+def hash_arquivo_xml(caminho):
+    with open(caminho, 'rb') as f:
+        return hash_conteudo(f.read())
+
+# Função para abrir o cache de parsing deste módulo
+# O contexto é o índice de NCMs monofásicos do registro, o único que parse_nfe
+# consulta (a classificação fica gravada nos itens); tabela_ncm não entra no contexto
+def abrir_cache_parse(caminho_db):
+    return CacheParse(caminho_db, contexto=('application.parser', obter_indice_ncm_monofasico()),
+                      funcao_hash=hash_arquivo_xml)
+
+# Função para listar os XMLs de um diretório em ordem alfabética
+def listar_xmls(diretorio):
+    return [
+        os.path.join(diretorio, arquivo)
+        for arquivo in sorted(os.listdir(diretorio))
+        if arquivo.endswith('.xml')
+    ]
+
+# Função para processar um diretório de XMLs
+# workers > 1 (ou 0 para todos os núcleos) distribui lotes em um pool de processos;
+# a ordem das notas é sempre a ordem alfabética dos arquivos
+# cache (caminho do SQLite ou CacheParse) evita reparsear arquivos inalterados
+def processar_xmls(diretorio, tabela_ncm=None, workers=1, tamanho_lote=None, cache=None):
+    return processar_xmls_diretorios([diretorio], tabela_ncm, workers, tamanho_lote, cache)[0]
+
+# Função para processar vários diretórios de XMLs (ex.: um por período) de uma vez
+# Todos os arquivos passam por um único pool de processos e uma única consulta
+# ao cache; retorna a lista de notas de cada diretório, na ordem da entrada
+def processar_xmls_diretorios(diretorios, tabela_ncm=None, workers=1, tamanho_lote=None, cache=None):
+    arquivos_diretorios = [listar_xmls(diretorio) for diretorio in diretorios]
+    arquivos = [arquivo for arquivos_diretorio in arquivos_diretorios for arquivo in arquivos_diretorio]
     
+    if cache is None:
+        resultados = _processar_arquivos(arquivos, tabela_ncm, workers, tamanho_lote)
+    else:
+        resultados = _processar_arquivos_com_cache(arquivos, cache, tabela_ncm, workers, tamanho_lote)
+    
+    notas_diretorios = []
+    inicio = 0
+    for arquivos_diretorio in arquivos_diretorios:
+        fim = inicio + len(arquivos_diretorio)
+        notas_diretorios.append([nota for nota in resultados[inicio:fim] if nota])
+        inicio = fim
+    return notas_diretorios
+
+# Função para processar arquivos reaproveitando o cache de parsing (consultas e
+# gravações ficam no processo principal)
+def _processar_arquivos_com_cache(arquivos, cache, tabela_ncm=None, workers=1, tamanho_lote=None):
+    cache_proprio = not isinstance(cache, CacheParse)
+    if cache_proprio:
+        cache = abrir_cache_parse(cache)
+    
+    try:
+        resultados = [cache.consultar(arquivo) for arquivo in arquivos]
+        pendentes = [indice for indice, nota in enumerate(resultados) if nota is CacheParse.AUSENTE]
+        
+        lotes = executar_lotes(processar_lote_xmls_cache, [arquivos[indice] for indice in pendentes],
+                               tabela_ncm, workers, tamanho_lote)
+        processados = (resultado for resultado_lote in lotes for resultado in resultado_lote)
+        for indice, (nota, metadados) in zip(pendentes, processados):
+            resultados[indice] = nota
+            # Arquivos inválidos também são gravados (None) para não serem relidos;
+            # erro de leitura não é gravado: a próxima execução tenta de novo
+            if metadados:
+                cache.gravar(arquivos[indice], nota, metadados['hash'], metadados['estado'])
+        cache.sincronizar()
+    finally:
+        if cache_proprio:
+            cache.fechar()
+    
+    return resultados
+
+# Função para processar os XMLs de um ZIP sem extraí-lo (mesmo paralelismo de processar_xmls)
+def processar_xmls_zip(caminho_zip, tabela_ncm=None, workers=1, tamanho_lote=None):
+    notas = []
+    for resultado_lote in executar_lotes(processar_lote_zip, listar_xmls_zip(caminho_zip),
+                                          tabela_ncm, workers, tamanho_lote):
+        notas.extend(nota for nota in resultado_lote if nota)
     return notas
 
+# Função para processar um diretório de XMLs direto em uma TabelaItens
+# Mesma ordem e paralelismo de processar_xmls, sem manter objetos por item
+def processar_xmls_tabela(diretorio, tabela_ncm=None, workers=1, tamanho_lote=None):
+    tabela_itens = TabelaItens()
+    for tabela_lote in executar_lotes(processar_lote_tabela, listar_xmls(diretorio),
+                                       tabela_ncm, workers, tamanho_lote):
+        tabela_itens.estender(tabela_lote)
+    return tabela_itens
+
+# Função para processar uma lista de arquivos, sequencialmente ou em lotes paralelos
+def _processar_arquivos(arquivos, tabela_ncm=None, workers=1, tamanho_lote=None):
+    resultados = []
+    for resultado_lote in executar_lotes(processar_lote_xmls, arquivos, tabela_ncm, workers, tamanho_lote):
+        resultados.extend(resultado_lote)
+    return resultados
+
+# Função para executar uma função de lote sobre os arquivos, na ordem dos lotes
+# ao_concluir_lote recebe o resultado de cada lote assim que ele termina (progresso);
+# executor reaproveita um pool de processos já aberto em vez de criar um por chamada
+def executar_lotes(funcao_lote, arquivos, tabela_ncm=None, workers=1, tamanho_lote=None,
+                   ao_concluir_lote=None, executor=None):
+    sequencial = executor is None and (workers == 1 or len(arquivos) <= 1)
+    if sequencial and ao_concluir_lote is None:
+        return [funcao_lote(arquivos, tabela_ncm)]
+    
+    workers = workers if workers and workers > 0 else (os.cpu_count() or 1)
+    tamanho_lote = tamanho_lote or max(1, min(256, -(-len(arquivos) // (workers * 4))))
+    lotes = dividir_em_lotes(arquivos, tamanho_lote)
+    
+    # Sem pool, mas com progresso: os lotes são processados um a um na própria thread
+    if sequencial:
+        return _coletar_lotes(map(funcao_lote, lotes, [tabela_ncm] * len(lotes)), ao_concluir_lote)
+    
+    # executor.map preserva a ordem dos lotes
+    if executor is not None:
+        return _coletar_lotes(executor.map(funcao_lote, lotes, [tabela_ncm] * len(lotes)), ao_concluir_lote)
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    # Cada worker carrega as tabelas de referência uma única vez
+    with ProcessPoolExecutor(max_workers=workers, initializer=aquecer_tabelas) as executor:
+        return _coletar_lotes(executor.map(funcao_lote, lotes, [tabela_ncm] * len(lotes)), ao_concluir_lote)
+
+# Função para reunir os resultados dos lotes, avisando a conclusão de cada um
+def _coletar_lotes(resultados_lotes, ao_concluir_lote=None):
+    resultados = []
+    for resultado_lote in resultados_lotes:
+        if ao_concluir_lote is not None:
+            ao_concluir_lote(resultado_lote)
+        resultados.append(resultado_lote)
+    return resultados
+
 # Função para calcular alíquotas efetivas de PIS e COFINS
 def calcular_aliquotas(dados_pgdas):
     aliquota_apurada = dados_pgdas.get("dados_estruturados", {}).get("aliquota_apurada")
@@ -351,49 +578,28 @@ def calcular_aliquotas(dados_pgdas):
     return aliquota_pis, aliquota_cofins
 
 # Função para analisar dados e calcular créditos
-def calcular_creditos(notas, dados_pgdas):
-    # Totais por categoria
-    total_monofasico = 0.0
-    total_nao_monofasico = 0.0
-    
-    # Itens por categoria
-    itens_monofasicos = []
-    itens_nao_monofasicos = []
-    
-    # Processar cada nota fiscal
-    for nf in notas:
-        for item in nf.itens:
-            # Calcular valor líquido do item (valor bruto - descontos/impostos não aplicáveis)
-            # Por simplicidade, estamos considerando o valor_total como o valor líquido base
-            # Se houver campos específicos para descontos, eles devem ser subtraídos aqui
-            valor_liquido = item.valor_total
-            
-            if item.tipo_tributario == "Monofasico":
-                total_monofasico += valor_liquido
-                itens_monofasicos.append(item)
-            else:
-                total_nao_monofasico += valor_liquido
-                itens_nao_monofasicos.append(item)
+# notas: lista de NotaFiscal ou TabelaItens (de processar_xmls_tabela);
+# RVM/RVN e detalhamentos saem do motor colunar em uma passada;
+# arquivo_relatorio recebe o CSV de classificação dos itens (None = não gerar)
+def calcular_creditos(notas, dados_pgdas, arquivo_relatorio='relatorio_classificacao_itens.csv'):
+    tabela = notas if isinstance(notas, TabelaItens) else TabelaItens.de_notas(notas)
     
     # Calcular alíquota efetiva de PIS e COFINS
     aliquota_pis, aliquota_cofins = calcular_aliquotas(dados_pgdas)
-    
-    # Calcular valores devidos sobre produtos não-monofásicos
-    # Usar valores líquidos (descontando outros valores que possam ter sido agregados)
-    pis_devido = total_nao_monofasico * aliquota_pis
-    cofins_devido = total_nao_monofasico * aliquota_cofins
-    
-    # Calcular créditos tributários (recolhido - devido sobre não-monofásicos)
     tributos = dados_pgdas.get("tributos", {})
-    credito_pis = tributos.get("pis", 0) - pis_devido
-    credito_cofins = tributos.get("cofins", 0) - cofins_devido
-    credito_total = credito_pis + credito_cofins
+    
+    # Totais por categoria sobre o valor líquido (valor bruto - descontos),
+    # devidos apenas sobre não-monofásicos e créditos (recolhido - devido)
+    motor = calcular_creditos_tabela(
+        tabela, aliquota_pis, aliquota_cofins,
+        tributos.get("pis", 0), tributos.get("cofins", 0)
+    )
     
     # Resultados
     resultados = {
-        "total_monofasico": total_monofasico,
-        "total_nao_monofasico": total_nao_monofasico,
-        "proporcao_monofasico": (total_monofasico / (total_monofasico + total_nao_monofasico)) * 100 if (total_monofasico + total_nao_monofasico) > 0 else 0,
+        "total_monofasico": motor.rvm,
+        "total_nao_monofasico": motor.rvn,
+        "proporcao_monofasico": motor.proporcao_monofasico,
         "aliquotas": {
             "aliquota_apurada": dados_pgdas.get("dados_estruturados", {}).get("aliquota_apurada", 0),
             "aliquota_pis": aliquota_pis,
@@ -404,32 +610,43 @@ def calcular_creditos(notas, dados_pgdas):
             "cofins": tributos.get("cofins", 0)
         },
         "tributos_devidos": {
-            "pis": pis_devido,
-            "cofins": cofins_devido
+            "pis": motor.pis_devido,
+            "cofins": motor.cofins_devido
         },
         "creditos": {
-            "pis": credito_pis,
-            "cofins": credito_cofins,
-            "total": credito_total
+            "pis": motor.credito_pis,
+            "cofins": motor.credito_cofins,
+            "total": motor.credito_total
         },
         "estatisticas": {
-            "qtd_notas": len(notas),
-            "qtd_itens_total": len(itens_monofasicos) + len(itens_nao_monofasicos),
-            "qtd_itens_monofasicos": len(itens_monofasicos),
-            "qtd_itens_nao_monofasicos": len(itens_nao_monofasicos)
-        }
+            "qtd_notas": tabela.qtd_notas,
+            "qtd_itens_total": motor.itens_monofasicos + motor.itens_nao_monofasicos,
+            "qtd_itens_monofasicos": motor.itens_monofasicos,
+            "qtd_itens_nao_monofasicos": motor.itens_nao_monofasicos
+        },
+        # Detalhamento por NCM, CFOP, CST, emitente e dia
+        "detalhamento": motor.detalhamentos()
     }
     
     # Geração de relatório simples de classificação
-    with open('relatorio_classificacao_itens.csv', 'w', encoding='utf-8') as f:
-        f.write('Tipo,NCM,Descricao,Valor Total\n')
-        for item in itens_monofasicos:
-            f.write(f'Monofasico,{item.ncm},"{item.descricao}",{item.valor_total}\n')
-        for item in itens_nao_monofasicos:
-            f.write(f'NaoMonofasico,{item.ncm},"{item.descricao}",{item.valor_total}\n')
+    if arquivo_relatorio:
+        gerar_relatorio_classificacao(tabela, arquivo_relatorio)
     
     return resultados
 
+# Função para gerar o relatório de classificação (monofásicos primeiro) a partir das colunas
+def gerar_relatorio_classificacao(tabela, arquivo_csv):
+    ncms = tabela.decodificada('ncm')
+    descricoes = tabela.decodificada('descricao')
+    linhas = list(zip(ncms, descricoes, tabela.coluna('valor_total')))
+    
+    with open(arquivo_csv, 'w', encoding='utf-8') as f:
+        f.write('Tipo,NCM,Descricao,Valor Total\n')
+        for ncm, descricao, centavos in compress(linhas, tabela.monofasico):
+            f.write(f'Monofasico,{ncm},"{descricao}",{para_float(centavos)}\n')
+        for ncm, descricao, centavos in compress(linhas, tabela.mascara_nao_monofasico()):
+            f.write(f'NaoMonofasico,{ncm},"{descricao}",{para_float(centavos)}\n')
+
 # Função para atualizar valor com SELIC
 def atualizar_selic(valor, taxa_selic):
     return valor * (1 + taxa_selic)
\ No newline at end of file
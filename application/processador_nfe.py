@@ -300,12 +300,86 @@ def extrair_dados_nfe(root):
     
     return itens
 
-def processar_xmls(diretorio):
+def analisar_arquivo_xml(arquivo):
+    """
+    Lê, classifica e extrai um arquivo XML com um único parse.
+    
+    Args:
+        arquivo (str): Caminho do arquivo XML
+        
+    Returns:
+        dict: Dicionário com 'tipo', 'evento', 'chave' e 'itens' do arquivo
+    """
+    resultado = {'tipo': 'DESCONHECIDO', 'evento': None, 'chave': '', 'itens': []}
+    
+    try:
+        # Analisar o XML
+        tree = ET.parse(arquivo)
+        root = tree.getroot()
+        
+        resultado['tipo'] = determinar_tipo_xml(root)
+        if resultado['tipo'] == 'EVENTO':
+            resultado['evento'] = extrair_evento_cancelamento(root)
+        elif resultado['tipo'] == 'NFE':
+            inf_nfe = root.find('.//nfe:infNFe', ns)
+            if inf_nfe is not None and 'Id' in inf_nfe.attrib:
+                resultado['chave'] = inf_nfe.attrib['Id'].replace('NFe', '')
+            resultado['itens'] = extrair_dados_nfe(root)
+    except Exception as e:
+        # Silenciosamente ignorar arquivos que não puderem ser processados
+        resultado['tipo'] = 'ERRO'
+    
+    return resultado
+
+def analisar_lote_xml(arquivos):
+    """
+    Analisa um lote de arquivos no processo worker, preservando a ordem.
+    
+    Args:
+        arquivos (list): Caminhos dos arquivos XML do lote
+        
+    Returns:
+        list: Resultados de analisar_arquivo_xml na ordem dos arquivos
+    """
+    return [analisar_arquivo_xml(arquivo) for arquivo in arquivos]
+
+def analisar_arquivos_xml(arquivos_xml, workers=1, tamanho_lote=None):
+    """
+    Analisa arquivos XML sequencialmente ou em um pool de processos.
+    
+    Args:
+        arquivos_xml (list): Caminhos dos arquivos XML
+        workers (int): Número de processos (1 = sequencial, 0 = todos os núcleos)
+        tamanho_lote (int): Quantidade de arquivos por lote enviado a cada worker
+        
+    Returns:
+        list: Resultados na mesma ordem de arquivos_xml
+    """
+    if workers == 1 or len(arquivos_xml) <= 1:
+        return analisar_lote_xml(arquivos_xml)
+    
+    from concurrent.futures import ProcessPoolExecutor
+    
+    workers = workers if workers and workers > 0 else (os.cpu_count() or 1)
+    tamanho_lote = tamanho_lote or max(1, min(256, -(-len(arquivos_xml) // (workers * 4))))
+    lotes = [arquivos_xml[i:i + tamanho_lote] for i in range(0, len(arquivos_xml), tamanho_lote)]
+    
+    resultados = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # executor.map preserva a ordem dos lotes
+        for resultado_lote in executor.map(analisar_lote_xml, lotes):
+            resultados.extend(resultado_lote)
+    
+    return resultados
+
+def processar_xmls(diretorio, workers=1, tamanho_lote=None):
     """
     Processa todos os arquivos XML em um diretório.
     
     Args:
         diretorio (str): Caminho do diretório contendo os arquivos XML
+        workers (int): Número de processos (1 = sequencial, 0 = todos os núcleos)
+        tamanho_lote (int): Quantidade de arquivos por lote enviado a cada worker
         
     Returns:
         tuple: (dados, estatisticas) onde dados é uma lista de dicionários com os dados extraídos
@@ -316,61 +390,44 @@ def processar_xmls(diretorio):
     
     # Listar arquivos XML no diretório
     try:
-        arquivos_xml = listar_arquivos_xml(diretorio)
+        arquivos_xml = sorted(listar_arquivos_xml(diretorio))
     except FileNotFoundError as e:
         print(f"Erro: {e}")
         return [], {}
     
+    # Cada arquivo é parseado uma única vez; os passos abaixo reutilizam o resultado
+    analises = analisar_arquivos_xml(arquivos_xml, workers, tamanho_lote)
+    
     # Dicionário para armazenar eventos de cancelamento por chave de nota
     cancelamentos = {}
     
     # Primeiro passo: encontrar todos os eventos de cancelamento
     print("Identificando eventos de cancelamento...")
-    for arquivo in arquivos_xml:
-        try:
-            # Analisar o XML
-            tree = ET.parse(arquivo)
-            root = tree.getroot()
+    for analise in analises:
+        evento = analise['evento']
+        if evento and evento['tipo'] == 'CANCELAMENTO':
+            chave_nfe = evento['chave_nfe']
             
-            # Verificar se é um evento de cancelamento
-            if determinar_tipo_xml(root) == 'EVENTO':
-                evento = extrair_evento_cancelamento(root)
-                if evento and evento['tipo'] == 'CANCELAMENTO':
-                    chave_nfe = evento['chave_nfe']
-                    data_evento = evento['data_evento']
-                    
-                    # Se já existir um evento para esta nota, manter apenas o mais recente
-                    if chave_nfe in cancelamentos:
-                        # Simplificação: assumir que o evento já existente é mais antigo
-                        # Uma implementação completa compararia as datas
-                        pass
-                    else:
-                        cancelamentos[chave_nfe] = 'CANCELADO'
-                    
-                    print(f"Nota {chave_nfe} marcada como CANCELADA.")
-        except Exception as e:
-            # Silenciosamente ignorar erros ao tentar processar arquivo como evento
-            pass
+            # Se já existir um evento para esta nota, manter apenas o mais recente
+            if chave_nfe in cancelamentos:
+                # Simplificação: assumir que o evento já existente é mais antigo
+                # Uma implementação completa compararia as datas
+                pass
+            else:
+                cancelamentos[chave_nfe] = 'CANCELADO'
+            
+            print(f"Nota {chave_nfe} marcada como CANCELADA.")
     
     # Segundo passo: verificar arquivos que têm "cancelada" ou similar no nome
     print("Verificando arquivos com indicação de cancelamento no nome...")
-    for arquivo in arquivos_xml:
+    for arquivo, analise in zip(arquivos_xml, analises):
         nome_arquivo = os.path.basename(arquivo).lower()
         if "cancel" in nome_arquivo or "-can" in nome_arquivo:
-            try:
-                # Tentar extrair a chave da NFe deste arquivo
-                tree = ET.parse(arquivo)
-                root = tree.getroot()
-                
-                # Verificar se é uma nota fiscal
-                if determinar_tipo_xml(root) == 'NFE':
-                    inf_nfe = root.find('.//nfe:infNFe', ns)
-                    if inf_nfe is not None and 'Id' in inf_nfe.attrib:
-                        chave_nfe = inf_nfe.attrib['Id'].replace('NFe', '')
-                        cancelamentos[chave_nfe] = 'CANCELADO'
-                        print(f"Nota {chave_nfe} marcada como CANCELADA pelo nome do arquivo.")
-            except Exception as e:
-                pass
+            # Verificar se é uma nota fiscal
+            if analise['tipo'] == 'NFE' and analise['chave']:
+                chave_nfe = analise['chave']
+                cancelamentos[chave_nfe] = 'CANCELADO'
+                print(f"Nota {chave_nfe} marcada como CANCELADA pelo nome do arquivo.")
     
     # Terceiro passo: verificar notas fiscais que estão marcadas como canceladas em seu conteúdo
     print("Verificando notas com status de cancelamento no conteúdo...")
@@ -416,36 +473,27 @@ def processar_xmls(diretorio):
     
     # Processar arquivos de notas fiscais
     print("Processando notas fiscais...")
-    for arquivo in arquivos_xml:
-        try:
-            # Analisar o XML
-            tree = ET.parse(arquivo)
-            root = tree.getroot()
+    for analise in analises:
+        # Verificar se é uma nota fiscal
+        if analise['tipo'] == 'NFE':
+            itens_nfe = analise['itens']
             
-            # Verificar se é uma nota fiscal
-            if determinar_tipo_xml(root) == 'NFE':
-                # Extrair dados da nota
-                itens_nfe = extrair_dados_nfe(root)
+            if itens_nfe:
+                count_notas += 1
+                count_itens += len(itens_nfe)
                 
-                if itens_nfe:
-                    count_notas += 1
-                    count_itens += len(itens_nfe)
-                    
-                    # Verificar se a nota foi cancelada
-                    chave_nfe = itens_nfe[0]["ChaveNFe"]
-                    if chave_nfe in cancelamentos:
-                        # Atualizar status de todos os itens da nota
-                        for item in itens_nfe:
-                            item["Status"] = "CANCELADO"
-                        count_canceladas += 1
-                    else:
-                        count_ativas += 1
-                    
-                    # Adicionar itens à lista de dados
-                    dados.extend(itens_nfe)
-        except Exception as e:
-            # print(f"Erro ao processar a nota {arquivo}: {e}")
-            pass
+                # Verificar se a nota foi cancelada
+                chave_nfe = itens_nfe[0]["ChaveNFe"]
+                if chave_nfe in cancelamentos:
+                    # Atualizar status de todos os itens da nota
+                    for item in itens_nfe:
+                        item["Status"] = "CANCELADO"
+                    count_canceladas += 1
+                else:
+                    count_ativas += 1
+                
+                # Adicionar itens à lista de dados
+                dados.extend(itens_nfe)
     
     # Calcular tempo de processamento
     tempo_fim = time.time()
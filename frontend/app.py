@@ -11,10 +11,11 @@ Funcionalidades:
 - Visualizações interativas
 """
 
-import os
 import json
 import zipfile
 import tempfile
+import uuid
+import threading
 from datetime import datetime
 from pathlib import Path
 import shutil
@@ -25,7 +26,11 @@ from werkzeug.utils import secure_filename
 # Importar módulos do sistema existente
 import sys
 sys.path.append('/Users/mcplara/Desktop/MOTOR_NOTAS_LIMPO 2/application')
-from parser import processar_xmls, calcular_creditos
+from parser import listar_xmls_zip, processar_lote_zip, executar_lotes, calcular_creditos
+from core.domain.tabelas import aquecer_tabelas
+from core.domain.tabela_itens import TabelaItens
+from core.infrastructure.repositorio_resultados import RepositorioResultados
+from jobs import JobQueue
 
 app = Flask(__name__)
 app.secret_key = 'motor_notas_secret_key_2025'
@@ -37,31 +42,49 @@ UPLOAD_FOLDER = BASE_DIR / 'frontend' / 'uploads'
 RESULTS_FOLDER = BASE_DIR / 'frontend' / 'results'
 ALLOWED_EXTENSIONS = {'zip', 'pdf', 'json'}
 
+# Sessões por página no histórico
+HISTORICO_POR_PAGINA = 20
+
+# Itens por página no dashboard (e máximo aceito pela API)
+ITENS_POR_PAGINA = 50
+MAX_ITENS_POR_PAGINA = 500
+
+# Processamento em segundo plano: jobs simultâneos, processos de parsing por
+# job (1 = na própria thread do job) e XMLs por lote (granularidade do progresso)
+JOB_WORKERS = 2
+PARSE_WORKERS = 1
+PARSE_BATCH_SIZE = 64
+
+# Carregar tabelas de referência (SELIC, NCMs) uma vez na inicialização
+aquecer_tabelas()
+
 # Criar diretórios necessários
 UPLOAD_FOLDER.mkdir(exist_ok=True)
 RESULTS_FOLDER.mkdir(exist_ok=True)
 
+# Fila local de jobs (uploads são processados fora da thread da requisição)
+job_queue = JobQueue(max_workers=JOB_WORKERS)
+
+# Pool de processos de parsing (PARSE_WORKERS > 1), aberto uma vez para todos os jobs
+_pool_parsing = None
+_lock_pool_parsing = threading.Lock()
+
+# Repositório de resultados (resumos indexados + resultado completo comprimido);
+# resultados antigos gravados como JSON são importados uma única vez
+results_store = RepositorioResultados(RESULTS_FOLDER / 'resultados.sqlite')
+results_store.importar_diretorio(RESULTS_FOLDER)
+
 def allowed_file(filename, extensions=None):
     if extensions is None:
         extensions = ALLOWED_EXTENSIONS
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in extensions
 
-def extract_zip_files(zip_path, extract_to):
-    """Extrai arquivos ZIP e organiza XMLs"""
+def list_zip_xml_members(zip_path):
+    """Lista os XMLs do ZIP (inclusive em subpastas) sem extrair nada para o disco"""
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(extract_to)
-        
-        # Encontrar todos os XMLs recursivamente
-        xml_files = []
-        for root, dirs, files in os.walk(extract_to):
-            for file in files:
-                if file.lower().endswith('.xml'):
-                    xml_files.append(os.path.join(root, file))
-        
-        return xml_files
-    except Exception as e:
-        raise Exception(f"Erro ao extrair ZIP: {str(e)}")
+        return listar_xmls_zip(zip_path)
+    except zipfile.BadZipFile as e:
+        raise Exception(f"Erro ao ler ZIP: {str(e)}")
 
 def processar_pgdas_pdf(pdf_path):
     """Processa arquivo PDF do PGDAS e extrai dados estruturados"""
@@ -86,9 +109,80 @@ def index():
     """Página principal"""
     return render_template('index.html')
 
+def obter_pool_parsing(workers=PARSE_WORKERS):
+    """Pool de processos de parsing compartilhado por todos os jobs, criado no
+    primeiro uso (None quando o parsing roda na própria thread do job)"""
+    global _pool_parsing
+    if workers == 1:
+        return None
+    with _lock_pool_parsing:
+        if _pool_parsing is None:
+            from concurrent.futures import ProcessPoolExecutor
+            # Cada processo carrega as tabelas de referência uma única vez e abre o ZIP por conta própria
+            _pool_parsing = ProcessPoolExecutor(max_workers=workers or None, initializer=aquecer_tabelas)
+        return _pool_parsing
+
+def parse_xml_members(xml_members, job, workers=PARSE_WORKERS):
+    """Parseia os XMLs direto dos membros do ZIP, em lotes, publicando o progresso no job"""
+    def registrar(resultado_lote):
+        validas = sum(1 for nota in resultado_lote if nota)
+        job.registrar_processados(validas, len(resultado_lote) - validas)
+    
+    resultados_lotes = executar_lotes(processar_lote_zip, xml_members, workers=workers,
+                                      tamanho_lote=PARSE_BATCH_SIZE, ao_concluir_lote=registrar,
+                                      executor=obter_pool_parsing(workers))
+    return [nota for resultado_lote in resultados_lotes for nota in resultado_lote if nota]
+
+def process_upload(job, session_id, timestamp, xml_zip_path, pgdas_pdf_path, periodo, nomes_arquivos, cliente=''):
+    """Job de processamento de um upload: leitura do ZIP, parsing, créditos e resultado"""
+    # Listar XMLs do ZIP (membros filtrados pelo nome, sem descompactar)
+    job.definir_etapa('Lendo ZIP')
+    xml_members = list_zip_xml_members(xml_zip_path)
+    job.registrar_vistos(len(xml_members))
+    
+    if not xml_members:
+        job.falhar('Nenhum arquivo XML encontrado no ZIP')
+        return
+    
+    # Processar XMLs
+    job.definir_etapa(f'Processando {len(xml_members)} XMLs')
+    notas = parse_xml_members(xml_members, job)
+    
+    if not notas:
+        job.falhar('Nenhuma nota fiscal válida encontrada')
+        return
+    
+    # Processar PGDAS (simulado por enquanto)
+    job.definir_etapa('Calculando créditos')
+    dados_pgdas = processar_pgdas_pdf(pgdas_pdf_path)
+    
+    # Calcular créditos (a tabela de itens também alimenta a listagem do dashboard)
+    tabela = TabelaItens.de_notas(notas)
+    resultados = calcular_creditos(tabela, dados_pgdas)
+    
+    # Salvar resultados, séries dos gráficos e itens no repositório
+    results_store.salvar({
+        'periodo': periodo,
+        'session_id': session_id,
+        'timestamp': timestamp,
+        'cliente': cliente,
+        'arquivos': {
+            'xml_zip': nomes_arquivos['xml_zip'],
+            'pgdas_pdf': nomes_arquivos['pgdas_pdf'],
+            'qtd_xmls': len(xml_members)
+        },
+        'resultados': resultados
+    }, itens=tabela)
+    
+    job.concluir(session_id)
+
+def wants_json():
+    """Cliente da API (fetch/XHR) prefere JSON a HTML"""
+    return request.accept_mimetypes.best == 'application/json'
+
 @app.route('/upload', methods=['POST'])
 def upload_files():
-    """Endpoint para upload dos arquivos"""
+    """Endpoint para upload dos arquivos: salva, enfileira o job e responde imediatamente"""
     try:
         # Verificar se os arquivos foram enviados
         if 'xml_zip' not in request.files or 'pgdas_pdf' not in request.files:
@@ -98,6 +192,7 @@ def upload_files():
         xml_zip = request.files['xml_zip']
         pgdas_pdf = request.files['pgdas_pdf']
         periodo = request.form.get('periodo', datetime.now().strftime('%Y-%m'))
+        cliente = request.form.get('cliente', '').strip()
         
         if xml_zip.filename == '' or pgdas_pdf.filename == '':
             flash('Selecione ambos os arquivos')
@@ -107,81 +202,74 @@ def upload_files():
             flash('Tipos de arquivo inválidos. Use ZIP para XMLs e PDF para PGDAS')
             return redirect(url_for('index'))
         
-        # Criar diretório para este processamento
+        # Criar diretório para este processamento: uploads no mesmo segundo
+        # rodam em jobs paralelos, então a sessão leva um sufixo único
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        session_dir = UPLOAD_FOLDER / f'session_{timestamp}'
-        session_dir.mkdir(exist_ok=True)
+        session_id = f'{timestamp}_{uuid.uuid4().hex[:8]}'
+        session_dir = UPLOAD_FOLDER / f'session_{session_id}'
+        session_dir.mkdir()
         
-        # Salvar arquivos
+        # Salvar arquivos (o stream do upload só é válido durante a requisição)
         xml_zip_path = session_dir / secure_filename(xml_zip.filename)
         pgdas_pdf_path = session_dir / secure_filename(pgdas_pdf.filename)
         
         xml_zip.save(xml_zip_path)
         pgdas_pdf.save(pgdas_pdf_path)
         
-        # Extrair XMLs
-        xml_extract_dir = session_dir / 'xmls'
-        xml_extract_dir.mkdir(exist_ok=True)
-        xml_files = extract_zip_files(xml_zip_path, xml_extract_dir)
-        
-        if not xml_files:
-            flash('Nenhum arquivo XML encontrado no ZIP')
-            return redirect(url_for('index'))
-        
-        # Processar arquivos
-        flash(f'Processando {len(xml_files)} XMLs e PGDAS...')
-        
-        # Processar XMLs
-        notas = processar_xmls(str(xml_extract_dir))
-        
-        if not notas:
-            flash('Nenhuma nota fiscal válida encontrada')
-            return redirect(url_for('index'))
-        
-        # Processar PGDAS (simulado por enquanto)
-        dados_pgdas = processar_pgdas_pdf(pgdas_pdf_path)
-        
-        # Calcular créditos
-        resultados = calcular_creditos(notas, dados_pgdas)
+        # Enfileirar processamento
+        job = job_queue.submit(
+            process_upload, session_id, timestamp, xml_zip_path, pgdas_pdf_path, periodo,
+            {'xml_zip': xml_zip.filename, 'pgdas_pdf': pgdas_pdf.filename}, cliente,
+            descricao=f'{xml_zip.filename} ({periodo})'
+        )
         
-        # Salvar resultados
-        resultado_path = RESULTS_FOLDER / f'resultado_{timestamp}.json'
-        with open(resultado_path, 'w', encoding='utf-8') as f:
-            json.dump({
-                'periodo': periodo,
-                'timestamp': timestamp,
-                'arquivos': {
-                    'xml_zip': xml_zip.filename,
-                    'pgdas_pdf': pgdas_pdf.filename,
-                    'qtd_xmls': len(xml_files)
-                },
-                'resultados': resultados
-            }, f, indent=2, ensure_ascii=False)
-        
-        return redirect(url_for('dashboard', session_id=timestamp))
+        if wants_json():
+            return jsonify({'job_id': job.id, 'status_url': url_for('api_job', job_id=job.id)}), 202
+        return redirect(url_for('job_status', job_id=job.id))
         
     except Exception as e:
         flash(f'Erro no processamento: {str(e)}')
         return redirect(url_for('index'))
 
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Página de acompanhamento do processamento (redireciona ao dashboard no fim)"""
+    job = job_queue.get(job_id)
+    if job is None:
+        flash('Processamento não encontrado')
+        return redirect(url_for('index'))
+    
+    return render_template('processando.html', job=job.to_dict())
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API de progresso do job: arquivos vistos, processados, com falha e ETA"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+    
+    dados = job.to_dict()
+    if dados['session_id']:
+        dados['dashboard_url'] = url_for('dashboard', session_id=dados['session_id'])
+    return jsonify(dados)
+
 @app.route('/dashboard/<session_id>')
 def dashboard(session_id):
     """Dashboard com resultados do processamento"""
     try:
-        resultado_path = RESULTS_FOLDER / f'resultado_{session_id}.json'
+        # Só totais e métricas: gráficos e itens são buscados pela API paginada
+        dados = results_store.carregar(session_id, detalhamento=False)
         
-        if not resultado_path.exists():
+        if dados is None:
             flash('Sessão não encontrada')
             return redirect(url_for('index'))
         
-        with open(resultado_path, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
-        
         resultados = dados['resultados']
         
         return render_template('dashboard.html', 
                              dados=dados, 
-                             resultados=resultados)
+                             resultados=resultados,
+                             session_id=session_id)
         
     except Exception as e:
         flash(f'Erro ao carregar dashboard: {str(e)}')
@@ -191,44 +279,113 @@ def dashboard(session_id):
 def api_resultados(session_id):
     """API endpoint para dados do dashboard"""
     try:
-        resultado_path = RESULTS_FOLDER / f'resultado_{session_id}.json'
+        dados = results_store.carregar(session_id)
         
-        if not resultado_path.exists():
+        if dados is None:
             return jsonify({'error': 'Sessão não encontrada'}), 404
         
-        with open(resultado_path, 'r', encoding='utf-8') as f:
-            dados = json.load(f)
-        
         return jsonify(dados)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/resultados/<session_id>/series/<nome>')
+def api_serie(session_id, nome):
+    """API de série pré-agregada para gráficos (tipo_produto, tributos, ncm, cfop, dia...)"""
+    try:
+        limite = request.args.get('limite', type=int)
+        serie = results_store.serie(session_id, nome, limite)
+        
+        if serie is None:
+            return jsonify({'error': 'Série não encontrada'}), 404
+        
+        return jsonify({'serie': nome, 'dados': serie})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def item_filters():
+    """Filtros da listagem de itens a partir da query string"""
+    filtros = {campo: request.args.get(campo, '').strip() or None
+               for campo in ('ncm', 'cfop', 'cst', 'emitente', 'dia', 'busca')}
+    monofasico = request.args.get('monofasico', '').strip().lower()
+    filtros['monofasico'] = {'1': True, 'true': True, '0': False, 'false': False}.get(monofasico)
+    return filtros
+
+@app.route('/api/resultados/<session_id>/itens')
+def api_itens(session_id):
+    """API paginada, ordenável e filtrável dos itens da sessão"""
+    try:
+        if results_store.resumo(session_id) is None:
+            return jsonify({'error': 'Sessão não encontrada'}), 404
+        
+        pagina = max(1, request.args.get('pagina', 1, type=int))
+        por_pagina = min(max(1, request.args.get('por_pagina', ITENS_POR_PAGINA, type=int)), MAX_ITENS_POR_PAGINA)
+        ordenar = request.args.get('ordenar', 'valor_total')
+        decrescente = request.args.get('ordem', 'desc').lower() != 'asc'
+        itens, total = results_store.listar_itens(
+            session_id, item_filters(), ordenar=ordenar, decrescente=decrescente,
+            pagina=pagina, por_pagina=por_pagina
+        )
+        
+        return jsonify({
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total': total,
+            'itens': itens
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def history_filters():
+    """Filtros e página do histórico a partir da query string"""
+    return {
+        'periodo': request.args.get('periodo', '').strip() or None,
+        'cliente': request.args.get('cliente', '').strip() or None,
+        'data_inicial': request.args.get('data_inicial', '').strip() or None,
+        'data_final': request.args.get('data_final', '').strip() or None
+    }
+
+@app.route('/api/resultados')
+def api_lista_resultados():
+    """API paginada e filtrável das sessões (apenas metadados e métricas-resumo)"""
+    try:
+        pagina = request.args.get('pagina', 1, type=int)
+        por_pagina = min(request.args.get('por_pagina', HISTORICO_POR_PAGINA, type=int), 200)
+        sessoes, total = results_store.listar(pagina=pagina, por_pagina=por_pagina, **history_filters())
+        
+        return jsonify({
+            'pagina': pagina,
+            'por_pagina': por_pagina,
+            'total': total,
+            'sessoes': sessoes
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/historico')
 def historico():
-    """Página com histórico de processamentos"""
+    """Página com histórico de processamentos (paginado e filtrável)"""
     try:
+        filtros = history_filters()
+        pagina = max(1, request.args.get('pagina', 1, type=int))
+        sessoes, total = results_store.listar(pagina=pagina, por_pagina=HISTORICO_POR_PAGINA, **filtros)
+        
         resultados = []
+        for sessao in sessoes:
+            sessao['data_processamento'] = datetime.fromisoformat(sessao['data_processamento'])
+            resultados.append(sessao)
         
-        for arquivo in RESULTS_FOLDER.glob('resultado_*.json'):
-            try:
-                with open(arquivo, 'r', encoding='utf-8') as f:
-                    dados = json.load(f)
-                
-                resultados.append({
-                    'session_id': dados['timestamp'],
-                    'periodo': dados.get('periodo', 'N/A'),
-                    'data_processamento': datetime.strptime(dados['timestamp'], '%Y%m%d_%H%M%S'),
-                    'qtd_xmls': dados['arquivos']['qtd_xmls'],
-                    'credito_total': dados['resultados']['creditos']['total']
-                })
-            except Exception:
-                continue
-        
-        # Ordenar por data (mais recente primeiro)
-        resultados.sort(key=lambda x: x['data_processamento'], reverse=True)
-        
-        return render_template('historico.html', resultados=resultados)
+        total_paginas = max(1, -(-total // HISTORICO_POR_PAGINA))
+        return render_template('historico.html',
+                               resultados=resultados,
+                               filtros={chave: valor or '' for chave, valor in filtros.items()},
+                               periodos=results_store.periodos(),
+                               pagina=pagina,
+                               total_paginas=total_paginas,
+                               total=total)
         
     except Exception as e:
         flash(f'Erro ao carregar histórico: {str(e)}')
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Fila de Jobs do Frontend - Motor de Notas
+Processamentos longos (upload de ZIP com milhares de XMLs) rodam em um pool
+local de threads, fora da thread da requisição HTTP. Não há broker externo:
+o estado dos jobs fica em memória no processo do servidor e é consultado
+por /api/jobs/<id>.
+"""
+
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Estados de um job
+STATUS_PENDENTE = 'pendente'
+STATUS_PROCESSANDO = 'processando'
+STATUS_CONCLUIDO = 'concluido'
+STATUS_ERRO = 'erro'
+
+# Jobs finalizados ficam disponíveis para consulta por este tempo (segundos)
+RETENCAO_JOBS = 24 * 60 * 60
+
+class Job:
+    """Estado e progresso de um processamento em segundo plano"""
+
+    def __init__(self, descricao=''):
+        self.id = uuid.uuid4().hex
+        self.descricao = descricao
+        self.status = STATUS_PENDENTE
+        self.etapa = 'Aguardando na fila'
+        self.arquivos_vistos = 0
+        self.arquivos_processados = 0
+        self.arquivos_com_falha = 0
+        self.session_id = None
+        self.erro = None
+        self.criado_em = time.time()
+        self.iniciado_em = None
+        self.finalizado_em = None
+        self._lock = threading.Lock()
+
+    def iniciar(self, etapa='Processando'):
+        with self._lock:
+            self.status = STATUS_PROCESSANDO
+            self.etapa = etapa
+            self.iniciado_em = time.time()
+
+    def definir_etapa(self, etapa):
+        with self._lock:
+            self.etapa = etapa
+
+    def registrar_vistos(self, quantidade=1):
+        """Arquivos encontrados na entrada (ainda não processados)"""
+        with self._lock:
+            self.arquivos_vistos += quantidade
+
+    def registrar_processados(self, processados=0, falhas=0):
+        """Arquivos já parseados, com nota válida ou com falha"""
+        with self._lock:
+            self.arquivos_processados += processados
+            self.arquivos_com_falha += falhas
+
+    def concluir(self, session_id):
+        with self._lock:
+            self.status = STATUS_CONCLUIDO
+            self.etapa = 'Concluído'
+            self.session_id = session_id
+            self.finalizado_em = time.time()
+
+    def falhar(self, mensagem):
+        with self._lock:
+            self.status = STATUS_ERRO
+            self.etapa = 'Erro'
+            self.erro = mensagem
+            self.finalizado_em = time.time()
+
+    @property
+    def finalizado(self):
+        return self.status in (STATUS_CONCLUIDO, STATUS_ERRO)
+
+    def eta_segundos(self):
+        """Tempo restante estimado pela vazão observada (None se indisponível)"""
+        concluidos = self.arquivos_processados + self.arquivos_com_falha
+        if self.status != STATUS_PROCESSANDO or not concluidos or not self.iniciado_em:
+            return None
+        restantes = max(0, self.arquivos_vistos - concluidos)
+        return (time.time() - self.iniciado_em) / concluidos * restantes
+
+    def to_dict(self):
+        with self._lock:
+            concluidos = self.arquivos_processados + self.arquivos_com_falha
+            eta = self.eta_segundos()
+            return {
+                'id': self.id,
+                'descricao': self.descricao,
+                'status': self.status,
+                'etapa': self.etapa,
+                'arquivos': {
+                    'vistos': self.arquivos_vistos,
+                    'processados': self.arquivos_processados,
+                    'com_falha': self.arquivos_com_falha
+                },
+                'progresso': round(100 * concluidos / self.arquivos_vistos, 1) if self.arquivos_vistos else 0,
+                'eta_segundos': round(eta, 1) if eta is not None else None,
+                'session_id': self.session_id,
+                'erro': self.erro
+            }
+
+class JobQueue:
+    """
+    Fila de jobs executados por um pool local de threads
+    A função do job recebe o Job como primeiro argumento para publicar progresso.
+    """
+
+    def __init__(self, max_workers=2, retencao=RETENCAO_JOBS):
+        self.retencao = retencao
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='motor-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, funcao, *args, descricao='', **kwargs):
+        """Enfileira a função e retorna o Job imediatamente"""
+        job = Job(descricao)
+        with self._lock:
+            self._remover_expirados()
+            self._jobs[job.id] = job
+        self._executor.submit(self._executar, job, funcao, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _executar(self, job, funcao, args, kwargs):
+        job.iniciar()
+        try:
+            funcao(job, *args, **kwargs)
+        except Exception as e:
+            job.falhar(str(e))
+            return
+        if not job.finalizado:
+            job.falhar('Job encerrado sem resultado')
+
+    def _remover_expirados(self):
+        limite = time.time() - self.retencao
+        expirados = [job_id for job_id, job in self._jobs.items()
+                     if job.finalizado and job.finalizado_em < limite]
+        for job_id in expirados:
+            del self._jobs[job_id]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Benchmark do backend de centavos (inteiros) contra Decimal e float
+Soma vProd, vDesc, vPIS e vCOFINS de um corpus de XMLs (total e por NCM)
+e confere que o resultado em centavos é idêntico ao Decimal.
+
+Uso:
+    python scripts/benchmark_centavos.py --xmls data/xmls/2025-03
+    python scripts/benchmark_centavos.py --sintetico 1000000
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+from core.domain.centavos import converter_coluna, para_decimal, CASAS_VALOR
+
+CAMPOS = ('vProd', 'vDesc', 'vPIS', 'vCOFINS')
+
+_RE_DET = re.compile(rb'<(?:\w+:)?det\b.*?</(?:\w+:)?det>', re.S)
+_RE_NCM = re.compile(rb'<(?:\w+:)?NCM>([^<]*)<')
+_RE_CAMPOS = {campo: re.compile(rb'<(?:\w+:)?' + campo.encode() + rb'>([^<]*)<') for campo in CAMPOS}
+
+# Função para ler o corpus: uma linha por item com NCM e textos dos valores
+def ler_corpus_xmls(diretorio):
+    linhas = []
+    for raiz, _, arquivos in os.walk(diretorio):
+        for arquivo in sorted(arquivos):
+            if not arquivo.endswith('.xml'):
+                continue
+            with open(os.path.join(raiz, arquivo), 'rb') as f:
+                conteudo = f.read()
+            for det in _RE_DET.finditer(conteudo):
+                bloco = det.group(0)
+                ncm = _RE_NCM.search(bloco)
+                valores = []
+                for campo in CAMPOS:
+                    encontrado = _RE_CAMPOS[campo].search(bloco)
+                    valores.append(encontrado.group(1).decode('ascii').strip() if encontrado else "0")
+                linhas.append((ncm.group(1).decode('ascii') if ncm else "", *valores))
+    return linhas
+
+# Função para gerar corpus sintético reprodutível
+def gerar_corpus_sintetico(quantidade, semente=42):
+    aleatorio = random.Random(semente)
+    ncms = [f"{aleatorio.randrange(10**7, 10**8)}" for _ in range(300)]
+    linhas = []
+    for _ in range(quantidade):
+        vprod = aleatorio.randrange(1, 5_000_000)
+        vdesc = aleatorio.randrange(0, vprod // 10 + 1)
+        linhas.append((
+            aleatorio.choice(ncms),
+            f"{vprod // 100}.{vprod % 100:02d}",
+            f"{vdesc // 100}.{vdesc % 100:02d}",
+            f"{vprod * 165 // 10000 / 100:.2f}",
+            f"{vprod * 760 // 10000 / 100:.2f}"
+        ))
+    return linhas
+
+# Cada backend: conversão (texto -> representação, uma vez por carga) e
+# agregação (totais por campo e vProd por NCM, repetida a cada relatório)
+def converter_decimal(colunas):
+    return [list(map(Decimal, textos)) for textos in colunas]
+
+def converter_float(colunas):
+    return [list(map(float, textos)) for textos in colunas]
+
+def converter_centavos(colunas):
+    return [converter_coluna(textos, CASAS_VALOR) for textos in colunas]
+
+def agregar(colunas_convertidas, ncms, zero):
+    totais = [sum(coluna, zero) for coluna in colunas_convertidas]
+    por_ncm = {}
+    for ncm, valor in zip(ncms, colunas_convertidas[0]):
+        por_ncm[ncm] = por_ncm.get(ncm, zero) + valor
+    return totais, por_ncm
+
+# Backends: nome, conversor e zero da soma
+BACKENDS = (
+    ('Decimal', converter_decimal, Decimal('0')),
+    ('float', converter_float, 0.0),
+    ('centavos', converter_centavos, 0)
+)
+
+def cronometrar(funcao, *argumentos):
+    inicio = time.perf_counter()
+    resultado = funcao(*argumentos)
+    return time.perf_counter() - inicio, resultado
+
+# Função para medir os backends alternados a cada repetição (melhor tempo de cada um):
+# oscilações da máquina atingem todos igualmente, em vez de só o que roda por último
+def medir_backends(colunas, ncms, repeticoes):
+    tempos = {nome: [float('inf'), float('inf')] for nome, _, _ in BACKENDS}
+    resultados = {}
+    for _ in range(repeticoes):
+        for nome, conversor, zero in BACKENDS:
+            resultados.pop(nome, None)
+            tempo_conversao, convertidas = cronometrar(conversor, colunas)
+            tempo_agregacao, resultados[nome] = cronometrar(agregar, convertidas, ncms, zero)
+            del convertidas
+            tempos[nome][0] = min(tempos[nome][0], tempo_conversao)
+            tempos[nome][1] = min(tempos[nome][1], tempo_agregacao)
+    return tempos, resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark centavos x Decimal x float")
+    parser.add_argument('--xmls', type=str, default=None, help='Diretório do corpus de XMLs (golden corpus)')
+    parser.add_argument('--sintetico', type=int, default=200000, help='Quantidade de itens sintéticos (sem --xmls)')
+    parser.add_argument('--repeticoes', type=int, default=5, help='Repetições por backend (melhor tempo)')
+    args = parser.parse_args()
+
+    if args.xmls:
+        print(f"📁 Lendo corpus: {args.xmls}")
+        linhas = ler_corpus_xmls(args.xmls)
+    else:
+        print(f"🎲 Corpus sintético: {args.sintetico} itens")
+        linhas = gerar_corpus_sintetico(args.sintetico)
+
+    if not linhas:
+        print("❌ Nenhum item encontrado")
+        return 1
+
+    ncms = [linha[0] for linha in linhas]
+    colunas = [[linha[indice] for linha in linhas] for indice in range(1, len(CAMPOS) + 1)]
+    
+    tempos, resultados = medir_backends(colunas, ncms, args.repeticoes)
+    
+    totais_decimal, ncm_decimal = resultados['Decimal']
+    totais_centavos, ncm_centavos = resultados['centavos']
+    ncm_float = resultados['float'][1]
+    
+    # Centavos deve reproduzir o Decimal exatamente, total a total e NCM a NCM
+    divergencias = [
+        campo for campo, centavos, decimal in zip(CAMPOS, totais_centavos, totais_decimal)
+        if para_decimal(centavos) != decimal
+    ]
+    divergencias += [
+        ncm for ncm, decimal in ncm_decimal.items()
+        if para_decimal(ncm_centavos.get(ncm, 0)) != decimal
+    ]
+    desvios_float = sum(
+        1 for ncm, decimal in ncm_decimal.items()
+        if Decimal(repr(ncm_float[ncm])) != decimal
+    )
+
+    print(f"\n📊 {len(linhas)} itens, {len(ncm_decimal)} NCMs (melhor de {args.repeticoes})")
+    print(f"   {'backend':<10}{'conversão':>12}{'agregação':>12}{'total':>10}")
+    for nome, (conversao, agregacao) in tempos.items():
+        print(f"   {nome:<10}{conversao:>11.3f}s{agregacao:>11.3f}s{conversao + agregacao:>9.3f}s")
+    
+    decimal_total = sum(tempos['Decimal'])
+    centavos_total = sum(tempos['centavos'])
+    print(f"\n   centavos x Decimal: {tempos['Decimal'][1] / tempos['centavos'][1]:.2f}x na agregação, "
+          f"{decimal_total / centavos_total:.2f}x no total")
+    print(f"   float: {desvios_float} totais por NCM diferentes do Decimal")
+    for campo, centavos in zip(CAMPOS, totais_centavos):
+        print(f"   Σ {campo}: {para_decimal(centavos)}")
+
+    if divergencias:
+        print(f"\n❌ Centavos diverge do Decimal em: {divergencias[:10]}")
+        return 1
+
+    print("\n✅ Totais em centavos idênticos ao Decimal")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
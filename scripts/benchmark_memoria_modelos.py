@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Benchmark de memória dos modelos do parser híbrido
+Monta notas com itens sintéticos (campos preenchidos como no parser: um
+objeto str/Decimal novo por campo) e mede os bytes alocados por item com
+tracemalloc. Para comparar com outra versão dos modelos (ex.: checkout
+anterior), informe o arquivo com --modelos-base.
+
+Uso:
+    python scripts/benchmark_memoria_modelos.py --itens 1000000
+    python scripts/benchmark_memoria_modelos.py --modelos-base /tmp/models_antigo.py
+"""
+
+import sys
+import gc
+import random
+import argparse
+import tracemalloc
+import importlib.util
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "parser_hibrido"))
+import models as modelos_atuais
+
+ITENS_POR_NOTA = 20
+
+# Função para carregar um models.py alternativo como módulo isolado
+def carregar_modelos(caminho):
+    especificacao = importlib.util.spec_from_file_location("models_base", caminho)
+    modulo = importlib.util.module_from_spec(especificacao)
+    especificacao.loader.exec_module(modulo)
+    return modulo
+
+# Função para gerar os textos dos campos (bytes, decodificados a cada item como no parser)
+def gerar_amostras(semente=42):
+    aleatorio = random.Random(semente)
+    return {
+        'ncm': [f"{aleatorio.randrange(10**7, 10**8)}".encode() for _ in range(2000)],
+        'cfop': [c.encode() for c in ("5102", "5405", "6102", "6404", "5949")],
+        'cst': [c.encode() for c in ("01", "04", "06", "49", "99")],
+        'unidade': [u.encode() for u in ("UN", "CX", "KG", "LT", "PC")],
+        'cnpj': [f"{aleatorio.randrange(10**13, 10**14)}".encode() for _ in range(300)],
+        'aleatorio': aleatorio
+    }
+
+# Função para montar as notas com os modelos informados
+def montar_notas(modelos, quantidade_itens, amostras, internar):
+    aleatorio = amostras['aleatorio']
+    internar_codigo = getattr(modelos, 'internar_codigo', None) if internar else None
+    codigo = internar_codigo or (lambda texto: texto)
+
+    notas = []
+    nota = None
+    for indice in range(quantidade_itens):
+        if indice % ITENS_POR_NOTA == 0:
+            nota = modelos.NotaFiscal()
+            nota.numero = str(indice // ITENS_POR_NOTA)
+            nota.serie = b"1".decode()
+            nota.modelo = b"55".decode()
+            nota.emitente_cnpj = codigo(aleatorio.choice(amostras['cnpj']).decode())
+            nota.emitente_nome = b"Empresa Teste Ltda".decode()
+            notas.append(nota)
+
+        item = modelos.ItemNotaFiscal()
+        item.numero = indice % ITENS_POR_NOTA + 1
+        item.codigo = f"P{indice % 5000}"
+        item.descricao = f"Produto {indice % 5000}"
+        item.ncm = codigo(aleatorio.choice(amostras['ncm']).decode())
+        item.cfop = codigo(aleatorio.choice(amostras['cfop']).decode())
+        item.unidade = codigo(aleatorio.choice(amostras['unidade']).decode())
+        cst = aleatorio.choice(amostras['cst'])
+        item.pis_cst = codigo(cst.decode())
+        item.cofins_cst = codigo(cst.decode())
+        item.pis_subgrupo = b"PISAliq".decode()
+        item.cofins_subgrupo = b"COFINSAliq".decode()
+        valor = aleatorio.randrange(1, 100000)
+        item.quantidade = Decimal("1.0000")
+        item.valor_unitario = Decimal(f"{valor // 100}.{valor % 100:02d}")
+        item.valor_bruto = Decimal(f"{valor // 100}.{valor % 100:02d}")
+        item.calcular_valor_total()
+        item.tipo_tributario = "Monofasico" if valor % 3 == 0 else "NaoMonofasico"
+        nota.adicionar_item(item)
+    return notas
+
+# Função para medir bytes por item de uma configuração
+def medir(modelos, quantidade_itens, internar):
+    amostras = gerar_amostras()
+    gc.collect()
+    tracemalloc.start()
+    inicio = tracemalloc.get_traced_memory()[0]
+    notas = montar_notas(modelos, quantidade_itens, amostras, internar)
+    gc.collect()
+    fim = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del notas
+    return (fim - inicio) / quantidade_itens
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memória dos modelos NFe")
+    parser.add_argument('--itens', type=int, default=1000000, help='Quantidade de itens do corpus sintético')
+    parser.add_argument('--modelos-base', type=str, default=None, help='models.py de referência (versão anterior)')
+    args = parser.parse_args()
+
+    print(f"🧪 Corpus sintético: {args.itens} itens ({ITENS_POR_NOTA} por nota)")
+    configuracoes = []
+    if args.modelos_base:
+        configuracoes.append(("base", carregar_modelos(args.modelos_base), False))
+    configuracoes.append(("slots", modelos_atuais, False))
+    configuracoes.append(("slots + internamento", modelos_atuais, True))
+
+    resultados = []
+    for nome, modelos, internar in configuracoes:
+        bytes_item = medir(modelos, args.itens, internar)
+        resultados.append((nome, bytes_item))
+        print(f"   {nome:<22}{bytes_item:>10.0f} B/item   {bytes_item * args.itens / 2**20:>9.1f} MiB")
+
+    referencia = resultados[0][1]
+    melhor = resultados[-1][1]
+    print(f"\n✅ Redução: {referencia / melhor:.2f}x ({resultados[0][0]} → {resultados[-1][0]})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -27,6 +27,11 @@ except ImportError:
     print("Execute: pip install pdfplumber")
     sys.exit(1)
 
+# Registro de tabelas de referência do sistema (src/core/domain)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from core.domain.registro_tabelas import registro_tabelas
+from core.domain.simples_nacional import obter_tabela_anexo
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
@@ -292,36 +297,12 @@ class ExtratorPGDASUniversal:
 
     def calcular_aliquota_apurada(self, rbt12):
         """Calcula a alíquota apurada usando a tabela do Anexo do Simples Nacional"""
-        import json
-        tabela_path = os.path.join(os.path.dirname(__file__), '../src/core/data/tabelas/Anexo do Simples.json')
-        with open(tabela_path, encoding='utf-8') as f:
-            tabela = json.load(f)
-        faixa = None
-        aliquota_nominal = 0.0
-        valor_deduzir = 0.0
-        # Encontrar faixa correta
-        for linha in tabela:
-            if not linha or not isinstance(linha, dict):
-                continue
-            faixa_nome = linha.get('Anexo I', '')
-            faixa_valor = linha.get('Column2', '')
-            if 'Até' in faixa_valor:
-                limite = float(faixa_valor.replace('Até','').replace('.','').replace(',','.').strip())
-                if rbt12 <= limite:
-                    aliquota_nominal = float(linha['Column3'])
-                    valor_deduzir = 0.0 if linha['Column4'] == '-' else float(linha['Column4'])
-                    break
-            elif 'a' in faixa_valor:
-                partes = faixa_valor.replace('De','').split('a')
-                min_ = float(partes[0].replace('.','').replace(',','.').strip())
-                max_ = float(partes[1].replace('.','').replace(',','.').strip())
-                if min_ < rbt12 <= max_:
-                    aliquota_nominal = float(linha['Column3'])
-                    valor_deduzir = float(linha['Column4'])
-                    break
-        if aliquota_nominal == 0.0:
-            return 0.0
-        return ((rbt12 * aliquota_nominal) - valor_deduzir) / rbt12
+        tabela_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../src/core/data/tabelas/Anexo do Simples.json')
+        # Tabela compilada uma vez pelo registro; sem o arquivo, usa o Anexo I oficial
+        tabela = registro_tabelas.tabela_anexo_simples(os.path.normpath(tabela_path)) or obter_tabela_anexo(1)
+        # Faixa localizada por busca binária
+        aliquota_apurada = tabela.aliquota_efetiva(rbt12)
+        return aliquota_apurada if aliquota_apurada is not None else 0.0
 
     def processar_pdf(self, caminho_pdf):
         """Processa um único PDF"""
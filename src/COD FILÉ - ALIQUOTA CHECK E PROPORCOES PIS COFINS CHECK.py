@@ -1,6 +1,10 @@
 import os
 import json
 import xml.etree.ElementTree as ET
+from core.domain.simples_nacional import TabelaAnexo
+from core.domain.centavos import para_centavos, para_float
+from core.domain.tabela_itens import TabelaItens
+from core.domain.motor_creditos import calcular_creditos_tabela
 
 # Diretórios e arquivos - CORRIGIDO PARA 2022
 DIR_XMLS = "/Users/mcplara/Desktop/MOTOR NOTAS ORGANIZADAS/data/xmls/2025-03"
@@ -51,6 +55,36 @@ def carregar_anexo_simples():
         print(f"⚠️ ERRO ao carregar Anexo do Simples: {str(e)}")
         return None
 
+# Anexo I compilado da última tabela carregada: (dados JSON, tabela, números das faixas)
+# A referência aos dados mantém a identidade válida enquanto o cache existir
+_anexo_compilado = None
+
+def compilar_anexo_1(anexo_simples_data):
+    """
+    Compila as faixas do Anexo I uma única vez por JSON carregado.
+    Retorna a TabelaAnexo (busca binária) e o número de cada faixa pelo limite superior.
+    """
+    global _anexo_compilado
+    if _anexo_compilado is not None and _anexo_compilado[0] is anexo_simples_data:
+        return _anexo_compilado[1], _anexo_compilado[2]
+    
+    faixas = anexo_simples_data["anexo_1"]
+    numeros_faixas = {
+        faixa.get("receita_bruta_anual_maxima", float('inf')): faixa.get("faixa", "N/A")
+        for faixa in faixas
+    }
+    tabela = TabelaAnexo.de_faixas([
+        (
+            faixa.get("receita_bruta_anual_minima", 0),
+            faixa.get("receita_bruta_anual_maxima", float('inf')),
+            faixa.get("aliquota", 0) / 100,  # Converte para decimal
+            faixa.get("valor_a_deduzir", 0)
+        )
+        for faixa in faixas
+    ])
+    _anexo_compilado = (anexo_simples_data, tabela, numeros_faixas)
+    return tabela, numeros_faixas
+
 def identificar_faixa_tributacao(rbt12, anexo_simples_data):
     """
     Identifica a faixa de tributação baseada na RBT12.
@@ -60,24 +94,22 @@ def identificar_faixa_tributacao(rbt12, anexo_simples_data):
         print("⚠️ ERRO: Dados do Anexo I não encontrados")
         return None, None, None
     
-    faixas = anexo_simples_data["anexo_1"]
+    # Faixas compiladas uma vez; por chamada, só a busca binária
+    tabela, numeros_faixas = compilar_anexo_1(anexo_simples_data)
     
-    for faixa in faixas:
-        limite_inicial = faixa.get("receita_bruta_anual_minima", 0)
-        limite_final = faixa.get("receita_bruta_anual_maxima", float('inf'))
+    faixa = tabela.faixa(rbt12)
+    if faixa is not None and faixa.limite_inferior <= rbt12:
+        faixa_numero = numeros_faixas[faixa.limite_superior]
+        aliquota_nominal = faixa.aliquota_nominal
+        valor_deducao = faixa.valor_deduzir
         
-        if limite_inicial <= rbt12 <= limite_final:
-            faixa_numero = faixa.get("faixa", "N/A")
-            aliquota_nominal = faixa.get("aliquota", 0) / 100  # Converte para decimal
-            valor_deducao = faixa.get("valor_a_deduzir", 0)
-            
-            print(f"🎯 Faixa identificada: {faixa_numero}")
-            print(f"   RBT12: R$ {rbt12:,.2f}")
-            print(f"   Limite: R$ {limite_inicial:,.2f} a R$ {limite_final:,.2f}")
-            print(f"   Alíquota Nominal: {aliquota_nominal*100:.2f}%")
-            print(f"   Valor Dedução: R$ {valor_deducao:,.2f}")
-            
-            return faixa_numero, aliquota_nominal, valor_deducao
+        print(f"🎯 Faixa identificada: {faixa_numero}")
+        print(f"   RBT12: R$ {rbt12:,.2f}")
+        print(f"   Limite: R$ {faixa.limite_inferior:,.2f} a R$ {faixa.limite_superior:,.2f}")
+        print(f"   Alíquota Nominal: {aliquota_nominal*100:.2f}%")
+        print(f"   Valor Dedução: R$ {valor_deducao:,.2f}")
+        
+        return faixa_numero, aliquota_nominal, valor_deducao
     
     print(f"⚠️ ERRO: Faixa não encontrada para RBT12 = R$ {rbt12:,.2f}")
     return None, None, None
@@ -200,18 +232,16 @@ def classificar_produtos_por_ncm():
     print(f"💡 ALÍQUOTA APURADA CALCULADA: {aliquota_apurada*100:.4f}%")
     print(f"   (RBT12: R$ {rbt12:,.2f} × {aliquota_nominal*100}% - R$ {valor_deducao:,.2f}) / R$ {rbt12:,.2f}")
     
-    # Contadores
+    # Itens em colunas; RVM/RVN e detalhamentos saem do motor de créditos
+    tabela = TabelaItens()
     total_itens = 0
-    itens_monofasicos = 0
-    itens_nao_monofasicos = 0
     
     # Listas para armazenar exemplos
     exemplos_monofasicos = []
     exemplos_nao_monofasicos = []
     
     # Totais de receita
-    rvm_total = 0  # Receita de produtos monofásicos
-    rvn_total = 0  # Receita de produtos não-monofásicos
+    # Totais acumulados em centavos (soma exata); convertidos após o laço
     rbv_total = 0  # Receita bruta de vendas (com desconto)
     rbd_total = 0  # Receita bruta sem desconto
     
@@ -247,7 +277,16 @@ def classificar_produtos_por_ncm():
             # Valor total da NF (já considera descontos)
             total_elem = info_nfe.find('.//nfe:total/nfe:ICMSTot/nfe:vNF', ns)
             if total_elem is not None:
-                rbv_total += float(total_elem.text)
+                rbv_total += para_centavos(total_elem.text)
+            
+            # Cabeçalho da nota para o detalhamento por emitente e dia
+            dh_emi = info_nfe.find('.//nfe:ide/nfe:dhEmi', ns)
+            cnpj_emit = info_nfe.find('.//nfe:emit/nfe:CNPJ', ns)
+            indice_nota = tabela.adicionar_nota(
+                info_nfe.get('Id', '')[3:],
+                data_emissao=dh_emi.text[:10] if dh_emi is not None else None,
+                cnpj_emitente=cnpj_emit.text if cnpj_emit is not None else ""
+            )
                 
             # Processar itens
             for det in info_nfe.findall('.//nfe:det', ns):
@@ -263,10 +302,10 @@ def classificar_produtos_por_ncm():
                 descricao = descricao_elem.text if descricao_elem is not None else ""
                 
                 vprod_elem = prod.find('.//nfe:vProd', ns)
-                vprod = float(vprod_elem.text) if vprod_elem is not None else 0
+                vprod = para_centavos(vprod_elem.text) if vprod_elem is not None else 0
                 
                 vdesc_elem = prod.find('.//nfe:vDesc', ns)
-                vdesc = float(vdesc_elem.text) if vdesc_elem is not None else 0
+                vdesc = para_centavos(vdesc_elem.text) if vdesc_elem is not None else 0
                 
                 # Valor líquido do item (vProd - vDesc)
                 valor_liquido = vprod - vdesc
@@ -279,33 +318,39 @@ def classificar_produtos_por_ncm():
                 # Critério: Compare NCM com "Espelho de NCM monofásica"
                 is_monofasico = ncm_text in ncms_monofasicos
                 
+                cfop_elem = prod.find('.//nfe:CFOP', ns)
+                pis_cst = det.find('.//nfe:imposto/nfe:PIS//nfe:CST', ns)
+                cofins_cst = det.find('.//nfe:imposto/nfe:COFINS//nfe:CST', ns)
+                tabela.adicionar_item(
+                    indice_nota, total_itens, "", descricao, ncm_text,
+                    cfop_elem.text if cfop_elem is not None else "",
+                    0, 0, para_float(vprod), para_float(vdesc), para_float(valor_liquido),
+                    pis_cst.text if pis_cst is not None else "", 0,
+                    cofins_cst.text if cofins_cst is not None else "", 0,
+                    monofasico=is_monofasico
+                )
+                
                 if is_monofasico:
                     # Produto MONOFÁSICO
-                    itens_monofasicos += 1
-                    rvm_total += valor_liquido
-                    
                     if len(exemplos_monofasicos) < 5:
                         exemplos_monofasicos.append({
                             "ncm": ncm_text,
                             "descricao": descricao,
-                            "vprod": vprod,
-                            "vdesc": vdesc,
-                            "valor_liquido": valor_liquido,
+                            "vprod": para_float(vprod),
+                            "vdesc": para_float(vdesc),
+                            "valor_liquido": para_float(valor_liquido),
                             "arquivo": arquivo,
                             "classificacao": "MONOFÁSICO (NCM no espelho)"
                         })
                 else:
                     # Produto NÃO-MONOFÁSICO
-                    itens_nao_monofasicos += 1
-                    rvn_total += valor_liquido
-                    
                     if len(exemplos_nao_monofasicos) < 5:
                         exemplos_nao_monofasicos.append({
                             "ncm": ncm_text,
                             "descricao": descricao,
-                            "vprod": vprod,
-                            "vdesc": vdesc,
-                            "valor_liquido": valor_liquido,
+                            "vprod": para_float(vprod),
+                            "vdesc": para_float(vdesc),
+                            "valor_liquido": para_float(valor_liquido),
                             "arquivo": arquivo,
                             "classificacao": "NÃO-MONOFÁSICO (NCM não consta no espelho)"
                         })
@@ -314,6 +359,10 @@ def classificar_produtos_por_ncm():
             print(f"⚠️ Erro ao processar {arquivo}: {str(e)}")
             continue
     
+    # Centavos -> reais para aplicação das alíquotas e relatório
+    rbv_total = para_float(rbv_total)
+    rbd_total = para_float(rbd_total)
+    
     # 💰 CÁLCULO DOS TRIBUTOS CONFORME V12
     print("\n💰 CALCULANDO TRIBUTOS...")
     print(f"📋 METODOLOGIA:")
@@ -331,8 +380,18 @@ def classificar_produtos_por_ncm():
     aliquota_pis_efetiva = aliquota_apurada * pis_prop
     aliquota_cofins_efetiva = aliquota_apurada * cofins_prop
     
-    pis_nao_monofasicos = rvn_total * aliquota_pis_efetiva
-    cofins_nao_monofasicos = rvn_total * aliquota_cofins_efetiva
+    # RVM/RVN, devidos e créditos em uma passada; detalhamento por NCM, CFOP, CST, emitente e dia
+    motor = calcular_creditos_tabela(
+        tabela, aliquota_pis_efetiva, aliquota_cofins_efetiva,
+        tributos_pgdas.get("pis", 0), tributos_pgdas.get("cofins", 0)
+    )
+    rvm_total = motor.rvm  # Receita de produtos monofásicos
+    rvn_total = motor.rvn  # Receita de produtos não-monofásicos
+    itens_monofasicos = motor.itens_monofasicos
+    itens_nao_monofasicos = motor.itens_nao_monofasicos
+    
+    pis_nao_monofasicos = motor.pis_devido
+    cofins_nao_monofasicos = motor.cofins_devido
     
     print(f"\n🧮 CÁLCULO DETALHADO:")
     print(f"   Alíquota Apurada: {aliquota_apurada*100:.4f}%")
@@ -385,7 +444,8 @@ def classificar_produtos_por_ncm():
             "credito_total": credito_total
         },
         "exemplos_monofasicos": exemplos_monofasicos,
-        "exemplos_nao_monofasicos": exemplos_nao_monofasicos
+        "exemplos_nao_monofasicos": exemplos_nao_monofasicos,
+        "detalhamento": motor.detalhamentos()
     }
 
 def main():
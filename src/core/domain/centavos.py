@@ -0,0 +1,152 @@
+from array import array
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from itertools import compress, repeat
+from operator import itemgetter, mul, truediv
+
+# Casas decimais fixas de cada grandeza (leiaute da NFe)
+CASAS_VALOR = 2              # vProd, vDesc, vPIS, vCOFINS, vNF: centavos
+CASAS_QUANTIDADE = 4         # qCom
+CASAS_VALOR_UNITARIO = 10    # vUnCom
+
+# Tipo de array para valores inteiros escalados (int64)
+TIPO_INTEIRO = 'q'
+
+# Magnitude (já escalada) abaixo da qual float * 10**casas fica a menos de
+# meio inteiro do valor exato; vProd (13.2) e qCom (11.4) sempre cabem
+LIMITE_EXATO_FLOAT = 10 ** 15
+
+_POTENCIAS = [10 ** casas for casas in range(19)]
+
+# Função para converter valor (str, int, float ou Decimal) em inteiro escalado
+def para_inteiro(valor, casas=CASAS_VALOR):
+    """
+    Converte valor em inteiro na escala 10**casas. Textos e floats só usam
+    aritmética de float quando o resultado é comprovadamente exato; os demais
+    casos seguem por inteiros/Decimal. Dígitos além da escala são
+    arredondados (ROUND_HALF_UP).
+
+    Returns:
+        int: valor escalado (0 se vazio ou inválido)
+    """
+    classe = valor.__class__
+    if classe is str:
+        # Caminho rápido: até `casas` decimais e magnitude exata em float
+        ponto = valor.find('.')
+        if ponto < 0:
+            ponto = len(valor)
+        if len(valor) - ponto <= casas + 1 and ponto + casas <= 15:
+            try:
+                return _arredondar(float(valor) * _POTENCIAS[casas])
+            except (ValueError, OverflowError):
+                pass
+    elif classe is float:
+        escalado = valor * _POTENCIAS[casas]
+        if -LIMITE_EXATO_FLOAT < escalado < LIMITE_EXATO_FLOAT:
+            return _arredondar(escalado)
+        # repr devolve o decimal mais curto que reproduz o float (ex.: 9.9 -> "9.9")
+        valor = repr(valor)
+    elif classe is int:
+        return valor * _POTENCIAS[casas]
+    elif valor is None:
+        return 0
+    elif isinstance(valor, Decimal):
+        return _decimal_para_inteiro(valor, casas)
+    elif isinstance(valor, int):
+        return int(valor) * _POTENCIAS[casas]
+
+    texto = str(valor).strip().replace(',', '.')
+    if not texto:
+        return 0
+
+    negativo = texto[0] == '-'
+    if texto[0] in '+-':
+        texto = texto[1:]
+
+    inteira, _, fracao = texto.partition('.')
+    if not (inteira.isdigit() or (not inteira and fracao)) or (fracao and not fracao.isdigit()):
+        # Notação científica ou lixo: caminho lento e tolerante
+        try:
+            return _decimal_para_inteiro(Decimal(('-' if negativo else '') + texto), casas)
+        except (InvalidOperation, ValueError):
+            return 0
+
+    resultado = int(inteira or '0') * _POTENCIAS[casas] + int(fracao[:casas].ljust(casas, '0') or '0')
+    if len(fracao) > casas and fracao[casas] >= '5':
+        resultado += 1
+    return -resultado if negativo else resultado
+
+def _arredondar(escalado):
+    # ROUND_HALF_UP (afastando do zero), como no caminho Decimal
+    return int(escalado + 0.5) if escalado >= 0 else -int(0.5 - escalado)
+
+def _decimal_para_inteiro(valor, casas):
+    if not valor.is_finite():
+        return 0
+    return int(valor.scaleb(casas).to_integral_value(rounding=ROUND_HALF_UP))
+
+# Função para converter valor monetário em centavos
+def para_centavos(valor):
+    return para_inteiro(valor, CASAS_VALOR)
+
+# Função para converter uma coluna inteira de textos em array int64 escalado
+def converter_coluna(textos, casas=CASAS_VALOR):
+    """
+    Converte vários textos de uma vez: float, escala e arredondamento rodam
+    em map() sobre funções nativas, sem chamada Python por valor. O resultado
+    só é aceito se for exato para a coluna inteira; caso contrário, cada
+    texto passa por para_inteiro.
+
+    Returns:
+        array: valores escalados (TIPO_INTEIRO), na ordem da entrada
+    """
+    textos = textos if isinstance(textos, list) else list(textos)
+    fator = float(_POTENCIAS[casas])
+    try:
+        if _casas_exatas(textos, casas):
+            # Texto com exatamente `casas` decimais: o float mais próximo, escalado,
+            # fica a menos de meio inteiro do valor, então o arredondamento é exato
+            escalados = list(map(float.__round__, map(mul, map(float, textos), repeat(fator))))
+            if -LIMITE_EXATO_FLOAT < min(escalados) and max(escalados) < LIMITE_EXATO_FLOAT:
+                return array(TIPO_INTEIRO, escalados)
+        else:
+            valores = list(map(float, textos))
+            limite = LIMITE_EXATO_FLOAT / fator
+            if not valores or (-limite < min(valores) and max(valores) < limite):
+                escalados = list(map(float.__round__, map(mul, valores, repeat(fator))))
+                # N / fator == float(texto) com |N| < LIMITE_EXATO_FLOAT: o texto está a
+                # menos de meio inteiro de N na escala, logo N é o arredondamento
+                # ROUND_HALF_UP de para_inteiro (vale também para textos com mais casas)
+                if list(map(truediv, escalados, repeat(fator))) == valores:
+                    return array(TIPO_INTEIRO, escalados)
+    except (ValueError, TypeError, OverflowError):
+        # Texto vazio, vírgula decimal, None, inf/nan: caminho exato por valor
+        pass
+    return array(TIPO_INTEIRO, [para_inteiro(texto, casas) for texto in textos])
+
+# Função para verificar se todos os textos têm o ponto decimal na mesma posição final
+def _casas_exatas(textos, casas):
+    if not textos or casas == 0:
+        return False
+    try:
+        return set(map(itemgetter(-casas - 1), textos)) == {'.'}
+    except (IndexError, TypeError):
+        return False
+
+# Função para converter inteiro escalado em Decimal exato (fronteira de relatório)
+def para_decimal(inteiro, casas=CASAS_VALOR):
+    return Decimal(inteiro).scaleb(-casas)
+
+# Função para converter inteiro escalado em float (JSON e cálculos com alíquotas)
+def para_float(inteiro, casas=CASAS_VALOR):
+    # Divisão de inteiros é arredondada corretamente: 990 / 100 == 9.9
+    return inteiro / _POTENCIAS[casas]
+
+# Função para formatar centavos como texto decimal ("1234.56")
+def formatar_centavos(centavos):
+    sinal = '-' if centavos < 0 else ''
+    inteira, fracao = divmod(abs(centavos), 100)
+    return f"{sinal}{inteira}.{fracao:02d}"
+
+# Função para somar inteiros escalados (soma exata, opcionalmente filtrada por máscara)
+def somar(valores, mascara=None):
+    return sum(valores if mascara is None else compress(valores, mascara))
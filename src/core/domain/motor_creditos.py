@@ -0,0 +1,246 @@
+from array import array
+from decimal import Decimal
+from itertools import compress
+from operator import add, mul, sub
+from core.domain.centavos import para_float, para_decimal, somar
+from core.domain.tabela_itens import TabelaItens, DicionarioCodigos, TIPO_FLAG, TIPO_CODIGO
+
+# Dimensões de detalhamento: colunas codificadas do item e atributos da nota
+DIMENSOES_ITEM = ('ncm', 'cfop', 'pis_cst', 'cofins_cst')
+DIMENSOES_NOTA = ('emitente', 'dia')
+DIMENSOES = DIMENSOES_ITEM + DIMENSOES_NOTA
+
+# Posições das medidas em cada grupo (valores em centavos)
+RVM, RVN, ITENS_MONOFASICOS, ITENS_NAO_MONOFASICOS = range(4)
+
+# Função para montar a máscara de itens válidos de notas não canceladas
+def mascara_ativos(tabela):
+    nota_ativa = [1 - cancelada for cancelada in tabela.nota_cancelada]
+    return array(TIPO_FLAG, map(mul, tabela.valido, map(nota_ativa.__getitem__, tabela.nota)))
+
+class AgregacaoCreditos:
+    """
+    RVM/RVN e contagens agrupadas por dimensão, calculadas direto sobre as
+    colunas da tabela. Cada dimensão é agregada em uma passada pelas linhas
+    (acumuladores em lista indexada pelo código) e guardada; filtros
+    ({dimensão: valores}) viram máscara sobre as linhas, sem recriar itens.
+    Todas as linhas entram no cálculo; com somente_ativos=True, itens
+    inválidos e itens de notas canceladas ficam de fora.
+    """
+
+    def __init__(self, tabela, somente_ativos=False):
+        self.tabela = tabela
+        self.somente_ativos = somente_ativos
+        if somente_ativos:
+            self.ativos = mascara_ativos(tabela)
+        else:
+            self.ativos = array(TIPO_FLAG, [1]) * len(tabela.nota)
+        self._grupos = {}
+        self._dias = None
+
+    def totais(self, filtro=None):
+        """
+        Args:
+            filtro: {dimensão: valor ou coleção de valores}
+        Returns:
+            list: [RVM, RVN, itens monofásicos, itens não-monofásicos]
+        """
+        mascara = self._mascara(filtro)
+        monofasicos = array(TIPO_FLAG, map(mul, mascara, self.tabela.monofasico))
+        nao_monofasicos = array(TIPO_FLAG, map(sub, mascara, monofasicos))
+        valores = self.tabela.valores['valor_total']
+        return [somar(valores, monofasicos), somar(valores, nao_monofasicos),
+                sum(monofasicos), sum(nao_monofasicos)]
+
+    def por(self, dimensao, filtro=None):
+        """
+        Medidas agrupadas por uma dimensão
+        Returns:
+            dict: {valor da dimensão: [RVM, RVN, itens M, itens N]}
+        """
+        if not filtro and dimensao in self._grupos:
+            return self._grupos[dimensao]
+
+        mascara = self._mascara(filtro)
+        if dimensao in DIMENSOES_ITEM:
+            valores = self.tabela.dicionarios[dimensao].valores
+            grupos = _agregar(self.tabela.codigos[dimensao], len(valores), self.tabela.monofasico,
+                              self.tabela.valores['valor_total'], mascara)
+        else:
+            # Agrega por nota e consolida pelo atributo da nota (poucas linhas)
+            codigos_nota, valores = self._codigos_nota(dimensao)
+            por_nota = _agregar(self.tabela.nota, self.tabela.qtd_notas, self.tabela.monofasico,
+                                self.tabela.valores['valor_total'], mascara)
+            grupos = [[0, 0, 0, 0] for _ in valores]
+            for codigo, medidas in zip(codigos_nota, por_nota):
+                grupo = grupos[codigo]
+                for posicao in range(4):
+                    grupo[posicao] += medidas[posicao]
+
+        resultado = {
+            valores[codigo]: medidas for codigo, medidas in enumerate(grupos)
+            if medidas[ITENS_MONOFASICOS] or medidas[ITENS_NAO_MONOFASICOS]
+        }
+        if not filtro:
+            self._grupos[dimensao] = resultado
+        return resultado
+
+    def _codigos_nota(self, dimensao):
+        if dimensao == 'emitente':
+            return self.tabela.nota_emitente, self.tabela.emitentes.valores
+        if dimensao == 'dia':
+            if self._dias is None:
+                # Data de emissão sem horário (YYYY-MM-DD)
+                dias = DicionarioCodigos()
+                codigos = array(TIPO_CODIGO, (dias.codificar((data or "")[:10]) for data in self.tabela.nota_data_emissao))
+                self._dias = (codigos, dias.valores)
+            return self._dias
+        raise KeyError(dimensao)
+
+    def _mascara(self, filtro):
+        if not filtro:
+            return self.ativos
+
+        mascara = self.ativos
+        for dimensao, aceitos in filtro.items():
+            if isinstance(aceitos, str) or not hasattr(aceitos, '__iter__'):
+                aceitos = (aceitos,)
+            aceitos = set(aceitos)
+
+            if dimensao in DIMENSOES_ITEM:
+                valores = self.tabela.dicionarios[dimensao].valores
+                codigos_linha = self.tabela.codigos[dimensao]
+            else:
+                codigos_nota, valores = self._codigos_nota(dimensao)
+                codigos_linha = map(codigos_nota.__getitem__, self.tabela.nota)
+
+            codigos = {codigo for codigo, valor in enumerate(valores) if valor in aceitos}
+            mascara = array(TIPO_FLAG, map(mul, mascara, map(codigos.__contains__, codigos_linha)))
+        return mascara
+
+class ResultadoCreditos:
+    """
+    Resultado do cálculo: RVM/RVN, tributos devidos, créditos e a agregação
+    para detalhamento. Valores monetários seguem o tipo das alíquotas (float ou
+    Decimal); RVM/RVN também ficam disponíveis em centavos.
+    """
+
+    def __init__(self, agregacao, aliquota_pis, aliquota_cofins, pis_recolhido,
+                 cofins_recolhido, dimensoes=DIMENSOES):
+        self.agregacao = agregacao
+        self.dimensoes = tuple(dimensoes)
+        self.aliquota_pis = aliquota_pis
+        self.aliquota_cofins = aliquota_cofins
+        self.pis_recolhido = pis_recolhido
+        self.cofins_recolhido = cofins_recolhido
+
+        (self.rvm_centavos, self.rvn_centavos,
+         self.itens_monofasicos, self.itens_nao_monofasicos) = agregacao.totais()
+
+        self.rvm = self._reais(self.rvm_centavos)
+        self.rvn = self._reais(self.rvn_centavos)
+
+        # Monofásicos não geram PIS/COFINS; devido apenas sobre a RVN
+        self.pis_devido = self.rvn * aliquota_pis
+        self.cofins_devido = self.rvn * aliquota_cofins
+
+        # Crédito = recolhido (PGDAS) - devido
+        self.credito_pis = pis_recolhido - self.pis_devido
+        self.credito_cofins = cofins_recolhido - self.cofins_devido
+        self.credito_total = self.credito_pis + self.credito_cofins
+
+    def _reais(self, centavos):
+        if isinstance(self.aliquota_pis, Decimal):
+            return para_decimal(centavos)
+        return para_float(centavos)
+
+    @property
+    def proporcao_monofasico(self):
+        """Percentual da RVM sobre a receita total"""
+        receita = self.rvm + self.rvn
+        return (self.rvm / receita) * 100 if receita > 0 else 0
+
+    def detalhamento(self, dimensao, filtro=None):
+        """
+        Detalha RVM/RVN, devidos e créditos por uma dimensão.
+
+        O recolhido no PGDAS não é discriminado por produto; cada grupo recebe
+        a parcela proporcional à sua receita. Assim o crédito do grupo é
+        (recolhido × participação) - devido do grupo, e a soma dos grupos
+        reproduz o crédito total.
+
+        Returns:
+            list: um dicionário por valor da dimensão, maior RVM primeiro
+        """
+        receita_total = self.rvm_centavos + self.rvn_centavos
+        linhas = []
+        for valor, (rvm, rvn, itens_m, itens_n) in self.agregacao.por(dimensao, filtro).items():
+            participacao = self._reais(rvm + rvn) / self._reais(receita_total) if receita_total else 0
+            rvn_reais = self._reais(rvn)
+            pis_devido = rvn_reais * self.aliquota_pis
+            cofins_devido = rvn_reais * self.aliquota_cofins
+            credito_pis = self.pis_recolhido * participacao - pis_devido
+            credito_cofins = self.cofins_recolhido * participacao - cofins_devido
+            linhas.append({
+                dimensao: valor,
+                "rvm": float(self._reais(rvm)),
+                "rvn": float(rvn_reais),
+                "itens_monofasicos": itens_m,
+                "itens_nao_monofasicos": itens_n,
+                "pis_devido": float(pis_devido),
+                "cofins_devido": float(cofins_devido),
+                "credito_pis": float(credito_pis),
+                "credito_cofins": float(credito_cofins),
+                "credito_total": float(credito_pis + credito_cofins)
+            })
+        linhas.sort(key=lambda linha: (-linha["rvm"], str(linha[dimensao])))
+        return linhas
+
+    def detalhamentos(self, dimensoes=None, filtro=None):
+        """Detalhamento de cada dimensão (padrão: as do cálculo)"""
+        return {dimensao: self.detalhamento(dimensao, filtro) for dimensao in (dimensoes or self.dimensoes)}
+
+# Função para calcular créditos sobre a tabela colunar
+def calcular_creditos_tabela(tabela, aliquota_pis, aliquota_cofins, pis_recolhido=0,
+                             cofins_recolhido=0, dimensoes=DIMENSOES, somente_ativos=False):
+    """
+    Calcula RVM/RVN, PIS/COFINS devidos e créditos sobre as colunas (somas
+    mascaradas, sem laço por item) e mantém a agregação para detalhamento.
+
+    Args:
+        tabela: TabelaItens ou lista de NotaFiscal
+        aliquota_pis, aliquota_cofins: alíquotas efetivas (float ou Decimal)
+        pis_recolhido, cofins_recolhido: valores declarados no PGDAS
+        dimensoes: dimensões incluídas em detalhamentos()
+        somente_ativos: exclui itens inválidos e itens de notas canceladas
+
+    Returns:
+        ResultadoCreditos
+    """
+    if not isinstance(tabela, TabelaItens):
+        tabela = TabelaItens.de_notas(tabela)
+
+    if isinstance(aliquota_pis, Decimal):
+        pis_recolhido = Decimal(str(pis_recolhido))
+        cofins_recolhido = Decimal(str(cofins_recolhido))
+
+    return ResultadoCreditos(AgregacaoCreditos(tabela, somente_ativos), aliquota_pis, aliquota_cofins,
+                             pis_recolhido, cofins_recolhido, dimensoes)
+
+# Função para somar valor_total por código, separando monofásicos, em uma passada
+def _agregar(codigos, quantidade, monofasico, valores, mascara):
+    """
+    Returns:
+        list: [RVM, RVN, itens M, itens N] para cada código (0..quantidade-1)
+    """
+    # Acumulador na posição 2 * código + flag monofásico
+    somas = [0] * (2 * quantidade)
+    itens = [0] * (2 * quantidade)
+    chaves = map(add, map(add, codigos, codigos), monofasico)
+    for chave, valor in compress(zip(chaves, valores), mascara):
+        somas[chave] += valor
+        itens[chave] += 1
+    return [
+        [somas[chave + 1], somas[chave], itens[chave + 1], itens[chave]]
+        for chave in range(0, 2 * quantidade, 2)
+    ]
@@ -45,21 +45,28 @@ class NFEParserHibrido:
         """
         Processa um XML de NFe com validação completa
         """
+        root = UtilXML.parsear_xml(xml_content)
+        if root is None:
+            self.estatisticas['total_processados'] += 1
+            self._log_erro("Estrutura XML inválida")
+            self.estatisticas['total_invalidos'] += 1
+            return None
+        
+        return self.processar_documento_nfe(root, arquivo_origem)
+    
+    def processar_documento_nfe(self, root: etree.Element, arquivo_origem: str = "") -> Optional[NotaFiscal]:
+        """
+        Processa uma NFe a partir da árvore já parseada (sem novo parse)
+        """
         self.estatisticas['total_processados'] += 1
         
         # Validação inicial da estrutura XML
-        if not UtilXML.validar_estrutura_xml(xml_content):
+        if not UtilXML.validar_raiz_nfe(root):
             self._log_erro("Estrutura XML inválida")
             self.estatisticas['total_invalidos'] += 1
             return None
         
         try:
-            # Parse do XML
-            if isinstance(xml_content, str):
-                xml_content = xml_content.encode('utf-8')
-            
-            root = etree.fromstring(xml_content)
-            
             # Localizar elemento NFe
             nfe_element = self._localizar_elemento_nfe(root)
             if nfe_element is None:
@@ -90,8 +97,7 @@ class NFEParserHibrido:
                 self.estatisticas['total_invalidos'] += 1
                 return None
             
-            # Recalcular totais e validar consistência
-            nota_fiscal.recalcular_totais()
+            # Validar consistência (totais já acumulados por adicionar_item)
             self._validar_consistencia_nota(nota_fiscal)
             
             # Adicionar logs de validação
@@ -115,12 +121,18 @@ class NFEParserHibrido:
         """
         Processa um evento de cancelamento de NFe
         """
+        root = UtilXML.parsear_xml(xml_content)
+        if root is None:
+            self._log_erro("Erro ao processar evento de cancelamento: XML inválido")
+            return None
+        
+        return self.processar_documento_evento(root)
+    
+    def processar_documento_evento(self, root: etree.Element) -> Optional[EventoCancelamento]:
+        """
+        Processa um evento de cancelamento a partir da árvore já parseada
+        """
         try:
-            if isinstance(xml_content, str):
-                xml_content = xml_content.encode('utf-8')
-            
-            root = etree.fromstring(xml_content)
-            
             # Verificar se é evento de cancelamento
             tipo_evento_elem = UtilXML.encontrar_elemento(root, 'tpEvento', self.namespace)
             if tipo_evento_elem is None or tipo_evento_elem.text != '110111':
@@ -165,41 +177,37 @@ class NFEParserHibrido:
         notas_fiscais = []
         cancelamentos = {}
         
-        # Primeiro passo: identificar cancelamentos
-        if incluir_cancelamentos:
-            self._log_info("Identificando eventos de cancelamento...")
-            for arquivo in arquivos_xml:
-                conteudo_xml = UtilArquivo.ler_arquivo_xml(arquivo)
-                if conteudo_xml:
-                    try:
-                        root = etree.fromstring(conteudo_xml.encode('utf-8'))
-                        if UtilArquivo.determinar_tipo_xml(root) == 'EVENTO':
-                            evento = self.processar_evento_cancelamento(conteudo_xml)
-                            if evento and evento.chave_nfe:
-                                cancelamentos[evento.chave_nfe] = evento
-                                self._log_info(f"Cancelamento encontrado: {evento.chave_nfe}")
-                    except Exception:
-                        continue
-        
-        # Segundo passo: processar notas fiscais
-        self._log_info("Processando notas fiscais...")
+        # Passo único: cada arquivo é lido e parseado uma vez; eventos de
+        # cancelamento são aplicados às notas ao final
+        self._log_info("Processando notas fiscais e eventos de cancelamento...")
         for arquivo in arquivos_xml:
-            conteudo_xml = UtilArquivo.ler_arquivo_xml(arquivo)
-            if conteudo_xml:
-                try:
-                    root = etree.fromstring(conteudo_xml.encode('utf-8'))
-                    if UtilArquivo.determinar_tipo_xml(root) == 'NFE':
-                        nota = self.processar_xml_nfe(conteudo_xml, arquivo)
-                        if nota:
-                            # Verificar se foi cancelada
-                            if nota.chave_acesso in cancelamentos:
-                                nota.marcar_como_cancelada("Evento de cancelamento encontrado")
-                                self.estatisticas['total_cancelados'] += 1
-                            
-                            notas_fiscais.append(nota)
-                except Exception as e:
-                    self._log_erro(f"Erro ao processar {arquivo}: {e}")
+            try:
+                with UtilArquivo.abrir_xml(arquivo) as conteudo_xml:
+                    root = UtilXML.parsear_xml(conteudo_xml)
+                if root is None:
+                    self._log_erro(f"Erro ao processar {arquivo}: XML ilegível ou malformado")
                     continue
+                
+                tipo = UtilArquivo.determinar_tipo_xml(root)
+                if tipo == 'EVENTO':
+                    if incluir_cancelamentos:
+                        evento = self.processar_documento_evento(root)
+                        if evento and evento.chave_nfe:
+                            cancelamentos[evento.chave_nfe] = evento
+                            self._log_info(f"Cancelamento encontrado: {evento.chave_nfe}")
+                elif tipo == 'NFE':
+                    nota = self.processar_documento_nfe(root, arquivo)
+                    if nota:
+                        notas_fiscais.append(nota)
+            except Exception as e:
+                self._log_erro(f"Erro ao processar {arquivo}: {e}")
+                continue
+        
+        # Verificar quais notas foram canceladas
+        for nota in notas_fiscais:
+            if nota.chave_acesso in cancelamentos:
+                nota.marcar_como_cancelada("Evento de cancelamento encontrado")
+                self.estatisticas['total_cancelados'] += 1
         
         self._log_info(f"Processamento concluído. {len(notas_fiscais)} notas processadas.")
         
@@ -547,7 +555,7 @@ class NFEParserHibrido:
     def _validar_consistencia_nota(self, nota_fiscal: NotaFiscal):
         """Valida consistência da nota fiscal"""
         # Validar se total de itens bate com total da nota
-        valor_calculado = sum(item.valor_total for item in nota_fiscal.itens)
+        valor_calculado = nota_fiscal.obter_valor_total_itens()
         diferenca = abs(valor_calculado - nota_fiscal.valor_total_nf)
         
         # Tolerância de R$ 0,01 para diferenças de arredondamento
@@ -557,8 +565,7 @@ class NFEParserHibrido:
             )
         
         # Validar se há pelo menos um item válido
-        itens_validos = [item for item in nota_fiscal.itens if item.valido]
-        if not itens_validos:
+        if not nota_fiscal.contar_itens_validos():
             nota_fiscal.adicionar_erro_validacao("Nenhum item válido encontrado na nota")
     
     def obter_estatisticas(self) -> Dict[str, Any]:
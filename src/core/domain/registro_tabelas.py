@@ -0,0 +1,341 @@
+import os
+import json
+import time
+import threading
+from core.domain.simples_nacional import TabelaAnexo
+
+# Diretório padrão das tabelas
+DIR_TABELAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tabelas")
+
+# Arquivos de referência conhecidos
+ARQUIVO_SELIC = "Tabela Selic.json"
+ARQUIVO_NCM_MONOFASICO = "Espelho de ncms monofásicas.json"
+ARQUIVO_ANEXO_SIMPLES = "Anexo do Simples.json"
+
+# Coluna da tabela de NCMs monofásicos
+COLUNA_NCM_MONOFASICO = "NCMs monofásicos"
+
+# Intervalo mínimo (segundos) entre verificações de modificação de um arquivo
+INTERVALO_VERIFICACAO_TABELAS = 1.0
+
+# Nomes dos meses na Tabela Selic
+MESES_SELIC = {
+    'Janeiro': 1, 'Fevereiro': 2, 'Março': 3, 'Abril': 4,
+    'Maio': 5, 'Junho': 6, 'Julho': 7, 'Agosto': 8,
+    'Setembro': 9, 'Outubro': 10, 'Novembro': 11, 'Dezembro': 12
+}
+
+# Função para normalizar um NCM (str ou int) para 8 dígitos
+def normalizar_ncm(ncm):
+    """
+    Normaliza NCM para string de 8 dígitos (ex.: 3049069 -> "03049069").
+
+    Returns:
+        str: NCM normalizado, ou None se inválido
+    """
+    if isinstance(ncm, int):
+        return f"{ncm:08d}" if ncm >= 0 else None
+    if ncm is None:
+        return None
+
+    ncm_limpo = str(ncm).strip().replace('.', '')
+    if not ncm_limpo.isdigit():
+        return None
+    return ncm_limpo.zfill(8)
+
+# Função para converter período ("YYYY-MM" ou "MM/YYYY") em índice absoluto de mês
+def indice_mes(periodo):
+    """
+    Converte período em número de meses desde o ano zero (ano * 12 + mes - 1).
+
+    Returns:
+        int: índice do mês, ou None se o formato for inválido
+    """
+    try:
+        if isinstance(periodo, tuple):
+            ano, mes = periodo
+        elif '-' in periodo:
+            ano, mes = periodo.split('-')[:2]
+        elif '/' in periodo:
+            mes, ano = periodo.split('/')[:2]
+        else:
+            return None
+        ano, mes = int(ano), int(mes)
+    except (ValueError, TypeError):
+        return None
+
+    if not 1 <= mes <= 12:
+        return None
+    return ano * 12 + mes - 1
+
+class SerieSelic:
+    """
+    Série mensal da SELIC com produtos acumulados pré-calculados.
+
+    produtos[k] = (1 + taxa[0]) * ... * (1 + taxa[k - 1]), de modo que o
+    fator entre dois meses quaisquer é uma única divisão. Meses sem taxa
+    na tabela contam como taxa zero.
+    """
+
+    def __init__(self, taxas):
+        # taxas: {(ano, mes): taxa}
+        self.taxas = dict(taxas)
+
+        indices = [ano * 12 + mes - 1 for ano, mes in self.taxas]
+        self.inicio = min(indices) if indices else 0
+        self.fim = max(indices) if indices else -1
+
+        self.produtos = [1.0]
+        for indice in range(self.inicio, self.fim + 1):
+            taxa = self.taxas.get((indice // 12, indice % 12 + 1), 0)
+            self.produtos.append(self.produtos[-1] * (1 + taxa))
+
+    def _produto_ate(self, indice):
+        """Produto acumulado de todos os meses até o índice (inclusive)"""
+        posicao = min(max(indice - self.inicio + 1, 0), len(self.produtos) - 1)
+        return self.produtos[posicao]
+
+    def fator_indices(self, indice_inicial, indice_final):
+        """Fator acumulado dos meses em (indice_inicial, indice_final]"""
+        if indice_final <= indice_inicial:
+            return 1.0
+        return self._produto_ate(indice_final) / self._produto_ate(indice_inicial)
+
+    def fator(self, periodo_inicial, periodo_final):
+        """
+        Fator SELIC acumulado a partir do mês seguinte ao período inicial
+        até o período final (inclusive).
+
+        Returns:
+            float: Fator acumulado (1.0 se algum período for inválido)
+        """
+        indice_inicial = indice_mes(periodo_inicial)
+        indice_final = indice_mes(periodo_final)
+        if indice_inicial is None or indice_final is None:
+            return 1.0
+        return self.fator_indices(indice_inicial, indice_final)
+
+    def fatores(self, periodos_iniciais, periodo_final):
+        """
+        Fatores acumulados de vários períodos até um mesmo período final.
+
+        Returns:
+            list: float por período, na mesma ordem da entrada
+        """
+        indice_final = indice_mes(periodo_final)
+        if indice_final is None:
+            return [1.0] * len(periodos_iniciais)
+
+        produto_final = self._produto_ate(indice_final)
+        resultado = []
+        for periodo in periodos_iniciais:
+            indice_inicial = indice_mes(periodo)
+            if indice_inicial is None or indice_final <= indice_inicial:
+                resultado.append(1.0)
+            else:
+                resultado.append(produto_final / self._produto_ate(indice_inicial))
+        return resultado
+
+    def get(self, chave, padrao=None):
+        """Taxa mensal de (ano, mes)"""
+        return self.taxas.get(chave, padrao)
+
+    def __len__(self):
+        return len(self.taxas)
+
+    def __bool__(self):
+        return bool(self.taxas)
+
+# Compiladores: transformam o JSON bruto na representação usada nas consultas
+
+def compilar_tabela_selic(tabela_selic):
+    """
+    Compila a Tabela Selic (linhas por mês, colunas por ano).
+
+    Returns:
+        SerieSelic: taxas por (ano, mes) e produtos acumulados
+    """
+    mapa_selic = {}
+    for linha in tabela_selic or []:
+        mes_num = MESES_SELIC.get(linha.get("Mês/Ano"))
+        if mes_num is None:
+            continue
+
+        for ano_col, taxa in linha.items():
+            if ano_col == "Mês/Ano" or taxa is None:
+                continue
+            try:
+                mapa_selic[(int(ano_col), mes_num)] = float(taxa)
+            except (ValueError, TypeError):
+                continue
+
+    return SerieSelic(mapa_selic)
+
+def compilar_ncms_monofasicos(tabela_ncm):
+    """
+    Compila a tabela de NCMs monofásicos.
+
+    Returns:
+        frozenset: NCMs normalizados para 8 dígitos
+    """
+    ncms = set()
+    for item in tabela_ncm or []:
+        ncm = normalizar_ncm(item.get(COLUNA_NCM_MONOFASICO))
+        if ncm is not None:
+            ncms.add(ncm)
+    return frozenset(ncms)
+
+def _converter_valor_br(texto):
+    return float(texto.replace('.', '').replace(',', '.').strip())
+
+def compilar_faixas_anexo(tabela_anexo, coluna_anexo='Anexo I'):
+    """
+    Compila as faixas de um anexo do Simples Nacional exportado em JSON
+    (colunas: nome da faixa, "Column2" com o intervalo, "Column3" com a
+    alíquota nominal e "Column4" com o valor a deduzir).
+
+    Returns:
+        TabelaAnexo: tabela compilada (sem repartição de tributos)
+    """
+    faixas = []
+    for linha in tabela_anexo or []:
+        if not linha or not isinstance(linha, dict) or coluna_anexo not in linha:
+            continue
+
+        faixa_valor = linha.get('Column2', '') or ''
+        try:
+            aliquota = float(linha['Column3'])
+            valor_deduzir = 0.0 if linha['Column4'] == '-' else float(linha['Column4'])
+
+            if 'Até' in faixa_valor:
+                faixas.append((None, _converter_valor_br(faixa_valor.replace('Até', '')), aliquota, valor_deduzir))
+            elif 'a' in faixa_valor:
+                partes = faixa_valor.replace('De', '').split('a')
+                faixas.append((_converter_valor_br(partes[0]), _converter_valor_br(partes[1]), aliquota, valor_deduzir))
+        except (KeyError, ValueError, TypeError, IndexError):
+            # Linhas de cabeçalho ou texto livre
+            continue
+
+    return TabelaAnexo.de_faixas(faixas)
+
+class RegistroTabelas:
+    """
+    Registro de tabelas de referência compartilhado pelo processo.
+
+    Cada arquivo é lido e compilado apenas na primeira consulta e
+    recarregado somente quando sua data de modificação muda.
+    """
+
+    def __init__(self, dir_tabelas=DIR_TABELAS, intervalo_verificacao=INTERVALO_VERIFICACAO_TABELAS):
+        self.dir_tabelas = dir_tabelas
+        self.intervalo_verificacao = intervalo_verificacao
+        self._lock = threading.RLock()
+        # (caminho, compilador) -> [mtime, valor, verificado_em]
+        self._entradas = {}
+
+    def _resolver_caminho(self, arquivo):
+        caminho = str(arquivo)
+        if not os.path.isabs(caminho):
+            caminho = os.path.join(self.dir_tabelas, caminho)
+        return os.path.abspath(caminho)
+
+    def obter(self, arquivo, compilador=None, padrao=None):
+        """
+        Retorna a tabela (compilada, se houver compilador) a partir do cache.
+
+        Args:
+            arquivo: nome do arquivo em dir_tabelas ou caminho absoluto
+            compilador: função aplicada ao JSON bruto uma vez por carga
+            padrao: valor retornado se o arquivo não existir ou for inválido
+
+        Returns:
+            Representação em memória da tabela, ou padrao
+        """
+        chave = (self._resolver_caminho(arquivo), compilador)
+        agora = time.monotonic()
+
+        entrada = self._entradas.get(chave)
+        if entrada is not None and agora - entrada[2] < self.intervalo_verificacao:
+            return entrada[1] if entrada[1] is not None else padrao
+
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            try:
+                mtime = os.path.getmtime(chave[0])
+            except OSError:
+                mtime = None
+
+            if entrada is None or entrada[0] != mtime:
+                valor = None
+                if mtime is not None:
+                    dados = self._ler_json(chave[0])
+                    if dados is not None:
+                        valor = compilador(dados) if compilador else dados
+                entrada = [mtime, valor, agora]
+                self._entradas[chave] = entrada
+            else:
+                entrada[2] = agora
+
+            return entrada[1] if entrada[1] is not None else padrao
+
+    def _ler_json(self, caminho):
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Erro ao carregar tabela {os.path.basename(caminho)}: {str(e)}")
+            return None
+
+    # Atalhos para as tabelas do sistema
+
+    def selic(self, arquivo=ARQUIVO_SELIC):
+        """Série SELIC compilada (taxas por (ano, mes) e produtos acumulados)"""
+        return self.obter(arquivo, compilar_tabela_selic, SerieSelic({}))
+
+    def ncms_monofasicos(self, arquivo=ARQUIVO_NCM_MONOFASICO):
+        """NCMs monofásicos normalizados (frozenset de strings de 8 dígitos)"""
+        return self.obter(arquivo, compilar_ncms_monofasicos, frozenset())
+
+    def tabela_anexo_simples(self, arquivo=ARQUIVO_ANEXO_SIMPLES):
+        """Anexo I exportado em JSON, compilado como TabelaAnexo (None se ausente)"""
+        return self.obter(arquivo, compilar_faixas_anexo)
+
+    def aquecer(self, tabelas=None):
+        """
+        Carrega antecipadamente as tabelas, para que processos de longa
+        duração (app web, workers) paguem o custo de leitura uma só vez.
+
+        Args:
+            tabelas: lista de (arquivo, compilador); padrão: SELIC, NCMs e Anexo do Simples
+
+        Returns:
+            dict: {arquivo: True se carregada}
+        """
+        if tabelas is None:
+            tabelas = [
+                (ARQUIVO_SELIC, compilar_tabela_selic),
+                (ARQUIVO_NCM_MONOFASICO, compilar_ncms_monofasicos),
+                (ARQUIVO_ANEXO_SIMPLES, compilar_faixas_anexo)
+            ]
+
+        return {
+            os.path.basename(str(arquivo)): self.obter(arquivo, compilador) is not None
+            for arquivo, compilador in tabelas
+        }
+
+    def invalidar(self, arquivo=None):
+        """Descarta do cache um arquivo (ou todos), forçando nova leitura"""
+        with self._lock:
+            if arquivo is None:
+                self._entradas.clear()
+                return
+            caminho = self._resolver_caminho(arquivo)
+            for chave in [chave for chave in self._entradas if chave[0] == caminho]:
+                del self._entradas[chave]
+
+# Registro único do processo
+registro_tabelas = RegistroTabelas()
+
+# Função para aquecer o registro global
+def aquecer_tabelas(tabelas=None):
+    return registro_tabelas.aquecer(tabelas)
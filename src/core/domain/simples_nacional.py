@@ -0,0 +1,238 @@
+from bisect import bisect_left
+
+# Limites superiores de receita bruta em 12 meses (RBT12) das seis faixas,
+# iguais para todos os anexos (LC 123/2006, redação da LC 155/2016)
+LIMITES_FAIXAS = (180000.00, 360000.00, 720000.00, 1800000.00, 3600000.00, 4800000.00)
+
+# Nomes dos anexos
+ANEXOS = {
+    1: "Anexo I - Comércio",
+    2: "Anexo II - Indústria",
+    3: "Anexo III - Serviços",
+    4: "Anexo IV - Serviços",
+    5: "Anexo V - Serviços"
+}
+
+# Tributos da repartição, na ordem das colunas de REPARTICAO
+TRIBUTOS_ANEXO = {
+    1: ('irpj', 'csll', 'cofins', 'pis', 'cpp', 'icms'),
+    2: ('irpj', 'csll', 'cofins', 'pis', 'cpp', 'ipi', 'icms'),
+    3: ('irpj', 'csll', 'cofins', 'pis', 'cpp', 'iss'),
+    4: ('irpj', 'csll', 'cofins', 'pis', 'iss'),
+    5: ('irpj', 'csll', 'cofins', 'pis', 'cpp', 'iss')
+}
+
+# Alíquota nominal (%) e valor a deduzir (R$) por faixa
+ALIQUOTAS_ANEXO = {
+    1: ((4.00, 0), (7.30, 5940), (9.50, 13860), (10.70, 22500), (14.30, 87300), (19.00, 378000)),
+    2: ((4.50, 0), (7.80, 5940), (10.00, 13860), (11.20, 22500), (14.70, 85500), (30.00, 720000)),
+    3: ((6.00, 0), (11.20, 9360), (13.50, 17640), (16.00, 35640), (21.00, 125640), (33.00, 648000)),
+    4: ((4.50, 0), (9.00, 8100), (10.20, 12420), (14.00, 39780), (22.00, 183780), (33.00, 828000)),
+    5: ((15.50, 0), (18.00, 4500), (19.50, 9900), (20.50, 17100), (23.00, 62100), (30.50, 540000))
+}
+
+# Percentual de repartição dos tributos (% da alíquota efetiva) por faixa
+REPARTICAO = {
+    1: (
+        (5.50, 3.50, 12.74, 2.76, 41.50, 34.00),
+        (5.50, 3.50, 12.74, 2.76, 41.50, 34.00),
+        (5.50, 3.50, 12.74, 2.76, 42.00, 33.50),
+        (5.50, 3.50, 12.74, 2.76, 42.00, 33.50),
+        (5.50, 3.50, 12.74, 2.76, 42.00, 33.50),
+        (13.50, 10.00, 28.27, 6.13, 42.10, 0.00)
+    ),
+    2: (
+        (5.50, 3.50, 11.51, 2.49, 37.50, 7.50, 32.00),
+        (5.50, 3.50, 11.51, 2.49, 37.50, 7.50, 32.00),
+        (5.50, 3.50, 11.51, 2.49, 37.50, 7.50, 32.00),
+        (5.50, 3.50, 11.51, 2.49, 37.50, 7.50, 32.00),
+        (5.50, 3.50, 11.51, 2.49, 37.50, 7.50, 32.00),
+        (8.50, 7.50, 20.96, 4.54, 23.50, 35.00, 0.00)
+    ),
+    3: (
+        (4.00, 3.50, 12.82, 2.78, 43.40, 33.50),
+        (4.00, 3.50, 14.05, 3.05, 43.40, 32.00),
+        (4.00, 3.50, 13.64, 2.96, 43.40, 32.50),
+        (4.00, 3.50, 13.64, 2.96, 43.40, 32.50),
+        (4.00, 3.50, 12.82, 2.78, 43.40, 33.50),
+        (35.00, 15.00, 16.03, 3.47, 30.50, 0.00)
+    ),
+    4: (
+        (18.80, 15.20, 17.67, 3.83, 44.50),
+        (19.80, 15.20, 20.55, 4.45, 40.00),
+        (20.80, 15.20, 19.73, 4.27, 40.00),
+        (17.80, 19.20, 18.90, 4.10, 40.00),
+        (18.80, 19.20, 18.08, 3.92, 40.00),
+        (53.50, 21.50, 20.55, 4.45, 0.00)
+    ),
+    5: (
+        (25.00, 15.00, 14.10, 3.05, 28.85, 14.00),
+        (23.00, 15.00, 14.10, 3.05, 27.85, 17.00),
+        (24.00, 15.00, 14.92, 3.23, 23.85, 19.00),
+        (21.00, 15.00, 15.74, 3.41, 23.85, 21.00),
+        (23.00, 12.50, 14.10, 3.05, 23.85, 23.50),
+        (35.00, 15.50, 16.44, 3.56, 29.50, 0.00)
+    )
+}
+
+class FaixaSimples:
+    """Faixa de um anexo: limites, alíquota nominal, dedução e repartição"""
+
+    __slots__ = ('numero', 'limite_inferior', 'limite_superior',
+                 'aliquota_nominal', 'valor_deduzir', 'reparticao')
+
+    def __init__(self, numero, limite_inferior, limite_superior, aliquota_nominal,
+                 valor_deduzir, reparticao=None):
+        self.numero = numero
+        self.limite_inferior = limite_inferior
+        self.limite_superior = limite_superior
+        self.aliquota_nominal = aliquota_nominal  # fração (ex.: 0.073)
+        self.valor_deduzir = valor_deduzir
+        self.reparticao = reparticao or {}  # tributo -> fração da alíquota efetiva
+
+    def aliquota_efetiva(self, rbt12):
+        """(RBT12 × Alíquota Nominal - Valor a Deduzir) / RBT12"""
+        if rbt12 <= 0:
+            # Sem receita acumulada (início de atividade): alíquota nominal
+            return self.aliquota_nominal
+        return (rbt12 * self.aliquota_nominal - self.valor_deduzir) / rbt12
+
+class TabelaAnexo:
+    """
+    Tabela compilada de um anexo do Simples Nacional.
+
+    A faixa é localizada por busca binária nos limites superiores, ou seja,
+    faixa i cobre (limite[i - 1], limite[i]].
+    """
+
+    def __init__(self, anexo, faixas):
+        self.anexo = anexo
+        self.faixas = sorted(faixas, key=lambda faixa: faixa.limite_superior)
+        self.limites = [faixa.limite_superior for faixa in self.faixas]
+
+    @classmethod
+    def oficial(cls, anexo):
+        """Compila a tabela oficial do anexo (1 a 5)"""
+        tributos = TRIBUTOS_ANEXO[anexo]
+        faixas = []
+        limite_inferior = 0.0
+        for indice, limite_superior in enumerate(LIMITES_FAIXAS):
+            aliquota, valor_deduzir = ALIQUOTAS_ANEXO[anexo][indice]
+            reparticao = {
+                tributo: percentual / 100
+                for tributo, percentual in zip(tributos, REPARTICAO[anexo][indice])
+            }
+            faixas.append(FaixaSimples(indice + 1, limite_inferior, limite_superior,
+                                       aliquota / 100, float(valor_deduzir), reparticao))
+            limite_inferior = limite_superior
+        return cls(anexo, faixas)
+
+    @classmethod
+    def de_faixas(cls, faixas, anexo=1):
+        """
+        Compila a partir de faixas avulsas (ex.: tabela exportada em JSON).
+
+        Args:
+            faixas: lista de (limite_inferior, limite_superior, aliquota_nominal,
+                    valor_deduzir), alíquota em fração
+        """
+        return cls(anexo, [
+            FaixaSimples(numero, limite_inferior or 0.0, limite_superior, aliquota, valor_deduzir)
+            for numero, (limite_inferior, limite_superior, aliquota, valor_deduzir)
+            in enumerate(sorted(faixas, key=lambda faixa: faixa[1]), start=1)
+        ])
+
+    def faixa(self, rbt12):
+        """
+        Retorna a faixa do RBT12.
+
+        Returns:
+            FaixaSimples: faixa correspondente, ou None se fora da tabela
+        """
+        if rbt12 is None or rbt12 < 0:
+            return None
+        posicao = bisect_left(self.limites, rbt12)
+        if posicao >= len(self.faixas):
+            return None
+        return self.faixas[posicao]
+
+    def aliquota_efetiva(self, rbt12):
+        """Alíquota efetiva do RBT12 (None se fora da tabela)"""
+        faixa = self.faixa(rbt12)
+        return faixa.aliquota_efetiva(rbt12) if faixa else None
+
+    def calcular(self, rbt12):
+        """
+        Calcula faixa, alíquotas e repartição para um RBT12.
+
+        Returns:
+            dict: faixa, aliquota_nominal, valor_deduzir, aliquota_efetiva e
+                  reparticao (fração da alíquota efetiva por tributo), ou None
+        """
+        faixa = self.faixa(rbt12)
+        if faixa is None:
+            return None
+        return {
+            "faixa": faixa.numero,
+            "aliquota_nominal": faixa.aliquota_nominal,
+            "valor_deduzir": faixa.valor_deduzir,
+            "aliquota_efetiva": faixa.aliquota_efetiva(rbt12),
+            "reparticao": dict(faixa.reparticao)
+        }
+
+    def __bool__(self):
+        return bool(self.faixas)
+
+    def __len__(self):
+        return len(self.faixas)
+
+# Tabelas oficiais compiladas uma vez por processo
+TABELAS_ANEXOS = {anexo: TabelaAnexo.oficial(anexo) for anexo in ANEXOS}
+
+# Função para obter a tabela compilada de um anexo
+def obter_tabela_anexo(anexo=1):
+    tabela = TABELAS_ANEXOS.get(anexo)
+    if tabela is None:
+        raise ValueError(f"Anexo do Simples Nacional inválido: {anexo}")
+    return tabela
+
+# Função para calcular faixa, alíquotas e repartição de um RBT12
+def calcular_simples(rbt12, anexo=1):
+    return obter_tabela_anexo(anexo).calcular(rbt12)
+
+# Função para calcular alíquotas efetivas de vários RBT12 em uma única chamada
+def aliquota_efetiva(rbt12_array, anexo=1):
+    """
+    Calcula a alíquota efetiva e a repartição de vários RBT12 de um anexo.
+
+    Args:
+        rbt12_array: sequência de receitas brutas acumuladas em 12 meses
+        anexo: número do anexo (1 a 5)
+
+    Returns:
+        dict: listas alinhadas com a entrada — "faixa", "aliquota_nominal",
+              "valor_deduzir", "aliquota_efetiva" e "reparticao"
+              ({tributo: [fração da alíquota efetiva]}); None para RBT12
+              fora da tabela
+    """
+    tabela = obter_tabela_anexo(anexo)
+    tributos = TRIBUTOS_ANEXO[anexo]
+
+    resultado = {
+        "faixa": [],
+        "aliquota_nominal": [],
+        "valor_deduzir": [],
+        "aliquota_efetiva": [],
+        "reparticao": {tributo: [] for tributo in tributos}
+    }
+
+    for rbt12 in rbt12_array:
+        faixa = tabela.faixa(rbt12)
+        resultado["faixa"].append(faixa.numero if faixa else None)
+        resultado["aliquota_nominal"].append(faixa.aliquota_nominal if faixa else None)
+        resultado["valor_deduzir"].append(faixa.valor_deduzir if faixa else None)
+        resultado["aliquota_efetiva"].append(faixa.aliquota_efetiva(rbt12) if faixa else None)
+        for tributo in tributos:
+            resultado["reparticao"][tributo].append(faixa.reparticao[tributo] if faixa else None)
+
+    return resultado
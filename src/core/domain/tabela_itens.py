@@ -0,0 +1,369 @@
+from array import array
+from itertools import compress
+from core.domain.centavos import (
+    para_inteiro, para_float, para_decimal, somar,
+    CASAS_VALOR, CASAS_QUANTIDADE, CASAS_VALOR_UNITARIO, TIPO_INTEIRO
+)
+
+# Campos de item na ordem aceita por TabelaItens.adicionar_item
+CAMPOS_ITEM = (
+    'numero', 'codigo', 'descricao', 'ncm', 'cfop', 'quantidade', 'valor_unitario',
+    'valor_bruto', 'valor_desconto', 'valor_total', 'pis_cst', 'pis_valor',
+    'cofins_cst', 'cofins_valor'
+)
+
+# Colunas numéricas (int64 escalado) e suas casas decimais
+COLUNAS_VALOR = {
+    'quantidade': CASAS_QUANTIDADE,
+    'valor_unitario': CASAS_VALOR_UNITARIO,
+    'valor_bruto': CASAS_VALOR,
+    'valor_desconto': CASAS_VALOR,
+    'valor_total': CASAS_VALOR,
+    'pis_valor': CASAS_VALOR,
+    'cofins_valor': CASAS_VALOR
+}
+
+# Colunas de texto codificadas por dicionário (índice uint32 + tabela de valores distintos)
+COLUNAS_CODIGO = ('codigo', 'descricao', 'ncm', 'cfop', 'pis_cst', 'cofins_cst')
+
+# Tipos das colunas de array
+TIPO_VALOR = TIPO_INTEIRO
+TIPO_CODIGO = 'I'
+TIPO_INDICE = 'I'
+TIPO_FLAG = 'b'
+
+class DicionarioCodigos:
+    """Valores distintos de uma coluna de texto; cada linha guarda apenas o código"""
+
+    def __init__(self, valores=()):
+        self.valores = []
+        self.codigos = {}
+        for valor in valores:
+            self.codificar(valor)
+
+    def codificar(self, valor):
+        """Retorna o código do valor, registrando-o se for novo"""
+        codigo = self.codigos.get(valor)
+        if codigo is None:
+            codigo = len(self.valores)
+            self.codigos[valor] = codigo
+            self.valores.append(valor)
+        return codigo
+
+    def decodificar(self, codigo):
+        return self.valores[codigo]
+
+    def __len__(self):
+        return len(self.valores)
+
+class LinhaItem:
+    """
+    Visão de uma linha da tabela com os mesmos atributos de ItemNotaFiscal.
+    Não copia dados: cada atributo é lido da coluna no momento do acesso.
+    """
+
+    __slots__ = ('tabela', 'indice')
+
+    def __init__(self, tabela, indice):
+        self.tabela = tabela
+        self.indice = indice
+
+    def __getattr__(self, nome):
+        tabela = object.__getattribute__(self, 'tabela')
+        return tabela.valor(nome, object.__getattribute__(self, 'indice'))
+
+    @property
+    def tipo_tributario(self):
+        return "Monofasico" if self.tabela.monofasico[self.indice] else "NaoMonofasico"
+
+    @property
+    def nota(self):
+        """Índice da nota do item"""
+        return self.tabela.nota[self.indice]
+
+    def to_dict(self):
+        dados = {campo: self.tabela.valor(campo, self.indice) for campo in CAMPOS_ITEM}
+        dados["tipo_tributario"] = self.tipo_tributario
+        return dados
+
+    def __repr__(self):
+        return f"LinhaItem({self.indice}, ncm={self.ncm!r}, valor_total={self.valor_total!r})"
+
+class TabelaItens:
+    """
+    Itens de notas fiscais em colunas (struct-of-arrays).
+
+    Valores ficam em arrays int64 escalados (centavos para valores
+    monetários, ver COLUNAS_VALOR), códigos (NCM, CFOP, CST, produto) em
+    arrays de índices para dicionários de valores distintos, e cada linha
+    aponta para a sua nota. Os itens de uma nota são contíguos, a partir de
+    inicio_nota[nota].
+
+    Somas são exatas em inteiros; conversão para float/Decimal só na saída.
+    """
+
+    def __init__(self):
+        # Colunas de item
+        self.nota = array(TIPO_INDICE)
+        self.numero = array(TIPO_INDICE)
+        self.monofasico = array(TIPO_FLAG)
+        self.valido = array(TIPO_FLAG)
+        self.valores = {coluna: array(TIPO_VALOR) for coluna in COLUNAS_VALOR}
+        self.codigos = {coluna: array(TIPO_CODIGO) for coluna in COLUNAS_CODIGO}
+        self.dicionarios = {coluna: DicionarioCodigos() for coluna in COLUNAS_CODIGO}
+
+        # Colunas de nota
+        self.inicio_nota = array(TIPO_INDICE)
+        self.nota_chave = []
+        self.nota_numero = []
+        self.nota_serie = []
+        self.nota_data_emissao = []
+        self.nota_emitente = array(TIPO_CODIGO)
+        self.nota_valor_total = array(TIPO_VALOR)
+        self.nota_valor_produtos = array(TIPO_VALOR)
+        self.nota_cancelada = array(TIPO_FLAG)
+        self.emitentes = DicionarioCodigos()
+        self.nomes_emitentes = {}
+
+    # Construção
+
+    def adicionar_nota(self, chave_acesso="", numero="", serie="", data_emissao=None,
+                       cnpj_emitente="", nome_emitente="", valor_total=0.0,
+                       valor_produtos=0.0, cancelada=False):
+        """
+        Registra o cabeçalho de uma nota; os itens seguintes pertencem a ela.
+
+        Returns:
+            int: índice da nota
+        """
+        if data_emissao is not None and not isinstance(data_emissao, str):
+            data_emissao = data_emissao.strftime("%Y-%m-%d")
+
+        self.inicio_nota.append(len(self.nota))
+        self.nota_chave.append(chave_acesso)
+        self.nota_numero.append(numero)
+        self.nota_serie.append(serie)
+        self.nota_data_emissao.append(data_emissao)
+        self.nota_emitente.append(self.emitentes.codificar(cnpj_emitente))
+        self.nomes_emitentes.setdefault(cnpj_emitente, nome_emitente)
+        self.nota_valor_total.append(para_inteiro(valor_total))
+        self.nota_valor_produtos.append(para_inteiro(valor_produtos))
+        self.nota_cancelada.append(1 if cancelada else 0)
+        return len(self.nota_chave) - 1
+
+    def adicionar_item(self, nota, numero, codigo, descricao, ncm, cfop, quantidade,
+                       valor_unitario, valor_bruto, valor_desconto, valor_total,
+                       pis_cst, pis_valor, cofins_cst, cofins_valor,
+                       monofasico=False, valido=True):
+        """Acrescenta uma linha (campos na ordem de CAMPOS_ITEM)"""
+        self.nota.append(nota)
+        self.numero.append(int(numero))
+        self.monofasico.append(1 if monofasico else 0)
+        self.valido.append(1 if valido else 0)
+
+        valores = self.valores
+        valores['quantidade'].append(para_inteiro(quantidade, CASAS_QUANTIDADE))
+        valores['valor_unitario'].append(para_inteiro(valor_unitario, CASAS_VALOR_UNITARIO))
+        valores['valor_bruto'].append(para_inteiro(valor_bruto))
+        valores['valor_desconto'].append(para_inteiro(valor_desconto))
+        valores['valor_total'].append(para_inteiro(valor_total))
+        valores['pis_valor'].append(para_inteiro(pis_valor))
+        valores['cofins_valor'].append(para_inteiro(cofins_valor))
+
+        for coluna, texto in (('codigo', codigo), ('descricao', descricao), ('ncm', ncm),
+                              ('cfop', cfop), ('pis_cst', pis_cst), ('cofins_cst', cofins_cst)):
+            self.codigos[coluna].append(self.dicionarios[coluna].codificar(texto))
+
+    def adicionar_nota_fiscal(self, nf):
+        """
+        Acrescenta um objeto NotaFiscal (application.parser ou parser_hibrido)
+        com seus itens; valores float e Decimal são convertidos para inteiros
+        escalados sem perda.
+
+        Returns:
+            int: índice da nota
+        """
+        indice = self.adicionar_nota(
+            nf.chave_acesso, nf.numero, nf.serie, nf.data_emissao,
+            _atributo(nf, 'cnpj_emitente', 'emitente_cnpj', ''),
+            _atributo(nf, 'nome_emitente', 'emitente_nome', ''),
+            _atributo(nf, 'valor_total', 'valor_total_nf', 0.0),
+            nf.valor_produtos,
+            getattr(nf, 'status', 'ATIVO') == 'CANCELADO'
+        )
+        for item in nf.itens:
+            self.adicionar_item(
+                indice, *(getattr(item, campo) for campo in CAMPOS_ITEM),
+                monofasico=item.tipo_tributario == "Monofasico",
+                valido=getattr(item, 'valido', True)
+            )
+        return indice
+
+    @classmethod
+    def de_notas(cls, notas):
+        """Monta a tabela a partir de objetos NotaFiscal"""
+        tabela = cls()
+        for nf in notas:
+            tabela.adicionar_nota_fiscal(nf)
+        return tabela
+
+    def marcar_canceladas(self, chaves):
+        """
+        Marca como canceladas as notas com chave de acesso em chaves (ex.:
+        eventos lidos depois das notas).
+
+        Returns:
+            int: quantidade de notas marcadas
+        """
+        chaves = set(chaves)
+        marcadas = 0
+        for indice, chave in enumerate(self.nota_chave):
+            if chave in chaves:
+                self.nota_cancelada[indice] = 1
+                marcadas += 1
+        return marcadas
+
+    def estender(self, outra):
+        """Acrescenta as notas e itens de outra tabela (ex.: lote de um worker)"""
+        deslocamento_nota = len(self.nota_chave)
+        deslocamento_item = len(self.nota)
+
+        self.nota.extend(array(TIPO_INDICE, (nota + deslocamento_nota for nota in outra.nota)))
+        self.numero.extend(outra.numero)
+        self.monofasico.extend(outra.monofasico)
+        self.valido.extend(outra.valido)
+        for coluna in COLUNAS_VALOR:
+            self.valores[coluna].extend(outra.valores[coluna])
+        for coluna in COLUNAS_CODIGO:
+            self.codigos[coluna].extend(
+                _remapear(outra.codigos[coluna], outra.dicionarios[coluna], self.dicionarios[coluna])
+            )
+
+        self.inicio_nota.extend(array(TIPO_INDICE, (inicio + deslocamento_item for inicio in outra.inicio_nota)))
+        self.nota_chave.extend(outra.nota_chave)
+        self.nota_numero.extend(outra.nota_numero)
+        self.nota_serie.extend(outra.nota_serie)
+        self.nota_data_emissao.extend(outra.nota_data_emissao)
+        self.nota_emitente.extend(_remapear(outra.nota_emitente, outra.emitentes, self.emitentes))
+        for cnpj, nome in outra.nomes_emitentes.items():
+            self.nomes_emitentes.setdefault(cnpj, nome)
+        self.nota_valor_total.extend(outra.nota_valor_total)
+        self.nota_valor_produtos.extend(outra.nota_valor_produtos)
+        self.nota_cancelada.extend(outra.nota_cancelada)
+        return self
+
+    # Acesso
+
+    def __len__(self):
+        return len(self.nota)
+
+    def __bool__(self):
+        # Tabela com notas sem itens não é vazia
+        return bool(self.nota_chave)
+
+    @property
+    def qtd_notas(self):
+        return len(self.nota_chave)
+
+    def __getitem__(self, indice):
+        if indice < 0:
+            indice += len(self.nota)
+        if not 0 <= indice < len(self.nota):
+            raise IndexError(indice)
+        return LinhaItem(self, indice)
+
+    def __iter__(self):
+        for indice in range(len(self.nota)):
+            yield LinhaItem(self, indice)
+
+    def coluna(self, nome):
+        """Array da coluna (para colunas codificadas, o array de códigos)"""
+        if nome in self.valores:
+            return self.valores[nome]
+        if nome in self.codigos:
+            return self.codigos[nome]
+        if nome in ('nota', 'numero', 'monofasico', 'valido'):
+            return getattr(self, nome)
+        raise KeyError(nome)
+
+    def decodificada(self, nome):
+        """Valores de texto de uma coluna codificada, linha a linha"""
+        valores = self.dicionarios[nome].valores
+        return [valores[codigo] for codigo in self.codigos[nome]]
+
+    def valor(self, nome, indice):
+        """Valor de uma célula (colunas numéricas como float)"""
+        if nome in self.valores:
+            return para_float(self.valores[nome][indice], COLUNAS_VALOR[nome])
+        if nome in self.codigos:
+            return self.dicionarios[nome].valores[self.codigos[nome][indice]]
+        if nome in ('nota', 'numero', 'monofasico', 'valido'):
+            return getattr(self, nome)[indice]
+        raise AttributeError(nome)
+
+    def itens_nota(self, nota):
+        """Visões dos itens de uma nota"""
+        inicio = self.inicio_nota[nota]
+        fim = self.inicio_nota[nota + 1] if nota + 1 < len(self.inicio_nota) else len(self.nota)
+        return [LinhaItem(self, indice) for indice in range(inicio, fim)]
+
+    def nota_dict(self, nota):
+        """Cabeçalho de uma nota"""
+        cnpj = self.emitentes.decodificar(self.nota_emitente[nota])
+        return {
+            "chave_acesso": self.nota_chave[nota],
+            "numero": self.nota_numero[nota],
+            "serie": self.nota_serie[nota],
+            "data_emissao": self.nota_data_emissao[nota],
+            "cnpj_emitente": cnpj,
+            "nome_emitente": self.nomes_emitentes.get(cnpj, ""),
+            "valor_total": para_float(self.nota_valor_total[nota]),
+            "valor_produtos": para_float(self.nota_valor_produtos[nota]),
+            "cancelada": bool(self.nota_cancelada[nota])
+        }
+
+    # Operações sobre colunas
+
+    def mascara_nao_monofasico(self):
+        return array(TIPO_FLAG, (1 - flag for flag in self.monofasico))
+
+    def somar(self, nome, mascara=None):
+        """Soma exata da coluna, na escala da coluna (centavos para valores)"""
+        return somar(self.coluna(nome), mascara)
+
+    def somar_decimal(self, nome, mascara=None):
+        """Soma da coluna como Decimal exato (fronteira de relatório)"""
+        return para_decimal(self.somar(nome, mascara), COLUNAS_VALOR[nome])
+
+    def contar(self, mascara):
+        return sum(mascara)
+
+    def somar_por(self, nome_codigo, nome_valor, mascara=None):
+        """
+        Soma de uma coluna de valor agrupada por uma coluna codificada.
+
+        Returns:
+            dict: {valor do código: soma na escala da coluna}
+        """
+        codigos = self.codigos[nome_codigo]
+        valores = self.valores[nome_valor]
+        pares = zip(codigos, valores) if mascara is None else compress(zip(codigos, valores), mascara)
+
+        somas = {}
+        for codigo, valor in pares:
+            somas[codigo] = somas.get(codigo, 0) + valor
+        dicionario = self.dicionarios[nome_codigo]
+        return {dicionario.valores[codigo]: soma for codigo, soma in somas.items()}
+
+# Função para ler um atributo com nome alternativo (modelos de application.parser
+# e parser_hibrido); só None conta como ausente, zero e texto vazio são valores
+def _atributo(objeto, nome, alternativo, padrao):
+    valor = getattr(objeto, nome, None)
+    if valor is None:
+        valor = getattr(objeto, alternativo, None)
+    return padrao if valor is None else valor
+
+# Função para remapear códigos de um dicionário para outro
+def _remapear(codigos, origem, destino):
+    mapa = [destino.codificar(valor) for valor in origem.valores]
+    return array(TIPO_CODIGO, (mapa[codigo] for codigo in codigos))
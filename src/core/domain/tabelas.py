@@ -1,9 +1,6 @@
-import os
-import json
 from datetime import datetime
-
-# Diretório das tabelas
-DIR_TABELAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tabelas")
+from core.domain.registro_tabelas import registro_tabelas, aquecer_tabelas, normalizar_ncm, ARQUIVO_NCM_MONOFASICO
+from core.domain.simples_nacional import obter_tabela_anexo
 
 # Mapas de meses
 MESES = {
@@ -23,15 +20,12 @@ MESES = {
 
 # Função para carregar uma tabela JSON
 def carregar_tabela(nome_arquivo):
-    caminho = os.path.join(DIR_TABELAS, nome_arquivo)
-    try:
-        if os.path.exists(caminho):
-            with open(caminho, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return None
-    except Exception as e:
-        print(f"Erro ao carregar tabela {nome_arquivo}: {str(e)}")
-        return None
+    """
+    Carrega uma tabela JSON pelo registro do processo (lida do disco apenas
+    na primeira chamada ou após modificação do arquivo).
+    O objeto retornado é compartilhado e não deve ser alterado.
+    """
+    return registro_tabelas.obter(nome_arquivo)
 
 # Função para consultar taxa SELIC
 def consultar_selic(periodo):
@@ -57,19 +51,11 @@ def consultar_selic(periodo):
     if not nome_mes:
         return None
     
-    # Carregar tabela SELIC
-    tabela_selic = carregar_tabela("Tabela Selic.json")
-    if not tabela_selic:
+    # Buscar taxa SELIC para o mês e ano na tabela compilada
+    try:
+        return registro_tabelas.selic().get((int(ano), int(mes)))
+    except ValueError:
         return None
-    
-    # Buscar taxa SELIC para o mês e ano
-    for linha in tabela_selic:
-        if linha.get("Mês/Ano") == nome_mes:
-            taxa = linha.get(ano)
-            if taxa is not None:
-                return float(taxa)
-    
-    return None
 
 def calcular_selic_acumulada(periodo_inicial, periodo_final=None):
     """
@@ -87,83 +73,42 @@ def calcular_selic_acumulada(periodo_inicial, periodo_final=None):
         data_atual = datetime.now()
         periodo_final = f"{data_atual.year}-{data_atual.month:02d}"
     
-    # Normalizar formatos
-    if '-' in periodo_inicial:
-        ano_inicial, mes_inicial = periodo_inicial.split('-')
-    elif '/' in periodo_inicial:
-        mes_inicial, ano_inicial = periodo_inicial.split('/')
-    else:
-        return 1.0  # Retornar 1.0 (sem atualização) em caso de erro
-    
-    if '-' in periodo_final:
-        ano_final, mes_final = periodo_final.split('-')
-    elif '/' in periodo_final:
-        mes_final, ano_final = periodo_final.split('/')
-    else:
-        return 1.0  # Retornar 1.0 (sem atualização) em caso de erro
-    
-    # Converter para inteiros
-    ano_inicial = int(ano_inicial)
-    mes_inicial = int(mes_inicial)
-    ano_final = int(ano_final)
-    mes_final = int(mes_final)
-    
-    # Carregar tabela SELIC
-    tabela_selic = carregar_tabela("Tabela Selic.json")
-    if not tabela_selic:
-        return 1.0
-    
-    # Criar mapeamento de meses/anos para taxas
-    mapa_selic = {}
-    for linha in tabela_selic:
-        mes_nome = linha.get("Mês/Ano")
-        if mes_nome not in MESES.values():
-            continue
-        
-        # Obter número do mês
-        mes_num = None
-        for num, nome in MESES.items():
-            if nome == mes_nome:
-                mes_num = int(num)
-                break
-        
-        if mes_num is None:
-            continue
-        
-        for ano_col in linha.keys():
-            if ano_col == "Mês/Ano":
-                continue
-            
-            try:
-                ano_num = int(ano_col)
-                taxa = linha.get(ano_col)
-                if taxa is not None:
-                    mapa_selic[(ano_num, mes_num)] = float(taxa)
-            except (ValueError, TypeError):
-                continue
+    # Produtos acumulados já compilados: o fator é uma única divisão
+    # (retorna 1.0, sem atualização, se algum período for inválido)
+    return registro_tabelas.selic().fator(periodo_inicial, periodo_final)
+
+# Função para calcular a SELIC acumulada de vários períodos de uma vez
+def calcular_fatores_selic(periodos_iniciais, periodo_final=None):
+    """
+    Calcula o fator SELIC acumulado de cada período até o período final.
     
-    # Calcular SELIC acumulada
-    fator_acumulado = 1.0
+    Args:
+        periodos_iniciais: lista de períodos "YYYY-MM" (ou "MM/YYYY")
+        periodo_final: string no formato "YYYY-MM" (padrão: hoje)
     
-    # Iniciar a partir do mês seguinte ao período inicial
-    ano_atual = ano_inicial
-    mes_atual = mes_inicial + 1
-    if mes_atual > 12:
-        mes_atual = 1
-        ano_atual += 1
+    Returns:
+        list: Fator acumulado por período, na mesma ordem da entrada
+    """
+    if periodo_final is None:
+        data_atual = datetime.now()
+        periodo_final = f"{data_atual.year}-{data_atual.month:02d}"
     
-    # Acumular até o mês do período final
-    while (ano_atual < ano_final) or (ano_atual == ano_final and mes_atual <= mes_final):
-        taxa = mapa_selic.get((ano_atual, mes_atual), 0)
-        fator_acumulado *= (1 + taxa)
-        
-        # Avançar para o próximo mês
-        mes_atual += 1
-        if mes_atual > 12:
-            mes_atual = 1
-            ano_atual += 1
+    return registro_tabelas.selic().fatores(list(periodos_iniciais), periodo_final)
+
+# Função para obter o índice de NCMs monofásicos
+def obter_indice_ncm_monofasico():
+    """
+    Retorna o conjunto de NCMs monofásicos (strings de 8 dígitos), carregado
+    pelo registro apenas na primeira chamada ou quando o arquivo for modificado.
     
-    return fator_acumulado
+    Returns:
+        frozenset: NCMs monofásicos
+    """
+    return registro_tabelas.ncms_monofasicos()
+
+# Função para descartar o índice (força recarga na próxima consulta)
+def limpar_cache_ncm_monofasico():
+    registro_tabelas.invalidar(ARQUIVO_NCM_MONOFASICO)
 
 # Função para verificar se um NCM é monofásico
 def verificar_ncm_monofasico(ncm):
@@ -176,23 +121,29 @@ def verificar_ncm_monofasico(ncm):
     Returns:
         bool: True se o NCM for monofásico, False caso contrário
     """
-    # Converter para inteiro para facilitar a comparação
-    try:
-        ncm_int = int(ncm)
-    except (ValueError, TypeError):
+    # Normalizar para 8 dígitos para comparar com o índice
+    ncm_normalizado = normalizar_ncm(ncm)
+    if ncm_normalizado is None:
         return False
     
-    # Carregar tabela de NCMs monofásicos
-    tabela_ncm = carregar_tabela("Espelho de ncms monofásicas.json")
-    if not tabela_ncm:
-        return False
+    return ncm_normalizado in obter_indice_ncm_monofasico()
+
+# Função para classificar vários NCMs em uma única chamada
+def classificar_ncms_monofasicos(ncms):
+    """
+    Verifica uma sequência de NCMs contra a tabela de NCMs monofásicos.
     
-    # Verificar se o NCM está na lista
-    for item in tabela_ncm:
-        if item.get("NCMs monofásicos") == ncm_int:
-            return True
+    Args:
+        ncms: sequência de códigos NCM (str ou int)
     
-    return False
+    Returns:
+        list: bool por NCM, na mesma ordem da entrada
+    """
+    indice = obter_indice_ncm_monofasico()
+    resultado = []
+    for ncm in ncms:
+        resultado.append(normalizar_ncm(ncm) in indice)
+    return resultado
 
 # Função para obter alíquota e valor a deduzir do Simples Nacional
 def obter_parametros_simples(receita_bruta, anexo=1):
@@ -206,23 +157,12 @@ def obter_parametros_simples(receita_bruta, anexo=1):
     Returns:
         tuple: (alíquota nominal, valor a deduzir) ou (None, None) se não encontrado
     """
-    # Para o MVP, definir manualmente os valores da tabela
-    # Com base na tabela do Simples Nacional para 2024
-    faixas = [
-        {"limite_inferior": 0, "limite_superior": 180000, "aliquota": 0.04, "valor_deduzir": 0},
-        {"limite_inferior": 180000.01, "limite_superior": 360000, "aliquota": 0.073, "valor_deduzir": 5940},
-        {"limite_inferior": 360000.01, "limite_superior": 720000, "aliquota": 0.095, "valor_deduzir": 13860},
-        {"limite_inferior": 720000.01, "limite_superior": 1800000, "aliquota": 0.107, "valor_deduzir": 22500},
-        {"limite_inferior": 1800000.01, "limite_superior": 3600000, "aliquota": 0.143, "valor_deduzir": 87300},
-        {"limite_inferior": 3600000.01, "limite_superior": 4800000, "aliquota": 0.19, "valor_deduzir": 378000}
-    ]
-    
-    # Encontrar a faixa correspondente à receita bruta
-    for faixa in faixas:
-        if faixa["limite_inferior"] <= receita_bruta <= faixa["limite_superior"]:
-            return faixa["aliquota"], faixa["valor_deduzir"]
+    # Tabela compilada do anexo, com busca binária da faixa
+    faixa = obter_tabela_anexo(anexo).faixa(receita_bruta)
+    if faixa is None:
+        return None, None
     
-    return None, None
+    return faixa.aliquota_nominal, faixa.valor_deduzir
 
 # Função para calcular alíquota efetiva
 def calcular_aliquota_efetiva(receita_bruta, aliquota_nominal, valor_deduzir):
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Cache Persistente de Parsing de XMLs
+Guarda em SQLite o resultado já processado de cada arquivo, para que novas
+execuções de um período só parseiem XMLs novos ou alterados.
+
+Validação de cada entrada:
+1. (caminho, tamanho, mtime) iguais -> acerto sem ler o arquivo
+2. conteúdo com o mesmo SHA-256 de uma entrada existente -> acerto por hash
+   (arquivo tocado, copiado ou movido); o hash do arquivo é calculado pela
+   função recebida em funcao_hash (ex.: UtilArquivo.hash_arquivo)
+"""
+
+import os
+import zlib
+import pickle
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+# Versão do formato gravado; alterar invalida todos os caches existentes
+VERSAO_CACHE = 6
+
+# Quantidade de gravações acumuladas antes de cada commit
+TAMANHO_TRANSACAO = 500
+
+# Sentinela para "entrada não encontrada" (None é um resultado válido)
+AUSENTE = object()
+
+def hash_conteudo(conteudo: bytes) -> str:
+    """SHA-256 hexadecimal do conteúdo do arquivo"""
+    return hashlib.sha256(conteudo).hexdigest()
+
+def forma_canonica(valor: Any) -> Any:
+    """
+    Representação de valor independente da ordem de dicionários e conjuntos
+    (tabelas em dict, set, frozenset ou lista de dicts geram sempre a mesma forma)
+    """
+    if isinstance(valor, dict):
+        return ('dict', tuple(sorted(((forma_canonica(chave), forma_canonica(item))
+                                      for chave, item in valor.items()), key=repr)))
+    if isinstance(valor, (set, frozenset)):
+        return ('set', tuple(sorted((forma_canonica(item) for item in valor), key=repr)))
+    if isinstance(valor, (list, tuple)):
+        return tuple(forma_canonica(item) for item in valor)
+    return valor
+
+def assinatura_contexto(*partes: Any) -> str:
+    """
+    Assinatura das condições do parsing (versão, tabelas de referência, etc.)
+    Entradas gravadas com outra assinatura são ignoradas
+    """
+    sha = hashlib.sha256(f"v{VERSAO_CACHE}".encode('utf-8'))
+    for parte in partes:
+        sha.update(b'\x00')
+        sha.update(repr(forma_canonica(parte)).encode('utf-8'))
+    return sha.hexdigest()[:16]
+
+class CacheParse:
+    """
+    Cache de resultados de parsing por arquivo, persistido em SQLite.
+    Uma instância pode ser compartilhada entre threads; em pools de processos
+    deve ser consultada e gravada apenas no processo principal.
+    """
+    
+    AUSENTE = AUSENTE
+
+    def __init__(self, caminho_db: str, contexto: Any = "",
+                 funcao_hash: Optional[Callable[[str], str]] = None):
+        """
+        Args:
+            caminho_db: Arquivo SQLite do cache
+            contexto: Condições do parsing (qualquer valor; dicts e conjuntos
+                      são comparados sem depender da ordem)
+            funcao_hash: SHA-256 hexadecimal de um arquivo pelo caminho; sem ela
+                         não há acerto por hash e as entradas são gravadas sem hash
+        """
+        self.caminho_db = str(caminho_db)
+        self.assinatura = assinatura_contexto(contexto)
+        self.funcao_hash = funcao_hash
+        self.acertos = 0
+        self.acertos_hash = 0
+        self.faltas = 0
+
+        diretorio = os.path.dirname(os.path.abspath(self.caminho_db))
+        os.makedirs(diretorio, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pendentes = 0
+        self._conexao = sqlite3.connect(self.caminho_db, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._migrar_chave_antiga()
+        # Uma linha por (arquivo, contexto): parsers com contextos diferentes
+        # podem dividir o mesmo arquivo de cache sem apagar as entradas um do outro
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                caminho TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                assinatura TEXT NOT NULL,
+                dados BLOB NOT NULL,
+                PRIMARY KEY (caminho, assinatura)
+            )
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_documentos_hash ON documentos (hash, assinatura)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_documentos_tamanho ON documentos (tamanho, assinatura)")
+        self._conexao.commit()
+
+    def _migrar_chave_antiga(self):
+        """Descarta a tabela do formato antigo (chave só pelo caminho); as
+        entradas dela já não valem, pois a assinatura mudou com VERSAO_CACHE"""
+        colunas_chave = [linha[1] for linha in self._conexao.execute("PRAGMA table_info(documentos)") if linha[5]]
+        if colunas_chave == ['caminho']:
+            self._conexao.execute("DROP TABLE documentos")
+
+    @staticmethod
+    def estado_arquivo(caminho: str) -> Tuple[int, int]:
+        """(tamanho, mtime em nanossegundos) do arquivo"""
+        estado = os.stat(caminho)
+        return estado.st_size, estado.st_mtime_ns
+
+    @staticmethod
+    def _codificar(valor: Any) -> bytes:
+        return zlib.compress(pickle.dumps(valor, protocol=pickle.HIGHEST_PROTOCOL), 1)
+
+    @staticmethod
+    def decodificar(dados: bytes) -> Any:
+        """Resultado gravado a partir do blob devolvido por consultar(..., bruto=True)"""
+        return pickle.loads(zlib.decompress(dados))
+
+    def consultar(self, caminho: str, bruto: bool = False) -> Any:
+        """
+        Retorna o resultado gravado para o arquivo, ou AUSENTE
+        se o arquivo é novo ou foi alterado
+        bruto: devolve o blob comprimido, a ser lido depois com decodificar()
+        """
+        caminho = os.path.abspath(caminho)
+        try:
+            tamanho, mtime_ns = self.estado_arquivo(caminho)
+        except OSError:
+            return AUSENTE
+
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT tamanho, mtime_ns, dados FROM documentos WHERE caminho = ? AND assinatura = ?",
+                (caminho, self.assinatura)
+            ).fetchone()
+
+            # 1. Mesmo caminho, tamanho e mtime: sem ler o arquivo
+            if linha is not None and linha[0] == tamanho and linha[1] == mtime_ns:
+                self.acertos += 1
+                return linha[2] if bruto else self.decodificar(linha[2])
+
+            if self.funcao_hash is None:
+                self.faltas += 1
+                return AUSENTE
+
+            # 2. Hash apenas quando há entrada de mesmo tamanho (evita ler arquivos novos)
+            candidato = self._conexao.execute(
+                "SELECT 1 FROM documentos WHERE tamanho = ? AND assinatura = ? LIMIT 1",
+                (tamanho, self.assinatura)
+            ).fetchone()
+            if candidato is None:
+                self.faltas += 1
+                return AUSENTE
+
+        try:
+            conteudo_hash = self.funcao_hash(caminho)
+        except OSError:
+            return AUSENTE
+
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT dados FROM documentos WHERE hash = ? AND assinatura = ? LIMIT 1",
+                (conteudo_hash, self.assinatura)
+            ).fetchone()
+            if linha is None:
+                self.faltas += 1
+                return AUSENTE
+
+            # Atualiza a entrada do caminho para acertar direto na próxima execução
+            self._gravar_linha(caminho, tamanho, mtime_ns, conteudo_hash, linha[0])
+            self.acertos_hash += 1
+
+        return linha[0] if bruto else self.decodificar(linha[0])
+
+    def gravar(self, caminho: str, valor: Any, conteudo_hash: Optional[str] = None,
+               estado: Optional[Tuple[int, int]] = None):
+        """
+        Grava o resultado do arquivo
+        Args:
+            caminho: Caminho do arquivo
+            valor: Resultado serializável com pickle
+            conteudo_hash: SHA-256 do conteúdo, se já calculado por quem leu o arquivo
+            estado: (tamanho, mtime_ns) observado antes da leitura
+        """
+        caminho = os.path.abspath(caminho)
+        try:
+            tamanho, mtime_ns = estado or self.estado_arquivo(caminho)
+            if not conteudo_hash and self.funcao_hash is not None:
+                conteudo_hash = self.funcao_hash(caminho)
+        except OSError:
+            return
+
+        dados = self._codificar(valor)
+        with self._lock:
+            self._gravar_linha(caminho, tamanho, mtime_ns, conteudo_hash, dados)
+
+    def _gravar_linha(self, caminho: str, tamanho: int, mtime_ns: int, conteudo_hash: str, dados: bytes):
+        self._conexao.execute(
+            "INSERT OR REPLACE INTO documentos (caminho, tamanho, mtime_ns, hash, assinatura, dados) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (caminho, tamanho, mtime_ns, conteudo_hash or '', self.assinatura, dados)
+        )
+        self._pendentes += 1
+        if self._pendentes >= TAMANHO_TRANSACAO:
+            self._conexao.commit()
+            self._pendentes = 0
+
+    def sincronizar(self):
+        """Confirma gravações pendentes no disco"""
+        with self._lock:
+            self._conexao.commit()
+            self._pendentes = 0
+
+    def limpar(self):
+        """Remove todas as entradas"""
+        with self._lock:
+            self._conexao.execute("DELETE FROM documentos")
+            self._conexao.commit()
+            self._pendentes = 0
+
+    def fechar(self):
+        """Confirma pendências e fecha a conexão"""
+        self.sincronizar()
+        with self._lock:
+            self._conexao.close()
+
+    def obter_estatisticas(self) -> dict:
+        """Acertos e faltas desde a abertura do cache"""
+        return {
+            'acertos': self.acertos,
+            'acertos_hash': self.acertos_hash,
+            'faltas': self.faltas
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT COUNT(*) FROM documentos WHERE assinatura = ?", (self.assinatura,)
+            ).fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Descoberta de Períodos
+Localiza os períodos (YYYY-MM) disponíveis a partir das pastas de XMLs e
+dos arquivos PGDAS (<periodo>.json). Usada pelo job de vários períodos da
+aplicação e pelo sistema integrado do parser híbrido.
+"""
+
+import re
+from pathlib import Path
+from typing import Iterable, List
+
+# Nome de período (pasta de XMLs ou arquivo PGDAS): YYYY-MM
+PADRAO_PERIODO = re.compile(r'\d{4}-\d{2}')
+
+def detectar_periodos(dir_xmls, dir_pgdas, sufixos_xmls: Iterable[str] = ('',)) -> List[str]:
+    """
+    Detecta os períodos disponíveis para processamento
+    Args:
+        dir_xmls: diretório com uma pasta de XMLs por período
+        dir_pgdas: diretório com um <periodo>.json por período
+        sufixos_xmls: sufixos aceitos no nome das pastas de XMLs (ex.: '-validos')
+    Returns:
+        list: períodos YYYY-MM sem repetição, em ordem crescente
+    """
+    periodos = set()
+    sufixos_xmls = tuple(sufixos_xmls)
+
+    dir_xmls = Path(dir_xmls)
+    if dir_xmls.is_dir():
+        for item in dir_xmls.iterdir():
+            if not item.is_dir():
+                continue
+            for sufixo in sufixos_xmls:
+                if sufixo and not item.name.endswith(sufixo):
+                    continue
+                periodo = item.name[:len(item.name) - len(sufixo)]
+                if PADRAO_PERIODO.fullmatch(periodo):
+                    periodos.add(periodo)
+                    break
+
+    dir_pgdas = Path(dir_pgdas)
+    if dir_pgdas.is_dir():
+        for arquivo in dir_pgdas.glob('*.json'):
+            if PADRAO_PERIODO.fullmatch(arquivo.stem):
+                periodos.add(arquivo.stem)
+
+    return sorted(periodos)
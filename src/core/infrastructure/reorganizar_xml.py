@@ -11,6 +11,11 @@ from pathlib import Path
 from xml.etree import ElementTree as ET
 from datetime import datetime
 import argparse
+import sys
+
+# Decodificador da chave de acesso do parser híbrido
+sys.path.append(str(Path(__file__).resolve().parents[2] / "parser_hibrido"))
+from chave_acesso import rotear_arquivo
 
 def extrair_data_do_xml(arquivo_path):
     """Extrai data de emissão do XML"""
@@ -28,20 +33,12 @@ def extrair_data_do_xml(arquivo_path):
         print(f"Erro ao ler {arquivo_path}: {e}")
     return None
 
-def extrair_data_do_nome(nome_arquivo):
-    """Extrai data do nome do arquivo NFe: UF+AAMM+DD"""
-    if len(nome_arquivo) >= 8:
-        ano_mes = nome_arquivo[2:6]  # posições 2-5
-        dia = nome_arquivo[6:8]      # posições 6-7
-        
-        ano = '20' + ano_mes[:2]     # 20 + AA
-        mes = ano_mes[2:4]           # MM
-        
-        try:
-            if 1 <= int(mes) <= 12:
-                return f"{ano}-{mes}-{dia}"
-        except:
-            pass
+def extrair_periodo_da_chave(arquivo_path):
+    """Extrai período (YYYY-MM) da chave de acesso no nome ou no início do arquivo"""
+    try:
+        return rotear_arquivo(arquivo_path).periodo
+    except OSError as e:
+        print(f"Erro ao ler {arquivo_path}: {e}")
     return None
 
 def main():
@@ -77,14 +74,13 @@ def main():
             arquivo_path = os.path.join(pasta_path, arquivo)
             
             try:
-                # Extrair data (priorizar XML, usar nome como backup)
-                data_xml = extrair_data_do_xml(arquivo_path)
-                data_nome = extrair_data_do_nome(arquivo)
-                
-                data_referencia = data_xml if data_xml else data_nome
+                # Período pela chave de acesso; parse do XML só sem chave válida
+                pasta_correta = extrair_periodo_da_chave(arquivo_path)
+                if pasta_correta is None:
+                    data_xml = extrair_data_do_xml(arquivo_path)
+                    pasta_correta = data_xml[:7] if data_xml else None  # YYYY-MM
                 
-                if data_referencia:
-                    pasta_correta = data_referencia[:7]  # YYYY-MM
+                if pasta_correta:
                     
                     # Verificar se está na pasta errada
                     if pasta_correta != pasta:
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Repositório de Resultados de Processamento
+Guarda em SQLite os metadados e as métricas-resumo de cada sessão
+(indexados por período, data e cliente) e o resultado completo comprimido,
+que só é lido quando a sessão é aberta.
+
+Listagens (histórico) consultam apenas as colunas-resumo; nenhum JSON
+completo é lido ou decodificado para montar a página. Séries de gráficos
+(detalhamentos já agregados pelo motor) e os itens da sessão ficam em tabelas
+próprias, para que o dashboard busque só o que exibe: séries prontas e
+páginas de itens ordenadas e filtradas no SQLite.
+"""
+
+import os
+import json
+import zlib
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from itertools import compress
+from typing import Any, Dict, List, Optional, Tuple
+from core.domain.centavos import para_float
+from core.domain.motor_creditos import AgregacaoCreditos
+
+# Formato do timestamp das sessões (nome dos arquivos resultado_<timestamp>.json)
+FORMATO_TIMESTAMP = '%Y%m%d_%H%M%S'
+
+# Colunas-resumo devolvidas nas listagens
+COLUNAS_RESUMO = (
+    'session_id', 'periodo', 'data_processamento', 'cliente', 'xml_zip', 'pgdas_pdf',
+    'qtd_xmls', 'qtd_notas', 'total_monofasico', 'total_nao_monofasico',
+    'credito_pis', 'credito_cofins', 'credito_total'
+)
+
+# Colunas da tabela de itens, na ordem gravada
+COLUNAS_ITEM = (
+    'nota', 'chave_acesso', 'emitente', 'dia', 'item', 'codigo', 'descricao',
+    'ncm', 'cfop', 'pis_cst', 'cofins_cst', 'valor_total', 'monofasico'
+)
+
+# Ordenações aceitas na listagem de itens (coluna da API -> coluna do SQLite)
+ORDENACOES_ITEM = {
+    'valor_total': 'valor_centavos', 'ncm': 'ncm', 'cfop': 'cfop', 'descricao': 'descricao',
+    'emitente': 'emitente', 'dia': 'dia', 'nota': 'nota', 'monofasico': 'monofasico'
+}
+
+# Séries derivadas do detalhamento do motor (ordenadas pela receita, maior primeiro)
+SERIES_DETALHAMENTO = ('ncm', 'cfop', 'pis_cst', 'cofins_cst', 'emitente')
+
+def resumir_resultado(dados: Dict[str, Any], cliente: str = "") -> Dict[str, Any]:
+    """
+    Extrai metadados e métricas-resumo de um resultado de sessão
+    (formato gravado pelo frontend: periodo, timestamp, arquivos, resultados;
+    session_id, quando presente, identifica a sessão no lugar do timestamp)
+    """
+    resultados = dados.get('resultados', {})
+    arquivos = dados.get('arquivos', {})
+    creditos = resultados.get('creditos', {})
+    return {
+        'session_id': dados.get('session_id') or dados['timestamp'],
+        'periodo': dados.get('periodo', ''),
+        'data_processamento': datetime.strptime(dados['timestamp'], FORMATO_TIMESTAMP).isoformat(sep=' '),
+        'cliente': cliente or dados.get('cliente', ''),
+        'xml_zip': arquivos.get('xml_zip', ''),
+        'pgdas_pdf': arquivos.get('pgdas_pdf', ''),
+        'qtd_xmls': arquivos.get('qtd_xmls', 0),
+        'qtd_notas': resultados.get('estatisticas', {}).get('qtd_notas', 0),
+        'total_monofasico': resultados.get('total_monofasico', 0),
+        'total_nao_monofasico': resultados.get('total_nao_monofasico', 0),
+        'credito_pis': creditos.get('pis', 0),
+        'credito_cofins': creditos.get('cofins', 0),
+        'credito_total': creditos.get('total', 0)
+    }
+
+def montar_series(resultados: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Séries prontas para os gráficos do dashboard, a partir de um resultado
+    de calcular_creditos (o detalhamento já vem agregado pelo motor)
+    """
+    recolhidos = resultados.get('tributos_recolhidos', {})
+    devidos = resultados.get('tributos_devidos', {})
+    series = {
+        'tipo_produto': [
+            {'tipo': 'Monofásico', 'valor': resultados.get('total_monofasico', 0)},
+            {'tipo': 'Não-monofásico', 'valor': resultados.get('total_nao_monofasico', 0)}
+        ],
+        'tributos': [
+            {'tributo': tributo, 'recolhido': recolhidos.get(tributo, 0), 'devido': devidos.get(tributo, 0)}
+            for tributo in ('pis', 'cofins')
+        ]
+    }
+
+    # Detalhamento gravado na ordem do motor (carregar() o remonta intacto);
+    # a ordem dos gráficos é aplicada na consulta por ordenar_serie()
+    detalhamento = resultados.get('detalhamento', {})
+    for dimensao in SERIES_DETALHAMENTO + ('dia',):
+        if dimensao in detalhamento:
+            series[dimensao] = detalhamento[dimensao]
+    return series
+
+def ordenar_serie(nome: str, dados: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Dias em ordem cronológica; demais dimensões pela receita, maior primeiro"""
+    if nome == 'dia':
+        return sorted(dados, key=lambda linha: linha['dia'])
+    if nome in SERIES_DETALHAMENTO:
+        return sorted(dados, key=lambda linha: -(linha['rvm'] + linha['rvn']))
+    return dados
+
+def linhas_itens(tabela, somente_ativos: bool = False) -> List[Tuple]:
+    """
+    Linhas da tabela de itens (COLUNAS_ITEM) a partir de uma TabelaItens;
+    como no motor de créditos, todos os itens entram, salvo com somente_ativos=True
+    (itens inválidos e de notas canceladas ficam de fora)
+    """
+    ativos = AgregacaoCreditos(tabela, somente_ativos).ativos
+    notas = [
+        (tabela.nota_numero[nota], tabela.nota_chave[nota],
+         tabela.emitentes.decodificar(tabela.nota_emitente[nota]), (tabela.nota_data_emissao[nota] or "")[:10])
+        for nota in range(tabela.qtd_notas)
+    ]
+    colunas = [tabela.decodificada(nome) for nome in ('codigo', 'descricao', 'ncm', 'cfop', 'pis_cst', 'cofins_cst')]
+    linhas = zip(tabela.nota, tabela.numero, *colunas, tabela.valores['valor_total'], tabela.monofasico)
+    return [
+        notas[nota] + (numero, codigo, descricao, ncm, cfop, pis_cst, cofins_cst, centavos, monofasico)
+        for nota, numero, codigo, descricao, ncm, cfop, pis_cst, cofins_cst, centavos, monofasico
+        in compress(linhas, ativos)
+    ]
+
+def _escapar_like(texto: str) -> str:
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+class RepositorioResultados:
+    """
+    Resultados de sessões persistidos em SQLite.
+    Uma instância pode ser compartilhada entre threads (ex.: servidor Flask).
+    """
+
+    def __init__(self, caminho_db: str):
+        self.caminho_db = str(caminho_db)
+        diretorio = os.path.dirname(os.path.abspath(self.caminho_db))
+        os.makedirs(diretorio, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(self.caminho_db, check_same_thread=False)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS sessoes (
+                session_id TEXT PRIMARY KEY,
+                periodo TEXT NOT NULL,
+                data_processamento TEXT NOT NULL,
+                cliente TEXT NOT NULL,
+                xml_zip TEXT NOT NULL,
+                pgdas_pdf TEXT NOT NULL,
+                qtd_xmls INTEGER NOT NULL,
+                qtd_notas INTEGER NOT NULL,
+                total_monofasico REAL NOT NULL,
+                total_nao_monofasico REAL NOT NULL,
+                credito_pis REAL NOT NULL,
+                credito_cofins REAL NOT NULL,
+                credito_total REAL NOT NULL,
+                dados BLOB NOT NULL
+            )
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_periodo ON sessoes (periodo, data_processamento)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_data ON sessoes (data_processamento)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_sessoes_cliente ON sessoes (cliente, data_processamento)")
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS series (
+                session_id TEXT NOT NULL,
+                serie TEXT NOT NULL,
+                dados BLOB NOT NULL,
+                PRIMARY KEY (session_id, serie)
+            )
+        """)
+        self._conexao.execute("""
+            CREATE TABLE IF NOT EXISTS itens (
+                session_id TEXT NOT NULL,
+                nota TEXT NOT NULL,
+                chave_acesso TEXT NOT NULL,
+                emitente TEXT NOT NULL,
+                dia TEXT NOT NULL,
+                item INTEGER NOT NULL,
+                codigo TEXT NOT NULL,
+                descricao TEXT NOT NULL,
+                ncm TEXT NOT NULL,
+                cfop TEXT NOT NULL,
+                pis_cst TEXT NOT NULL,
+                cofins_cst TEXT NOT NULL,
+                valor_centavos INTEGER NOT NULL,
+                monofasico INTEGER NOT NULL
+            )
+        """)
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_itens_valor ON itens (session_id, valor_centavos)")
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_itens_ncm ON itens (session_id, ncm)")
+        self._conexao.commit()
+
+    @staticmethod
+    def _codificar(dados: Dict[str, Any]) -> bytes:
+        return zlib.compress(json.dumps(dados, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+
+    @staticmethod
+    def _decodificar(dados: bytes) -> Dict[str, Any]:
+        return json.loads(zlib.decompress(dados))
+
+    def salvar(self, dados: Dict[str, Any], cliente: str = "", itens=None) -> str:
+        """
+        Grava (ou substitui) o resultado da sessão
+        O detalhamento vai para a tabela de séries e não é repetido no
+        resultado comprimido; carregar() remonta o resultado completo.
+        Args:
+            itens: TabelaItens da sessão (opcional), para a listagem de itens
+        Returns:
+            str: session_id
+        """
+        resumo = resumir_resultado(dados, cliente)
+        session_id = resumo['session_id']
+        series = montar_series(dados.get('resultados', {}))
+
+        base = dict(dados, resultados={
+            chave: valor for chave, valor in dados.get('resultados', {}).items() if chave != 'detalhamento'
+        })
+        valores = [resumo[coluna] for coluna in COLUNAS_RESUMO] + [self._codificar(base)]
+        linhas = linhas_itens(itens) if itens is not None else None
+
+        with self._lock:
+            self._conexao.execute(
+                f"INSERT OR REPLACE INTO sessoes ({', '.join(COLUNAS_RESUMO)}, dados) "
+                f"VALUES ({', '.join('?' * (len(COLUNAS_RESUMO) + 1))})",
+                valores
+            )
+            self._gravar_series(session_id, series)
+            if linhas is not None:
+                self._conexao.execute("DELETE FROM itens WHERE session_id = ?", (session_id,))
+                self._conexao.executemany(
+                    f"INSERT INTO itens VALUES ({', '.join('?' * (len(COLUNAS_ITEM) + 1))})",
+                    ((session_id,) + linha for linha in linhas)
+                )
+            self._conexao.commit()
+        return session_id
+
+    def _gravar_series(self, session_id: str, series: Dict[str, List[Dict[str, Any]]]):
+        self._conexao.execute("DELETE FROM series WHERE session_id = ?", (session_id,))
+        self._conexao.executemany(
+            "INSERT INTO series (session_id, serie, dados) VALUES (?, ?, ?)",
+            ((session_id, nome, self._codificar(dados)) for nome, dados in series.items())
+        )
+
+    def carregar(self, session_id: str, detalhamento: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Resultado da sessão (descomprimido sob demanda) ou None
+        Args:
+            detalhamento: remonta resultados['detalhamento'] a partir das séries
+                          (False: só totais, alíquotas e estatísticas)
+        """
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT dados FROM sessoes WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if linha is None:
+            return None
+
+        dados = self._decodificar(linha[0])
+        resultados = dados.get('resultados', {})
+        if detalhamento and 'detalhamento' not in resultados:
+            detalhes = {}
+            for dimensao in SERIES_DETALHAMENTO + ('dia',):
+                serie = self._serie(session_id, dimensao)
+                if serie:
+                    detalhes[dimensao] = serie
+            if detalhes:
+                resultados['detalhamento'] = detalhes
+        elif not detalhamento:
+            resultados.pop('detalhamento', None)
+        return dados
+
+    def serie(self, session_id: str, nome: str, limite: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Série pré-agregada de um gráfico, já ordenada (None se a sessão não tiver a série)
+        Sessões gravadas antes das séries têm as séries montadas na primeira consulta.
+        """
+        dados = self._serie(session_id, nome)
+        if dados is None:
+            return None
+        dados = ordenar_serie(nome, dados)
+        return dados[:limite] if limite else dados
+
+    def _serie(self, session_id: str, nome: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT dados FROM series WHERE session_id = ? AND serie = ?", (session_id, nome)
+            ).fetchone()
+            if linha is not None:
+                return self._decodificar(linha[0])
+
+            existentes = self._conexao.execute(
+                "SELECT COUNT(*) FROM series WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            if existentes:
+                return None
+            sessao = self._conexao.execute(
+                "SELECT dados FROM sessoes WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if sessao is None:
+                return None
+            series = montar_series(self._decodificar(sessao[0]).get('resultados', {}))
+            self._gravar_series(session_id, series)
+            self._conexao.commit()
+            return series.get(nome)
+
+    def listar_itens(self, session_id: str, filtros: Optional[Dict[str, Any]] = None,
+                     ordenar: str = 'valor_total', decrescente: bool = True,
+                     pagina: int = 1, por_pagina: int = 50) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Página de itens da sessão, ordenada e filtrada no SQLite
+        Args:
+            filtros: ncm (prefixo), cfop, cst (PIS ou COFINS), emitente, dia,
+                     monofasico (bool) e busca (trecho da descrição)
+            ordenar: chave de ORDENACOES_ITEM
+        Returns:
+            tuple: (itens da página, total de itens do filtro)
+        """
+        filtros = filtros or {}
+        condicoes = ["session_id = ?"]
+        parametros = [session_id]
+        if filtros.get('ncm'):
+            condicoes.append("ncm LIKE ? ESCAPE '\\'")
+            parametros.append(_escapar_like(filtros['ncm']) + '%')
+        for campo in ('cfop', 'emitente', 'dia'):
+            if filtros.get(campo):
+                condicoes.append(f"{campo} = ?")
+                parametros.append(filtros[campo])
+        if filtros.get('cst'):
+            condicoes.append("(pis_cst = ? OR cofins_cst = ?)")
+            parametros.extend([filtros['cst'], filtros['cst']])
+        if filtros.get('monofasico') is not None:
+            condicoes.append("monofasico = ?")
+            parametros.append(1 if filtros['monofasico'] else 0)
+        if filtros.get('busca'):
+            condicoes.append("descricao LIKE ? ESCAPE '\\'")
+            parametros.append('%' + _escapar_like(filtros['busca']) + '%')
+        where = ' AND '.join(condicoes)
+
+        coluna = ORDENACOES_ITEM.get(ordenar, 'valor_centavos')
+        direcao = 'DESC' if decrescente else 'ASC'
+        pagina = max(1, int(pagina))
+        por_pagina = max(1, int(por_pagina))
+        with self._lock:
+            total = self._conexao.execute(f"SELECT COUNT(*) FROM itens WHERE {where}", parametros).fetchone()[0]
+            linhas = self._conexao.execute(
+                f"SELECT {', '.join(COLUNAS_ITEM[:-2])}, valor_centavos, monofasico FROM itens WHERE {where} "
+                f"ORDER BY {coluna} {direcao}, rowid LIMIT ? OFFSET ?",
+                parametros + [por_pagina, (pagina - 1) * por_pagina]
+            ).fetchall()
+
+        itens = []
+        for linha in linhas:
+            item = dict(zip(COLUNAS_ITEM, linha))
+            item['valor_total'] = para_float(item['valor_total'])
+            item['monofasico'] = bool(item['monofasico'])
+            itens.append(item)
+        return itens, total
+
+    def resumo(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Metadados e métricas da sessão, sem ler o resultado completo"""
+        with self._lock:
+            linha = self._conexao.execute(
+                f"SELECT {', '.join(COLUNAS_RESUMO)} FROM sessoes WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return dict(zip(COLUNAS_RESUMO, linha)) if linha is not None else None
+
+    def listar(self, periodo: Optional[str] = None, cliente: Optional[str] = None,
+               data_inicial: Optional[str] = None, data_final: Optional[str] = None,
+               pagina: int = 1, por_pagina: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Sessões mais recentes primeiro, filtradas e paginadas no SQLite
+        Args:
+            periodo: período exato (YYYY-MM)
+            cliente: trecho do cliente (busca por prefixo)
+            data_inicial, data_final: limites de data de processamento (YYYY-MM-DD)
+            pagina: página a partir de 1
+        Returns:
+            tuple: (sessões da página, total de sessões do filtro)
+        """
+        condicoes = []
+        parametros = []
+        if periodo:
+            condicoes.append("periodo = ?")
+            parametros.append(periodo)
+        if cliente:
+            condicoes.append("cliente LIKE ? ESCAPE '\\'")
+            parametros.append(_escapar_like(cliente) + '%')
+        if data_inicial:
+            condicoes.append("data_processamento >= ?")
+            parametros.append(data_inicial)
+        if data_final:
+            # Inclui o dia inteiro da data final
+            condicoes.append("data_processamento < ?")
+            parametros.append(data_final + '~')
+        where = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+
+        pagina = max(1, int(pagina))
+        por_pagina = max(1, int(por_pagina))
+        with self._lock:
+            total = self._conexao.execute(f"SELECT COUNT(*) FROM sessoes {where}", parametros).fetchone()[0]
+            linhas = self._conexao.execute(
+                f"SELECT {', '.join(COLUNAS_RESUMO)} FROM sessoes {where} "
+                f"ORDER BY data_processamento DESC, session_id DESC LIMIT ? OFFSET ?",
+                parametros + [por_pagina, (pagina - 1) * por_pagina]
+            ).fetchall()
+        return [dict(zip(COLUNAS_RESUMO, linha)) for linha in linhas], total
+
+    def periodos(self) -> List[str]:
+        """Períodos com sessões gravadas (para filtros), mais recente primeiro"""
+        with self._lock:
+            return [linha[0] for linha in self._conexao.execute(
+                "SELECT DISTINCT periodo FROM sessoes ORDER BY periodo DESC")]
+
+    def importar_diretorio(self, diretorio: str, padrao: str = 'resultado_*.json') -> int:
+        """
+        Importa resultados gravados como JSON (formato anterior ao repositório)
+        que ainda não estejam no banco
+        Returns:
+            int: quantidade de sessões importadas
+        """
+        with self._lock:
+            existentes = {linha[0] for linha in self._conexao.execute("SELECT session_id FROM sessoes")}
+
+        importadas = 0
+        for arquivo in sorted(Path(diretorio).glob(padrao)):
+            if arquivo.stem[len('resultado_'):] in existentes:
+                continue
+            try:
+                with open(arquivo, 'r', encoding='utf-8') as f:
+                    dados = json.load(f)
+                if (dados.get('session_id') or dados.get('timestamp')) in existentes:
+                    continue
+                self.salvar(dados)
+                importadas += 1
+            except Exception:
+                continue
+        return importadas
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM sessoes").fetchone()[0]
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.fechar()
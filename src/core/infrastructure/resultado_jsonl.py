@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Resultado de Período em JSON Lines
+Grava a análise de um período como um documento-resumo compacto
+(<nome>.json) e dois arquivos JSON Lines comprimidos com gzip:
+<nome>.notas.jsonl.gz (uma nota por linha, sem os itens) e
+<nome>.itens.jsonl.gz (um item por linha, na ordem das notas).
+
+Notas e itens são escritos um a um, à medida que são produzidos; nenhum
+documento com todas as notas é montado em memória. A leitura também é
+feita linha a linha.
+"""
+
+import os
+import json
+import gzip
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+# Identificação do formato gravado no resumo
+FORMATO_RESULTADO = 'jsonl-gzip-v1'
+
+# Nível do gzip: 6 comprime quase como 9 em bem menos tempo
+NIVEL_COMPRESSAO = 6
+
+# JSON compacto (sem indentação nem espaços)
+SEPARADORES = (',', ':')
+
+def caminhos_resultado(diretorio, nome: str) -> Dict[str, Path]:
+    """Arquivos do resultado: resumo, notas e itens"""
+    diretorio = Path(diretorio)
+    return {
+        'resumo': diretorio / f"{nome}.json",
+        'notas': diretorio / f"{nome}.notas.jsonl.gz",
+        'itens': diretorio / f"{nome}.itens.jsonl.gz"
+    }
+
+def _linha_json(dados: Dict[str, Any]) -> str:
+    return json.dumps(dados, ensure_ascii=False, separators=SEPARADORES) + '\n'
+
+class EscritorResultadoJSONL:
+    """
+    Escrita incremental de um resultado de período.
+    Os arquivos são gravados com sufixo .tmp e só substituem os anteriores
+    em finalizar(); saindo do bloco with sem finalizar (ou com exceção),
+    os temporários são descartados.
+    """
+
+    def __init__(self, diretorio, nome: str, nivel_compressao: int = NIVEL_COMPRESSAO):
+        self.caminhos = caminhos_resultado(diretorio, nome)
+        self.caminhos['resumo'].parent.mkdir(parents=True, exist_ok=True)
+        self._temporarios = {chave: caminho.with_name(caminho.name + '.tmp')
+                             for chave, caminho in self.caminhos.items()}
+        self._notas = gzip.open(self._temporarios['notas'], 'wt', encoding='utf-8', compresslevel=nivel_compressao)
+        self._itens = gzip.open(self._temporarios['itens'], 'wt', encoding='utf-8', compresslevel=nivel_compressao)
+        self.qtd_notas = 0
+        self.qtd_itens = 0
+        self.finalizado = False
+
+    def escrever_nota(self, nota):
+        """
+        Acrescenta uma nota (NotaFiscal ou o dicionário de to_dict())
+        Os itens vão para o arquivo de itens, com a chave de acesso da nota
+        """
+        self.escrever_cabecalho(self.escrever_itens(nota))
+
+    def escrever_itens(self, nota) -> Dict[str, Any]:
+        """
+        Grava só os itens da nota e devolve o cabeçalho (nota sem itens, com
+        qtd_itens), para ser escrito depois com escrever_cabecalho() - por
+        exemplo, quando o status da nota depende de eventos ainda não lidos.
+        Os cabeçalhos devem ser escritos na mesma ordem dos itens.
+        """
+        dados = nota.to_dict() if hasattr(nota, 'to_dict') else dict(nota)
+        itens = dados.pop('itens', [])
+        chave_acesso = dados.get('identificacao', {}).get('chave_acesso')
+
+        dados['qtd_itens'] = len(itens)
+        for item in itens:
+            self._itens.write(_linha_json(dict(item, chave_acesso=chave_acesso)))
+        self.qtd_itens += len(itens)
+        return dados
+
+    def escrever_cabecalho(self, dados: Dict[str, Any]):
+        """Acrescenta o cabeçalho devolvido por escrever_itens()"""
+        self._notas.write(_linha_json(dados))
+        self.qtd_notas += 1
+
+    def escrever_notas(self, notas: Iterable) -> int:
+        """Acrescenta as notas de um iterável; retorna quantas foram escritas"""
+        inicio = self.qtd_notas
+        for nota in notas:
+            self.escrever_nota(nota)
+        return self.qtd_notas - inicio
+
+    def finalizar(self, resumo: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Grava o documento-resumo (com as referências aos arquivos de notas
+        e itens em resumo['detalhes']) e publica os arquivos
+        Returns:
+            dict: documento-resumo gravado
+        """
+        self._notas.close()
+        self._itens.close()
+
+        documento = dict(resumo)
+        documento['detalhes'] = dict(resumo.get('detalhes', {}), **{
+            'formato': FORMATO_RESULTADO,
+            'notas': {'arquivo': self.caminhos['notas'].name, 'quantidade': self.qtd_notas},
+            'itens': {'arquivo': self.caminhos['itens'].name, 'quantidade': self.qtd_itens}
+        })
+        with open(self._temporarios['resumo'], 'w', encoding='utf-8') as f:
+            json.dump(documento, f, ensure_ascii=False, separators=SEPARADORES)
+
+        # Resumo publicado por último: quem o lê encontra notas e itens completos
+        for chave in ('notas', 'itens', 'resumo'):
+            os.replace(self._temporarios[chave], self.caminhos[chave])
+        self.finalizado = True
+        return documento
+
+    def descartar(self):
+        """Fecha e remove os arquivos temporários"""
+        self._notas.close()
+        self._itens.close()
+        for caminho in self._temporarios.values():
+            try:
+                caminho.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        if not self.finalizado:
+            self.descartar()
+
+class LeitorResultadoJSONL:
+    """
+    Leitura em streaming de um resultado gravado por EscritorResultadoJSONL.
+    Resumos no formato antigo (notas completas em detalhes['notas']) também
+    são aceitos.
+    """
+
+    def __init__(self, arquivo_resumo):
+        self.arquivo_resumo = Path(arquivo_resumo)
+        self._resumo = None
+
+    @property
+    def resumo(self) -> Dict[str, Any]:
+        """Documento-resumo (lido uma única vez)"""
+        if self._resumo is None:
+            with open(self.arquivo_resumo, 'r', encoding='utf-8') as f:
+                self._resumo = json.load(f)
+        return self._resumo
+
+    @property
+    def formato(self) -> Optional[str]:
+        return self.resumo.get('detalhes', {}).get('formato')
+
+    def _arquivo(self, chave: str) -> Path:
+        return self.arquivo_resumo.with_name(self.resumo['detalhes'][chave]['arquivo'])
+
+    def _linhas(self, chave: str) -> Iterator[Dict[str, Any]]:
+        with gzip.open(self._arquivo(chave), 'rt', encoding='utf-8') as f:
+            for linha in f:
+                yield json.loads(linha)
+
+    def itens(self) -> Iterator[Dict[str, Any]]:
+        """Itens de todas as notas, um a um (com a chave de acesso da nota)"""
+        if self.formato != FORMATO_RESULTADO:
+            for nota in self.resumo.get('detalhes', {}).get('notas', []):
+                chave_acesso = nota.get('identificacao', {}).get('chave_acesso')
+                for item in nota.get('itens', []):
+                    yield dict(item, chave_acesso=chave_acesso)
+            return
+        yield from self._linhas('itens')
+
+    def notas(self, com_itens: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Notas, uma a uma, no formato de NotaFiscal.to_dict()
+        Args:
+            com_itens: remonta nota['itens'] lendo o arquivo de itens em paralelo
+        """
+        if self.formato != FORMATO_RESULTADO:
+            for nota in self.resumo.get('detalhes', {}).get('notas', []):
+                if com_itens:
+                    yield nota
+                else:
+                    yield dict({chave: valor for chave, valor in nota.items() if chave != 'itens'},
+                               qtd_itens=len(nota.get('itens', [])))
+            return
+
+        if not com_itens:
+            yield from self._linhas('notas')
+            return
+
+        # Itens gravados na ordem das notas: cada nota consome qtd_itens linhas
+        itens = self._linhas('itens')
+        try:
+            for nota in self._linhas('notas'):
+                nota['itens'] = [
+                    {chave: valor for chave, valor in item.items() if chave != 'chave_acesso'}
+                    for item in islice(itens, nota.pop('qtd_itens', 0))
+                ]
+                yield nota
+        finally:
+            itens.close()
@@ -3,7 +3,8 @@
 Script Profissional de Reorganização de XMLs NFe
 =====================================
 
-Reorganiza automaticamente arquivos XML por data real de emissão extraída do conteúdo.
+Reorganiza automaticamente arquivos XML pelo período de emissão (AAMM da chave de acesso,
+com parse do conteúdo apenas quando a chave está ausente ou inconsistente).
 
 Funcionalidades:
 - Validação automática do padrão nome vs conteúdo XML
@@ -31,6 +32,10 @@ from collections import defaultdict, Counter
 from typing import Dict, List, Tuple, Optional, Set
 import logging
 
+# Roteamento por chave de acesso do parser híbrido (somente biblioteca padrão)
+sys.path.append(str(Path(__file__).resolve().parents[2] / "parser_hibrido"))
+from chave_acesso import rotear_arquivo, rotear_nome, RotaArquivo
+
 # Configuração do logging
 def setup_logging(log_dir: Path, dry_run: bool = False) -> logging.Logger:
     """Configura sistema de logging detalhado"""
@@ -100,51 +105,52 @@ class XMLAnalyzer:
             self.logger.error(f"Erro inesperado ao ler {arquivo_path}: {e}")
             return None
     
-    def extrair_data_nome(self, nome_arquivo: str) -> Optional[str]:
-        """Extrai data do nome do arquivo NFe: UF+AAMM+DD"""
-        if not nome_arquivo.endswith('.xml'):
-            return None
-            
-        # Remover extensão e sufixos como -nfe, -can
-        nome_base = nome_arquivo.replace('.xml', '').split('-')[0]
-        
-        if len(nome_base) >= 8:
-            try:
-                ano_mes = nome_base[2:6]  # posições 2-5 (AAMM)
-                dia = nome_base[6:8]      # posições 6-7 (DD)
-                
-                ano = '20' + ano_mes[:2]  # 20 + AA
-                mes = ano_mes[2:4]        # MM
-                
-                # Validar se o mês é válido
-                if 1 <= int(mes) <= 12 and 1 <= int(dia) <= 31:
-                    return f"{ano}-{mes.zfill(2)}-{dia.zfill(2)}"
-            except (ValueError, IndexError):
-                pass
-        
-        return None
+    def extrair_periodo_nome(self, nome_arquivo: str) -> Optional[str]:
+        """Extrai período (YYYY-MM) da chave de acesso contida no nome do arquivo"""
+        return rotear_nome(nome_arquivo).periodo
     
-    def is_cancelamento(self, arquivo_path: Path) -> bool:
-        """Verifica se o arquivo é um cancelamento"""
+    def is_cancelamento(self, arquivo_path: Path, rota: Optional[RotaArquivo] = None) -> bool:
+        """Verifica se o arquivo é um cancelamento (pelo nome ou pelo tpEvento da rota)"""
         nome = arquivo_path.name.lower()
-        return '-can.xml' in nome or 'cancelamento' in nome
+        if '-can.xml' in nome or 'cancelamento' in nome:
+            return True
+        return rota is not None and rota.eh_cancelamento
     
     def validate_xml_integrity(self, arquivo_path: Path) -> Dict[str, any]:
         """Valida integridade e extrai metadados do XML"""
         result = {
             'valid': False,
+            'periodo': None,
+            'origem_periodo': '',
             'data_xml': None,
-            'data_nome': None,
             'is_cancelamento': False,
+            'tipo': None,
+            'chave': '',
+            'cnpj': '',
+            'modelo': '',
             'size': 0,
             'error': None
         }
         
         try:
             result['size'] = arquivo_path.stat().st_size
-            result['is_cancelamento'] = self.is_cancelamento(arquivo_path)
-            result['data_nome'] = self.extrair_data_nome(arquivo_path.name)
-            result['data_xml'] = self.extrair_data_xml(arquivo_path)
+            
+            # Período, CNPJ e modelo pela chave de acesso (nome ou primeiros KB)
+            rota = rotear_arquivo(arquivo_path)
+            result['periodo'] = rota.periodo
+            result['origem_periodo'] = rota.origem
+            result['tipo'] = rota.tipo
+            result['chave'] = rota.chave
+            result['cnpj'] = rota.cnpj
+            result['modelo'] = rota.modelo
+            result['is_cancelamento'] = self.is_cancelamento(arquivo_path, rota)
+            
+            # Parse completo só quando a chave está ausente ou inconsistente
+            if result['periodo'] is None and rota.tipo != 'EVENTO':
+                result['data_xml'] = self.extrair_data_xml(arquivo_path)
+                if result['data_xml']:
+                    result['periodo'] = result['data_xml'][:7]
+                    result['origem_periodo'] = 'conteudo'
             result['valid'] = True
             
         except Exception as e:
@@ -351,16 +357,16 @@ class XMLReorganizer:
                     self.stats['valid_files'] += 1
                     
                     # Verificar se está na pasta correta
-                    data_ref = resultado['data_xml'] or resultado['data_nome']
-                    if data_ref:
-                        pasta_correta = data_ref[:7]  # YYYY-MM
+                    pasta_correta = resultado['periodo']  # YYYY-MM
+                    if pasta_correta:
                         if pasta_correta != pasta.name:
                             problema = {
                                 'arquivo': str(arquivo),
                                 'pasta_atual': pasta.name,
                                 'pasta_correta': pasta_correta,
-                                'data_xml': resultado['data_xml'],
-                                'data_nome': resultado['data_nome']
+                                'origem_periodo': resultado['origem_periodo'],
+                                'cnpj': resultado['cnpj'],
+                                'modelo': resultado['modelo']
                             }
                             problemas_encontrados.append(problema)
                 else:
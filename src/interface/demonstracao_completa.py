@@ -519,7 +519,7 @@ def demonstrar_funcionalidades_avancadas():
     # Demonstrar serialização JSON
     print("\n📄 Demonstrando serialização JSON...")
     try:
-        from parser_hibrido import NotaFiscal, ItemNotaFiscal
+        from models import NotaFiscal, ItemNotaFiscal
         
         # Criar objetos de demonstração
         nota_demo = NotaFiscal()
@@ -7,6 +7,19 @@ Módulo que combina robustez técnica com funcionalidades completas de negócio
 from parser_hibrido.parser_hibrido import NFEParserHibrido, processar_xml_nfe_hibrido, processar_diretorio_nfe_hibrido
 from parser_hibrido.models import NotaFiscal, ItemNotaFiscal, EventoCancelamento, converter_para_decimal
 from parser_hibrido.validators import ValidadorFiscal
+from parser_hibrido.esquema_extracao import EsquemaExtracaoNFe
+from parser_hibrido.diagnosticos import (
+    Diagnosticos, EstatisticasProcessamento, RegistroDiagnostico, RegistroExecucao,
+    CODIGOS_DIAGNOSTICO
+)
+from parser_hibrido.nucleo_parser import parse_nfe_bytes, parse_nfe_root, parse_nfe_stream, parse_evento_root
+from parser_hibrido.classificador_xml import CabecalhoXML, classificar_arquivo, classificar_conteudo, classificar_fluxo
+from parser_hibrido.chave_acesso import (
+    ChaveAcesso, RotaArquivo, calcular_dv, decodificar_chave, rotear_arquivo, agrupar_arquivos
+)
+from parser_hibrido.processamento_lote import (
+    processar_arquivos_paralelo, dividir_em_lotes, mesclar_estatisticas
+)
 from parser_hibrido.utils import (
     UtilXML, UtilData, UtilValor, UtilArquivo, UtilTributario, UtilLog,
     NAMESPACE_NFE, extrair_chave_acesso, formatar_cnpj_cpf
@@ -37,11 +50,33 @@ __all__ = [
     'ItemNotaFiscal', 
     'EventoCancelamento',
     'ValidadorFiscal',
+    'EsquemaExtracaoNFe',
+    'Diagnosticos',
+    'EstatisticasProcessamento',
+    'RegistroDiagnostico',
+    'RegistroExecucao',
+    'CabecalhoXML',
+    'ChaveAcesso',
+    'RotaArquivo',
     
     # Funções de conveniência
     'processar_xml_nfe_hibrido',
     'processar_diretorio_nfe_hibrido',
     'converter_para_decimal',
+    'parse_nfe_bytes',
+    'parse_nfe_root',
+    'parse_nfe_stream',
+    'parse_evento_root',
+    'classificar_arquivo',
+    'classificar_fluxo',
+    'classificar_conteudo',
+    'calcular_dv',
+    'decodificar_chave',
+    'rotear_arquivo',
+    'agrupar_arquivos',
+    'processar_arquivos_paralelo',
+    'dividir_em_lotes',
+    'mesclar_estatisticas',
     
     # Utilitários
     'UtilXML',
@@ -53,6 +88,7 @@ __all__ = [
     
     # Constantes
     'NAMESPACE_NFE',
+    'CODIGOS_DIAGNOSTICO',
     
     # Funções auxiliares
     'extrair_chave_acesso',
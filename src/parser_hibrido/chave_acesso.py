@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Chave de Acesso da NFe
+Decodifica os 44 dígitos da chave (cUF, AAMM, CNPJ, modelo, série, número,
+tipo de emissão, código numérico e DV) e roteia arquivos para
+período/CNPJ/modelo a partir do nome ou dos primeiros bytes, sem parse
+"""
+
+import os
+import re
+from collections import defaultdict
+from typing import Optional, Dict, List, Tuple, Iterable
+
+from classificador_xml import classificar_arquivo
+
+# Pesos do módulo 11, aplicados da direita para a esquerda
+PESOS_DV = (2, 3, 4, 5, 6, 7, 8, 9)
+
+# Códigos IBGE das UFs
+CODIGOS_UF = frozenset((
+    11, 12, 13, 14, 15, 16, 17, 21, 22, 23, 24, 25, 26, 27, 28, 29,
+    31, 32, 33, 35, 41, 42, 43, 50, 51, 52, 53
+))
+
+# Sequências de exatamente 44 dígitos (nome "<chave>-nfe.xml", "NFe<chave>.xml")
+_RE_CHAVE_NOME = re.compile(r'(?<!\d)(\d{44})(?!\d)')
+
+# Nome de evento: "ID" + tpEvento (6) + chave (44) + nSeqEvento (2)
+_RE_EVENTO_NOME = re.compile(r'(?<!\d)(\d{6})(\d{44})(\d{2})(?!\d)')
+
+_RE_PERIODO_DATA = re.compile(r'(\d{4})-(\d{2})')
+
+# Função para calcular o dígito verificador (módulo 11) dos 43 primeiros dígitos
+def calcular_dv(chave_sem_dv: str) -> int:
+    soma = 0
+    for posicao, digito in enumerate(reversed(chave_sem_dv)):
+        soma += int(digito) * PESOS_DV[posicao % 8]
+    resto = soma % 11
+    return 0 if resto < 2 else 11 - resto
+
+# Função para validar estrutura e DV da chave de acesso
+def validar_chave(chave: str) -> bool:
+    return decodificar_chave(chave) is not None
+
+class ChaveAcesso:
+    """Campos da chave de acesso (44 dígitos, DV conferido)"""
+
+    __slots__ = ('chave', 'uf', 'ano', 'mes', 'cnpj', 'modelo', 'serie',
+                 'numero', 'tipo_emissao', 'codigo', 'dv')
+
+    def __init__(self, chave: str):
+        self.chave = chave
+        self.uf = chave[0:2]
+        self.ano = 2000 + int(chave[2:4])
+        self.mes = int(chave[4:6])
+        self.cnpj = chave[6:20]
+        self.modelo = chave[20:22]
+        self.serie = chave[22:25]
+        self.numero = chave[25:34]
+        self.tipo_emissao = chave[34]
+        self.codigo = chave[35:43]
+        self.dv = chave[43]
+
+    @property
+    def periodo(self) -> str:
+        """Período de emissão (YYYY-MM)"""
+        return f"{self.ano}-{self.mes:02d}"
+
+    def como_dict(self) -> Dict[str, str]:
+        """Converte campos para dicionário"""
+        dados = {campo: getattr(self, campo) for campo in self.__slots__}
+        dados['periodo'] = self.periodo
+        return dados
+
+    def __repr__(self) -> str:
+        return f"ChaveAcesso({self.chave!r})"
+
+# Função para decodificar a chave (None se ausente, malformada ou com DV incorreto)
+def decodificar_chave(chave: Optional[str]) -> Optional[ChaveAcesso]:
+    if not chave:
+        return None
+    chave = chave.strip()
+    if chave[:3].upper() == 'NFE':
+        chave = chave[3:]
+    if len(chave) != 44 or not chave.isdigit():
+        return None
+    if int(chave[:2]) not in CODIGOS_UF or not 1 <= int(chave[4:6]) <= 12:
+        return None
+    if calcular_dv(chave[:43]) != int(chave[43]):
+        return None
+    return ChaveAcesso(chave)
+
+class RotaArquivo:
+    """
+    Destino de um arquivo: período, CNPJ do emitente e modelo
+    origem: 'nome' (chave no nome), 'cabecalho' (chave nos primeiros bytes),
+    'data_cabecalho' (dhEmi sem chave válida) ou '' (requer parse completo)
+    """
+
+    __slots__ = ('periodo', 'cnpj', 'modelo', 'chave', 'tipo', 'tipo_evento', 'origem')
+
+    def __init__(self, periodo: Optional[str] = None, cnpj: str = "", modelo: str = "",
+                 chave: str = "", tipo: Optional[str] = None, tipo_evento: str = "",
+                 origem: str = ""):
+        self.periodo = periodo
+        self.cnpj = cnpj
+        self.modelo = modelo
+        self.chave = chave
+        self.tipo = tipo
+        self.tipo_evento = tipo_evento
+        self.origem = origem
+
+    @classmethod
+    def da_chave(cls, chave: ChaveAcesso, origem: str, tipo: Optional[str] = None,
+                 tipo_evento: str = "") -> 'RotaArquivo':
+        return cls(chave.periodo, chave.cnpj, chave.modelo, chave.chave, tipo, tipo_evento, origem)
+
+    @property
+    def grupo(self) -> Tuple[Optional[str], str, str]:
+        """Chave de agrupamento (periodo, cnpj, modelo)"""
+        return (self.periodo, self.cnpj, self.modelo)
+
+    @property
+    def eh_cancelamento(self) -> bool:
+        """Evento de cancelamento (110111)"""
+        return self.tipo_evento == '110111'
+
+    def como_dict(self) -> Dict[str, Optional[str]]:
+        """Converte rota para dicionário"""
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"RotaArquivo({self.periodo!r}, cnpj={self.cnpj!r}, modelo={self.modelo!r}, origem={self.origem!r})"
+
+# Função para rotear pelo nome do arquivo (nenhuma leitura de disco)
+def rotear_nome(nome_arquivo: str) -> RotaArquivo:
+    nome = os.path.basename(nome_arquivo)
+
+    for encontrado in _RE_CHAVE_NOME.finditer(nome):
+        chave = decodificar_chave(encontrado.group(1))
+        if chave is not None:
+            return RotaArquivo.da_chave(chave, 'nome')
+
+    for encontrado in _RE_EVENTO_NOME.finditer(nome):
+        chave = decodificar_chave(encontrado.group(2))
+        if chave is not None:
+            return RotaArquivo.da_chave(chave, 'nome', 'EVENTO', encontrado.group(1))
+
+    return RotaArquivo()
+
+# Função para rotear um arquivo: nome, depois cabeçalho; parse só fica para o chamador
+def rotear_arquivo(caminho_arquivo: str, ler_cabecalho: bool = True) -> RotaArquivo:
+    """
+    Determina período/CNPJ/modelo do arquivo sem parse do XML
+    Args:
+        caminho_arquivo: Caminho do XML
+        ler_cabecalho: Se False, usa apenas o nome do arquivo
+    Returns:
+        RotaArquivo: periodo None quando a chave está ausente ou inconsistente
+        e o cabeçalho não tem dhEmi (o chamador deve recorrer ao parse)
+    """
+    rota = rotear_nome(caminho_arquivo)
+    if rota.periodo is not None or not ler_cabecalho:
+        return rota
+
+    cabecalho = classificar_arquivo(caminho_arquivo)
+    chave = decodificar_chave(cabecalho.chave)
+    if chave is not None:
+        return RotaArquivo.da_chave(chave, 'cabecalho', cabecalho.tipo, cabecalho.tipo_evento)
+
+    rota = RotaArquivo(tipo=cabecalho.tipo, tipo_evento=cabecalho.tipo_evento, chave=cabecalho.chave)
+    data = _RE_PERIODO_DATA.match(cabecalho.data_emissao)
+    if data and 1 <= int(data.group(2)) <= 12:
+        rota.periodo = f"{data.group(1)}-{data.group(2)}"
+        rota.origem = 'data_cabecalho'
+    return rota
+
+# Função para agrupar arquivos por (periodo, cnpj, modelo)
+def agrupar_arquivos(caminhos: Iterable[str], ler_cabecalho: bool = True) -> Dict[Tuple[Optional[str], str, str], List[str]]:
+    grupos = defaultdict(list)
+    for caminho in caminhos:
+        grupos[rotear_arquivo(caminho, ler_cabecalho).grupo].append(caminho)
+    return dict(grupos)
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Classificador de Documentos XML por Cabeçalho
+Identifica NFe e eventos lendo apenas os primeiros KB do arquivo,
+sem montar árvore (tag raiz, Id do infNFe, tpEvento, chNFe e datas)
+"""
+
+import re
+from typing import Optional, Dict, BinaryIO
+
+# Bytes lidos do início do arquivo; ide/infEvento ficam bem antes deste limite
+TAMANHO_CABECALHO = 4096
+
+# Leitura estendida quando o cabeçalho não coube na primeira janela
+TAMANHO_CABECALHO_MAXIMO = 65536
+
+# Tag raiz (nome local) -> tipo de documento
+TIPOS_POR_RAIZ = {
+    'nfeProc': 'NFE',
+    'NFe': 'NFE',
+    'procEventoNFe': 'EVENTO',
+    'evento': 'EVENTO'
+}
+
+# Primeiro elemento do documento (ignora declaração, comentários e DOCTYPE)
+_RE_RAIZ = re.compile(rb'<(?![?!])(?:[\w.\-]+:)?([\w.\-]+)')
+_RE_ID_NFE = re.compile(rb'<(?:[\w.\-]+:)?infNFe\b[^>]*?\bId\s*=\s*["\']NFe(\d{44})["\']')
+_RE_CH_NFE = re.compile(rb'<(?:[\w.\-]+:)?chNFe>\s*(\d{44})\s*<')
+_RE_TP_EVENTO = re.compile(rb'<(?:[\w.\-]+:)?tpEvento>\s*(\d+)\s*<')
+_RE_DH_EMI = re.compile(rb'<(?:[\w.\-]+:)?dhEmi>\s*([^<\s]+)\s*<')
+_RE_DH_EVENTO = re.compile(rb'<(?:[\w.\-]+:)?dhEvento>\s*([^<\s]+)\s*<')
+
+class CabecalhoXML:
+    """
+    Resultado da classificação pelo cabeçalho
+    tipo: 'NFE', 'EVENTO', 'DESCONHECIDO' ou None (cabeçalho ilegível,
+    o chamador deve recorrer ao parse completo)
+    """
+
+    __slots__ = ('tipo', 'raiz', 'chave', 'tipo_evento', 'data_emissao', 'data_evento')
+
+    def __init__(self, tipo: Optional[str] = None, raiz: str = "", chave: str = "",
+                 tipo_evento: str = "", data_emissao: str = "", data_evento: str = ""):
+        self.tipo = tipo
+        self.raiz = raiz
+        self.chave = chave
+        self.tipo_evento = tipo_evento
+        self.data_emissao = data_emissao
+        self.data_evento = data_evento
+
+    @property
+    def eh_cancelamento(self) -> bool:
+        """Evento de cancelamento (110111)"""
+        return self.tipo == 'EVENTO' and self.tipo_evento == '110111'
+
+    def como_dict(self) -> Dict[str, Optional[str]]:
+        """Converte cabeçalho para dicionário"""
+        return {campo: getattr(self, campo) for campo in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"CabecalhoXML({self.tipo!r}, chave={self.chave!r}, tipo_evento={self.tipo_evento!r})"
+
+def _extrair(regex, conteudo: bytes) -> str:
+    encontrado = regex.search(conteudo)
+    return encontrado.group(1).decode('ascii', 'replace') if encontrado else ""
+
+def classificar_conteudo(inicio: bytes) -> CabecalhoXML:
+    """
+    Classifica o documento a partir dos bytes iniciais
+    Args:
+        inicio: Primeiros bytes do arquivo (ou o conteúdo completo)
+    Returns:
+        CabecalhoXML: tipo, chave de acesso, código do evento e datas encontrados
+    """
+    raiz = _RE_RAIZ.search(inicio or b'')
+    if raiz is None:
+        # UTF-16, binário ou vazio: não é possível decidir sem o parse completo
+        return CabecalhoXML()
+
+    nome_raiz = raiz.group(1).decode('ascii', 'replace')
+    tipo = TIPOS_POR_RAIZ.get(nome_raiz, 'DESCONHECIDO')
+    cabecalho = CabecalhoXML(tipo, nome_raiz)
+
+    if tipo == 'NFE':
+        cabecalho.chave = _extrair(_RE_ID_NFE, inicio)
+        cabecalho.data_emissao = _extrair(_RE_DH_EMI, inicio)
+    elif tipo == 'EVENTO':
+        cabecalho.chave = _extrair(_RE_CH_NFE, inicio)
+        cabecalho.tipo_evento = _extrair(_RE_TP_EVENTO, inicio)
+        cabecalho.data_evento = _extrair(_RE_DH_EVENTO, inicio)
+
+    return cabecalho
+
+def _cabecalho_completo(cabecalho: CabecalhoXML) -> bool:
+    if cabecalho.tipo is None:
+        return False
+    if cabecalho.tipo == 'NFE':
+        return bool(cabecalho.chave and cabecalho.data_emissao)
+    if cabecalho.tipo == 'EVENTO':
+        return bool(cabecalho.chave and cabecalho.tipo_evento)
+    return True
+
+def classificar_arquivo(caminho_arquivo: str, tamanho: int = TAMANHO_CABECALHO) -> CabecalhoXML:
+    """
+    Classifica um arquivo lendo apenas o início
+    Se a chave ou o código do evento não couberem na primeira janela,
+    lê até TAMANHO_CABECALHO_MAXIMO antes de desistir
+    """
+    with open(caminho_arquivo, 'rb') as f:
+        return classificar_fluxo(f, tamanho)
+
+def classificar_fluxo(arquivo: BinaryIO, tamanho: int = TAMANHO_CABECALHO) -> CabecalhoXML:
+    """
+    Classifica um arquivo já aberto em modo 'rb', lendo o início a partir
+    da posição atual (o chamador pode reaproveitar o mesmo arquivo no parse)
+    """
+    inicio = arquivo.read(tamanho)
+    cabecalho = classificar_conteudo(inicio)
+    if len(inicio) == tamanho and not _cabecalho_completo(cabecalho):
+        inicio += arquivo.read(max(0, TAMANHO_CABECALHO_MAXIMO - tamanho))
+        cabecalho = classificar_conteudo(inicio)
+    return cabecalho
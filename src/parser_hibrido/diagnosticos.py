@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+Diagnósticos e Estatísticas do Processamento
+Registros estruturados por documento, log da execução limitado e
+contadores seguros para uso concorrente
+"""
+
+import logging
+import threading
+from collections import deque, Counter
+from typing import Optional, List, Dict, Union, Iterable
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Contadores padrão do processamento de NFe
+CHAVES_ESTATISTICAS = (
+    'total_processados',
+    'total_validos',
+    'total_invalidos',
+    'total_cancelados'
+)
+
+# Quantidade máxima de registros mantidos no log da execução
+LIMITE_LOG_EXECUCAO = 1000
+
+# Catálogo de códigos de diagnóstico: código -> descrição
+CODIGOS_DIAGNOSTICO = {
+    # Validação de campos (ValidadorFiscal)
+    'CNPJ_AUSENTE': "CNPJ vazio ou None",
+    'CNPJ_TAMANHO': "CNPJ sem 14 dígitos",
+    'CNPJ_NAO_NUMERICO': "CNPJ contém caracteres não numéricos",
+    'CNPJ_INVALIDO': "CNPJ inválido conhecido",
+    'CPF_AUSENTE': "CPF vazio ou None",
+    'CPF_TAMANHO': "CPF sem 11 dígitos",
+    'CPF_NAO_NUMERICO': "CPF contém caracteres não numéricos",
+    'NCM_AUSENTE': "NCM vazio ou None",
+    'NCM_TAMANHO': "NCM sem 8 dígitos",
+    'NCM_NAO_NUMERICO': "NCM contém caracteres não numéricos",
+    'CFOP_AUSENTE': "CFOP vazio ou None",
+    'CFOP_TAMANHO': "CFOP sem 4 dígitos",
+    'CFOP_NAO_NUMERICO': "CFOP contém caracteres não numéricos",
+    'CFOP_PRIMEIRO_DIGITO': "CFOP com primeiro dígito inválido",
+    'CST_AUSENTE': "CST vazio ou None",
+    'CST_TAMANHO': "CST sem 2 dígitos",
+    'CST_INVALIDO': "CST inválido",
+    'CHAVE_AUSENTE': "Chave de acesso vazia ou None",
+    'CHAVE_TAMANHO': "Chave sem 44 dígitos",
+    'CHAVE_NAO_NUMERICA': "Chave contém caracteres não numéricos",
+    'VALOR_INVALIDO': "Valor monetário inválido",
+    'IE_TAMANHO': "IE fora do intervalo de 8-15 dígitos",
+
+    # Processamento de documentos
+    'XML_INVALIDO': "Estrutura XML inválida",
+    'NFE_NAO_ENCONTRADA': "Elemento NFe não encontrado",
+    'NFE_PROCESSADA': "NFe processada com sucesso",
+    'NFE_COM_ALERTAS': "NFe processada com alertas",
+    'NFE_ERRO': "Erro no processamento da NFe",
+    'ITEM_SEM_PROD': "Elemento prod não encontrado no item",
+    'ITEM_ERRO': "Erro ao processar item",
+    'EVENTO_ERRO': "Erro ao processar evento de cancelamento",
+
+    # Execução
+    'DIRETORIO_INICIO': "Iniciando processamento do diretório",
+    'DIRETORIO_VAZIO': "Nenhum arquivo XML encontrado",
+    'DOCUMENTOS_INICIO': "Processando notas fiscais e eventos",
+    'CANCELAMENTO_ENCONTRADO': "Cancelamento encontrado",
+    'DIRETORIO_CONCLUIDO': "Processamento concluído",
+    'ARQUIVO_ERRO': "Erro ao processar arquivo",
+    'CACHE_CONSULTADO': "Arquivos reaproveitados do cache de parsing",
+}
+
+# Níveis aceitos e correspondência com o logging
+NIVEIS_LOG = {
+    'INFO': logging.INFO,
+    'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR
+}
+
+class RegistroDiagnostico:
+    """
+    Registro estruturado: código, nível e detalhe variável
+    O texto só é montado quando necessário (exportação ou logging)
+    """
+
+    __slots__ = ('codigo', 'nivel', 'detalhe')
+
+    def __init__(self, codigo: str, nivel: str = "INFO", detalhe: str = ""):
+        self.codigo = codigo
+        self.nivel = nivel
+        self.detalhe = detalhe
+
+    @property
+    def mensagem(self) -> str:
+        """Descrição do código acrescida do detalhe"""
+        descricao = CODIGOS_DIAGNOSTICO.get(self.codigo, self.codigo)
+        return f"{descricao}: {self.detalhe}" if self.detalhe else descricao
+
+    def como_dict(self) -> Dict[str, str]:
+        """Converte registro para dicionário"""
+        return {'codigo': self.codigo, 'nivel': self.nivel, 'detalhe': self.detalhe}
+
+    def __str__(self) -> str:
+        return f"[{self.nivel}] [{self.codigo}] {self.mensagem}"
+
+    def __repr__(self) -> str:
+        return f"RegistroDiagnostico({self.codigo!r}, {self.nivel!r}, {self.detalhe!r})"
+
+    def __eq__(self, outro) -> bool:
+        if not isinstance(outro, RegistroDiagnostico):
+            return NotImplemented
+        return (self.codigo, self.nivel, self.detalhe) == (outro.codigo, outro.nivel, outro.detalhe)
+
+    def __getstate__(self):
+        return (self.codigo, self.nivel, self.detalhe)
+
+    def __setstate__(self, estado):
+        self.codigo, self.nivel, self.detalhe = estado
+
+def _emitir_log(registro: RegistroDiagnostico):
+    """Replica o registro no logger do módulo, formatando apenas se habilitado"""
+    logger.log(NIVEIS_LOG.get(registro.nivel, logging.INFO), "%s", registro)
+
+class Diagnosticos:
+    """Registros de diagnóstico de um único documento processado"""
+
+    def __init__(self, arquivo_origem: str = ""):
+        self.arquivo_origem = arquivo_origem
+        self.registros: List[RegistroDiagnostico] = []
+        self.registros_validacao: List[RegistroDiagnostico] = []
+
+    def registrar(self, codigo: str, nivel: str = "INFO", detalhe: str = "") -> RegistroDiagnostico:
+        """
+        Registra diagnóstico do processamento e replica no logger do módulo
+        Args:
+            codigo: Código do catálogo CODIGOS_DIAGNOSTICO
+            nivel: Nível (INFO, WARNING, ERROR)
+            detalhe: Valor variável associado (número da nota, exceção, etc.)
+        """
+        registro = RegistroDiagnostico(codigo, nivel, detalhe)
+        self.registros.append(registro)
+        _emitir_log(registro)
+        return registro
+
+    def registrar_validacao(self, codigo: str, nivel: str = "INFO", detalhe: str = "") -> RegistroDiagnostico:
+        """Registra diagnóstico emitido pelo ValidadorFiscal"""
+        registro = RegistroDiagnostico(codigo, nivel, detalhe)
+        self.registros_validacao.append(registro)
+        _emitir_log(registro)
+        return registro
+
+    def info(self, codigo: str, detalhe: str = ""):
+        """Registra mensagem informativa"""
+        self.registrar(codigo, "INFO", detalhe)
+
+    def aviso(self, codigo: str, detalhe: str = ""):
+        """Registra aviso"""
+        self.registrar(codigo, "WARNING", detalhe)
+
+    def erro(self, codigo: str, detalhe: str = ""):
+        """Registra erro"""
+        self.registrar(codigo, "ERROR", detalhe)
+
+    @property
+    def mensagens(self) -> List[str]:
+        """Mensagens do processamento formatadas"""
+        return [str(registro) for registro in self.registros]
+
+    @property
+    def logs_validacao(self) -> List[str]:
+        """Mensagens de validação formatadas"""
+        return [str(registro) for registro in self.registros_validacao]
+
+    def todos_registros(self) -> List[RegistroDiagnostico]:
+        """Registros de processamento seguidos dos de validação"""
+        return self.registros + self.registros_validacao
+
+    def contagem_por_codigo(self) -> Dict[str, int]:
+        """Quantidade de registros por código"""
+        return dict(Counter(registro.codigo for registro in self.todos_registros()))
+
+    def tem_erros(self) -> bool:
+        """Verifica se há mensagens de erro"""
+        return any(registro.nivel == "ERROR" for registro in self.registros)
+
+class RegistroExecucao:
+    """
+    Log de uma execução inteira em buffer circular
+    Mantém apenas os últimos registros, mas conta todos por código
+    """
+
+    def __init__(self, limite: int = LIMITE_LOG_EXECUCAO):
+        self._lock = threading.Lock()
+        self.limite = limite
+        self._buffer = deque(maxlen=limite)
+        self._contagem = Counter()
+        self._total = 0
+
+    def adicionar(self, registros: Iterable[RegistroDiagnostico]):
+        """Adiciona registros ao buffer e aos contadores"""
+        with self._lock:
+            for registro in registros:
+                self._buffer.append(registro)
+                self._contagem[registro.codigo] += 1
+                self._total += 1
+
+    def registrar(self, codigo: str, nivel: str = "INFO", detalhe: str = "") -> RegistroDiagnostico:
+        """Registra diagnóstico da própria execução e replica no logger"""
+        registro = RegistroDiagnostico(codigo, nivel, detalhe)
+        _emitir_log(registro)
+        self.adicionar((registro,))
+        return registro
+
+    def absorver(self, diagnosticos: Diagnosticos):
+        """Incorpora os registros de um documento"""
+        self.adicionar(diagnosticos.todos_registros())
+
+    def mesclar(self, outro: 'RegistroExecucao') -> 'RegistroExecucao':
+        """Incorpora buffer e contadores de outro registro (ex.: lote de um worker)"""
+        with outro._lock:
+            registros = list(outro._buffer)
+            contagem = Counter(outro._contagem)
+            total = outro._total
+        with self._lock:
+            self._buffer.extend(registros)
+            self._contagem.update(contagem)
+            self._total += total
+        return self
+
+    def registros(self) -> List[RegistroDiagnostico]:
+        """Registros mantidos no buffer, do mais antigo ao mais recente"""
+        with self._lock:
+            return list(self._buffer)
+
+    def mensagens(self) -> List[str]:
+        """Registros do buffer formatados"""
+        return [str(registro) for registro in self.registros()]
+
+    def contagem_por_codigo(self) -> Dict[str, int]:
+        """Quantidade de registros por código em toda a execução"""
+        with self._lock:
+            return dict(self._contagem)
+
+    @property
+    def total_registrado(self) -> int:
+        """Total de registros recebidos, inclusive os já descartados do buffer"""
+        with self._lock:
+            return self._total
+
+    @property
+    def total_descartados(self) -> int:
+        """Registros que saíram do buffer por excederem o limite"""
+        with self._lock:
+            return self._total - len(self._buffer)
+
+    def limpar(self):
+        """Esvazia buffer e contadores"""
+        with self._lock:
+            self._buffer.clear()
+            self._contagem.clear()
+            self._total = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def __getstate__(self):
+        with self._lock:
+            return (self.limite, list(self._buffer), dict(self._contagem), self._total)
+
+    def __setstate__(self, estado):
+        self.limite, registros, contagem, self._total = estado
+        self._lock = threading.Lock()
+        self._buffer = deque(registros, maxlen=self.limite)
+        self._contagem = Counter(contagem)
+
+class EstatisticasProcessamento:
+    """
+    Contadores de processamento protegidos por lock
+    Podem ser compartilhados entre threads e mesclados entre processos
+    """
+
+    def __init__(self, valores: Optional[Dict[str, int]] = None):
+        self._lock = threading.Lock()
+        self._valores: Dict[str, int] = {chave: 0 for chave in CHAVES_ESTATISTICAS}
+        if valores:
+            self.mesclar(valores)
+
+    def incrementar(self, chave: str, quantidade: int = 1):
+        """Incrementa um contador de forma atômica"""
+        with self._lock:
+            self._valores[chave] = self._valores.get(chave, 0) + quantidade
+
+    def mesclar(self, outras: Union['EstatisticasProcessamento', Dict[str, int]]) -> 'EstatisticasProcessamento':
+        """Soma os contadores de outra instância (ou dicionário) nesta"""
+        valores = outras.como_dict() if isinstance(outras, EstatisticasProcessamento) else outras
+        with self._lock:
+            for chave, valor in valores.items():
+                self._valores[chave] = self._valores.get(chave, 0) + valor
+        return self
+
+    def limpar(self):
+        """Zera todos os contadores"""
+        with self._lock:
+            self._valores = {chave: 0 for chave in CHAVES_ESTATISTICAS}
+
+    def como_dict(self) -> Dict[str, int]:
+        """Retorna cópia dos contadores"""
+        with self._lock:
+            return dict(self._valores)
+
+    def __getitem__(self, chave: str) -> int:
+        with self._lock:
+            return self._valores[chave]
+
+    def get(self, chave: str, default: int = 0) -> int:
+        with self._lock:
+            return self._valores.get(chave, default)
+
+    def __getstate__(self):
+        return self.como_dict()
+
+    def __setstate__(self, valores: Dict[str, int]):
+        self._lock = threading.Lock()
+        self._valores = dict(valores)
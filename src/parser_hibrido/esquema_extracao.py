@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Esquema de Extração Compilado para NFe
+XPaths pré-compilados por campo, com namespace detectado uma vez por documento
+"""
+
+import logging
+from typing import Optional, List, Dict
+from lxml import etree
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Namespace padrão para NFe
+URI_NFE = 'http://www.portalfiscal.inf.br/nfe'
+
+# Grupos de elementos (caminhos relativos; {p} recebe o prefixo do namespace)
+GRUPOS = {
+    # Relativos à raiz do documento
+    'NFe': 'self::{p}NFe | {p}NFe',
+    'infEvento': '{p}evento/{p}infEvento | self::{p}evento/{p}infEvento',
+
+    # Relativos ao elemento NFe
+    'infNFe': '{p}infNFe',
+
+    # Relativos ao elemento infNFe
+    'ide': '{p}ide',
+    'emit': '{p}emit',
+    'enderEmit': '{p}emit/{p}enderEmit',
+    'dest': '{p}dest',
+    'ICMSTot': '{p}total/{p}ICMSTot',
+    'infAdic': '{p}infAdic',
+    'det': '{p}det',
+
+    # Relativos ao elemento det
+    'prod': '{p}prod',
+    'imposto': '{p}imposto',
+    'PIS': ('{p}imposto/{p}PIS/{p}PISAliq | {p}imposto/{p}PIS/{p}PISQtde | '
+            '{p}imposto/{p}PIS/{p}PISNT | {p}imposto/{p}PIS/{p}PISOutr'),
+    'COFINS': ('{p}imposto/{p}COFINS/{p}COFINSAliq | {p}imposto/{p}COFINS/{p}COFINSQtde | '
+               '{p}imposto/{p}COFINS/{p}COFINSNT | {p}imposto/{p}COFINS/{p}COFINSOutr'),
+}
+
+# Campos de texto por grupo: atributo -> tag filha direta do grupo
+CAMPOS = {
+    'ide': {
+        'numero': 'nNF',
+        'serie': 'serie',
+        'modelo': 'mod',
+        'natureza_operacao': 'natOp',
+        'codigo_uf': 'cUF',
+        'data_emissao': 'dhEmi'
+    },
+    'emit': {
+        'cnpj': 'CNPJ',
+        'cpf': 'CPF',
+        'nome': 'xNome',
+        'ie': 'IE'
+    },
+    'enderEmit': {
+        'logradouro': 'xLgr',
+        'numero': 'nro',
+        'bairro': 'xBairro',
+        'municipio': 'xMun',
+        'uf': 'UF',
+        'cep': 'CEP'
+    },
+    'dest': {
+        'cnpj': 'CNPJ',
+        'cpf': 'CPF',
+        'nome': 'xNome',
+        'ie': 'IE'
+    },
+    'ICMSTot': {
+        'valor_produtos': 'vProd',
+        'valor_total_nf': 'vNF',
+        'valor_desconto_total': 'vDesc',
+        'valor_pis_total': 'vPIS',
+        'valor_cofins_total': 'vCOFINS'
+    },
+    'infAdic': {
+        'informacoes_adicionais': 'infCpl'
+    },
+    'prod': {
+        'codigo': 'cProd',
+        'ean': 'cEAN',
+        'descricao': 'xProd',
+        'ncm': 'NCM',
+        'cest': 'CEST',
+        'cfop': 'CFOP',
+        'unidade': 'uCom',
+        'quantidade': 'qCom',
+        'valor_unitario': 'vUnCom',
+        'valor_bruto': 'vProd',
+        'valor_desconto': 'vDesc'
+    },
+    'PIS': {
+        'cst': 'CST',
+        'base_calculo': 'vBC',
+        'aliquota': 'pPIS',
+        'valor': 'vPIS'
+    },
+    'COFINS': {
+        'cst': 'CST',
+        'base_calculo': 'vBC',
+        'aliquota': 'pCOFINS',
+        'valor': 'vCOFINS'
+    },
+    'infEvento': {
+        'tipo_evento': 'tpEvento',
+        'chave_nfe': 'chNFe',
+        'data_evento': 'dhEvento',
+        'numero_sequencial': 'nSeqEvento',
+        'justificativa': 'detEvento/{p}xJust'
+    }
+}
+
+class CamposCompilados:
+    """XPaths compilados para um namespace específico"""
+
+    def __init__(self, uri: str):
+        self.uri = uri
+        prefixo = 'nfe:' if uri else ''
+        namespaces = {'nfe': uri} if uri else None
+
+        self._grupos = {
+            nome: etree.XPath(caminho.format(p=prefixo), namespaces=namespaces)
+            for nome, caminho in GRUPOS.items()
+        }
+        self._campos = {
+            grupo: {
+                campo: etree.XPath(f"string({prefixo}{tag.format(p=prefixo)})", namespaces=namespaces)
+                for campo, tag in campos.items()
+            }
+            for grupo, campos in CAMPOS.items()
+        }
+
+    def elemento(self, grupo: str, contexto) -> Optional[etree.Element]:
+        """Retorna o primeiro elemento do grupo ou None"""
+        if contexto is None:
+            return None
+        resultado = self._grupos[grupo](contexto)
+        return resultado[0] if resultado else None
+
+    def elementos(self, grupo: str, contexto) -> List[etree.Element]:
+        """Retorna todos os elementos do grupo"""
+        if contexto is None:
+            return []
+        return self._grupos[grupo](contexto)
+
+    def texto(self, grupo: str, campo: str, contexto, default: str = "") -> str:
+        """Retorna o texto do campo no grupo, sem busca na subárvore"""
+        if contexto is None:
+            return default
+        return self._campos[grupo][campo](contexto).strip() or default
+
+    def textos(self, grupo: str, contexto) -> Dict[str, str]:
+        """Retorna todos os campos de texto do grupo"""
+        return {campo: self.texto(grupo, campo, contexto) for campo in self._campos[grupo]}
+
+class EsquemaExtracaoNFe:
+    """
+    Esquema de extração compilado uma vez por instância de parser
+    Cada lookup custa o mesmo com a tag presente ou ausente
+    """
+
+    def __init__(self):
+        self._por_namespace: Dict[str, CamposCompilados] = {
+            URI_NFE: CamposCompilados(URI_NFE)
+        }
+
+    @staticmethod
+    def detectar_namespace(root: etree.Element) -> str:
+        """Detecta o namespace do documento a partir da raiz"""
+        if root is None or not isinstance(root.tag, str):
+            return ''
+        return etree.QName(root).namespace or ''
+
+    def para_documento(self, root: etree.Element) -> CamposCompilados:
+        """Retorna os XPaths compilados para o namespace do documento"""
+        uri = self.detectar_namespace(root)
+        campos = self._por_namespace.get(uri)
+        if campos is None:
+            logger.debug(f"Compilando esquema para namespace '{uri}'")
+            campos = CamposCompilados(uri)
+            self._por_namespace[uri] = campos
+        return campos
@@ -11,7 +11,7 @@ import logging
 from pathlib import Path
 from decimal import Decimal
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Iterable, Callable, Union
 
 # Adicionar paths necessários
 current_dir = Path(__file__).parent
@@ -22,9 +22,18 @@ sys.path.append(str(current_dir.parent))
 from parser_hibrido import (
     NFEParserHibrido,
     processar_diretorio_nfe_hibrido,
-    configurar_logging
+    configurar_logging,
+    UtilArquivo
 )
 
+# Registro de tabelas de referência compartilhado pelo processo
+from core.domain.registro_tabelas import registro_tabelas, ARQUIVO_NCM_MONOFASICO, ARQUIVO_SELIC
+from core.infrastructure.cache_parse import CacheParse
+from core.infrastructure.resultado_jsonl import EscritorResultadoJSONL
+from core.infrastructure.periodos import detectar_periodos
+from core.domain.tabela_itens import TabelaItens
+from core.domain.motor_creditos import calcular_creditos_tabela
+
 # Imports do sistema existente (adaptados)
 try:
     from src.tabelas import carregar_tabela_ncm_monofasico, carregar_tabela_selic
@@ -57,14 +66,14 @@ class SistemaIntegradoNFe:
         self.configurar_diretorios()
         self.configurar_logging()
         
+        # Logger
+        self.logger = logging.getLogger(__name__)
+        
         # Carregar tabelas de referência
         self.tabela_ncm_monofasico = self.carregar_tabelas_referencia()
         
         # Criar parser híbrido
         self.parser = NFEParserHibrido(self.tabela_ncm_monofasico)
-        
-        # Logger
-        self.logger = logging.getLogger(__name__)
     
     def configurar_diretorios(self):
         """Configura estrutura de diretórios"""
@@ -88,19 +97,17 @@ class SistemaIntegradoNFe:
     def carregar_tabelas_referencia(self) -> Dict:
         """Carrega tabelas de referência"""
         try:
-            # Tentar carregar tabela de NCMs monofásicos
-            arquivo_ncm = self.dir_tabelas / "Espelho de ncms monofásicas.json"
-            if arquivo_ncm.exists():
-                with open(arquivo_ncm, 'r', encoding='utf-8') as f:
-                    tabela = json.load(f)
-                    self.logger.info(f"Tabela NCM carregada: {len(tabela)} NCMs")
-                    return tabela
+            # Tabela de NCMs monofásicos compilada pelo registro do processo
+            arquivo_ncm = self.dir_tabelas / ARQUIVO_NCM_MONOFASICO
+            tabela = registro_tabelas.ncms_monofasicos(arquivo_ncm)
+            if tabela:
+                self.logger.info(f"Tabela NCM carregada: {len(tabela)} NCMs")
             else:
                 self.logger.warning("Tabela de NCMs não encontrada")
-                return {}
+            return tabela
         except Exception as e:
             self.logger.error(f"Erro ao carregar tabela NCM: {e}")
-            return {}
+            return frozenset()
     
     def processar_periodo(self, periodo: str) -> Dict[str, Any]:
         """
@@ -115,41 +122,48 @@ class SistemaIntegradoNFe:
             self.logger.error(f"Dados PGDAS não encontrados para {periodo}")
             return {"erro": "Dados PGDAS não encontrados"}
         
-        # Processar XMLs do período
-        resultado_xmls = self.processar_xmls_periodo(periodo)
-        if not resultado_xmls['notas']:
-            self.logger.warning(f"Nenhuma nota fiscal encontrada para {periodo}")
-            return {"erro": "Nenhuma nota fiscal encontrada"}
-        
-        # Calcular créditos tributários
-        resultado_creditos = self.calcular_creditos_tributarios(
-            resultado_xmls['notas'], 
-            dados_pgdas
-        )
-        
-        # Consolidar resultados
-        resultado_final = {
-            "periodo": periodo,
-            "processamento": {
-                "data_hora": datetime.now().isoformat(),
-                "versao_parser": "hibrido_v1.0"
-            },
-            "pgdas": dados_pgdas,
-            "xmls": {
-                "estatisticas": resultado_xmls['estatisticas'],
-                "total_notas": len(resultado_xmls['notas']),
-                "total_cancelamentos": len(resultado_xmls['cancelamentos'])
-            },
-            "creditos": resultado_creditos,
-            "detalhes": {
-                "notas": [nota.to_dict() for nota in resultado_xmls['notas']],
-                "cancelamentos": [canc.to_dict() for canc in resultado_xmls['cancelamentos']],
-                "logs": resultado_xmls['logs']
+        # Itens gravados e somados na tabela à medida que as notas são lidas;
+        # até os cancelamentos serem conhecidos só os cabeçalhos ficam em memória
+        tabela = TabelaItens()
+        cabecalhos = []
+        with EscritorResultadoJSONL(self.dir_resultados, f"analise_hibrida_{periodo}") as escritor:
+            def ao_processar_nota(nota):
+                tabela.adicionar_nota_fiscal(nota)
+                cabecalhos.append(escritor.escrever_itens(nota))
+            
+            # Processar XMLs do período
+            resultado_xmls = self.processar_xmls_periodo(periodo, ao_processar_nota)
+            if not cabecalhos:
+                self.logger.warning(f"Nenhuma nota fiscal encontrada para {periodo}")
+                return {"erro": "Nenhuma nota fiscal encontrada"}
+            
+            self.aplicar_cancelamentos(tabela, cabecalhos, resultado_xmls['cancelamentos'])
+            
+            # Calcular créditos tributários
+            resultado_creditos = self.calcular_creditos_tributarios(tabela, dados_pgdas)
+            
+            # Consolidar resultados
+            resultado_final = {
+                "periodo": periodo,
+                "processamento": {
+                    "data_hora": datetime.now().isoformat(),
+                    "versao_parser": "hibrido_v1.0"
+                },
+                "pgdas": dados_pgdas,
+                "xmls": {
+                    "estatisticas": resultado_xmls['estatisticas'],
+                    "total_notas": len(cabecalhos),
+                    "total_cancelamentos": len(resultado_xmls['cancelamentos'])
+                },
+                "creditos": resultado_creditos,
+                "detalhes": {
+                    "cancelamentos": [canc.to_dict() for canc in resultado_xmls['cancelamentos']],
+                    "logs": resultado_xmls['logs']
+                }
             }
-        }
-        
-        # Salvar resultado
-        self.salvar_resultado(resultado_final, periodo)
+            
+            # Salvar resultado (cabeçalhos das notas e resumo; itens já gravados)
+            resultado_final = self.salvar_resultado(resultado_final, periodo, escritor, cabecalhos)
         
         # Exibir relatório
         self.gerar_relatorio_periodo(resultado_final)
@@ -173,8 +187,13 @@ class SistemaIntegradoNFe:
         
         return None
     
-    def processar_xmls_periodo(self, periodo: str) -> Dict[str, Any]:
-        """Processa XMLs de um período específico"""
+    def processar_xmls_periodo(self, periodo: str,
+                               ao_processar_nota: Optional[Callable] = None) -> Dict[str, Any]:
+        """
+        Processa XMLs de um período específico
+        ao_processar_nota: recebe cada nota assim que lida; nesse caso as notas
+        não voltam no resultado e os cancelamentos não são aplicados a elas
+        """
         # Buscar diretório de XMLs do período
         possíveis_diretorios = [
             self.dir_xmls / f"{periodo}-validos",
@@ -194,45 +213,53 @@ class SistemaIntegradoNFe:
         
         self.logger.info(f"Processando XMLs do diretório: {diretorio_xmls}")
         
-        # Usar parser híbrido para processar
-        resultado = processar_diretorio_nfe_hibrido(
-            str(diretorio_xmls),
-            self.tabela_ncm_monofasico,
-            incluir_cancelamentos=True
-        )
+        # Usar parser híbrido para processar; reexecuções só parseiam XMLs novos ou alterados
+        arquivo_cache = self.dir_data / "cache" / "parse_xmls.sqlite"
+        with CacheParse(arquivo_cache, contexto=self.parser.contexto_cache(),
+                        funcao_hash=UtilArquivo.hash_arquivo) as cache:
+            resultado = processar_diretorio_nfe_hibrido(
+                str(diretorio_xmls),
+                self.tabela_ncm_monofasico,
+                incluir_cancelamentos=True,
+                cache=cache,
+                ao_processar_nota=ao_processar_nota
+            )
+            self.logger.info(f"Cache de parsing: {cache.obter_estatisticas()}")
         
         return resultado
     
-    def calcular_creditos_tributarios(self, notas: List, dados_pgdas: Dict) -> Dict[str, Any]:
+    def aplicar_cancelamentos(self, tabela: TabelaItens, cabecalhos: List[Dict],
+                              cancelamentos: List) -> int:
+        """
+        Marca como canceladas, na tabela e nos cabeçalhos ainda não gravados,
+        as notas com evento de cancelamento (eventos podem vir depois das notas)
+        Returns:
+            int: quantidade de notas canceladas
+        """
+        chaves = {evento.chave_nfe for evento in cancelamentos}
+        if not chaves:
+            return 0
+        
+        tabela.marcar_canceladas(chaves)
+        horario = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        canceladas = 0
+        for dados in cabecalhos:
+            if dados['identificacao']['chave_acesso'] in chaves:
+                # Mesmo efeito de NotaFiscal.marcar_como_cancelada no dicionário
+                dados['status'] = "CANCELADO"
+                dados['metadados']['logs_processamento'].append(
+                    f"[{horario}] Nota cancelada: Evento de cancelamento encontrado")
+                canceladas += 1
+        return canceladas
+    
+    def calcular_creditos_tributarios(self, notas: Union[List, TabelaItens], dados_pgdas: Dict) -> Dict[str, Any]:
         """
         Calcula créditos tributários usando metodologia híbrida
-        Combina lógica existente com validação robusta
+        Combina lógica existente com validação robusta; inclui detalhamento
+        por NCM, CFOP, CST, emitente e dia
+        notas: lista de NotaFiscal ou TabelaItens já montada
         """
-        # Totais por categoria
-        total_monofasico = Decimal('0')
-        total_nao_monofasico = Decimal('0')
-        
-        # Contadores
-        itens_monofasicos = 0
-        itens_nao_monofasicos = 0
-        
-        # Processar cada nota fiscal
-        for nota in notas:
-            if nota.eh_nota_cancelada():
-                continue  # Pular notas canceladas
-            
-            for item in nota.itens:
-                if not item.valido:
-                    continue  # Pular itens inválidos
-                
-                valor_item = item.obter_valor_base_tributacao()
-                
-                if item.tipo_tributario == "Monofasico":
-                    total_monofasico += valor_item
-                    itens_monofasicos += 1
-                else:
-                    total_nao_monofasico += valor_item
-                    itens_nao_monofasicos += 1
+        tabela = notas if isinstance(notas, TabelaItens) else TabelaItens.de_notas(notas)
         
         # Calcular alíquotas efetivas
         aliquota_efetiva = Decimal(str(dados_pgdas.get("aliquota_efetiva", 0)))
@@ -241,19 +268,19 @@ class SistemaIntegradoNFe:
         aliquota_pis = aliquota_efetiva * Decimal(str(proporcoes.get("pis", 0.0276)))
         aliquota_cofins = aliquota_efetiva * Decimal(str(proporcoes.get("cofins", 0.1274)))
         
-        # Calcular tributos devidos (apenas sobre não-monofásicos)
-        pis_devido = total_nao_monofasico * aliquota_pis
-        cofins_devido = total_nao_monofasico * aliquota_cofins
-        
-        # Tributos recolhidos (do PGDAS)
+        # RVM/RVN, devidos (apenas sobre não-monofásicos) e créditos em uma
+        # passada sobre as colunas; notas canceladas e itens inválidos ficam de fora
         tributos = dados_pgdas.get("tributos", {})
-        pis_recolhido = Decimal(str(tributos.get("pis", 0)))
-        cofins_recolhido = Decimal(str(tributos.get("cofins", 0)))
-        
-        # Calcular créditos
-        credito_pis = pis_recolhido - pis_devido
-        credito_cofins = cofins_recolhido - cofins_devido
-        credito_total = credito_pis + credito_cofins
+        motor = calcular_creditos_tabela(
+            tabela, aliquota_pis, aliquota_cofins,
+            tributos.get("pis", 0), tributos.get("cofins", 0),
+            somente_ativos=True
+        )
+        total_monofasico, total_nao_monofasico = motor.rvm, motor.rvn
+        itens_monofasicos, itens_nao_monofasicos = motor.itens_monofasicos, motor.itens_nao_monofasicos
+        pis_devido, cofins_devido = motor.pis_devido, motor.cofins_devido
+        pis_recolhido, cofins_recolhido = motor.pis_recolhido, motor.cofins_recolhido
+        credito_pis, credito_cofins, credito_total = motor.credito_pis, motor.credito_cofins, motor.credito_total
         
         # Aplicar atualização SELIC (se disponível)
         credito_atualizado = self.aplicar_atualizacao_selic(credito_total, dados_pgdas.get("periodo"))
@@ -291,25 +318,20 @@ class SistemaIntegradoNFe:
                 "itens_monofasicos": itens_monofasicos,
                 "itens_nao_monofasicos": itens_nao_monofasicos,
                 "total_itens": itens_monofasicos + itens_nao_monofasicos
-            }
+            },
+            "detalhamento": motor.detalhamentos()
         }
     
     def aplicar_atualizacao_selic(self, valor: Decimal, periodo: str) -> Decimal:
         """Aplica atualização SELIC ao valor"""
         try:
-            # Tentar carregar tabela SELIC
-            arquivo_selic = self.dir_tabelas / "Tabela Selic.json"
-            if arquivo_selic.exists():
-                with open(arquivo_selic, 'r', encoding='utf-8') as f:
-                    tabela_selic = json.load(f)
-                
-                # Calcular taxa acumulada até período atual
-                taxa_acumulada = Decimal('1.0')
-                for mes_data, taxa in tabela_selic.items():
-                    if mes_data <= periodo:  # Simplificado
-                        taxa_acumulada *= (1 + Decimal(str(taxa / 100)))
-                
-                return valor * taxa_acumulada
+            # Série SELIC compilada pelo registro (produtos acumulados)
+            serie_selic = registro_tabelas.selic(self.dir_tabelas / ARQUIVO_SELIC)
+            if serie_selic:
+                # Calcular fator acumulado até período atual
+                hoje = datetime.now()
+                fator = serie_selic.fator(periodo or "", f"{hoje.year}-{hoje.month:02d}")
+                return valor * Decimal(str(fator))
             else:
                 self.logger.warning("Tabela SELIC não encontrada")
                 return valor
@@ -317,17 +339,26 @@ class SistemaIntegradoNFe:
             self.logger.error(f"Erro ao aplicar SELIC: {e}")
             return valor
     
-    def salvar_resultado(self, resultado: Dict, periodo: str):
-        """Salva resultado em arquivo JSON"""
-        arquivo_resultado = self.dir_resultados / f"analise_hibrida_{periodo}.json"
-        
+    def salvar_resultado(self, resultado: Dict, periodo: str, escritor: EscritorResultadoJSONL,
+                         cabecalhos: Iterable[Dict] = ()) -> Dict:
+        """
+        Salva o resultado: resumo JSON compacto (analise_hibrida_<periodo>.json)
+        e notas/itens em JSON Lines com gzip; os itens já foram gravados pelo
+        escritor durante a leitura e aqui entram os cabeçalhos das notas
+        Returns:
+            dict: resumo gravado (detalhes com as referências aos arquivos)
+        """
         try:
-            with open(arquivo_resultado, 'w', encoding='utf-8') as f:
-                json.dump(resultado, f, indent=2, ensure_ascii=False)
+            for dados in cabecalhos:
+                escritor.escrever_cabecalho(dados)
+            resultado = escritor.finalizar(resultado)
             
-            self.logger.info(f"Resultado salvo: {arquivo_resultado}")
+            self.logger.info(f"Resultado salvo: {escritor.caminhos['resumo']} "
+                             f"({escritor.qtd_notas} notas, {escritor.qtd_itens} itens)")
         except Exception as e:
             self.logger.error(f"Erro ao salvar resultado: {e}")
+        
+        return resultado
     
     def gerar_relatorio_periodo(self, resultado: Dict):
         """Gera relatório formatado do período"""
@@ -448,27 +479,7 @@ def migrar_sistema_existente():
 
 def detectar_periodos_disponiveis(sistema) -> List[str]:
     """Detecta períodos disponíveis para processamento"""
-    periodos = []
-    
-    # Verificar diretórios de XMLs
-    if sistema.dir_xmls.exists():
-        for item in sistema.dir_xmls.iterdir():
-            if item.is_dir():
-                nome = item.name
-                if nome.endswith("-validos"):
-                    periodo = nome.replace("-validos", "")
-                    if len(periodo) == 7 and "-" in periodo:  # YYYY-MM
-                        periodos.append(periodo)
-    
-    # Verificar arquivos PGDAS
-    if sistema.dir_pgdas.exists():
-        for arquivo in sistema.dir_pgdas.glob("*.json"):
-            nome = arquivo.stem
-            if len(nome) == 7 and "-" in nome:  # YYYY-MM
-                if nome not in periodos:
-                    periodos.append(nome)
-    
-    return sorted(periodos)
+    return detectar_periodos(sistema.dir_xmls, sistema.dir_pgdas, sufixos_xmls=("-validos",))
 
 if __name__ == "__main__":
     import argparse
@@ -28,6 +28,11 @@ except ImportError as e:
     print(f"❌ Erro ao importar parser híbrido: {e}")
     PARSER_HIBRIDO_OK = False
 
+try:
+    from core.domain.registro_tabelas import registro_tabelas
+except ImportError as e:
+    print(f"❌ Erro ao importar registro de tabelas: {e}")
+
 try:
     from src.parser import processar_xmls as processar_existente
     SISTEMA_EXISTENTE_OK = True
@@ -565,12 +570,11 @@ resultado = parser.processar_diretorio(diretorio_xmls)
             return False
     
     def carregar_tabela_ncm(self):
-        """Carrega tabela de NCM do sistema"""
+        """Carrega tabela de NCM do sistema (compilada e em cache no registro)"""
         try:
-            with open('data/tabelas/Espelho de ncms monofásicas.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except:
-            return {}
+            return registro_tabelas.ncms_monofasicos(os.path.abspath('data/tabelas/Espelho de ncms monofásicas.json'))
+        except Exception:
+            return frozenset()
     
     def salvar_resultados_teste(self, resultado):
         """Salva resultados do teste paralelo"""
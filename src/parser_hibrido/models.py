@@ -4,14 +4,48 @@ Modelos de Dados Aprimorados para NFe
 Classes orientadas a objeto com validação e precisão fiscal
 """
 
+import sys
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import json
 
+# Decimal é imutável: o zero padrão dos campos é compartilhado entre instâncias
+DECIMAL_ZERO = Decimal('0')
+
+# Códigos fiscais repetidos (NCM, CFOP, CST, unidade, CNPJ) passam a ter uma
+# única instância por valor distinto; sys.intern não mantém viva a string que
+# nenhum objeto usa mais (texto livre, como nomes, não é internado)
+def internar_codigo(codigo: str) -> str:
+    """Retorna a instância compartilhada do código"""
+    return sys.intern(str(codigo)) if isinstance(codigo, str) else codigo
+
+# Campos internados ao recarregar objetos serializados (pickle)
+CAMPOS_INTERNADOS_ITEM = ('ncm', 'cfop', 'unidade', 'pis_cst', 'cofins_cst')
+CAMPOS_INTERNADOS_NOTA = ('emitente_cnpj',)
+
+def _restaurar_slots(objeto, estado, campos_internados):
+    """Restaura atributos de um objeto com __slots__ e reinterna os códigos"""
+    slots = estado[1] if isinstance(estado, tuple) else estado
+    for campo, valor in slots.items():
+        setattr(objeto, campo, valor)
+    for campo in campos_internados:
+        valor = getattr(objeto, campo, None)
+        if isinstance(valor, str):
+            setattr(objeto, campo, internar_codigo(valor))
+
 class ItemNotaFiscal:
     """Classe para representar um item de nota fiscal com validação robusta"""
     
+    __slots__ = (
+        'numero', 'codigo', 'ean', 'descricao', 'ncm', 'cest', 'cfop', 'unidade',
+        'quantidade', 'valor_unitario', 'valor_bruto', 'valor_desconto', 'valor_total',
+        'pis_cst', 'pis_base_calculo', 'pis_aliquota', 'pis_valor', 'pis_subgrupo',
+        'cofins_cst', 'cofins_base_calculo', 'cofins_aliquota', 'cofins_valor', 'cofins_subgrupo',
+        'tipo_tributario', 'eh_monofasico_por_ncm', 'eh_monofasico_por_cst',
+        'valido', '_erros_validacao'
+    )
+    
     def __init__(self):
         # Dados básicos do item
         self.numero: int = 0
@@ -26,26 +60,26 @@ class ItemNotaFiscal:
         
         # Dados comerciais
         self.unidade: str = ""
-        self.quantidade: Decimal = Decimal('0')
-        self.valor_unitario: Decimal = Decimal('0')
+        self.quantidade: Decimal = DECIMAL_ZERO
+        self.valor_unitario: Decimal = DECIMAL_ZERO
         
         # Valores do produto
-        self.valor_bruto: Decimal = Decimal('0')  # vProd
-        self.valor_desconto: Decimal = Decimal('0')  # vDesc
-        self.valor_total: Decimal = Decimal('0')  # valor_bruto - valor_desconto
+        self.valor_bruto: Decimal = DECIMAL_ZERO  # vProd
+        self.valor_desconto: Decimal = DECIMAL_ZERO  # vDesc
+        self.valor_total: Decimal = DECIMAL_ZERO  # valor_bruto - valor_desconto
         
         # Tributos PIS
         self.pis_cst: str = ""
-        self.pis_base_calculo: Decimal = Decimal('0')
-        self.pis_aliquota: Decimal = Decimal('0')
-        self.pis_valor: Decimal = Decimal('0')
+        self.pis_base_calculo: Decimal = DECIMAL_ZERO
+        self.pis_aliquota: Decimal = DECIMAL_ZERO
+        self.pis_valor: Decimal = DECIMAL_ZERO
         self.pis_subgrupo: str = ""  # PISAliq, PISNT, etc.
         
         # Tributos COFINS
         self.cofins_cst: str = ""
-        self.cofins_base_calculo: Decimal = Decimal('0')
-        self.cofins_aliquota: Decimal = Decimal('0')
-        self.cofins_valor: Decimal = Decimal('0')
+        self.cofins_base_calculo: Decimal = DECIMAL_ZERO
+        self.cofins_aliquota: Decimal = DECIMAL_ZERO
+        self.cofins_valor: Decimal = DECIMAL_ZERO
         self.cofins_subgrupo: str = ""  # COFINSAliq, COFINSNT, etc.
         
         # Classificação tributária
@@ -53,9 +87,22 @@ class ItemNotaFiscal:
         self.eh_monofasico_por_ncm: bool = False
         self.eh_monofasico_por_cst: bool = False
         
-        # Validação
+        # Validação (lista de erros criada apenas no primeiro erro)
         self.valido: bool = True
-        self.erros_validacao: List[str] = []
+        self._erros_validacao: Optional[List[str]] = None
+    
+    @property
+    def erros_validacao(self) -> List[str]:
+        if self._erros_validacao is None:
+            self._erros_validacao = []
+        return self._erros_validacao
+    
+    @erros_validacao.setter
+    def erros_validacao(self, erros: List[str]):
+        self._erros_validacao = erros
+    
+    def __setstate__(self, estado):
+        _restaurar_slots(self, estado, CAMPOS_INTERNADOS_ITEM)
     
     def calcular_valor_total(self):
         """Calcula o valor total do item (bruto - desconto)"""
@@ -118,7 +165,7 @@ class ItemNotaFiscal:
             },
             "validacao": {
                 "valido": self.valido,
-                "erros": self.erros_validacao
+                "erros": self._erros_validacao or []
             }
         }
     
@@ -132,6 +179,18 @@ class ItemNotaFiscal:
 class NotaFiscal:
     """Classe para representar uma nota fiscal completa com validação robusta"""
     
+    __slots__ = (
+        'chave_acesso', 'numero', 'serie', 'modelo', 'data_emissao', 'natureza_operacao', 'codigo_uf',
+        'emitente_cnpj', 'emitente_nome', 'emitente_ie', '_emitente_endereco',
+        'destinatario_cnpj_cpf', 'destinatario_nome', 'destinatario_ie', '_destinatario_endereco',
+        'valor_produtos', 'valor_total_nf', 'valor_desconto_total', 'valor_pis_total', 'valor_cofins_total',
+        'itens', 'status', 'valida', '_erros_validacao', 'logs_processamento',
+        'informacoes_adicionais', 'data_processamento', 'arquivo_origem',
+        '_soma_valor_bruto', '_soma_valor_desconto', '_soma_valor_total', '_soma_pis', '_soma_cofins',
+        '_qtd_itens_validos',
+        '_itens_monofasicos', '_itens_nao_monofasicos', '_valor_monofasicos', '_valor_nao_monofasicos'
+    )
+    
     def __init__(self):
         # Identificação da nota
         self.chave_acesso: str = ""
@@ -146,28 +205,31 @@ class NotaFiscal:
         self.emitente_cnpj: str = ""
         self.emitente_nome: str = ""
         self.emitente_ie: str = ""
-        self.emitente_endereco: Dict[str, str] = {}
+        self._emitente_endereco: Optional[Dict[str, str]] = None
         
         # Dados do destinatário
         self.destinatario_cnpj_cpf: str = ""
         self.destinatario_nome: str = ""
         self.destinatario_ie: str = ""
-        self.destinatario_endereco: Dict[str, str] = {}
+        self._destinatario_endereco: Optional[Dict[str, str]] = None
         
         # Valores totais da nota
-        self.valor_produtos: Decimal = Decimal('0')  # vProd
-        self.valor_total_nf: Decimal = Decimal('0')  # vNF
-        self.valor_desconto_total: Decimal = Decimal('0')  # vDesc
-        self.valor_pis_total: Decimal = Decimal('0')
-        self.valor_cofins_total: Decimal = Decimal('0')
+        self.valor_produtos: Decimal = DECIMAL_ZERO  # vProd
+        self.valor_total_nf: Decimal = DECIMAL_ZERO  # vNF
+        self.valor_desconto_total: Decimal = DECIMAL_ZERO  # vDesc
+        self.valor_pis_total: Decimal = DECIMAL_ZERO
+        self.valor_cofins_total: Decimal = DECIMAL_ZERO
         
         # Itens da nota
         self.itens: List[ItemNotaFiscal] = []
         
+        # Acumuladores dos itens (atualizados em adicionar_item/remover_item)
+        self._zerar_acumuladores()
+        
         # Status e validação
         self.status: str = "ATIVO"  # ATIVO, CANCELADO, INUTILIZADO
         self.valida: bool = True
-        self.erros_validacao: List[str] = []
+        self._erros_validacao: Optional[List[str]] = None
         self.logs_processamento: List[str] = []
         
         # Informações adicionais
@@ -177,23 +239,121 @@ class NotaFiscal:
         self.data_processamento: Optional[datetime] = None
         self.arquivo_origem: str = ""
     
+    # Endereços e erros criados apenas quando usados
+    
+    @property
+    def emitente_endereco(self) -> Dict[str, str]:
+        if self._emitente_endereco is None:
+            self._emitente_endereco = {}
+        return self._emitente_endereco
+    
+    @emitente_endereco.setter
+    def emitente_endereco(self, endereco: Dict[str, str]):
+        self._emitente_endereco = endereco
+    
+    @property
+    def destinatario_endereco(self) -> Dict[str, str]:
+        if self._destinatario_endereco is None:
+            self._destinatario_endereco = {}
+        return self._destinatario_endereco
+    
+    @destinatario_endereco.setter
+    def destinatario_endereco(self, endereco: Dict[str, str]):
+        self._destinatario_endereco = endereco
+    
+    @property
+    def erros_validacao(self) -> List[str]:
+        if self._erros_validacao is None:
+            self._erros_validacao = []
+        return self._erros_validacao
+    
+    @erros_validacao.setter
+    def erros_validacao(self, erros: List[str]):
+        self._erros_validacao = erros
+    
+    def __setstate__(self, estado):
+        _restaurar_slots(self, estado, CAMPOS_INTERNADOS_NOTA)
+    
+    def _zerar_acumuladores(self):
+        """Inicializa somas e partições por tipo tributário"""
+        self._soma_valor_bruto: Decimal = DECIMAL_ZERO
+        self._soma_valor_desconto: Decimal = DECIMAL_ZERO
+        self._soma_valor_total: Decimal = DECIMAL_ZERO
+        self._soma_pis: Decimal = DECIMAL_ZERO
+        self._soma_cofins: Decimal = DECIMAL_ZERO
+        self._qtd_itens_validos: int = 0
+        
+        self._itens_monofasicos: List[ItemNotaFiscal] = []
+        self._itens_nao_monofasicos: List[ItemNotaFiscal] = []
+        self._valor_monofasicos: Decimal = DECIMAL_ZERO
+        self._valor_nao_monofasicos: Decimal = DECIMAL_ZERO
+    
     def adicionar_item(self, item: ItemNotaFiscal):
-        """Adiciona item à nota fiscal"""
+        """Adiciona item à nota fiscal (totais atualizados em O(1))"""
         self.itens.append(item)
+        self._acumular_item(item, 1)
         self.recalcular_totais()
     
+    def remover_item(self, item: ItemNotaFiscal):
+        """Remove item da nota fiscal e desconta seus valores dos totais"""
+        self.itens.remove(item)
+        self._acumular_item(item, -1)
+        self.recalcular_totais()
+    
+    def _acumular_item(self, item: ItemNotaFiscal, sinal: int):
+        """Soma (sinal 1) ou subtrai (sinal -1) os valores do item dos acumuladores"""
+        if sinal > 0:
+            self._soma_valor_bruto += item.valor_bruto
+            self._soma_valor_desconto += item.valor_desconto
+            self._soma_valor_total += item.valor_total
+            self._soma_pis += item.pis_valor
+            self._soma_cofins += item.cofins_valor
+        else:
+            self._soma_valor_bruto -= item.valor_bruto
+            self._soma_valor_desconto -= item.valor_desconto
+            self._soma_valor_total -= item.valor_total
+            self._soma_pis -= item.pis_valor
+            self._soma_cofins -= item.cofins_valor
+        
+        if item.valido:
+            self._qtd_itens_validos += sinal
+        
+        if item.tipo_tributario == "Monofasico":
+            particao = self._itens_monofasicos
+            self._valor_monofasicos += item.valor_total if sinal > 0 else -item.valor_total
+        elif item.tipo_tributario == "NaoMonofasico":
+            particao = self._itens_nao_monofasicos
+            self._valor_nao_monofasicos += item.valor_total if sinal > 0 else -item.valor_total
+        else:
+            return
+        
+        if sinal > 0:
+            particao.append(item)
+        else:
+            particao.remove(item)
+    
     def recalcular_totais(self):
-        """Recalcula totais da nota baseado nos itens"""
-        self.valor_produtos = sum(item.valor_bruto for item in self.itens)
-        self.valor_desconto_total = sum(item.valor_desconto for item in self.itens)
-        self.valor_pis_total = sum(item.pis_valor for item in self.itens)
-        self.valor_cofins_total = sum(item.cofins_valor for item in self.itens)
+        """Atualiza totais da nota a partir dos acumuladores dos itens"""
+        self.valor_produtos = self._soma_valor_bruto
+        self.valor_desconto_total = self._soma_valor_desconto
+        self.valor_pis_total = self._soma_pis
+        self.valor_cofins_total = self._soma_cofins
         
         # Valor total calculado (pode diferir do XML em casos específicos)
         valor_calculado = self.valor_produtos - self.valor_desconto_total
         
         return valor_calculado
     
+    def reconstruir_acumuladores(self):
+        """
+        Refaz acumuladores e partições varrendo os itens (O(n))
+        Necessário apenas se itens forem alterados após adicionados
+        """
+        self._zerar_acumuladores()
+        for item in self.itens:
+            self._acumular_item(item, 1)
+        return self.recalcular_totais()
+    
     def adicionar_erro_validacao(self, erro: str):
         """Adiciona erro de validação à nota"""
         self.erros_validacao.append(erro)
@@ -206,27 +366,35 @@ class NotaFiscal:
     
     def obter_itens_monofasicos(self) -> List[ItemNotaFiscal]:
         """Retorna lista de itens classificados como monofásicos"""
-        return [item for item in self.itens if item.tipo_tributario == "Monofasico"]
+        return list(self._itens_monofasicos)
     
     def obter_itens_nao_monofasicos(self) -> List[ItemNotaFiscal]:
         """Retorna lista de itens não-monofásicos"""
-        return [item for item in self.itens if item.tipo_tributario == "NaoMonofasico"]
+        return list(self._itens_nao_monofasicos)
+    
+    def obter_valor_total_itens(self) -> Decimal:
+        """Retorna a soma do valor total (bruto - desconto) dos itens"""
+        return self._soma_valor_total
+    
+    def contar_itens_validos(self) -> int:
+        """Retorna quantos itens estavam válidos ao serem adicionados"""
+        return self._qtd_itens_validos
     
     def obter_valor_total_monofasicos(self) -> Decimal:
         """Retorna valor total dos produtos monofásicos"""
-        return sum(item.valor_total for item in self.obter_itens_monofasicos())
+        return self._valor_monofasicos
     
     def obter_valor_total_nao_monofasicos(self) -> Decimal:
         """Retorna valor total dos produtos não-monofásicos"""
-        return sum(item.valor_total for item in self.obter_itens_nao_monofasicos())
+        return self._valor_nao_monofasicos
     
     def obter_proporcao_monofasicos(self) -> Decimal:
         """Retorna proporção de produtos monofásicos (0-100)"""
-        total_geral = self.obter_valor_total_monofasicos() + self.obter_valor_total_nao_monofasicos()
+        total_geral = self._valor_monofasicos + self._valor_nao_monofasicos
         if total_geral == 0:
             return Decimal('0')
         
-        proporcao = (self.obter_valor_total_monofasicos() / total_geral) * 100
+        proporcao = (self._valor_monofasicos / total_geral) * 100
         return proporcao.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
     
     def eh_nota_cancelada(self) -> bool:
@@ -243,10 +411,10 @@ class NotaFiscal:
         """Retorna estatísticas da nota fiscal"""
         return {
             "total_itens": len(self.itens),
-            "itens_monofasicos": len(self.obter_itens_monofasicos()),
-            "itens_nao_monofasicos": len(self.obter_itens_nao_monofasicos()),
-            "valor_total_monofasicos": float(self.obter_valor_total_monofasicos()),
-            "valor_total_nao_monofasicos": float(self.obter_valor_total_nao_monofasicos()),
+            "itens_monofasicos": len(self._itens_monofasicos),
+            "itens_nao_monofasicos": len(self._itens_nao_monofasicos),
+            "valor_total_monofasicos": float(self._valor_monofasicos),
+            "valor_total_nao_monofasicos": float(self._valor_nao_monofasicos),
             "proporcao_monofasicos": float(self.obter_proporcao_monofasicos()),
             "valor_pis_total": float(self.valor_pis_total),
             "valor_cofins_total": float(self.valor_cofins_total),
@@ -270,13 +438,13 @@ class NotaFiscal:
                 "cnpj": self.emitente_cnpj,
                 "nome": self.emitente_nome,
                 "ie": self.emitente_ie,
-                "endereco": self.emitente_endereco
+                "endereco": self._emitente_endereco or {}
             },
             "destinatario": {
                 "cnpj_cpf": self.destinatario_cnpj_cpf,
                 "nome": self.destinatario_nome,
                 "ie": self.destinatario_ie,
-                "endereco": self.destinatario_endereco
+                "endereco": self._destinatario_endereco or {}
             },
             "totais": {
                 "valor_produtos": float(self.valor_produtos),
@@ -289,7 +457,7 @@ class NotaFiscal:
             "status": self.status,
             "validacao": {
                 "valida": self.valida,
-                "erros": self.erros_validacao
+                "erros": self._erros_validacao or []
             },
             "metadados": {
                 "data_processamento": self.data_processamento.isoformat() if self.data_processamento else None,
@@ -315,6 +483,9 @@ class NotaFiscal:
 class EventoCancelamento:
     """Classe para representar eventos de cancelamento de NFe"""
     
+    __slots__ = ('chave_nfe', 'tipo_evento', 'data_evento', 'justificativa',
+                 'numero_protocolo', 'numero_sequencial')
+    
     def __init__(self):
         self.chave_nfe: str = ""
         self.tipo_evento: str = "110111"  # Cancelamento
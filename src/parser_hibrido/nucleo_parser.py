@@ -0,0 +1,586 @@
+#!/usr/bin/env python3
+"""
+Núcleo Reentrante do Parser de NFe
+Funções puras de extração: nenhum estado é guardado entre chamadas
+"""
+
+import logging
+from decimal import Decimal
+from datetime import datetime
+from typing import Optional, Dict, Tuple, Union, BinaryIO
+from lxml import etree
+
+# Imports locais
+from models import NotaFiscal, ItemNotaFiscal, EventoCancelamento, converter_para_decimal, internar_codigo
+from validators import ValidadorFiscal
+from diagnosticos import Diagnosticos
+from esquema_extracao import EsquemaExtracaoNFe, CamposCompilados
+from utils import UtilXML, UtilArquivo, UtilData, UtilTributario, extrair_chave_acesso
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Esquema compartilhado quando o chamador não fornece um (XPath compilado é thread-safe)
+_esquema_padrao = None
+
+# Tamanho de arquivo a partir do qual a extração é feita em streaming
+LIMITE_STREAMING_BYTES = 512 * 1024
+
+# Únicos elementos entregues pelo iterparse; o restante é filtrado pelo libxml2
+TAGS_STREAMING = ('{*}infNFe', '{*}det')
+
+def obter_esquema_padrao() -> EsquemaExtracaoNFe:
+    """Retorna o esquema de extração compartilhado pelo processo"""
+    global _esquema_padrao
+    if _esquema_padrao is None:
+        _esquema_padrao = EsquemaExtracaoNFe()
+    return _esquema_padrao
+
+def parse_nfe_bytes(data: Union[str, bytes], tabelas: Optional[Dict] = None,
+                    arquivo_origem: str = "",
+                    esquema: Optional[EsquemaExtracaoNFe] = None) -> Tuple[Optional[NotaFiscal], Diagnosticos]:
+    """
+    Processa o conteúdo de um XML de NFe sem efeitos colaterais
+    Args:
+        data: Conteúdo do XML (bytes preferencialmente)
+        tabelas: Tabela de NCMs monofásicos
+        arquivo_origem: Caminho do arquivo (apenas informativo)
+        esquema: Esquema de extração compilado (opcional)
+    Returns:
+        tuple: (NotaFiscal ou None, Diagnosticos do documento)
+    """
+    return parse_nfe_root(UtilXML.parsear_xml(data), tabelas, arquivo_origem, esquema)
+
+def parse_nfe_root(root: Optional[etree.Element], tabelas: Optional[Dict] = None,
+                   arquivo_origem: str = "",
+                   esquema: Optional[EsquemaExtracaoNFe] = None) -> Tuple[Optional[NotaFiscal], Diagnosticos]:
+    """
+    Processa uma NFe a partir da árvore já parseada, sem efeitos colaterais
+    Returns:
+        tuple: (NotaFiscal ou None, Diagnosticos do documento)
+    """
+    diagnosticos = Diagnosticos(arquivo_origem)
+    
+    # Validação inicial da estrutura XML
+    if not UtilXML.validar_raiz_nfe(root):
+        diagnosticos.erro("XML_INVALIDO", arquivo_origem)
+        return None, diagnosticos
+    
+    extracao = _ExtracaoNFe(tabelas, esquema or obter_esquema_padrao(), diagnosticos)
+    return extracao.extrair(root, arquivo_origem), diagnosticos
+
+def parse_nfe_stream(fonte: Union[str, BinaryIO], tabelas: Optional[Dict] = None,
+                     arquivo_origem: str = "",
+                     esquema: Optional[EsquemaExtracaoNFe] = None) -> Tuple[Optional[NotaFiscal], Diagnosticos]:
+    """
+    Processa uma NFe em streaming (iterparse), sem montar a árvore completa
+    Cada det é extraído assim que sua tag fecha e descartado em seguida,
+    de modo que a memória não cresce com o número de itens
+    Args:
+        fonte: Caminho do arquivo ou objeto binário com read()
+        tabelas: Tabela de NCMs monofásicos
+        arquivo_origem: Caminho do arquivo (apenas informativo)
+        esquema: Esquema de extração compilado (opcional)
+    Returns:
+        tuple: (NotaFiscal ou None, Diagnosticos do documento)
+    """
+    diagnosticos = Diagnosticos(arquivo_origem)
+    extracao = _ExtracaoNFe(tabelas, esquema or obter_esquema_padrao(), diagnosticos)
+    try:
+        return extracao.extrair_streaming(fonte, arquivo_origem), diagnosticos
+    except etree.XMLSyntaxError:
+        if isinstance(fonte, str):
+            # Encoding não declarado (cp1252/latin-1): parse completo com fallback
+            with UtilArquivo.abrir_xml(fonte) as conteudo:
+                return parse_nfe_bytes(conteudo, tabelas, arquivo_origem, esquema)
+        if hasattr(fonte, 'fileno'):
+            # Arquivo aberto pelo chamador: mesmo fallback, sem reabrir
+            with UtilArquivo.buffer_xml(fonte) as conteudo:
+                return parse_nfe_bytes(conteudo, tabelas, arquivo_origem, esquema)
+        diagnosticos.erro("XML_INVALIDO", arquivo_origem)
+        return None, diagnosticos
+
+def parse_evento_root(root: Optional[etree.Element],
+                      esquema: Optional[EsquemaExtracaoNFe] = None) -> Tuple[Optional[EventoCancelamento], Diagnosticos]:
+    """
+    Processa um evento de cancelamento a partir da árvore já parseada
+    Returns:
+        tuple: (EventoCancelamento ou None, Diagnosticos do documento)
+    """
+    diagnosticos = Diagnosticos()
+    if root is None:
+        return None, diagnosticos
+    
+    try:
+        campos = (esquema or obter_esquema_padrao()).para_documento(root)
+        inf_evento = campos.elemento('infEvento', root)
+        
+        # Verificar se é evento de cancelamento
+        if campos.texto('infEvento', 'tipo_evento', inf_evento) != '110111':
+            return None, diagnosticos
+        
+        # Criar evento
+        evento = EventoCancelamento()
+        
+        # Extrair chave da NFe cancelada, data e justificativa
+        evento.chave_nfe = campos.texto('infEvento', 'chave_nfe', inf_evento)
+        evento.data_evento = UtilData.parsear_data_nfe(campos.texto('infEvento', 'data_evento', inf_evento))
+        evento.justificativa = campos.texto('infEvento', 'justificativa', inf_evento)
+        
+        return evento, diagnosticos
+        
+    except Exception as e:
+        diagnosticos.erro("EVENTO_ERRO", str(e))
+        return None, diagnosticos
+
+class _ExtracaoNFe:
+    """
+    Estado de uma única extração (validador grava nos diagnósticos do documento)
+    Criado a cada documento, por isso seguro para threads e processos
+    """
+    
+    def __init__(self, tabela_ncm_monofasico: Optional[Dict], esquema: EsquemaExtracaoNFe,
+                 diagnosticos: Diagnosticos):
+        self.tabela_ncm_monofasico = tabela_ncm_monofasico or {}
+        self.esquema = esquema
+        self.diagnosticos = diagnosticos
+        self.validador = ValidadorFiscal(diagnosticos)
+    
+    def extrair(self, root: etree.Element, arquivo_origem: str = "") -> Optional[NotaFiscal]:
+        """Extrai a NotaFiscal completa da árvore"""
+        try:
+            # Namespace detectado uma vez; XPaths já compilados no esquema
+            campos = self.esquema.para_documento(root)
+            
+            # Localizar elemento NFe
+            nfe_element = self._localizar_elemento_nfe(root, campos)
+            if nfe_element is None:
+                self.diagnosticos.erro("NFE_NAO_ENCONTRADA", arquivo_origem)
+                return None
+            
+            inf_nfe = campos.elemento('infNFe', nfe_element)
+            nota_fiscal = self._criar_nota(arquivo_origem)
+            
+            # Extrair dados principais
+            if not self._extrair_cabecalho(inf_nfe, nota_fiscal, campos):
+                return None
+            
+            self._extrair_dados_totais(inf_nfe, nota_fiscal, campos)
+            self._extrair_informacoes_adicionais(inf_nfe, nota_fiscal, campos)
+            
+            # Processar itens
+            if not self._processar_itens(inf_nfe, nota_fiscal, campos):
+                return None
+            
+            return self._concluir_nota(nota_fiscal)
+            
+        except Exception as e:
+            self.diagnosticos.erro("NFE_ERRO", str(e))
+            return None
+    
+    def extrair_streaming(self, fonte: Union[str, BinaryIO], arquivo_origem: str = "") -> Optional[NotaFiscal]:
+        """
+        Extrai a NotaFiscal com iterparse
+        ide/emit/dest precedem os itens e são extraídos no primeiro det;
+        total/infAdic vêm depois e são extraídos no fechamento de infNFe
+        Erros de sintaxe XML são propagados para o chamador
+        """
+        nota_fiscal = None
+        inf_nfe = None
+        campos = None
+        cabecalho_ok = None  # None enquanto o cabeçalho não foi extraído
+        total_det = 0
+        
+        try:
+            contexto = etree.iterparse(fonte, events=('start', 'end'), tag=TAGS_STREAMING,
+                                       resolve_entities=False, no_network=True)
+            for evento, elemento in contexto:
+                if etree.QName(elemento).localname == 'infNFe':
+                    if evento == 'start' and inf_nfe is None:
+                        if not self._validar_infnfe_streaming(elemento):
+                            self.diagnosticos.erro("XML_INVALIDO", arquivo_origem)
+                            return None
+                        inf_nfe = elemento
+                        campos = self.esquema.para_documento(elemento)
+                        nota_fiscal = self._criar_nota(arquivo_origem)
+                    elif evento == 'end' and elemento is inf_nfe:
+                        if cabecalho_ok is None:
+                            cabecalho_ok = self._extrair_cabecalho(inf_nfe, nota_fiscal, campos)
+                        if not cabecalho_ok:
+                            return None
+                        self._extrair_dados_totais(inf_nfe, nota_fiscal, campos)
+                        # ICMSTot vem depois dos itens: os totais acumulados prevalecem, como no caminho DOM
+                        nota_fiscal.recalcular_totais()
+                        self._extrair_informacoes_adicionais(inf_nfe, nota_fiscal, campos)
+                    continue
+                
+                # det: apenas filhos diretos do infNFe, no fechamento da tag
+                if evento != 'end' or inf_nfe is None or elemento.getparent() is not inf_nfe:
+                    continue
+                
+                if cabecalho_ok is None:
+                    cabecalho_ok = self._extrair_cabecalho(inf_nfe, nota_fiscal, campos)
+                if not cabecalho_ok:
+                    return None
+                
+                total_det += 1
+                item = self._processar_item_individual(elemento, nota_fiscal, campos)
+                if item:
+                    nota_fiscal.adicionar_item(item)
+                
+                # Libera o item e os irmãos anteriores (cabeçalho e itens já consumidos)
+                elemento.clear(keep_tail=True)
+                while elemento.getprevious() is not None:
+                    del inf_nfe[0]
+            
+            if inf_nfe is None:
+                if UtilXML.validar_raiz_nfe(contexto.root):
+                    self.diagnosticos.erro("NFE_NAO_ENCONTRADA", arquivo_origem)
+                else:
+                    self.diagnosticos.erro("XML_INVALIDO", arquivo_origem)
+                return None
+            
+            if not self._verificar_itens(nota_fiscal, total_det):
+                return None
+            
+            return self._concluir_nota(nota_fiscal)
+            
+        except etree.XMLSyntaxError:
+            raise
+        except Exception as e:
+            self.diagnosticos.erro("NFE_ERRO", str(e))
+            return None
+    
+    @staticmethod
+    def _validar_infnfe_streaming(inf_nfe: etree.Element) -> bool:
+        """infNFe deve estar em NFe, e a raiz ser NFe ou nfeProc (como em parse_nfe_root)"""
+        nfe = inf_nfe.getparent()
+        if nfe is None or etree.QName(nfe).localname != 'NFe':
+            return False
+        return UtilXML.validar_raiz_nfe(inf_nfe.getroottree().getroot())
+    
+    def _criar_nota(self, arquivo_origem: str) -> NotaFiscal:
+        """Cria NotaFiscal vazia para o documento"""
+        nota_fiscal = NotaFiscal()
+        nota_fiscal.arquivo_origem = arquivo_origem
+        nota_fiscal.data_processamento = datetime.now()
+        return nota_fiscal
+    
+    def _extrair_cabecalho(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados) -> bool:
+        """Extrai identificação, emitente e destinatário"""
+        if not self._extrair_dados_identificacao(inf_nfe, nota_fiscal, campos):
+            return False
+        
+        if not self._extrair_dados_emitente(inf_nfe, nota_fiscal, campos):
+            return False
+        
+        self._extrair_dados_destinatario(inf_nfe, nota_fiscal, campos)
+        return True
+    
+    def _concluir_nota(self, nota_fiscal: NotaFiscal) -> NotaFiscal:
+        """Valida consistência (totais já acumulados por adicionar_item) e registra o resultado"""
+        self._validar_consistencia_nota(nota_fiscal)
+        
+        # Adicionar logs de validação (apenas deste documento)
+        nota_fiscal.logs_processamento.extend(self.diagnosticos.logs_validacao)
+        
+        if nota_fiscal.valida:
+            self.diagnosticos.info("NFE_PROCESSADA", nota_fiscal.numero)
+        else:
+            self.diagnosticos.aviso("NFE_COM_ALERTAS", nota_fiscal.numero)
+        
+        return nota_fiscal
+    
+    def _localizar_elemento_nfe(self, root: etree.Element, campos: CamposCompilados) -> Optional[etree.Element]:
+        """Localiza o elemento NFe na estrutura XML (raiz NFe ou filho de nfeProc)"""
+        return campos.elemento('NFe', root)
+    
+    def _extrair_dados_identificacao(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados) -> bool:
+        """Extrai dados de identificação da NFe"""
+        if inf_nfe is None:
+            nota_fiscal.adicionar_erro_validacao("Elemento infNFe não encontrado")
+            return False
+        
+        # Chave de acesso
+        nota_fiscal.chave_acesso = extrair_chave_acesso(inf_nfe) or ""
+        if not self.validador.validar_chave_nfe(nota_fiscal.chave_acesso):
+            nota_fiscal.adicionar_erro_validacao("Chave de acesso inválida")
+        
+        # Dados de identificação
+        ide = campos.elemento('ide', inf_nfe)
+        if ide is None:
+            nota_fiscal.adicionar_erro_validacao("Elemento ide não encontrado")
+            return False
+        
+        nota_fiscal.numero = campos.texto('ide', 'numero', ide)
+        nota_fiscal.serie = campos.texto('ide', 'serie', ide)
+        nota_fiscal.modelo = campos.texto('ide', 'modelo', ide)
+        nota_fiscal.natureza_operacao = campos.texto('ide', 'natureza_operacao', ide)
+        nota_fiscal.codigo_uf = campos.texto('ide', 'codigo_uf', ide)
+        
+        # Data de emissão
+        data_emissao_str = campos.texto('ide', 'data_emissao', ide)
+        nota_fiscal.data_emissao = UtilData.parsear_data_nfe(data_emissao_str)
+        
+        # Validações básicas
+        if not nota_fiscal.numero:
+            nota_fiscal.adicionar_erro_validacao("Número da nota não encontrado")
+            return False
+        
+        return True
+    
+    def _extrair_dados_emitente(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados) -> bool:
+        """Extrai dados do emitente"""
+        emit = campos.elemento('emit', inf_nfe)
+        
+        if emit is None:
+            nota_fiscal.adicionar_erro_validacao("Dados do emitente não encontrados")
+            return False
+        
+        # CNPJ/CPF do emitente
+        cnpj = campos.texto('emit', 'cnpj', emit)
+        cpf = campos.texto('emit', 'cpf', emit)
+        
+        if cnpj:
+            nota_fiscal.emitente_cnpj = internar_codigo(cnpj)
+            if not self.validador.validar_cnpj(cnpj):
+                nota_fiscal.adicionar_erro_validacao("CNPJ do emitente inválido")
+        elif cpf:
+            nota_fiscal.emitente_cnpj = cpf  # Usar mesmo campo para CPF
+            if not self.validador.validar_cpf(cpf):
+                nota_fiscal.adicionar_erro_validacao("CPF do emitente inválido")
+        else:
+            nota_fiscal.adicionar_erro_validacao("CNPJ/CPF do emitente não encontrado")
+            return False
+        
+        # Nome do emitente
+        nota_fiscal.emitente_nome = campos.texto('emit', 'nome', emit)
+        if not nota_fiscal.emitente_nome:
+            nota_fiscal.adicionar_erro_validacao("Nome do emitente não encontrado")
+            return False
+        
+        # IE do emitente
+        nota_fiscal.emitente_ie = campos.texto('emit', 'ie', emit)
+        
+        # Endereço do emitente
+        ender_emit = campos.elemento('enderEmit', inf_nfe)
+        if ender_emit is not None:
+            nota_fiscal.emitente_endereco = campos.textos('enderEmit', ender_emit)
+        
+        return True
+    
+    def _extrair_dados_destinatario(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados):
+        """Extrai dados do destinatário"""
+        dest = campos.elemento('dest', inf_nfe)
+        
+        if dest is None:
+            return  # Destinatário é opcional
+        
+        # CNPJ/CPF do destinatário
+        cnpj = campos.texto('dest', 'cnpj', dest)
+        cpf = campos.texto('dest', 'cpf', dest)
+        
+        if cnpj:
+            nota_fiscal.destinatario_cnpj_cpf = cnpj
+            if not self.validador.validar_cnpj(cnpj):
+                nota_fiscal.adicionar_erro_validacao("CNPJ do destinatário inválido")
+        elif cpf:
+            nota_fiscal.destinatario_cnpj_cpf = cpf
+            if not self.validador.validar_cpf(cpf):
+                nota_fiscal.adicionar_erro_validacao("CPF do destinatário inválido")
+        
+        # Nome do destinatário
+        nota_fiscal.destinatario_nome = campos.texto('dest', 'nome', dest)
+        nota_fiscal.destinatario_ie = campos.texto('dest', 'ie', dest)
+    
+    def _extrair_dados_totais(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados):
+        """Extrai totais da NFe"""
+        icms_tot = campos.elemento('ICMSTot', inf_nfe)
+        if icms_tot is None:
+            return
+        
+        nota_fiscal.valor_produtos = converter_para_decimal(
+            campos.texto('ICMSTot', 'valor_produtos', icms_tot, "0")
+        )
+        nota_fiscal.valor_total_nf = converter_para_decimal(
+            campos.texto('ICMSTot', 'valor_total_nf', icms_tot, "0")
+        )
+        nota_fiscal.valor_desconto_total = converter_para_decimal(
+            campos.texto('ICMSTot', 'valor_desconto_total', icms_tot, "0")
+        )
+        nota_fiscal.valor_pis_total = converter_para_decimal(
+            campos.texto('ICMSTot', 'valor_pis_total', icms_tot, "0")
+        )
+        nota_fiscal.valor_cofins_total = converter_para_decimal(
+            campos.texto('ICMSTot', 'valor_cofins_total', icms_tot, "0")
+        )
+    
+    def _extrair_informacoes_adicionais(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados):
+        """Extrai informações adicionais"""
+        inf_adic = campos.elemento('infAdic', inf_nfe)
+        
+        if inf_adic is not None:
+            nota_fiscal.informacoes_adicionais = campos.texto('infAdic', 'informacoes_adicionais', inf_adic)
+    
+    def _processar_itens(self, inf_nfe: etree.Element, nota_fiscal: NotaFiscal, campos: CamposCompilados) -> bool:
+        """Processa itens da NFe"""
+        itens_det = campos.elementos('det', inf_nfe)
+        
+        for det in itens_det:
+            item = self._processar_item_individual(det, nota_fiscal, campos)
+            if item:
+                nota_fiscal.adicionar_item(item)
+        
+        return self._verificar_itens(nota_fiscal, len(itens_det))
+    
+    def _verificar_itens(self, nota_fiscal: NotaFiscal, total_det: int) -> bool:
+        """Verifica se a nota tem itens e se algum foi processado"""
+        if not total_det:
+            nota_fiscal.adicionar_erro_validacao("Nenhum item encontrado na nota fiscal")
+            return False
+        
+        if not nota_fiscal.itens:
+            nota_fiscal.adicionar_erro_validacao("Nenhum item válido processado")
+            return False
+        
+        return True
+    
+    def _processar_item_individual(self, det_element: etree.Element, nota_fiscal: NotaFiscal,
+                                   campos: CamposCompilados) -> Optional[ItemNotaFiscal]:
+        """Processa um item individual da NFe"""
+        try:
+            item = ItemNotaFiscal()
+            
+            # Número do item
+            item.numero = int(det_element.get('nItem', '0'))
+            
+            # Dados do produto
+            prod = campos.elemento('prod', det_element)
+            if prod is None:
+                self.diagnosticos.aviso("ITEM_SEM_PROD", str(item.numero))
+                return None
+            
+            item.codigo = campos.texto('prod', 'codigo', prod)
+            item.ean = campos.texto('prod', 'ean', prod)
+            item.descricao = campos.texto('prod', 'descricao', prod)
+            # Códigos repetidos entre itens: uma instância por valor distinto
+            item.ncm = internar_codigo(campos.texto('prod', 'ncm', prod))
+            item.cest = campos.texto('prod', 'cest', prod)
+            item.cfop = internar_codigo(campos.texto('prod', 'cfop', prod))
+            item.unidade = internar_codigo(campos.texto('prod', 'unidade', prod))
+            
+            # Validações básicas
+            if not item.codigo:
+                item.adicionar_erro_validacao("Código do produto não encontrado")
+            
+            if not item.descricao:
+                item.adicionar_erro_validacao("Descrição do produto não encontrada")
+            
+            if item.ncm and not self.validador.validar_ncm(item.ncm):
+                item.adicionar_erro_validacao("NCM inválido")
+            
+            if item.cfop and not self.validador.validar_cfop(item.cfop):
+                item.adicionar_erro_validacao("CFOP inválido")
+            
+            # Valores comerciais
+            item.quantidade = converter_para_decimal(campos.texto('prod', 'quantidade', prod, "0"))
+            item.valor_unitario = converter_para_decimal(campos.texto('prod', 'valor_unitario', prod, "0"))
+            item.valor_bruto = converter_para_decimal(campos.texto('prod', 'valor_bruto', prod, "0"))
+            item.valor_desconto = converter_para_decimal(campos.texto('prod', 'valor_desconto', prod, "0"))
+            
+            # Calcular valor total
+            item.calcular_valor_total()
+            
+            # Processar impostos
+            self._processar_impostos_item(det_element, item, campos)
+            
+            # Classificar tributação
+            self._classificar_tributacao_item(item)
+            
+            return item
+            
+        except Exception as e:
+            self.diagnosticos.erro("ITEM_ERRO", str(e))
+            return None
+    
+    def _processar_impostos_item(self, det_element: etree.Element, item: ItemNotaFiscal, campos: CamposCompilados):
+        """Processa impostos do item"""
+        # Processar PIS (PISAliq, PISQtde, PISNT ou PISOutr)
+        pis_info = campos.elemento('PIS', det_element)
+        if pis_info is not None:
+            self._processar_pis_item(pis_info, item, campos)
+        
+        # Processar COFINS (COFINSAliq, COFINSQtde, COFINSNT ou COFINSOutr)
+        cofins_info = campos.elemento('COFINS', det_element)
+        if cofins_info is not None:
+            self._processar_cofins_item(cofins_info, item, campos)
+    
+    def _processar_pis_item(self, pis_info: etree.Element, item: ItemNotaFiscal, campos: CamposCompilados):
+        """Processa subgrupo de PIS do item"""
+        item.pis_cst = internar_codigo(campos.texto('PIS', 'cst', pis_info))
+        item.pis_base_calculo = converter_para_decimal(campos.texto('PIS', 'base_calculo', pis_info, "0"))
+        item.pis_aliquota = converter_para_decimal(campos.texto('PIS', 'aliquota', pis_info, "0"))
+        item.pis_valor = converter_para_decimal(campos.texto('PIS', 'valor', pis_info, "0"))
+        item.pis_subgrupo = etree.QName(pis_info).localname
+        
+        # Validar CST
+        if item.pis_cst and not self.validador.validar_cst(item.pis_cst):
+            item.adicionar_erro_validacao("CST PIS inválido")
+    
+    def _processar_cofins_item(self, cofins_info: etree.Element, item: ItemNotaFiscal, campos: CamposCompilados):
+        """Processa subgrupo de COFINS do item"""
+        item.cofins_cst = internar_codigo(campos.texto('COFINS', 'cst', cofins_info))
+        item.cofins_base_calculo = converter_para_decimal(campos.texto('COFINS', 'base_calculo', cofins_info, "0"))
+        item.cofins_aliquota = converter_para_decimal(campos.texto('COFINS', 'aliquota', cofins_info, "0"))
+        item.cofins_valor = converter_para_decimal(campos.texto('COFINS', 'valor', cofins_info, "0"))
+        item.cofins_subgrupo = etree.QName(cofins_info).localname
+        
+        # Validar CST
+        if item.cofins_cst and not self.validador.validar_cst(item.cofins_cst):
+            item.adicionar_erro_validacao("CST COFINS inválido")
+    
+    def _classificar_tributacao_item(self, item: ItemNotaFiscal):
+        """
+        Classifica tributação do item seguindo metodologia híbrida
+        Prioriza NCM (conforme Mecanismo V2), mas também considera CST
+        """
+        # Estratégia 1: Classificação por NCM (prioritária)
+        if item.ncm and self._verificar_ncm_monofasico(item.ncm):
+            item.eh_monofasico_por_ncm = True
+            item.tipo_tributario = "Monofasico"
+            return
+        
+        # Estratégia 2: Classificação por CST (secundária)
+        if UtilTributario.eh_produto_monofasico_por_cst(item.pis_cst, item.cofins_cst):
+            item.eh_monofasico_por_cst = True
+            item.tipo_tributario = "Monofasico"
+            return
+        
+        # Se não for monofásico por nenhum critério
+        item.tipo_tributario = "NaoMonofasico"
+    
+    def _verificar_ncm_monofasico(self, ncm: str) -> bool:
+        """
+        Verifica se NCM é monofásico usando tabela de referência
+        """
+        if not self.tabela_ncm_monofasico:
+            return False
+        
+        # Buscar NCM exato na tabela
+        return ncm in self.tabela_ncm_monofasico
+    
+    def _validar_consistencia_nota(self, nota_fiscal: NotaFiscal):
+        """Valida consistência da nota fiscal"""
+        # Validar se total de itens bate com total da nota
+        valor_calculado = nota_fiscal.obter_valor_total_itens()
+        diferenca = abs(valor_calculado - nota_fiscal.valor_total_nf)
+        
+        # Tolerância de R$ 0,01 para diferenças de arredondamento
+        if diferenca > Decimal('0.01'):
+            nota_fiscal.adicionar_erro_validacao(
+                f"Divergência entre valor calculado ({valor_calculado}) e valor da nota ({nota_fiscal.valor_total_nf})"
+            )
+        
+        # Validar se há pelo menos um item válido
+        if not nota_fiscal.contar_itens_validos():
+            nota_fiscal.adicionar_erro_validacao("Nenhum item válido encontrado na nota")
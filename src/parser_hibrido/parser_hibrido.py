@@ -6,19 +6,21 @@ Combina robustez técnica do parser fornecido com funcionalidades de negócio da
 
 import os
 import json
+import hashlib
 import logging
-from decimal import Decimal
-from datetime import datetime
-from typing import Optional, List, Dict, Any, Union
+from typing import Optional, List, Dict, Any, Union, Callable
 from lxml import etree
 
 # Imports locais
-from models import NotaFiscal, ItemNotaFiscal, EventoCancelamento, converter_para_decimal
-from validators import ValidadorFiscal
-from utils import (
-    UtilXML, UtilData, UtilValor, UtilArquivo, UtilTributario, UtilLog,
-    NAMESPACE_NFE, extrair_chave_acesso
+from models import NotaFiscal, EventoCancelamento
+from esquema_extracao import EsquemaExtracaoNFe
+from diagnosticos import (
+    Diagnosticos, EstatisticasProcessamento, RegistroExecucao, LIMITE_LOG_EXECUCAO
 )
+from classificador_xml import classificar_fluxo
+from nucleo_parser import parse_nfe_root, parse_nfe_stream, parse_evento_root, LIMITE_STREAMING_BYTES
+from processamento_lote import processar_arquivos_paralelo
+from utils import UtilXML, UtilValor, UtilArquivo, UtilLog, NAMESPACE_NFE
 
 # Configurar logging
 logger = logging.getLogger(__name__)
@@ -29,565 +31,355 @@ class NFEParserHibrido:
     Combina validação robusta com funcionalidades completas de negócio
     """
     
-    def __init__(self, tabela_ncm_monofasico: Optional[Dict] = None):
+    def __init__(self, tabela_ncm_monofasico: Optional[Dict] = None,
+                 limite_logs: int = LIMITE_LOG_EXECUCAO,
+                 limite_streaming: int = LIMITE_STREAMING_BYTES):
         self.namespace = NAMESPACE_NFE
-        self.validador = ValidadorFiscal()
+        self.esquema = EsquemaExtracaoNFe()
         self.tabela_ncm_monofasico = tabela_ncm_monofasico or {}
-        self.logs_processamento = []
-        self.estatisticas = {
-            'total_processados': 0,
-            'total_validos': 0,
-            'total_invalidos': 0,
-            'total_cancelados': 0
-        }
+        # Arquivos a partir deste tamanho são extraídos em streaming (0 desativa)
+        self.limite_streaming = limite_streaming
+        self.registro_execucao = RegistroExecucao(limite_logs)
+        self.estatisticas = EstatisticasProcessamento()
+    
+    @property
+    def logs_processamento(self) -> List[str]:
+        """Últimos registros da execução formatados (buffer limitado)"""
+        return self.registro_execucao.mensagens()
     
     def processar_xml_nfe(self, xml_content: Union[str, bytes], arquivo_origem: str = "") -> Optional[NotaFiscal]:
         """
         Processa um XML de NFe com validação completa
         """
-        self.estatisticas['total_processados'] += 1
-        
-        # Validação inicial da estrutura XML
-        if not UtilXML.validar_estrutura_xml(xml_content):
-            self._log_erro("Estrutura XML inválida")
-            self.estatisticas['total_invalidos'] += 1
-            return None
+        root = UtilXML.parsear_xml(xml_content)
+        return self.processar_documento_nfe(root, arquivo_origem)
+    
+    def processar_documento_nfe(self, root: Optional[etree.Element], arquivo_origem: str = "",
+                                metadados: Optional[Dict] = None) -> Optional[NotaFiscal]:
+        """
+        Processa uma NFe a partir da árvore já parseada
+        Delega ao núcleo reentrante e apenas agrega estatísticas e logs
+        metadados: dict do cache de parsing que recebe os diagnósticos do documento
+        """
+        nota_fiscal, diagnosticos = parse_nfe_root(
+            root, self.tabela_ncm_monofasico, arquivo_origem, self.esquema
+        )
+        return self._contabilizar_nfe(nota_fiscal, diagnosticos, metadados)
+    
+    def processar_arquivo_nfe_streaming(self, arquivo: str, metadados: Optional[Dict] = None,
+                                        fonte=None) -> Optional[NotaFiscal]:
+        """
+        Processa uma NFe em streaming, sem montar a árvore completa
+        Indicado para notas grandes (centenas de itens): memória constante por item
+        fonte: arquivo já aberto em modo 'rb' (padrão: abre o caminho)
+        """
+        nota_fiscal, diagnosticos = parse_nfe_stream(
+            arquivo if fonte is None else fonte, self.tabela_ncm_monofasico, arquivo, self.esquema
+        )
+        return self._contabilizar_nfe(nota_fiscal, diagnosticos, metadados)
+    
+    def _contabilizar_nfe(self, nota_fiscal: Optional[NotaFiscal], diagnosticos: Diagnosticos,
+                          metadados: Optional[Dict] = None) -> Optional[NotaFiscal]:
+        """Agrega diagnósticos e estatísticas de uma NFe processada"""
+        self._registrar_diagnosticos(diagnosticos, metadados)
+        
+        self.estatisticas.incrementar('total_processados')
+        if nota_fiscal is not None and nota_fiscal.valida:
+            self.estatisticas.incrementar('total_validos')
+        else:
+            self.estatisticas.incrementar('total_invalidos')
         
-        try:
-            # Parse do XML
-            if isinstance(xml_content, str):
-                xml_content = xml_content.encode('utf-8')
-            
-            root = etree.fromstring(xml_content)
-            
-            # Localizar elemento NFe
-            nfe_element = self._localizar_elemento_nfe(root)
-            if nfe_element is None:
-                self._log_erro("Elemento NFe não encontrado")
-                self.estatisticas['total_invalidos'] += 1
-                return None
-            
-            # Criar objeto NotaFiscal
-            nota_fiscal = NotaFiscal()
-            nota_fiscal.arquivo_origem = arquivo_origem
-            nota_fiscal.data_processamento = datetime.now()
-            
-            # Extrair dados principais
-            if not self._extrair_dados_identificacao(nfe_element, nota_fiscal):
-                self.estatisticas['total_invalidos'] += 1
-                return None
-            
-            if not self._extrair_dados_emitente(nfe_element, nota_fiscal):
-                self.estatisticas['total_invalidos'] += 1
-                return None
-            
-            self._extrair_dados_destinatario(nfe_element, nota_fiscal)
-            self._extrair_dados_totais(nfe_element, nota_fiscal)
-            self._extrair_informacoes_adicionais(nfe_element, nota_fiscal)
-            
-            # Processar itens
-            if not self._processar_itens(nfe_element, nota_fiscal):
-                self.estatisticas['total_invalidos'] += 1
-                return None
-            
-            # Recalcular totais e validar consistência
-            nota_fiscal.recalcular_totais()
-            self._validar_consistencia_nota(nota_fiscal)
-            
-            # Adicionar logs de validação
-            nota_fiscal.logs_processamento.extend(self.validador.obter_logs_validacao())
-            
-            if nota_fiscal.valida:
-                self.estatisticas['total_validos'] += 1
-                self._log_info(f"NFe processada com sucesso: {nota_fiscal.numero}")
-            else:
-                self.estatisticas['total_invalidos'] += 1
-                self._log_aviso(f"NFe processada com alertas: {nota_fiscal.numero}")
-            
-            return nota_fiscal
-            
-        except Exception as e:
-            self._log_erro(f"Erro no processamento da NFe: {e}")
-            self.estatisticas['total_invalidos'] += 1
-            return None
+        return nota_fiscal
     
     def processar_evento_cancelamento(self, xml_content: Union[str, bytes]) -> Optional[EventoCancelamento]:
         """
         Processa um evento de cancelamento de NFe
         """
-        try:
-            if isinstance(xml_content, str):
-                xml_content = xml_content.encode('utf-8')
-            
-            root = etree.fromstring(xml_content)
-            
-            # Verificar se é evento de cancelamento
-            tipo_evento_elem = UtilXML.encontrar_elemento(root, 'tpEvento', self.namespace)
-            if tipo_evento_elem is None or tipo_evento_elem.text != '110111':
-                return None
-            
-            # Criar evento
-            evento = EventoCancelamento()
-            
-            # Extrair chave da NFe cancelada
-            chave_elem = UtilXML.encontrar_elemento(root, 'chNFe', self.namespace)
-            if chave_elem is not None:
-                evento.chave_nfe = chave_elem.text
-            
-            # Extrair data do evento
-            data_elem = UtilXML.encontrar_elemento(root, 'dhEvento', self.namespace)
-            if data_elem is not None:
-                evento.data_evento = UtilData.parsear_data_nfe(data_elem.text)
-            
-            # Extrair justificativa
-            justificativa_elem = UtilXML.encontrar_elemento(root, 'xJust', self.namespace)
-            if justificativa_elem is not None:
-                evento.justificativa = justificativa_elem.text
-            
-            return evento
-            
-        except Exception as e:
-            self._log_erro(f"Erro ao processar evento de cancelamento: {e}")
+        root = UtilXML.parsear_xml(xml_content)
+        if root is None:
             return None
+        
+        return self.processar_documento_evento(root)
+    
+    def processar_documento_evento(self, root: etree.Element,
+                                   metadados: Optional[Dict] = None) -> Optional[EventoCancelamento]:
+        """
+        Processa um evento de cancelamento a partir da árvore já parseada
+        """
+        evento, diagnosticos = parse_evento_root(root, self.esquema)
+        self._registrar_diagnosticos(diagnosticos, metadados)
+        return evento
+    
+    def contexto_cache(self) -> tuple:
+        """
+        Contexto do cache de parsing: resultados gravados com outra
+        tabela de NCMs monofásicos (chaves ou valores) não são reaproveitados
+        O CacheParse reduz o contexto a uma assinatura independente da ordem
+        da tabela (dict, conjunto ou lista de dicts legada)
+        """
+        return ('parser_hibrido', self.tabela_ncm_monofasico)
     
-    def processar_diretorio(self, diretorio: str, incluir_cancelamentos: bool = True) -> Dict[str, Any]:
+    def processar_diretorio(self, diretorio: str, incluir_cancelamentos: bool = True,
+                            workers: int = 1, tamanho_lote: Optional[int] = None,
+                            cache=None,
+                            ao_processar_nota: Optional[Callable[[NotaFiscal], None]] = None) -> Dict[str, Any]:
         """
         Processa todos os XMLs de um diretório
+        Com workers > 1 (ou workers=0 para todos os núcleos) usa pool de processos;
+        a ordem dos resultados é a mesma da listagem de arquivos
+        cache: CacheParse opcional (core.infrastructure.cache_parse); arquivos
+        inalterados desde a última execução não são lidos nem parseados
+        ao_processar_nota: recebe cada nota assim que lida, na ordem da listagem,
+        e as notas não são acumuladas ('notas' volta vazio); como os eventos
+        podem vir depois das notas, os cancelamentos devolvidos são aplicados
+        por quem chamou
         """
-        self._log_info(f"Iniciando processamento do diretório: {diretorio}")
+        self._log_info("DIRETORIO_INICIO", diretorio)
         
         # Listar arquivos XML
         arquivos_xml = UtilArquivo.listar_xmls_diretorio(diretorio)
         if not arquivos_xml:
-            self._log_aviso("Nenhum arquivo XML encontrado")
-            return {'notas': [], 'cancelamentos': [], 'estatisticas': self.estatisticas}
+            self._log_aviso("DIRETORIO_VAZIO", diretorio)
+            return {'notas': [], 'cancelamentos': [], 'estatisticas': self.obter_estatisticas(),
+                    'logs': self.logs_processamento, 'diagnosticos': self.obter_diagnosticos()}
         
         notas_fiscais = []
+        chaves_notas = []
         cancelamentos = {}
         
-        # Primeiro passo: identificar cancelamentos
-        if incluir_cancelamentos:
-            self._log_info("Identificando eventos de cancelamento...")
-            for arquivo in arquivos_xml:
-                conteudo_xml = UtilArquivo.ler_arquivo_xml(arquivo)
-                if conteudo_xml:
-                    try:
-                        root = etree.fromstring(conteudo_xml.encode('utf-8'))
-                        if UtilArquivo.determinar_tipo_xml(root) == 'EVENTO':
-                            evento = self.processar_evento_cancelamento(conteudo_xml)
-                            if evento and evento.chave_nfe:
-                                cancelamentos[evento.chave_nfe] = evento
-                                self._log_info(f"Cancelamento encontrado: {evento.chave_nfe}")
-                    except Exception:
-                        continue
-        
-        # Segundo passo: processar notas fiscais
-        self._log_info("Processando notas fiscais...")
-        for arquivo in arquivos_xml:
-            conteudo_xml = UtilArquivo.ler_arquivo_xml(arquivo)
-            if conteudo_xml:
-                try:
-                    root = etree.fromstring(conteudo_xml.encode('utf-8'))
-                    if UtilArquivo.determinar_tipo_xml(root) == 'NFE':
-                        nota = self.processar_xml_nfe(conteudo_xml, arquivo)
-                        if nota:
-                            # Verificar se foi cancelada
-                            if nota.chave_acesso in cancelamentos:
-                                nota.marcar_como_cancelada("Evento de cancelamento encontrado")
-                                self.estatisticas['total_cancelados'] += 1
-                            
-                            notas_fiscais.append(nota)
-                except Exception as e:
-                    self._log_erro(f"Erro ao processar {arquivo}: {e}")
-                    continue
-        
-        self._log_info(f"Processamento concluído. {len(notas_fiscais)} notas processadas.")
+        def registrar(resultado):
+            if resultado is None:
+                return
+            tipo, documento = resultado
+            if tipo == 'EVENTO':
+                if documento.chave_nfe:
+                    cancelamentos[documento.chave_nfe] = documento
+                    self._log_info("CANCELAMENTO_ENCONTRADO", documento.chave_nfe)
+            elif tipo == 'NFE':
+                if ao_processar_nota is None:
+                    notas_fiscais.append(documento)
+                else:
+                    chaves_notas.append(documento.chave_acesso)
+                    ao_processar_nota(documento)
+        
+        # Resultados registrados na ordem da listagem assim que os anteriores
+        # ficam prontos; acertos do cache esperam a vez ainda comprimidos
+        resultados_arquivos = {}
+        gravados = {}
+        proximo = 0
+        pendentes = list(range(len(arquivos_xml)))
+        
+        def liberar_prontos():
+            nonlocal proximo
+            while proximo < len(arquivos_xml):
+                if proximo in gravados:
+                    registrar(self._reaproveitar_resultado(
+                        arquivos_xml[proximo], cache.decodificar(gravados.pop(proximo)),
+                        incluir_cancelamentos))
+                elif proximo in resultados_arquivos:
+                    registrar(resultados_arquivos.pop(proximo))
+                else:
+                    break
+                proximo += 1
+        
+        if cache is not None:
+            pendentes = []
+            for indice, arquivo in enumerate(arquivos_xml):
+                gravado = cache.consultar(arquivo, bruto=True)
+                if gravado is cache.AUSENTE:
+                    pendentes.append(indice)
+                else:
+                    gravados[indice] = gravado
+            self._log_info("CACHE_CONSULTADO",
+                           f"{len(arquivos_xml) - len(pendentes)} de {len(arquivos_xml)} arquivos")
+        
+        def gravar_cache(arquivo, resultado, metadados):
+            # Gravado antes da aplicação dos cancelamentos, que depende do período
+            if cache is not None and metadados and metadados.get('completo'):
+                cache.gravar(arquivo, (metadados['tipo'], resultado[1] if resultado else None,
+                                       metadados['diagnosticos']),
+                             metadados['hash'], metadados['estado'])
+        
+        # Passo único: cada arquivo pendente é lido e parseado uma só vez
+        self._log_info("DOCUMENTOS_INICIO", f"{len(pendentes)} arquivos")
+        liberar_prontos()
+        arquivos_pendentes = [arquivos_xml[indice] for indice in pendentes]
+        if workers == 1 or len(arquivos_pendentes) <= 1:
+            for indice, arquivo in zip(pendentes, arquivos_pendentes):
+                metadados = {} if cache is not None else None
+                resultado = self._processar_arquivo(arquivo, incluir_cancelamentos, metadados)
+                gravar_cache(arquivo, resultado, metadados)
+                resultados_arquivos[indice] = resultado
+                liberar_prontos()
+        else:
+            posicao = 0
+            for resultados, estatisticas, registro_lote, metadados_lote in processar_arquivos_paralelo(
+                    type(self), arquivos_pendentes, self.tabela_ncm_monofasico,
+                    incluir_cancelamentos, workers, tamanho_lote, cache is not None):
+                self.estatisticas.mesclar(estatisticas)
+                self.registro_execucao.mesclar(registro_lote)
+                for resultado, metadados in zip(resultados, metadados_lote):
+                    indice = pendentes[posicao]
+                    gravar_cache(arquivos_xml[indice], resultado, metadados)
+                    resultados_arquivos[indice] = resultado
+                    posicao += 1
+                liberar_prontos()
+        
+        if cache is not None:
+            cache.sincronizar()
+        
+        # Aplicar cancelamentos após a leitura (eventos podem vir depois das notas)
+        for nota in notas_fiscais:
+            if nota.chave_acesso in cancelamentos:
+                nota.marcar_como_cancelada("Evento de cancelamento encontrado")
+                self.estatisticas.incrementar('total_cancelados')
+        for chave in chaves_notas:
+            if chave in cancelamentos:
+                self.estatisticas.incrementar('total_cancelados')
+        
+        self._log_info("DIRETORIO_CONCLUIDO", f"{len(notas_fiscais) + len(chaves_notas)} notas processadas")
         
         return {
             'notas': notas_fiscais,
             'cancelamentos': list(cancelamentos.values()),
-            'estatisticas': self.estatisticas,
-            'logs': self.logs_processamento
+            'estatisticas': self.obter_estatisticas(),
+            'logs': self.logs_processamento,
+            'diagnosticos': self.obter_diagnosticos()
         }
     
-    def _localizar_elemento_nfe(self, root: etree.Element) -> Optional[etree.Element]:
-        """Localiza o elemento NFe na estrutura XML"""
-        if root.tag.endswith('nfeProc'):
-            return UtilXML.encontrar_elemento(root, 'NFe', self.namespace)
-        elif root.tag.endswith('NFe'):
-            return root
-        return None
-    
-    def _extrair_dados_identificacao(self, nfe_element: etree.Element, nota_fiscal: NotaFiscal) -> bool:
-        """Extrai dados de identificação da NFe"""
-        inf_nfe = UtilXML.encontrar_elemento(nfe_element, 'infNFe', self.namespace)
-        if inf_nfe is None:
-            nota_fiscal.adicionar_erro_validacao("Elemento infNFe não encontrado")
-            return False
-        
-        # Chave de acesso
-        nota_fiscal.chave_acesso = extrair_chave_acesso(inf_nfe) or ""
-        if not self.validador.validar_chave_nfe(nota_fiscal.chave_acesso):
-            nota_fiscal.adicionar_erro_validacao("Chave de acesso inválida")
-        
-        # Dados de identificação
-        ide = UtilXML.encontrar_elemento(inf_nfe, 'ide', self.namespace)
-        if ide is None:
-            nota_fiscal.adicionar_erro_validacao("Elemento ide não encontrado")
-            return False
-        
-        nota_fiscal.numero = UtilXML.obter_texto_elemento(ide, 'nNF', namespace=self.namespace)
-        nota_fiscal.serie = UtilXML.obter_texto_elemento(ide, 'serie', namespace=self.namespace)
-        nota_fiscal.modelo = UtilXML.obter_texto_elemento(ide, 'mod', namespace=self.namespace)
-        nota_fiscal.natureza_operacao = UtilXML.obter_texto_elemento(ide, 'natOp', namespace=self.namespace)
-        nota_fiscal.codigo_uf = UtilXML.obter_texto_elemento(ide, 'cUF', namespace=self.namespace)
-        
-        # Data de emissão
-        data_emissao_str = UtilXML.obter_texto_elemento(ide, 'dhEmi', namespace=self.namespace)
-        nota_fiscal.data_emissao = UtilData.parsear_data_nfe(data_emissao_str)
-        
-        # Validações básicas
-        if not nota_fiscal.numero:
-            nota_fiscal.adicionar_erro_validacao("Número da nota não encontrado")
-            return False
-        
-        return True
-    
-    def _extrair_dados_emitente(self, nfe_element: etree.Element, nota_fiscal: NotaFiscal) -> bool:
-        """Extrai dados do emitente"""
-        inf_nfe = UtilXML.encontrar_elemento(nfe_element, 'infNFe', self.namespace)
-        emit = UtilXML.encontrar_elemento(inf_nfe, 'emit', self.namespace)
-        
-        if emit is None:
-            nota_fiscal.adicionar_erro_validacao("Dados do emitente não encontrados")
-            return False
-        
-        # CNPJ/CPF do emitente
-        cnpj = UtilXML.obter_texto_elemento(emit, 'CNPJ', namespace=self.namespace)
-        cpf = UtilXML.obter_texto_elemento(emit, 'CPF', namespace=self.namespace)
-        
-        if cnpj:
-            nota_fiscal.emitente_cnpj = cnpj
-            if not self.validador.validar_cnpj(cnpj):
-                nota_fiscal.adicionar_erro_validacao("CNPJ do emitente inválido")
-        elif cpf:
-            nota_fiscal.emitente_cnpj = cpf  # Usar mesmo campo para CPF
-            if not self.validador.validar_cpf(cpf):
-                nota_fiscal.adicionar_erro_validacao("CPF do emitente inválido")
-        else:
-            nota_fiscal.adicionar_erro_validacao("CNPJ/CPF do emitente não encontrado")
-            return False
-        
-        # Nome do emitente
-        nota_fiscal.emitente_nome = UtilXML.obter_texto_elemento(emit, 'xNome', namespace=self.namespace)
-        if not nota_fiscal.emitente_nome:
-            nota_fiscal.adicionar_erro_validacao("Nome do emitente não encontrado")
-            return False
-        
-        # IE do emitente
-        nota_fiscal.emitente_ie = UtilXML.obter_texto_elemento(emit, 'IE', namespace=self.namespace)
-        
-        # Endereço do emitente
-        ender_emit = UtilXML.encontrar_elemento(emit, 'enderEmit', self.namespace)
-        if ender_emit is not None:
-            nota_fiscal.emitente_endereco = {
-                'logradouro': UtilXML.obter_texto_elemento(ender_emit, 'xLgr', namespace=self.namespace),
-                'numero': UtilXML.obter_texto_elemento(ender_emit, 'nro', namespace=self.namespace),
-                'bairro': UtilXML.obter_texto_elemento(ender_emit, 'xBairro', namespace=self.namespace),
-                'municipio': UtilXML.obter_texto_elemento(ender_emit, 'xMun', namespace=self.namespace),
-                'uf': UtilXML.obter_texto_elemento(ender_emit, 'UF', namespace=self.namespace),
-                'cep': UtilXML.obter_texto_elemento(ender_emit, 'CEP', namespace=self.namespace)
-            }
-        
-        return True
-    
-    def _extrair_dados_destinatario(self, nfe_element: etree.Element, nota_fiscal: NotaFiscal):
-        """Extrai dados do destinatário"""
-        inf_nfe = UtilXML.encontrar_elemento(nfe_element, 'infNFe', self.namespace)
-        dest = UtilXML.encontrar_elemento(inf_nfe, 'dest', self.namespace)
-        
-        if dest is None:
-            return  # Destinatário é opcional
-        
-        # CNPJ/CPF do destinatário
-        cnpj = UtilXML.obter_texto_elemento(dest, 'CNPJ', namespace=self.namespace)
-        cpf = UtilXML.obter_texto_elemento(dest, 'CPF', namespace=self.namespace)
-        
-        if cnpj:
-            nota_fiscal.destinatario_cnpj_cpf = cnpj
-            if not self.validador.validar_cnpj(cnpj):
-                nota_fiscal.adicionar_erro_validacao("CNPJ do destinatário inválido")
-        elif cpf:
-            nota_fiscal.destinatario_cnpj_cpf = cpf
-            if not self.validador.validar_cpf(cpf):
-                nota_fiscal.adicionar_erro_validacao("CPF do destinatário inválido")
-        
-        # Nome do destinatário
-        nota_fiscal.destinatario_nome = UtilXML.obter_texto_elemento(dest, 'xNome', namespace=self.namespace)
-        nota_fiscal.destinatario_ie = UtilXML.obter_texto_elemento(dest, 'IE', namespace=self.namespace)
-    
-    def _extrair_dados_totais(self, nfe_element: etree.Element, nota_fiscal: NotaFiscal):
-        """Extrai totais da NFe"""
-        inf_nfe = UtilXML.encontrar_elemento(nfe_element, 'infNFe', self.namespace)
-        total = UtilXML.encontrar_elemento(inf_nfe, 'total', self.namespace)
-        
-        if total is None:
-            return
-        
-        icms_tot = UtilXML.encontrar_elemento(total, 'ICMSTot', self.namespace)
-        if icms_tot is not None:
-            nota_fiscal.valor_produtos = converter_para_decimal(
-                UtilXML.obter_texto_elemento(icms_tot, 'vProd', "0", self.namespace)
-            )
-            nota_fiscal.valor_total_nf = converter_para_decimal(
-                UtilXML.obter_texto_elemento(icms_tot, 'vNF', "0", self.namespace)
-            )
-            nota_fiscal.valor_desconto_total = converter_para_decimal(
-                UtilXML.obter_texto_elemento(icms_tot, 'vDesc', "0", self.namespace)
-            )
-            nota_fiscal.valor_pis_total = converter_para_decimal(
-                UtilXML.obter_texto_elemento(icms_tot, 'vPIS', "0", self.namespace)
-            )
-            nota_fiscal.valor_cofins_total = converter_para_decimal(
-                UtilXML.obter_texto_elemento(icms_tot, 'vCOFINS', "0", self.namespace)
-            )
-    
-    def _extrair_informacoes_adicionais(self, nfe_element: etree.Element, nota_fiscal: NotaFiscal):
-        """Extrai informações adicionais"""
-        inf_nfe = UtilXML.encontrar_elemento(nfe_element, 'infNFe', self.namespace)
-        inf_adic = UtilXML.encontrar_elemento(inf_nfe, 'infAdic', self.namespace)
-        
-        if inf_adic is not None:
-            nota_fiscal.informacoes_adicionais = UtilXML.obter_texto_elemento(
-                inf_adic, 'infCpl', namespace=self.namespace
-            )
-    
-    def _processar_itens(self, nfe_element: etree.Element, nota_fiscal: NotaFiscal) -> bool:
-        """Processa itens da NFe"""
-        inf_nfe = UtilXML.encontrar_elemento(nfe_element, 'infNFe', self.namespace)
-        itens_det = UtilXML.encontrar_todos_elementos(inf_nfe, 'det', self.namespace)
-        
-        if not itens_det:
-            nota_fiscal.adicionar_erro_validacao("Nenhum item encontrado na nota fiscal")
-            return False
-        
-        for det in itens_det:
-            item = self._processar_item_individual(det, nota_fiscal)
-            if item:
-                nota_fiscal.adicionar_item(item)
-        
-        if not nota_fiscal.itens:
-            nota_fiscal.adicionar_erro_validacao("Nenhum item válido processado")
-            return False
-        
-        return True
-    
-    def _processar_item_individual(self, det_element: etree.Element, nota_fiscal: NotaFiscal) -> Optional[ItemNotaFiscal]:
-        """Processa um item individual da NFe"""
+    def _processar_arquivo(self, arquivo: str, incluir_cancelamentos: bool = True,
+                           metadados: Optional[Dict] = None) -> Optional[tuple]:
+        """
+        Lê, parseia e processa um arquivo XML
+        Args:
+            metadados: dict opcional preenchido com 'estado' (tamanho, mtime_ns),
+                       'hash', 'tipo', 'completo' e 'diagnosticos' (registros do
+                       documento), usados pelo cache de parsing
+        Returns:
+            tuple: ('NFE', NotaFiscal), ('EVENTO', EventoCancelamento) ou None
+        """
         try:
-            item = ItemNotaFiscal()
-            
-            # Número do item
-            item.numero = int(det_element.get('nItem', '0'))
-            
-            # Dados do produto
-            prod = UtilXML.encontrar_elemento(det_element, 'prod', self.namespace)
-            if prod is None:
-                self._log_aviso(f"Elemento prod não encontrado no item {item.numero}")
-                return None
-            
-            item.codigo = UtilXML.obter_texto_elemento(prod, 'cProd', namespace=self.namespace)
-            item.ean = UtilXML.obter_texto_elemento(prod, 'cEAN', namespace=self.namespace)
-            item.descricao = UtilXML.obter_texto_elemento(prod, 'xProd', namespace=self.namespace)
-            item.ncm = UtilXML.obter_texto_elemento(prod, 'NCM', namespace=self.namespace)
-            item.cest = UtilXML.obter_texto_elemento(prod, 'CEST', namespace=self.namespace)
-            item.cfop = UtilXML.obter_texto_elemento(prod, 'CFOP', namespace=self.namespace)
-            item.unidade = UtilXML.obter_texto_elemento(prod, 'uCom', namespace=self.namespace)
-            
-            # Validações básicas
-            if not item.codigo:
-                item.adicionar_erro_validacao("Código do produto não encontrado")
-            
-            if not item.descricao:
-                item.adicionar_erro_validacao("Descrição do produto não encontrada")
-            
-            if item.ncm and not self.validador.validar_ncm(item.ncm):
-                item.adicionar_erro_validacao("NCM inválido")
-            
-            if item.cfop and not self.validador.validar_cfop(item.cfop):
-                item.adicionar_erro_validacao("CFOP inválido")
-            
-            # Valores comerciais
-            item.quantidade = converter_para_decimal(
-                UtilXML.obter_texto_elemento(prod, 'qCom', "0", self.namespace)
-            )
-            item.valor_unitario = converter_para_decimal(
-                UtilXML.obter_texto_elemento(prod, 'vUnCom', "0", self.namespace)
-            )
-            item.valor_bruto = converter_para_decimal(
-                UtilXML.obter_texto_elemento(prod, 'vProd', "0", self.namespace)
-            )
-            item.valor_desconto = converter_para_decimal(
-                UtilXML.obter_texto_elemento(prod, 'vDesc', "0", self.namespace)
-            )
-            
-            # Calcular valor total
-            item.calcular_valor_total()
-            
-            # Processar impostos
-            self._processar_impostos_item(det_element, item)
-            
-            # Classificar tributação
-            self._classificar_tributacao_item(item)
-            
-            return item
-            
-        except Exception as e:
-            self._log_erro(f"Erro ao processar item: {e}")
-            return None
-    
-    def _processar_impostos_item(self, det_element: etree.Element, item: ItemNotaFiscal):
-        """Processa impostos do item"""
-        imposto = UtilXML.encontrar_elemento(det_element, 'imposto', self.namespace)
-        if imposto is None:
-            return
-        
-        # Processar PIS
-        pis_element = UtilXML.encontrar_elemento(imposto, 'PIS', self.namespace)
-        if pis_element is not None:
-            self._processar_pis_item(pis_element, item)
-        
-        # Processar COFINS
-        cofins_element = UtilXML.encontrar_elemento(imposto, 'COFINS', self.namespace)
-        if cofins_element is not None:
-            self._processar_cofins_item(cofins_element, item)
-    
-    def _processar_pis_item(self, pis_element: etree.Element, item: ItemNotaFiscal):
-        """Processa PIS do item"""
-        # Buscar em diferentes subgrupos de PIS
-        subgrupos = ['PISAliq', 'PISQtde', 'PISNT', 'PISOutr']
-        
-        for subgrupo in subgrupos:
-            pis_info = UtilXML.encontrar_elemento(pis_element, subgrupo, self.namespace)
-            if pis_info is not None:
-                item.pis_cst = UtilXML.obter_texto_elemento(pis_info, 'CST', namespace=self.namespace)
-                item.pis_base_calculo = converter_para_decimal(
-                    UtilXML.obter_texto_elemento(pis_info, 'vBC', "0", self.namespace)
-                )
-                item.pis_aliquota = converter_para_decimal(
-                    UtilXML.obter_texto_elemento(pis_info, 'pPIS', "0", self.namespace)
-                )
-                item.pis_valor = converter_para_decimal(
-                    UtilXML.obter_texto_elemento(pis_info, 'vPIS', "0", self.namespace)
-                )
-                item.pis_subgrupo = subgrupo
-                
-                # Validar CST
-                if item.pis_cst and not self.validador.validar_cst(item.pis_cst):
-                    item.adicionar_erro_validacao("CST PIS inválido")
+            # Um único open por arquivo: classificação, parse e hash usam o mesmo descritor
+            with open(arquivo, 'rb') as f:
+                # Estado observado antes da leitura: alteração concorrente invalida a entrada do cache
+                estado = os.fstat(f.fileno())
+                if metadados is not None:
+                    metadados['estado'] = (estado.st_size, estado.st_mtime_ns)
+                    metadados['diagnosticos'] = []
                 
-                break
-    
-    def _processar_cofins_item(self, cofins_element: etree.Element, item: ItemNotaFiscal):
-        """Processa COFINS do item"""
-        # Buscar em diferentes subgrupos de COFINS
-        subgrupos = ['COFINSAliq', 'COFINSQtde', 'COFINSNT', 'COFINSOutr']
-        
-        for subgrupo in subgrupos:
-            cofins_info = UtilXML.encontrar_elemento(cofins_element, subgrupo, self.namespace)
-            if cofins_info is not None:
-                item.cofins_cst = UtilXML.obter_texto_elemento(cofins_info, 'CST', namespace=self.namespace)
-                item.cofins_base_calculo = converter_para_decimal(
-                    UtilXML.obter_texto_elemento(cofins_info, 'vBC', "0", self.namespace)
-                )
-                item.cofins_aliquota = converter_para_decimal(
-                    UtilXML.obter_texto_elemento(cofins_info, 'pCOFINS', "0", self.namespace)
-                )
-                item.cofins_valor = converter_para_decimal(
-                    UtilXML.obter_texto_elemento(cofins_info, 'vCOFINS', "0", self.namespace)
-                )
-                item.cofins_subgrupo = subgrupo
+                # Classificação pelo cabeçalho: eventos ignorados e documentos
+                # desconhecidos não são lidos por inteiro nem parseados
+                cabecalho = classificar_fluxo(f)
+                tipo = cabecalho.tipo
+                if tipo == 'DESCONHECIDO' or (tipo == 'EVENTO' and not incluir_cancelamentos):
+                    if metadados is not None:
+                        # Reclassificar custa uma leitura de poucos KB: não vai para o cache
+                        metadados.update(hash=None, tipo=tipo, completo=False)
+                    return None
                 
-                # Validar CST
-                if item.cofins_cst and not self.validador.validar_cst(item.cofins_cst):
-                    item.adicionar_erro_validacao("CST COFINS inválido")
+                # NFe grande: extração em streaming, sem árvore completa em memória
+                if tipo == 'NFE' and self.limite_streaming and estado.st_size >= self.limite_streaming:
+                    if metadados is not None:
+                        metadados.update(hash=UtilArquivo.hash_fluxo(f), tipo=tipo, completo=True)
+                    f.seek(0)
+                    nota = self.processar_arquivo_nfe_streaming(arquivo, metadados, f)
+                    return ('NFE', nota) if nota else None
                 
-                break
-    
-    def _classificar_tributacao_item(self, item: ItemNotaFiscal):
-        """
-        Classifica tributação do item seguindo metodologia híbrida
-        Prioriza NCM (conforme Mecanismo V2), mas também considera CST
-        """
-        # Estratégia 1: Classificação por NCM (prioritária)
-        if item.ncm and self._verificar_ncm_monofasico(item.ncm):
-            item.eh_monofasico_por_ncm = True
-            item.tipo_tributario = "Monofasico"
-            return
-        
-        # Estratégia 2: Classificação por CST (secundária)
-        if UtilTributario.eh_produto_monofasico_por_cst(item.pis_cst, item.cofins_cst):
-            item.eh_monofasico_por_cst = True
-            item.tipo_tributario = "Monofasico"
-            return
+                # Bytes (ou mmap, em arquivos grandes) direto para o lxml; a árvore
+                # não depende do buffer depois do parse
+                with UtilArquivo.buffer_xml(f) as conteudo:
+                    root = UtilXML.parsear_xml(conteudo)
+                    # Hash só alimenta o cache de parsing
+                    if metadados is not None:
+                        metadados['hash'] = hashlib.sha256(conteudo).hexdigest()
+            if tipo is None and root is not None:
+                # Cabeçalho ilegível (ex.: UTF-16): classificação pela árvore
+                tipo = UtilArquivo.determinar_tipo_xml(root)
+            
+            if metadados is not None:
+                metadados['tipo'] = tipo
+                # Evento ignorado não pode ser reaproveitado por execução que o inclua
+                metadados['completo'] = not (tipo == 'EVENTO' and not incluir_cancelamentos)
+            
+            if root is None:
+                return None
+            
+            if tipo == 'EVENTO':
+                if incluir_cancelamentos:
+                    evento = self.processar_documento_evento(root, metadados)
+                    if evento:
+                        return ('EVENTO', evento)
+            elif tipo == 'NFE':
+                nota = self.processar_documento_nfe(root, arquivo, metadados)
+                if nota:
+                    return ('NFE', nota)
+        except Exception as e:
+            self._log_erro("ARQUIVO_ERRO", f"{arquivo}: {e}")
+            if metadados is not None:
+                # Erro de leitura não vai para o cache: a próxima execução tenta de novo
+                metadados['completo'] = False
         
-        # Se não for monofásico por nenhum critério
-        item.tipo_tributario = "NaoMonofasico"
+        return None
     
-    def _verificar_ncm_monofasico(self, ncm: str) -> bool:
+    def _reaproveitar_resultado(self, arquivo: str, gravado: tuple,
+                                incluir_cancelamentos: bool) -> Optional[tuple]:
         """
-        Verifica se NCM é monofásico usando tabela de referência
+        Converte entrada do cache de parsing em resultado de _processar_arquivo,
+        contabilizando estatísticas e diagnósticos como se o arquivo tivesse
+        sido processado
         """
-        if not self.tabela_ncm_monofasico:
-            return False
-        
-        # Buscar NCM exato na tabela
-        return ncm in self.tabela_ncm_monofasico
-    
-    def _validar_consistencia_nota(self, nota_fiscal: NotaFiscal):
-        """Valida consistência da nota fiscal"""
-        # Validar se total de itens bate com total da nota
-        valor_calculado = sum(item.valor_total for item in nota_fiscal.itens)
-        diferenca = abs(valor_calculado - nota_fiscal.valor_total_nf)
+        tipo, documento, registros = gravado
+        if tipo == 'EVENTO' and not incluir_cancelamentos:
+            return None
         
-        # Tolerância de R$ 0,01 para diferenças de arredondamento
-        if diferenca > Decimal('0.01'):
-            nota_fiscal.adicionar_erro_validacao(
-                f"Divergência entre valor calculado ({valor_calculado}) e valor da nota ({nota_fiscal.valor_total_nf})"
-            )
+        self.registro_execucao.adicionar(registros)
+        if tipo == 'NFE':
+            self.estatisticas.incrementar('total_processados')
+            if documento is not None and documento.valida:
+                self.estatisticas.incrementar('total_validos')
+            else:
+                self.estatisticas.incrementar('total_invalidos')
+            if documento is not None:
+                documento.arquivo_origem = arquivo
         
-        # Validar se há pelo menos um item válido
-        itens_validos = [item for item in nota_fiscal.itens if item.valido]
-        if not itens_validos:
-            nota_fiscal.adicionar_erro_validacao("Nenhum item válido encontrado na nota")
+        return (tipo, documento) if documento is not None else None
     
     def obter_estatisticas(self) -> Dict[str, Any]:
         """Retorna estatísticas do processamento"""
-        return self.estatisticas.copy()
+        return self.estatisticas.como_dict()
     
     def limpar_estatisticas(self):
         """Limpa estatísticas do processamento"""
-        self.estatisticas = {
-            'total_processados': 0,
-            'total_validos': 0,
-            'total_invalidos': 0,
-            'total_cancelados': 0
-        }
+        self.estatisticas.limpar()
+    
+    def obter_diagnosticos(self) -> Dict[str, int]:
+        """Retorna quantidade de diagnósticos por código em toda a execução"""
+        return self.registro_execucao.contagem_por_codigo()
+    
+    def limpar_logs(self):
+        """Limpa log e contadores de diagnósticos da execução"""
+        self.registro_execucao.limpar()
+    
+    def _registrar_diagnosticos(self, diagnosticos: Diagnosticos, metadados: Optional[Dict] = None):
+        """
+        Anexa registros de um documento ao log da execução
+        Com metadados, guarda também os registros para o cache de parsing
+        """
+        self.registro_execucao.absorver(diagnosticos)
+        if metadados is not None:
+            metadados.setdefault('diagnosticos', []).extend(diagnosticos.todos_registros())
     
-    def _log_info(self, mensagem: str):
+    def _log_info(self, codigo: str, detalhe: str = ""):
         """Log de informação"""
-        logger.info(mensagem)
-        self.logs_processamento.append(f"[INFO] {mensagem}")
+        self.registro_execucao.registrar(codigo, "INFO", detalhe)
     
-    def _log_aviso(self, mensagem: str):
+    def _log_aviso(self, codigo: str, detalhe: str = ""):
         """Log de aviso"""
-        logger.warning(mensagem)
-        self.logs_processamento.append(f"[WARNING] {mensagem}")
+        self.registro_execucao.registrar(codigo, "WARNING", detalhe)
     
-    def _log_erro(self, mensagem: str):
+    def _log_erro(self, codigo: str, detalhe: str = ""):
         """Log de erro"""
-        logger.error(mensagem)
-        self.logs_processamento.append(f"[ERROR] {mensagem}")
+        self.registro_execucao.registrar(codigo, "ERROR", detalhe)
 
 # Função de conveniência para usar o parser
 def processar_xml_nfe_hibrido(xml_content: Union[str, bytes], 
@@ -602,9 +394,13 @@ def processar_xml_nfe_hibrido(xml_content: Union[str, bytes],
 # Função para processar diretório
 def processar_diretorio_nfe_hibrido(diretorio: str, 
                                   tabela_ncm_monofasico: Optional[Dict] = None,
-                                  incluir_cancelamentos: bool = True) -> Dict[str, Any]:
+                                  incluir_cancelamentos: bool = True,
+                                  workers: int = 1,
+                                  cache=None,
+                                  ao_processar_nota: Optional[Callable[[NotaFiscal], None]] = None) -> Dict[str, Any]:
     """
     Função de conveniência para processar diretório de XMLs
     """
     parser = NFEParserHibrido(tabela_ncm_monofasico)
-    return parser.processar_diretorio(diretorio, incluir_cancelamentos)
+    return parser.processar_diretorio(diretorio, incluir_cancelamentos, workers, cache=cache,
+                                      ao_processar_nota=ao_processar_nota)
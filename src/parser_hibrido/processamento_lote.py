@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Processamento em Lote com Pool de Processos
+Divide a lista de arquivos em lotes e distribui entre workers
+"""
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List, Dict, Any, Tuple, Iterator
+
+# Imports locais
+from diagnosticos import RegistroExecucao
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Tamanho padrão de lote por worker
+TAMANHO_LOTE_PADRAO = 256
+
+# Parser reutilizado por todos os lotes de um mesmo worker
+_parser_worker = None
+
+def dividir_em_lotes(itens: List[Any], tamanho_lote: int) -> List[List[Any]]:
+    """
+    Divide a lista em lotes consecutivos preservando a ordem
+    """
+    tamanho_lote = max(1, tamanho_lote)
+    return [itens[i:i + tamanho_lote] for i in range(0, len(itens), tamanho_lote)]
+
+def calcular_tamanho_lote(total_itens: int, workers: int) -> int:
+    """
+    Calcula tamanho de lote que distribui o trabalho sem lotes gigantes
+    """
+    if total_itens <= 0:
+        return 1
+    # Aproximadamente 4 lotes por worker para balancear carga
+    return max(1, min(TAMANHO_LOTE_PADRAO, -(-total_itens // (workers * 4))))
+
+def normalizar_workers(workers: Optional[int]) -> int:
+    """
+    Normaliza número de workers (None ou 0 = todos os núcleos)
+    """
+    if not workers or workers < 1:
+        return os.cpu_count() or 1
+    return workers
+
+def mesclar_estatisticas(destino: Dict[str, int], origem: Dict[str, int]) -> Dict[str, int]:
+    """
+    Soma contadores de estatísticas de origem em destino
+    """
+    for chave, valor in origem.items():
+        destino[chave] = destino.get(chave, 0) + valor
+    return destino
+
+def _inicializar_worker(classe_parser, tabela_ncm_monofasico: Optional[Dict]):
+    """
+    Inicializa um parser por processo worker, carregando as tabelas uma vez
+    """
+    global _parser_worker
+    _parser_worker = classe_parser(tabela_ncm_monofasico)
+
+def _processar_lote(arquivos: List[str], incluir_cancelamentos: bool,
+                    coletar_metadados: bool = False) -> Tuple[List[Tuple[str, Any]], Dict[str, int], RegistroExecucao, List[Optional[Dict]]]:
+    """
+    Processa um lote de arquivos no worker
+    Returns:
+        tuple: (resultados na ordem de entrada, estatísticas do lote, registro de diagnósticos do lote,
+                metadados de cada arquivo para o cache de parsing ou None)
+    """
+    parser = _parser_worker
+    parser.limpar_estatisticas()
+    parser.limpar_logs()
+
+    resultados = []
+    metadados_lote = []
+    for arquivo in arquivos:
+        metadados = {} if coletar_metadados else None
+        resultados.append(parser._processar_arquivo(arquivo, incluir_cancelamentos, metadados))
+        metadados_lote.append(metadados)
+
+    return resultados, parser.obter_estatisticas(), parser.registro_execucao, metadados_lote
+
+def processar_arquivos_paralelo(classe_parser,
+                                arquivos: List[str],
+                                tabela_ncm_monofasico: Optional[Dict] = None,
+                                incluir_cancelamentos: bool = True,
+                                workers: Optional[int] = None,
+                                tamanho_lote: Optional[int] = None,
+                                coletar_metadados: bool = False) -> Iterator[Tuple[List[Tuple[str, Any]], Dict[str, int], RegistroExecucao, List[Optional[Dict]]]]:
+    """
+    Processa arquivos XML em um pool de processos
+    classe_parser deve expor _processar_arquivo (ex.: NFEParserHibrido)
+    Os lotes são devolvidos na mesma ordem da lista de entrada
+    coletar_metadados: devolve estado e hash de cada arquivo (para o cache de parsing)
+    """
+    workers = normalizar_workers(workers)
+    tamanho_lote = tamanho_lote or calcular_tamanho_lote(len(arquivos), workers)
+    lotes = dividir_em_lotes(arquivos, tamanho_lote)
+
+    logger.info(f"Processando {len(arquivos)} arquivos em {len(lotes)} lotes com {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_inicializar_worker,
+                             initargs=(classe_parser, tabela_ncm_monofasico)) as executor:
+        # executor.map preserva a ordem de submissão dos lotes
+        yield from executor.map(_processar_lote, lotes,
+                                [incluir_cancelamentos] * len(lotes),
+                                [coletar_metadados] * len(lotes))
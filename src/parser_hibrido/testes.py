@@ -7,7 +7,20 @@ Conjunto de testes para validar todas as funcionalidades
 import unittest
 import sys
 import os
+import io
+import json
+import tempfile
+import sqlite3
+import zipfile
+import time
+import threading
+import hashlib
+import contextlib
+import importlib.util
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from types import SimpleNamespace
 from decimal import Decimal
 
 # Adicionar diretório pai ao path
@@ -16,11 +29,91 @@ sys.path.append(str(Path(__file__).parent.parent))
 from parser_hibrido import (
     NFEParserHibrido,
     NotaFiscal,
-    ItemNotaFiscal,
-    ValidadorFiscal,
-    converter_para_decimal,
-    processar_xml_nfe_hibrido
+    processar_xml_nfe_hibrido,
+    EsquemaExtracaoNFe
 )
+from models import ItemNotaFiscal, converter_para_decimal
+from validators import ValidadorFiscal
+from processamento_lote import dividir_em_lotes
+from classificador_xml import classificar_conteudo, classificar_arquivo
+from chave_acesso import calcular_dv, decodificar_chave, rotear_arquivo
+from nucleo_parser import parse_nfe_bytes, parse_nfe_stream
+from diagnosticos import EstatisticasProcessamento, RegistroExecucao, RegistroDiagnostico
+from core.infrastructure.cache_parse import CacheParse
+from core.infrastructure.repositorio_resultados import RepositorioResultados, linhas_itens
+from core.infrastructure.resultado_jsonl import EscritorResultadoJSONL, LeitorResultadoJSONL, caminhos_resultado
+from core.infrastructure.periodos import detectar_periodos
+from utils import UtilXML, UtilArquivo, obter_parser_xml
+from core.domain.tabela_itens import TabelaItens
+from core.domain.motor_creditos import calcular_creditos_tabela
+from core.domain.registro_tabelas import (
+    RegistroTabelas, SerieSelic, compilar_ncms_monofasicos, ARQUIVO_SELIC, ARQUIVO_NCM_MONOFASICO, ARQUIVO_ANEXO_SIMPLES
+)
+from core.domain.simples_nacional import (
+    LIMITES_FAIXAS, ANEXOS, TRIBUTOS_ANEXO, obter_tabela_anexo, calcular_simples, aliquota_efetiva
+)
+from core.domain.centavos import para_inteiro, converter_coluna, para_decimal, CASAS_QUANTIDADE
+from lxml import etree
+
+DIR_RAIZ = Path(__file__).parent.parent.parent
+
+def carregar_modulo(caminho, nome):
+    """Importa um script pelo caminho (scripts fora de pacotes ou com espaços no nome)"""
+    especificacao = importlib.util.spec_from_file_location(nome, caminho)
+    modulo = importlib.util.module_from_spec(especificacao)
+    especificacao.loader.exec_module(modulo)
+    return modulo
+
+CHAVE_TESTE = "35241212345678000123550010000000111000000011"
+
+def gerar_xml_nfe(chave=CHAVE_TESTE, itens=None, numero="11"):
+    """Gera XML nfeProc mínimo para os testes"""
+    itens = itens or [("30049069", "100.00", "0.00", "04"), ("22030000", "50.00", "5.00", "01")]
+    dets = []
+    total = Decimal("0")
+    for indice, (ncm, v_prod, v_desc, cst) in enumerate(itens, start=1):
+        total += Decimal(v_prod) - Decimal(v_desc)
+        dets.append(f"""
+      <det nItem="{indice}">
+        <prod>
+          <cProd>P{indice}</cProd><cEAN>SEM GTIN</cEAN><xProd>Produto {indice}</xProd>
+          <NCM>{ncm}</NCM><CFOP>5102</CFOP><uCom>UN</uCom>
+          <qCom>1.0000</qCom><vUnCom>{v_prod}</vUnCom><vProd>{v_prod}</vProd><vDesc>{v_desc}</vDesc>
+        </prod>
+        <imposto>
+          <PIS><PISNT><CST>{cst}</CST></PISNT></PIS>
+          <COFINS><COFINSNT><CST>{cst}</CST></COFINSNT></COFINS>
+        </imposto>
+      </det>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">
+  <NFe>
+    <infNFe Id="NFe{chave}" versao="4.00">
+      <ide>
+        <cUF>35</cUF><natOp>Venda</natOp><mod>55</mod><serie>1</serie>
+        <nNF>{numero}</nNF><dhEmi>2024-12-01T10:00:00-03:00</dhEmi>
+      </ide>
+      <emit>
+        <CNPJ>12345678000123</CNPJ><xNome>Empresa Teste Ltda</xNome><IE>123456789</IE>
+      </emit>{"".join(dets)}
+      <total><ICMSTot><vProd>0</vProd><vDesc>0</vDesc><vNF>{total}</vNF></ICMSTot></total>
+    </infNFe>
+  </NFe>
+  <protNFe versao="4.00"><infProt><chNFe>{chave}</chNFe></infProt></protNFe>
+</nfeProc>"""
+
+def gerar_xml_cancelamento(chave=CHAVE_TESTE):
+    """Gera XML procEventoNFe de cancelamento para os testes"""
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<procEventoNFe xmlns="http://www.portalfiscal.inf.br/nfe" versao="1.00">
+  <evento versao="1.00">
+    <infEvento Id="ID110111{chave}01">
+      <cOrgao>35</cOrgao><chNFe>{chave}</chNFe><dhEvento>2024-12-02T10:00:00-03:00</dhEvento>
+      <tpEvento>110111</tpEvento><nSeqEvento>1</nSeqEvento>
+      <detEvento versao="1.00"><descEvento>Cancelamento</descEvento><xJust>Erro na emissao da nota</xJust></detEvento>
+    </infEvento>
+  </evento>
+</procEventoNFe>"""
 
 class TestValidadorFiscal(unittest.TestCase):
     """Testes para o ValidadorFiscal"""
@@ -125,6 +218,1277 @@ class TestModelos(unittest.TestCase):
         self.assertEqual(nota.valor_produtos, Decimal("300.00"))
         self.assertEqual(nota.valor_desconto_total, Decimal("30.00"))
         self.assertEqual(len(nota.itens), 2)
+    
+    def _item(self, valor, tipo):
+        item = ItemNotaFiscal()
+        item.valor_bruto = Decimal(valor)
+        item.pis_valor = Decimal("1.00")
+        item.calcular_valor_total()
+        item.tipo_tributario = tipo
+        return item
+    
+    def test_nota_fiscal_particoes_incrementais(self):
+        """Partições e totais por tipo tributário acompanham inclusão e remoção"""
+        nota = NotaFiscal()
+        mono = self._item("30.00", "Monofasico")
+        nota.adicionar_item(mono)
+        nota.adicionar_item(self._item("70.00", "NaoMonofasico"))
+        
+        estatisticas = nota.obter_estatisticas()
+        self.assertEqual((estatisticas["itens_monofasicos"], estatisticas["itens_nao_monofasicos"]), (1, 1))
+        self.assertEqual(nota.obter_proporcao_monofasicos(), Decimal("30.00"))
+        self.assertEqual(nota.valor_pis_total, Decimal("2.00"))
+        
+        nota.remover_item(mono)
+        self.assertEqual((nota.obter_itens_monofasicos(), nota.valor_produtos), ([], Decimal("70.00")))
+        self.assertEqual(nota.obter_valor_total_monofasicos(), Decimal("0"))
+    
+    def test_nota_fiscal_contadores_de_consistencia(self):
+        """Valor total dos itens e itens válidos acompanham inclusão e remoção"""
+        nota = NotaFiscal()
+        valido = self._item("30.00", "Monofasico")
+        invalido = self._item("70.00", "NaoMonofasico")
+        invalido.adicionar_erro_validacao("NCM inválido")
+        nota.adicionar_item(valido)
+        nota.adicionar_item(invalido)
+        self.assertEqual((nota.obter_valor_total_itens(), nota.contar_itens_validos()), (Decimal("100.00"), 1))
+        
+        nota.remover_item(valido)
+        self.assertEqual((nota.obter_valor_total_itens(), nota.contar_itens_validos()), (Decimal("70.00"), 0))
+        
+        
+        # Parser lê os contadores ao validar a nota
+        nota, _ = parse_nfe_bytes(gerar_xml_nfe(itens=[("123", "10.00", "0.00", "04")]).encode('utf-8'), {})
+        self.assertEqual(nota.contar_itens_validos(), 0)
+        self.assertEqual(nota.erros_validacao, ["Nenhum item válido encontrado na nota"])
+    
+    def test_nota_fiscal_reconstruir_acumuladores(self):
+        """Item alterado após a inclusão é refletido após reconstruir_acumuladores"""
+        nota = NotaFiscal()
+        item = self._item("50.00", "NaoMonofasico")
+        nota.adicionar_item(item)
+        
+        item.tipo_tributario = "Monofasico"
+        nota.reconstruir_acumuladores()
+        self.assertEqual(nota.obter_valor_total_monofasicos(), Decimal("50.00"))
+        self.assertEqual(nota.obter_estatisticas()["itens_nao_monofasicos"], 0)
+    
+    def test_modelos_compactos(self):
+        """Modelos sem __dict__, erros criados sob demanda e códigos internados após pickle"""
+        import pickle
+        itens = [("30049069", "10.00", "0.00", "04"), ("30049069", "5.00", "0.00", "04")]
+        nota, _ = parse_nfe_bytes(gerar_xml_nfe(itens=itens).encode('utf-8'), {"30049069": True})
+        self.assertFalse(hasattr(nota.itens[0], '__dict__'))
+        self.assertIsNone(nota.itens[0]._erros_validacao)
+        self.assertEqual(nota.itens[0].to_dict()["validacao"]["erros"], [])
+        
+        copia = pickle.loads(pickle.dumps(nota, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertIs(copia.itens[0].ncm, nota.itens[1].ncm)
+        self.assertEqual(copia.to_dict()["estatisticas"], nota.to_dict()["estatisticas"])
+        
+        # Internamento do interpretador (sem tabela própria que só cresce)
+        from models import internar_codigo
+        self.assertIs(internar_codigo("".join(["3004", "9069"])), sys.intern("30049069"))
+        self.assertIsNone(internar_codigo(None))
+
+class TestParserHibrido(unittest.TestCase):
+    """Testes para o NFEParserHibrido"""
+    
+    def test_processar_xml_nfe(self):
+        """Teste processamento de XML individual"""
+        parser = NFEParserHibrido()
+        nota = parser.processar_xml_nfe(gerar_xml_nfe())
+        
+        self.assertIsNotNone(nota)
+        self.assertEqual(nota.chave_acesso, CHAVE_TESTE)
+        self.assertEqual(len(nota.itens), 2)
+        self.assertEqual(nota.itens[1].valor_total, Decimal("45.00"))
+        self.assertEqual(parser.obter_estatisticas()['total_processados'], 1)
+    
+    def test_processar_xml_invalido(self):
+        """Teste XML malformado ou com raiz inválida"""
+        parser = NFEParserHibrido()
+        self.assertIsNone(parser.processar_xml_nfe("<nfeProc>"))
+        self.assertIsNone(parser.processar_xml_nfe(gerar_xml_cancelamento()))
+        self.assertEqual(parser.obter_estatisticas()['total_invalidos'], 2)
+    
+    def test_processar_diretorio_com_cancelamento(self):
+        """Teste diretório com evento listado depois da nota"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            Path(diretorio, "a_nota.xml").write_text(gerar_xml_nfe(), encoding="utf-8")
+            Path(diretorio, "z_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            
+            parser = NFEParserHibrido()
+            resultado = parser.processar_diretorio(diretorio)
+        
+        self.assertEqual(len(resultado['notas']), 1)
+        self.assertEqual(len(resultado['cancelamentos']), 1)
+        self.assertTrue(resultado['notas'][0].eh_nota_cancelada())
+        self.assertEqual(resultado['estatisticas']['total_processados'], 1)
+        self.assertEqual(resultado['estatisticas']['total_cancelados'], 1)
+    
+    def test_diretorio_entrega_notas_durante_a_leitura(self):
+        """Com ao_processar_nota as notas saem na ordem da listagem e não são acumuladas"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            for indice in range(5):
+                Path(diretorio, f"nota_{indice}.xml").write_text(
+                    gerar_xml_nfe(chave=CHAVE_TESTE[:-3] + f"{indice:03d}", numero=str(indice)), encoding="utf-8"
+                )
+            Path(diretorio, "z_evento.xml").write_text(
+                gerar_xml_cancelamento(chave=CHAVE_TESTE[:-3] + "002"), encoding="utf-8"
+            )
+            arquivo_cache = os.path.join(diretorio, "cache", "parse.sqlite")
+            
+            # Cache parcial: acertos intercalados com arquivos parseados no pool
+            with CacheParse(arquivo_cache) as cache:
+                NFEParserHibrido().processar_diretorio(diretorio, cache=cache)
+            for indice in (1, 3):
+                Path(diretorio, f"nota_{indice}.xml").write_text(
+                    gerar_xml_nfe(chave=CHAVE_TESTE[:-3] + f"{indice:03d}", numero=f"{indice}0"), encoding="utf-8"
+                )
+            with CacheParse(arquivo_cache) as cache:
+                recebidas = []
+                resultado = NFEParserHibrido().processar_diretorio(
+                    diretorio, workers=2, tamanho_lote=1, cache=cache,
+                    ao_processar_nota=lambda nota: recebidas.append(nota.numero))
+                self.assertEqual(cache.obter_estatisticas()['acertos'], 4)
+        
+        self.assertEqual(recebidas, ["0", "10", "2", "30", "4"])
+        self.assertEqual(resultado['notas'], [])
+        self.assertEqual(len(resultado['cancelamentos']), 1)
+        self.assertEqual(resultado['estatisticas']['total_processados'], 5)
+        self.assertEqual(resultado['estatisticas']['total_cancelados'], 1)
+
+class TestProcessamentoLote(unittest.TestCase):
+    """Testes para o processamento em lote com pool de processos"""
+    
+    def test_dividir_em_lotes(self):
+        """Lotes preservam ordem e cobrem toda a lista"""
+        lotes = dividir_em_lotes(list(range(7)), 3)
+        self.assertEqual(lotes, [[0, 1, 2], [3, 4, 5], [6]])
+    
+    def test_paralelo_igual_sequencial(self):
+        """Resultados paralelos na mesma ordem e com estatísticas mescladas"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            for indice in range(6):
+                chave = CHAVE_TESTE[:-3] + f"{indice:03d}"
+                Path(diretorio, f"nota_{indice}.xml").write_text(
+                    gerar_xml_nfe(chave=chave, numero=str(indice)), encoding="utf-8"
+                )
+            Path(diretorio, "z_evento.xml").write_text(
+                gerar_xml_cancelamento(chave=CHAVE_TESTE[:-3] + "003"), encoding="utf-8"
+            )
+            
+            sequencial = NFEParserHibrido().processar_diretorio(diretorio)
+            paralelo = NFEParserHibrido().processar_diretorio(diretorio, workers=2, tamanho_lote=2)
+        
+        self.assertEqual([n.numero for n in paralelo['notas']], [n.numero for n in sequencial['notas']])
+        self.assertEqual(paralelo['estatisticas'], sequencial['estatisticas'])
+        self.assertEqual(paralelo['estatisticas']['total_processados'], 6)
+        self.assertEqual(paralelo['estatisticas']['total_cancelados'], 1)
+
+class TestCacheParse(unittest.TestCase):
+    """Testes para o cache persistente de parsing"""
+    
+    def test_reexecucao_usa_cache(self):
+        """Segunda execução reaproveita todos os arquivos com o mesmo resultado"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            Path(diretorio, "a_nota.xml").write_text(gerar_xml_nfe(), encoding="utf-8")
+            Path(diretorio, "z_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            arquivo_cache = os.path.join(diretorio, "cache", "parse.sqlite")
+            
+            with CacheParse(arquivo_cache) as cache:
+                primeira = NFEParserHibrido().processar_diretorio(diretorio, cache=cache)
+            with CacheParse(arquivo_cache) as cache:
+                segunda = NFEParserHibrido().processar_diretorio(diretorio, cache=cache)
+                self.assertEqual(cache.obter_estatisticas()['acertos'], 2)
+        
+        self.assertEqual(segunda['estatisticas'], primeira['estatisticas'])
+        self.assertEqual([n.to_dict() for n in segunda['notas']], [n.to_dict() for n in primeira['notas']])
+        self.assertTrue(segunda['notas'][0].eh_nota_cancelada())
+    
+    def test_arquivo_alterado_ou_copiado(self):
+        """Conteúdo alterado é reparseado; conteúdo igual em outro caminho usa o hash"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio, "nota.xml")
+            arquivo.write_text(gerar_xml_nfe(numero="11"), encoding="utf-8")
+            cache = CacheParse(os.path.join(diretorio, "parse.sqlite"), funcao_hash=UtilArquivo.hash_arquivo)
+            cache.gravar(str(arquivo), "gravado")
+            
+            Path(diretorio, "copia.xml").write_bytes(arquivo.read_bytes())
+            self.assertEqual(cache.consultar(os.path.join(diretorio, "copia.xml")), "gravado")
+            self.assertEqual(cache.obter_estatisticas()['acertos_hash'], 1)
+            
+            arquivo.write_text(gerar_xml_nfe(numero="12"), encoding="utf-8")
+            self.assertIs(cache.consultar(str(arquivo)), CacheParse.AUSENTE)
+            cache.fechar()
+    
+    def test_diagnosticos_iguais_com_cache(self):
+        """Execução com cache registra os mesmos diagnósticos da execução completa"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            Path(diretorio, "a_nota.xml").write_text(gerar_xml_nfe(), encoding="utf-8")
+            Path(diretorio, "b_nota.xml").write_text(
+                gerar_xml_nfe(chave=CHAVE_TESTE[:-3] + "002", itens=[("123", "10.00", "0.00", "99")]),
+                encoding="utf-8"
+            )
+            Path(diretorio, "z_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            arquivo_cache = os.path.join(diretorio, "parse.sqlite")
+            
+            diagnosticos = []
+            for _ in range(2):
+                parser = NFEParserHibrido()
+                with CacheParse(arquivo_cache, parser.contexto_cache()) as cache:
+                    parser.processar_diretorio(diretorio, cache=cache)
+                diagnosticos.append(parser.obter_diagnosticos())
+            self.assertEqual(cache.obter_estatisticas()['acertos'], 3)
+        
+        self.assertIn('NCM_TAMANHO', diagnosticos[0])
+        self.assertEqual(diagnosticos[1], diagnosticos[0])
+    
+    def test_contexto_de_tabela_legada(self):
+        """Contexto aceita lista de dicts e não depende da ordem das tabelas"""
+        legada = [{"NCMs monofásicos": "30049069"}, {"NCMs monofásicos": 22030000}]
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo_cache = os.path.join(diretorio, "parse.sqlite")
+            assinaturas = {}
+            for nome, tabela in (('legada', legada), ('dict', {"30049069": 1, "22030000": 2}),
+                                 ('dict_invertido', {"22030000": 2, "30049069": 1}),
+                                 ('dict_valores', {"30049069": 1, "22030000": 3})):
+                with CacheParse(arquivo_cache, NFEParserHibrido(tabela).contexto_cache()) as cache:
+                    assinaturas[nome] = cache.assinatura
+        
+        self.assertEqual(assinaturas['dict'], assinaturas['dict_invertido'])
+        self.assertNotEqual(assinaturas['dict'], assinaturas['dict_valores'])
+        self.assertNotEqual(assinaturas['legada'], assinaturas['dict'])
+
+    def test_contextos_no_mesmo_arquivo(self):
+        """Contextos diferentes no mesmo SQLite não apagam as entradas um do outro"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio, "nota.xml")
+            arquivo.write_text(gerar_xml_nfe(), encoding="utf-8")
+            arquivo_cache = os.path.join(diretorio, "parse.sqlite")
+
+            # Tabela no formato antigo (chave só pelo caminho) é substituída
+            with sqlite3.connect(arquivo_cache) as conexao:
+                conexao.execute("CREATE TABLE documentos (caminho TEXT PRIMARY KEY, tamanho INTEGER NOT NULL, "
+                                "mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL, assinatura TEXT NOT NULL, "
+                                "dados BLOB NOT NULL)")
+            conexao.close()
+
+            with CacheParse(arquivo_cache, "A") as contexto_a, CacheParse(arquivo_cache, "B") as contexto_b:
+                contexto_a.gravar(str(arquivo), "resultado A")
+                contexto_a.sincronizar()
+                contexto_b.gravar(str(arquivo), "resultado B")
+                self.assertEqual((len(contexto_a), len(contexto_b)), (1, 1))
+                self.assertEqual(contexto_a.consultar(str(arquivo)), "resultado A")
+                self.assertEqual(contexto_b.consultar(str(arquivo)), "resultado B")
+
+    def test_aplicacao_grava_sem_reler(self):
+        """Execução fria da aplicação grava hash e estado lidos junto com o parse"""
+        parser_app = carregar_aplicacao("parser")
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio, "nota.xml")
+            arquivo.write_bytes(gerar_xml_nfe().encode("utf-8"))
+            arquivo_cache = os.path.join(diretorio, "cache", "parse.sqlite")
+
+            with mock.patch.object(parser_app, "hash_arquivo_xml") as hash_arquivo, \
+                    contextlib.redirect_stdout(io.StringIO()):
+                notas = parser_app.processar_xmls(diretorio, cache=arquivo_cache)
+            hash_arquivo.assert_not_called()
+            self.assertEqual(len(notas), 1)
+
+            with sqlite3.connect(arquivo_cache) as conexao:
+                tamanho, mtime_ns, conteudo_hash = conexao.execute(
+                    "SELECT tamanho, mtime_ns, hash FROM documentos").fetchone()
+            conexao.close()
+            estado = arquivo.stat()
+            self.assertEqual((tamanho, mtime_ns), (estado.st_size, estado.st_mtime_ns))
+            self.assertEqual(conteudo_hash, hashlib.sha256(arquivo.read_bytes()).hexdigest())
+
+            # Estado gravado é o anterior à leitura: arquivo alterado durante o parse é reparseado
+            alterar = lambda *args: arquivo.write_text(gerar_xml_nfe(numero="12345"), encoding="utf-8")
+            with mock.patch.object(parser_app, "processar_conteudo_xml", side_effect=alterar):
+                parser_app.processar_xmls(diretorio, cache=os.path.join(diretorio, "outro.sqlite"))
+            with parser_app.abrir_cache_parse(os.path.join(diretorio, "outro.sqlite")) as cache:
+                self.assertIs(cache.consultar(str(arquivo)), CacheParse.AUSENTE)
+
+class TestRepositorioResultados(unittest.TestCase):
+    """Testes para o repositório SQLite de resultados do frontend"""
+    
+    @staticmethod
+    def gerar_resultado(timestamp, periodo, credito_total):
+        return {
+            'periodo': periodo,
+            'timestamp': timestamp,
+            'arquivos': {'xml_zip': 'xmls.zip', 'pgdas_pdf': 'pgdas.pdf', 'qtd_xmls': 3},
+            'resultados': {'creditos': {'pis': 1.0, 'cofins': 2.0, 'total': credito_total},
+                           'estatisticas': {'qtd_notas': 3}, 'total_monofasico': 150.0, 'total_nao_monofasico': 50.0,
+                           'detalhamento': {
+                               'ncm': [{'ncm': '30049069', 'rvm': 150.0, 'rvn': 0.0}, {'ncm': '22030000', 'rvm': 0.0, 'rvn': 50.0}],
+                               'dia': [{'dia': '2024-03-02', 'rvm': 0.0, 'rvn': 50.0}, {'dia': '2024-03-01', 'rvm': 150.0, 'rvn': 0.0}]
+                           }}
+        }
+    
+    def test_listar_paginado_e_filtrado(self):
+        """Histórico mais recente primeiro, filtrado por período e cliente"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            with RepositorioResultados(os.path.join(diretorio, "resultados.sqlite")) as repositorio:
+                for dia in range(1, 6):
+                    repositorio.salvar(self.gerar_resultado(f"2024031{dia}_100000", f"2024-0{dia % 2 + 1}", dia * 10.0),
+                                       cliente="Farmácia Central" if dia <= 2 else "Drogaria Sul")
+                
+                pagina, total = repositorio.listar(pagina=2, por_pagina=2)
+                self.assertEqual(total, 5)
+                self.assertEqual([sessao['session_id'] for sessao in pagina], ["20240313_100000", "20240312_100000"])
+                
+                sessoes, total = repositorio.listar(periodo="2024-02", cliente="Farm")
+                self.assertEqual(total, 1)
+                self.assertEqual(sessoes[0]['credito_total'], 10.0)
+                self.assertNotIn('resultados', sessoes[0])
+    
+    def test_resultado_completo_e_importacao(self):
+        """JSONs antigos são importados uma vez; o resultado completo volta intacto"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            dados = self.gerar_resultado("20240315_143022", "2024-03", 80.5)
+            Path(diretorio, "resultado_20240315_143022.json").write_text(json.dumps(dados), encoding="utf-8")
+            
+            with RepositorioResultados(os.path.join(diretorio, "resultados.sqlite")) as repositorio:
+                self.assertEqual(repositorio.importar_diretorio(diretorio), 1)
+                self.assertEqual(repositorio.importar_diretorio(diretorio), 0)
+                self.assertEqual(repositorio.carregar("20240315_143022"), dados)
+                self.assertIsNone(repositorio.carregar("inexistente"))
+    
+    def test_series_pre_agregadas(self):
+        """Séries dos gráficos prontas no repositório, sem o detalhamento no resultado"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            with RepositorioResultados(os.path.join(diretorio, "resultados.sqlite")) as repositorio:
+                repositorio.salvar(self.gerar_resultado("20240315_143022", "2024-03", 80.5))
+                
+                self.assertEqual([linha['valor'] for linha in repositorio.serie("20240315_143022", "tipo_produto")], [150.0, 50.0])
+                self.assertEqual([linha['ncm'] for linha in repositorio.serie("20240315_143022", "ncm", limite=1)], ['30049069'])
+                self.assertEqual([linha['dia'] for linha in repositorio.serie("20240315_143022", "dia")], ['2024-03-01', '2024-03-02'])
+                self.assertIsNone(repositorio.serie("20240315_143022", "inexistente"))
+                self.assertNotIn('detalhamento', repositorio.carregar("20240315_143022", detalhamento=False)['resultados'])
+    
+    def test_listar_itens_ordenado_e_filtrado(self):
+        """Itens paginados, ordenados e filtrados no SQLite (notas canceladas incluídas)"""
+        tabela = TabelaItens()
+        for numero, cancelada, itens in (("1", False, [("30049069", "100.00", True), ("22030000", "300.00", False), ("30042099", "200.00", True)]),
+                                         ("2", True, [("30049069", "500.00", True)])):
+            nota = tabela.adicionar_nota(numero=numero, data_emissao="2024-03-01", cnpj_emitente="111", cancelada=cancelada)
+            for item, (ncm, valor, monofasico) in enumerate(itens, 1):
+                tabela.adicionar_item(nota, item, "P", "Produto", ncm, "5405", 1, valor, valor, 0, valor, "04", 0, "04", 0, monofasico=monofasico)
+        with tempfile.TemporaryDirectory() as diretorio:
+            with RepositorioResultados(os.path.join(diretorio, "resultados.sqlite")) as repositorio:
+                repositorio.salvar(self.gerar_resultado("20240315_143022", "2024-03", 80.5), itens=tabela)
+                
+                itens, total = repositorio.listar_itens("20240315_143022", por_pagina=2)
+                self.assertEqual(total, 4)
+                self.assertEqual([item['valor_total'] for item in itens], [500.0, 300.0])
+                
+                itens, total = repositorio.listar_itens("20240315_143022", {'ncm': '3004', 'monofasico': True},
+                                                        ordenar='valor_total', decrescente=False)
+                self.assertEqual(total, 3)
+                self.assertEqual([item['item'] for item in itens], [1, 3, 1])
+                self.assertTrue(all(item['monofasico'] for item in itens))
+
+    def test_sessoes_no_mesmo_segundo(self):
+        """Uploads no mesmo segundo (session_id com sufixo) não se sobrescrevem"""
+        tabela = TabelaItens()
+        nota = tabela.adicionar_nota(numero="1", data_emissao="2024-03-01", cnpj_emitente="111")
+        tabela.adicionar_item(nota, 1, "P", "Produto", "30049069", "5405", 1, "10.00", "10.00", 0, "10.00", "04", 0, "04", 0)
+        with tempfile.TemporaryDirectory() as diretorio:
+            with RepositorioResultados(os.path.join(diretorio, "resultados.sqlite")) as repositorio:
+                for sufixo, credito in (("aaaa1111", 10.0), ("bbbb2222", 20.0)):
+                    dados = dict(self.gerar_resultado("20240315_143022", "2024-03", credito),
+                                 session_id=f"20240315_143022_{sufixo}")
+                    self.assertEqual(repositorio.salvar(dados, itens=tabela), dados['session_id'])
+
+                self.assertEqual(repositorio.carregar("20240315_143022_aaaa1111")['resultados']['creditos']['total'], 10.0)
+                self.assertEqual(repositorio.carregar("20240315_143022_bbbb2222")['resultados']['creditos']['total'], 20.0)
+                self.assertEqual(repositorio.listar_itens("20240315_143022_aaaa1111")[1], 1)
+                self.assertEqual(repositorio.listar_itens("20240315_143022_bbbb2222")[1], 1)
+
+class TestResultadoJSONL(unittest.TestCase):
+    """Testes para o resultado de período em JSON Lines com gzip"""
+    
+    def test_escrita_e_leitura_em_streaming(self):
+        """Resumo compacto com referências; notas e itens relidos um a um"""
+        notas = [parse_nfe_bytes(gerar_xml_nfe(numero=str(numero)).encode('utf-8'), {"30049069": True})[0]
+                 for numero in (11, 12)]
+        with tempfile.TemporaryDirectory() as diretorio:
+            with EscritorResultadoJSONL(diretorio, "analise") as escritor:
+                self.assertEqual(escritor.escrever_notas(notas), 2)
+                resumo = escritor.finalizar({"periodo": "2024-12", "detalhes": {"logs": ["ok"]}})
+            
+            caminhos = caminhos_resultado(diretorio, "analise")
+            self.assertNotIn("\n", caminhos['resumo'].read_text(encoding='utf-8'))
+            self.assertEqual(sorted(os.listdir(diretorio)), sorted(caminho.name for caminho in caminhos.values()))
+            self.assertEqual((resumo['detalhes']['notas']['quantidade'], resumo['detalhes']['itens']['quantidade']), (2, 4))
+            
+            leitor = LeitorResultadoJSONL(caminhos['resumo'])
+            self.assertEqual(leitor.resumo['detalhes']['logs'], ["ok"])
+            self.assertEqual(list(leitor.notas(com_itens=True)), [nota.to_dict() for nota in notas])
+            self.assertEqual([nota['qtd_itens'] for nota in leitor.notas()], [2, 2])
+            self.assertEqual([item['ncm'] for item in leitor.itens()], ["30049069", "22030000"] * 2)
+    
+    def test_descarte_e_formato_antigo(self):
+        """Escrita interrompida não publica arquivos; resumos antigos continuam legíveis"""
+        nota, _ = parse_nfe_bytes(gerar_xml_nfe().encode('utf-8'), {"30049069": True})
+        with tempfile.TemporaryDirectory() as diretorio:
+            with self.assertRaises(RuntimeError):
+                with EscritorResultadoJSONL(diretorio, "analise") as escritor:
+                    escritor.escrever_nota(nota)
+                    raise RuntimeError("falha no meio da escrita")
+            self.assertEqual(os.listdir(diretorio), [])
+            
+            antigo = Path(diretorio, "analise_antiga.json")
+            antigo.write_text(json.dumps({"detalhes": {"notas": [nota.to_dict()]}}), encoding='utf-8')
+            leitor = LeitorResultadoJSONL(antigo)
+            self.assertEqual(list(leitor.notas(com_itens=True)), [nota.to_dict()])
+            self.assertEqual([item['chave_acesso'] for item in leitor.itens()], [CHAVE_TESTE] * 2)
+
+    def test_periodo_gravado_durante_a_leitura(self):
+        """Sistema integrado grava os itens ao ler e aplica cancelamentos só aos cabeçalhos"""
+        from migracao_sistema import SistemaIntegradoNFe
+        
+        with tempfile.TemporaryDirectory() as diretorio:
+            base = Path(diretorio)
+            dir_xmls = base / "data" / "xmls" / "2024-12"
+            dir_xmls.mkdir(parents=True)
+            (base / "data" / "pgdas").mkdir()
+            (base / "data" / "pgdas" / "2024-12.json").write_text(
+                json.dumps({"aliquota_efetiva": 0.06, "tributos": {"pis": 1, "cofins": 2}}), encoding="utf-8")
+            Path(dir_xmls, "a_nota.xml").write_text(gerar_xml_nfe(), encoding="utf-8")
+            Path(dir_xmls, "b_nota.xml").write_text(
+                gerar_xml_nfe(chave=CHAVE_TESTE[:-3] + "002", numero="12"), encoding="utf-8")
+            Path(dir_xmls, "z_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            
+            sistema = SistemaIntegradoNFe(diretorio)
+            escritos = []
+            escrever_itens = EscritorResultadoJSONL.escrever_itens
+            
+            def espiar_itens(escritor, nota):
+                # A nota chega ao escritor antes de o diretório terminar
+                escritos.append((nota.numero, nota.status))
+                return escrever_itens(escritor, nota)
+            
+            with mock.patch.object(EscritorResultadoJSONL, 'escrever_itens', espiar_itens), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                resultado = sistema.processar_periodo("2024-12")
+            
+            leitor = LeitorResultadoJSONL(sistema.dir_resultados / "analise_hibrida_2024-12.json")
+            notas = list(leitor.notas())
+            itens = list(leitor.itens())
+        
+        self.assertEqual(escritos, [("11", "ATIVO"), ("12", "ATIVO")])
+        self.assertEqual([nota['status'] for nota in notas], ["CANCELADO", "ATIVO"])
+        self.assertIn("Nota cancelada", notas[0]['metadados']['logs_processamento'][-1])
+        self.assertEqual(len(itens), 4)
+        self.assertEqual(resultado['xmls']['total_notas'], 2)
+        # Nota cancelada fica fora dos créditos
+        self.assertEqual(resultado['creditos']['estatisticas']['total_itens'], 2)
+
+class TestRegistroTabelas(unittest.TestCase):
+    """Testes para o registro de tabelas de referência do processo"""
+    
+    def test_carga_preguicosa_e_recarga_por_mtime(self):
+        """Tabela compilada só na primeira consulta e recompilada quando o mtime muda"""
+        compilacoes = []
+        def compilador(dados):
+            compilacoes.append(1)
+            return compilar_ncms_monofasicos(dados)
+        
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio, "ncms.json")
+            arquivo.write_text(json.dumps([{"NCMs monofásicos": "3004.90.69"}]), encoding='utf-8')
+            registro = RegistroTabelas(diretorio, intervalo_verificacao=0)
+            self.assertEqual(compilacoes, [])
+            
+            self.assertEqual(registro.obter("ncms.json", compilador), frozenset({"30049069"}))
+            self.assertIs(registro.obter("ncms.json", compilador), registro.obter("ncms.json", compilador))
+            self.assertEqual(len(compilacoes), 1)
+            
+            arquivo.write_text(json.dumps([{"NCMs monofásicos": 22030000}]), encoding='utf-8')
+            mtime = os.path.getmtime(arquivo) + 10
+            os.utime(arquivo, (mtime, mtime))
+            self.assertEqual(registro.obter("ncms.json", compilador), frozenset({"22030000"}))
+            self.assertEqual(len(compilacoes), 2)
+            
+            arquivo.unlink()
+            self.assertEqual(registro.obter("ncms.json", compilador, padrao=frozenset()), frozenset())
+    
+    def test_aquecer_inclui_anexo(self):
+        """Aquecimento carrega SELIC, NCMs e Anexo do Simples de uma vez"""
+        tabelas = {
+            ARQUIVO_SELIC: [{"Mês/Ano": "Janeiro", "2024": 0.01}],
+            ARQUIVO_NCM_MONOFASICO: [{"NCMs monofásicos": "30049069"}],
+            ARQUIVO_ANEXO_SIMPLES: [{"Anexo I": "1ª Faixa", "Column2": "Até 180.000,00", "Column3": "0.04", "Column4": "-"},
+                                    {"Anexo I": "2ª Faixa", "Column2": "De 180.000,01 a 360.000,00", "Column3": "0.073", "Column4": "5940"}]
+        }
+        with tempfile.TemporaryDirectory() as diretorio:
+            for nome, dados in tabelas.items():
+                Path(diretorio, nome).write_text(json.dumps(dados), encoding='utf-8')
+            registro = RegistroTabelas(diretorio)
+            
+            self.assertEqual(registro.aquecer(), {nome: True for nome in tabelas})
+            anexo = registro.tabela_anexo_simples()
+            self.assertEqual(len(anexo), 2)
+            self.assertAlmostEqual(anexo.aliquota_efetiva(360000.0), (360000 * 0.073 - 5940) / 360000)
+
+class TestSerieSelic(unittest.TestCase):
+    """Testes para a série SELIC com produtos acumulados"""
+    
+    # Taxas de 2023-03 a 2024-06, sem 2023-08 (mês ausente conta como zero)
+    TAXAS = {(2023 + (mes - 1) // 12, (mes - 1) % 12 + 1): 0.008 + mes / 10000
+             for mes in range(3, 19) if mes != 8}
+    
+    @staticmethod
+    def fator_mes_a_mes(taxas, periodo_inicial, periodo_final):
+        """Acúmulo mês a mês, como o cálculo original de calcular_selic_acumulada"""
+        ano_inicial, mes_inicial = map(int, periodo_inicial.split('-'))
+        ano_final, mes_final = map(int, periodo_final.split('-'))
+        ano, mes = (ano_inicial + 1, 1) if mes_inicial == 12 else (ano_inicial, mes_inicial + 1)
+        fator = 1.0
+        while (ano, mes) <= (ano_final, mes_final):
+            fator *= 1 + taxas.get((ano, mes), 0)
+            ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        return fator
+    
+    def test_paridade_com_acumulo_mensal(self):
+        """Divisão de produtos igual ao acúmulo mês a mês, inclusive fora da série"""
+        serie = SerieSelic(self.TAXAS)
+        periodos = [f"{ano}-{mes:02d}" for ano in (2022, 2023, 2024, 2025) for mes in range(1, 13)]
+        for inicial in periodos:
+            for final in periodos:
+                self.assertAlmostEqual(serie.fator(inicial, final), self.fator_mes_a_mes(self.TAXAS, inicial, final),
+                                       places=12, msg=(inicial, final))
+        
+        self.assertEqual(serie.fator("2023-08", "07/2023"), 1.0)
+        self.assertEqual(serie.fator("2023-13", "2024-01"), 1.0)
+        self.assertEqual(serie.fator("invalido", "2024-01"), 1.0)
+        self.assertAlmostEqual(serie.fator("12/2023", "2024-02"), serie.fator("2023-12", "2024-02"))
+    
+    def test_fatores_igual_a_fator(self):
+        """API vetorizada devolve, elemento a elemento, o mesmo que fator()"""
+        serie = SerieSelic(self.TAXAS)
+        iniciais = ["2022-06", "2023-02", "2023-07", "2023-12", "2024-06", "2024-09", "xx", "2023-00"]
+        for final in ("2022-01", "2023-10", "2024-06", "2025-03"):
+            self.assertEqual(serie.fatores(iniciais, final), [serie.fator(inicial, final) for inicial in iniciais])
+        self.assertEqual(serie.fatores(iniciais, "invalido"), [1.0] * len(iniciais))
+        self.assertEqual(SerieSelic({}).fatores(["2024-01"], "2024-06"), [1.0])
+
+class TestSimplesNacional(unittest.TestCase):
+    """Testes para as tabelas compiladas dos anexos do Simples Nacional"""
+    
+    def test_faixas_nos_limites(self):
+        """Faixa i cobre (limite[i - 1], limite[i]]; fora da tabela não há faixa"""
+        for anexo in ANEXOS:
+            tabela = obter_tabela_anexo(anexo)
+            self.assertEqual(len(tabela), 6)
+            for numero, limite in enumerate(LIMITES_FAIXAS, start=1):
+                self.assertEqual(tabela.faixa(limite).numero, numero)
+                self.assertEqual(tabela.faixa(limite - 0.01).numero, numero)
+                if numero < 6:
+                    self.assertEqual(tabela.faixa(limite + 0.01).numero, numero + 1)
+            self.assertIsNone(tabela.faixa(LIMITES_FAIXAS[-1] + 0.01))
+            self.assertIsNone(tabela.faixa(-1))
+            for faixa in tabela.faixas:
+                self.assertAlmostEqual(sum(faixa.reparticao.values()), 1.0)
+        
+        self.assertEqual(calcular_simples(0)['aliquota_efetiva'], 0.04)
+        self.assertAlmostEqual(calcular_simples(360000.0)['aliquota_efetiva'], (360000 * 0.073 - 5940) / 360000)
+        self.assertEqual(calcular_simples(4000000.0, anexo=1)['reparticao']['pis'], 0.0613)
+        self.assertEqual(calcular_simples(4000000.0, anexo=3)['faixa'], 6)
+        self.assertIsNone(calcular_simples(5000000.0))
+        with self.assertRaises(ValueError):
+            obter_tabela_anexo(6)
+    
+    def test_aliquota_efetiva_em_lote(self):
+        """API em lote alinhada com a entrada e igual ao cálculo unitário"""
+        rbt12s = [0, 180000.0, 180000.01, 1500000.0, 4800000.0, 4800000.01]
+        for anexo in ANEXOS:
+            resultado = aliquota_efetiva(rbt12s, anexo)
+            for posicao, rbt12 in enumerate(rbt12s):
+                esperado = calcular_simples(rbt12, anexo)
+                if esperado is None:
+                    self.assertIsNone(resultado['faixa'][posicao])
+                    self.assertIsNone(resultado['aliquota_efetiva'][posicao])
+                    continue
+                self.assertEqual(resultado['faixa'][posicao], esperado['faixa'])
+                self.assertEqual(resultado['aliquota_efetiva'][posicao], esperado['aliquota_efetiva'])
+                self.assertEqual({tributo: resultado['reparticao'][tributo][posicao] for tributo in TRIBUTOS_ANEXO[anexo]},
+                                 esperado['reparticao'])
+    
+    def test_chamadores(self):
+        """Cálculo genérico usa a repartição da faixa 6; COD FILÉ respeita os limites do JSON"""
+        generico = carregar_modulo(DIR_RAIZ / "application" / "calculo_credito_generico.py", "calculo_credito_generico")
+        rbt12 = 4000000.0
+        efetiva = (rbt12 * 0.19 - 378000) / rbt12
+        devido = 100000.0 * efetiva * (0.0613 + 0.2827)
+        with contextlib.redirect_stdout(io.StringIO()):
+            credito = generico.calcular_credito_generico(rbt12, 100000.0, 1000.0, 5000.0, "2024-01")
+        self.assertAlmostEqual(credito, (6000.0 - devido) * generico.calcular_selic_acumulada("2024-01"))
+        
+        cod_file = carregar_modulo(DIR_RAIZ / "src" / "COD FILÉ - ALIQUOTA CHECK E PROPORCOES PIS COFINS CHECK.py", "cod_file")
+        anexo = {"anexo_1": [
+            {"faixa": "1ª", "receita_bruta_anual_minima": 0, "receita_bruta_anual_maxima": 180000, "aliquota": 4.0, "valor_a_deduzir": 0},
+            {"faixa": "2ª", "receita_bruta_anual_minima": 180000.01, "receita_bruta_anual_maxima": 360000, "aliquota": 7.3, "valor_a_deduzir": 5940}
+        ]}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(cod_file.identificar_faixa_tributacao(180000, anexo), ("1ª", 0.04, 0))
+            self.assertEqual(cod_file.identificar_faixa_tributacao(180000.01, anexo), ("2ª", 0.073, 5940))
+            self.assertEqual(cod_file.identificar_faixa_tributacao(180000.005, anexo), (None, None, None))
+            self.assertEqual(cod_file.identificar_faixa_tributacao(360000.01, anexo), (None, None, None))
+            
+            # Faixas compiladas uma vez por JSON carregado; outro JSON recompila
+            with mock.patch.object(cod_file, 'TabelaAnexo', wraps=cod_file.TabelaAnexo) as tabela_anexo:
+                for rbt12 in (1000, 200000, 300000):
+                    cod_file.identificar_faixa_tributacao(rbt12, anexo)
+                self.assertEqual(tabela_anexo.de_faixas.call_count, 0)
+                outro_anexo = {"anexo_1": anexo["anexo_1"][:1]}
+                self.assertEqual(cod_file.identificar_faixa_tributacao(200000, outro_anexo), (None, None, None))
+                cod_file.identificar_faixa_tributacao(1000, outro_anexo)
+                self.assertEqual(tabela_anexo.de_faixas.call_count, 1)
+    
+    @unittest.skipUnless(importlib.util.find_spec("pdfplumber"), "pdfplumber não instalado")
+    def test_extrator_pgdas(self):
+        """Extrator de PGDAS usa o Anexo I oficial quando a tabela exportada não existe"""
+        extrator = carregar_modulo(DIR_RAIZ / "scripts" / "extrator_universal_pgdas.py", "extrator_universal_pgdas")
+        calcular = extrator.ExtratorPGDASUniversal().calcular_aliquota_apurada
+        self.assertAlmostEqual(calcular(360000.0), obter_tabela_anexo(1).aliquota_efetiva(360000.0))
+        self.assertEqual(calcular(5000000.0), 0.0)
+
+class TestClassificadorXML(unittest.TestCase):
+    """Testes para a classificação pelo cabeçalho, sem parse"""
+    
+    def test_classificar_nota_e_evento(self):
+        """Tipo, chave e código do evento lidos do início do documento"""
+        nota = classificar_conteudo(gerar_xml_nfe().encode('utf-8'))
+        self.assertEqual((nota.tipo, nota.chave), ('NFE', CHAVE_TESTE))
+        self.assertTrue(nota.data_emissao.startswith('2024-12-01'))
+        
+        evento = classificar_conteudo(gerar_xml_cancelamento().encode('utf-8'))
+        self.assertEqual((evento.tipo, evento.chave, evento.tipo_evento), ('EVENTO', CHAVE_TESTE, '110111'))
+        self.assertTrue(evento.eh_cancelamento)
+        
+        self.assertEqual(classificar_conteudo(b'<?xml version="1.0"?><retConsSitNFe/>').tipo, 'DESCONHECIDO')
+        self.assertIsNone(classificar_conteudo('<NFe/>'.encode('utf-16')).tipo)
+    
+    def test_arquivo_com_cabecalho_longo(self):
+        """Chave além da primeira janela é encontrada na leitura estendida"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            arquivo = Path(diretorio, "nota.xml")
+            arquivo.write_text("<!--" + "x" * 5000 + "-->" + gerar_xml_nfe().split("?>", 1)[1], encoding="utf-8")
+            cabecalho = classificar_arquivo(str(arquivo))
+        self.assertEqual((cabecalho.tipo, cabecalho.chave), ('NFE', CHAVE_TESTE))
+    
+    def test_arquivo_aberto_uma_vez(self):
+        """Classificação, parse (árvore ou streaming) e hash usam o mesmo open"""
+        abertos = []
+        abrir = open
+        def contar(caminho, *args, **kwargs):
+            abertos.append(os.path.basename(str(caminho)))
+            return abrir(caminho, *args, **kwargs)
+        
+        with tempfile.TemporaryDirectory() as diretorio:
+            Path(diretorio, "a_nota.xml").write_text(gerar_xml_nfe(), encoding="utf-8")
+            # cp1252 sem declaração: o streaming recorre ao parse com fallback sem reabrir
+            Path(diretorio, "b_nota.xml").write_bytes(
+                gerar_xml_nfe(chave=CHAVE_TESTE[:-3] + "002").split("?>", 1)[1]
+                .replace("Empresa Teste", "Açúcar").encode("cp1252")
+            )
+            Path(diretorio, "z_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            
+            for limite in (0, 1000):
+                abertos.clear()
+                parser = NFEParserHibrido(limite_streaming=limite)
+                with mock.patch('builtins.open', side_effect=contar), \
+                     mock.patch('hashlib.sha256', side_effect=hashlib.sha256) as sha256:
+                    resultado = parser.processar_diretorio(diretorio, incluir_cancelamentos=False)
+                self.assertEqual(sorted(abertos), ["a_nota.xml", "b_nota.xml", "z_evento.xml"])
+                # Sem cache de parsing, nenhum hash de conteúdo é calculado
+                sha256.assert_not_called()
+                self.assertEqual([n.emitente_nome for n in resultado['notas']],
+                                 ["Empresa Teste Ltda", "Açúcar Ltda"])
+
+    def test_parser_legado_um_parse_por_arquivo(self):
+        """Parser legado do core: um parse por arquivo, cp1252 sem declaração e cancelamento aplicado"""
+        legado = carregar_modulo(DIR_RAIZ / "src" / "core" / "domain" / "parser_hibrido.py", "parser_hibrido_legado")
+        with tempfile.TemporaryDirectory() as diretorio:
+            Path(diretorio, "a_nota.xml").write_bytes(
+                gerar_xml_nfe().split("?>", 1)[1].replace("Empresa Teste", "Açúcar").encode("cp1252")
+            )
+            Path(diretorio, "b_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            
+            parsear = UtilXML.parsear_xml
+            with mock.patch.object(UtilXML, 'parsear_xml', side_effect=parsear) as contador:
+                resultado = legado.NFEParserHibrido().processar_diretorio(diretorio)
+        
+        self.assertEqual(contador.call_count, 2)
+        self.assertEqual([n.emitente_nome for n in resultado['notas']], ["Açúcar Ltda"])
+        self.assertTrue(resultado['notas'][0].eh_nota_cancelada())
+
+class TestChaveAcesso(unittest.TestCase):
+    """Testes para decodificação da chave e roteamento sem parse"""
+    
+    CHAVE_VALIDA = CHAVE_TESTE[:43] + str(calcular_dv(CHAVE_TESTE[:43]))
+    
+    def test_decodificar_chave(self):
+        """Campos da chave e conferência do DV"""
+        chave = decodificar_chave("NFe" + self.CHAVE_VALIDA)
+        self.assertEqual((chave.uf, chave.periodo, chave.cnpj), ("35", "2024-12", "12345678000123"))
+        self.assertEqual((chave.modelo, chave.serie, chave.numero), ("55", "001", "000000011"))
+        
+        dv_errado = self.CHAVE_VALIDA[:43] + str((int(self.CHAVE_VALIDA[43]) + 1) % 10)
+        self.assertIsNone(decodificar_chave(dv_errado))
+        self.assertIsNone(decodificar_chave(self.CHAVE_VALIDA[:40]))
+    
+    def test_rotear_por_nome_e_cabecalho(self):
+        """Nome com chave dispensa leitura; sem chave válida usa o cabeçalho"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            inexistente = Path(diretorio, f"{self.CHAVE_VALIDA}-nfe.xml")
+            rota = rotear_arquivo(str(inexistente))
+            self.assertEqual((rota.grupo, rota.origem), (("2024-12", "12345678000123", "55"), "nome"))
+            
+            evento = rotear_arquivo(f"ID110111{self.CHAVE_VALIDA}01-procEventoNFe.xml")
+            self.assertTrue(evento.eh_cancelamento)
+            
+            arquivo = Path(diretorio, "nota.xml")
+            arquivo.write_text(gerar_xml_nfe(self.CHAVE_VALIDA), encoding="utf-8")
+            self.assertEqual(rotear_arquivo(str(arquivo)).origem, "cabecalho")
+            
+            # Chave com DV incorreto: período pelo dhEmi do cabeçalho
+            arquivo.write_text(gerar_xml_nfe(CHAVE_TESTE), encoding="utf-8")
+            rota = rotear_arquivo(str(arquivo))
+            self.assertEqual((rota.periodo, rota.origem, rota.cnpj), ("2024-12", "data_cabecalho", ""))
+
+class TestTabelaItens(unittest.TestCase):
+    """Testes para a tabela colunar de itens"""
+    
+    def _tabela(self, numero=11):
+        itens = [("30049069", "10.00", "0.50", "04"), ("22030000", "5.00", "0.00", "01"), ("30049069", "2.50", "0.00", "04")]
+        nota, _ = parse_nfe_bytes(gerar_xml_nfe(itens=itens, numero=numero).encode('utf-8'), {"30049069": True})
+        return nota, TabelaItens.de_notas([nota])
+    
+    def test_colunas_e_visoes(self):
+        """Visões de linha reproduzem os itens; códigos repetidos são compartilhados"""
+        nota, tabela = self._tabela()
+        self.assertEqual((len(tabela), tabela.qtd_notas), (3, 1))
+        self.assertEqual(len(tabela.dicionarios['ncm']), 2)
+        
+        linha = tabela[2]
+        self.assertEqual((linha.ncm, linha.valor_total, linha.tipo_tributario), ("30049069", 2.5, "Monofasico"))
+        self.assertEqual([visao.numero for visao in tabela.itens_nota(0)], [item.numero for item in nota.itens])
+        
+        # Somas em centavos (inteiros exatos)
+        self.assertEqual(tabela.somar('valor_total', tabela.monofasico), 1200)
+        self.assertEqual(tabela.somar_decimal('valor_total'), Decimal("17.00"))
+        self.assertEqual(tabela.somar_por('ncm', 'valor_total'), {"30049069": 1200, "22030000": 500})
+    
+    def test_estender_remapeia_codigos(self):
+        """Concatenação de lotes mantém índices de nota e códigos coerentes"""
+        _, tabela = self._tabela(11)
+        outra = TabelaItens()
+        outra.adicionar_nota("", "99")
+        outra.adicionar_item(0, 1, "P9", "Outro", "22030000", "5102", 1, 7, 7, 0, 7, "01", 0, "01", 0)
+        
+        tabela.estender(outra)
+        self.assertEqual((len(tabela), tabela.qtd_notas), (4, 2))
+        self.assertEqual((tabela[3].ncm, tabela[3].nota), ("22030000", 1))
+        self.assertEqual(len(tabela.dicionarios['ncm']), 2)
+        self.assertEqual(tabela.itens_nota(1)[0].descricao, "Outro")
+    
+    def test_de_notas_preserva_zero_e_vazio(self):
+        """Zero e texto vazio do nome principal não caem no atributo alternativo"""
+        nota = SimpleNamespace(
+            chave_acesso=CHAVE_TESTE, numero="1", serie="1", data_emissao=None, valor_produtos=0.0, itens=[],
+            cnpj_emitente="", emitente_cnpj="99999999000199",
+            nome_emitente="Emitente", emitente_nome="Outro",
+            valor_total=0.0, valor_total_nf=Decimal("150.00")
+        )
+        tabela = TabelaItens.de_notas([nota, SimpleNamespace(**dict(vars(nota), cnpj_emitente=None, valor_total=None))])
+        
+        self.assertEqual(list(tabela.nota_valor_total), [0, 15000])
+        self.assertEqual([tabela.emitentes.valores[codigo] for codigo in tabela.nota_emitente],
+                         ["", "99999999000199"])
+
+class TestMotorCreditos(unittest.TestCase):
+    """Testes para o motor colunar de créditos"""
+    
+    def _tabela(self):
+        tabela = TabelaItens()
+        for cnpj, dia, itens in (("111", "2024-12-01", [("30049069", "5405", "04", "100.00", True), ("22030000", "5102", "01", "50.00", False)]),
+                                 ("222", "2024-12-02", [("30049069", "5405", "04", "30.00", True), ("22030000", "5102", "01", "20.00", False)])):
+            nota = tabela.adicionar_nota(numero=cnpj, data_emissao=dia + "T10:00:00-03:00", cnpj_emitente=cnpj)
+            for numero, (ncm, cfop, cst, valor, monofasico) in enumerate(itens, 1):
+                tabela.adicionar_item(nota, numero, "P", "", ncm, cfop, 1, valor, valor, 0, valor, cst, 0, cst, 0, monofasico=monofasico)
+        return tabela
+    
+    def test_totais_e_creditos(self):
+        """RVM/RVN e créditos em Decimal"""
+        tabela = self._tabela()
+        resultado = calcular_creditos_tabela(tabela, Decimal("0.01"), Decimal("0.05"), 2, 10)
+        self.assertEqual((resultado.rvm, resultado.rvn), (Decimal("130.00"), Decimal("70.00")))
+        self.assertEqual((resultado.itens_monofasicos, resultado.itens_nao_monofasicos), (2, 2))
+        self.assertEqual(resultado.pis_devido, Decimal("0.7"))
+        self.assertEqual(resultado.credito_total, Decimal("12") - Decimal("4.2"))
+    
+    def test_somente_ativos_opcional(self):
+        """Por padrão todos os itens entram; somente_ativos exclui inválidos e notas canceladas"""
+        tabela = self._tabela()
+        tabela.nota_cancelada[1] = 1
+        tabela.valido[1] = 0
+        
+        todos = calcular_creditos_tabela(tabela, 0.01, 0.05)
+        self.assertEqual((todos.rvm, todos.rvn), (130.0, 70.0))
+        self.assertEqual(len(linhas_itens(tabela)), 4)
+        
+        ativos = calcular_creditos_tabela(tabela, 0.01, 0.05, somente_ativos=True)
+        self.assertEqual((ativos.rvm, ativos.rvn), (100.0, 0.0))
+        self.assertEqual([linha[-2] for linha in linhas_itens(tabela, somente_ativos=True)], [10000])
+    
+    def test_detalhamento_por_dimensao(self):
+        """Grupos por NCM, emitente e dia somam o total; filtro detalha sem recalcular"""
+        resultado = calcular_creditos_tabela(self._tabela(), 0.01, 0.05, 2.0, 10.0)
+        
+        por_dia = resultado.detalhamento('dia')
+        self.assertEqual([linha['dia'] for linha in por_dia], ["2024-12-01", "2024-12-02"])
+        self.assertAlmostEqual(sum(linha['credito_total'] for linha in por_dia), resultado.credito_total)
+        
+        por_ncm = {linha['ncm']: linha for linha in resultado.detalhamento('ncm')}
+        self.assertEqual((por_ncm["30049069"]['rvm'], por_ncm["22030000"]['rvn']), (130.0, 70.0))
+        self.assertEqual(resultado.agregacao.por('cfop', {'emitente': "222"}), {"5405": [3000, 0, 1, 0], "5102": [0, 2000, 0, 1]})
+
+class TestCentavos(unittest.TestCase):
+    """Testes para o backend de valores em centavos"""
+    
+    def test_para_inteiro(self):
+        """Conversão exata com ROUND_HALF_UP para qualquer tipo de entrada"""
+        self.assertEqual(para_inteiro("9.9"), 990)
+        self.assertEqual(para_inteiro(9.9), 990)
+        self.assertEqual(para_inteiro(Decimal("0.005")), 1)
+        self.assertEqual(para_inteiro("1,005"), 101)
+        self.assertEqual(para_inteiro("-2.345"), -235)
+        self.assertEqual(para_inteiro("12345678901234.56"), 1234567890123456)
+        self.assertEqual(para_inteiro("1.2345", CASAS_QUANTIDADE), 12345)
+        self.assertEqual((para_inteiro(None), para_inteiro(""), para_inteiro("abc")), (0, 0, 0))
+    
+    def test_converter_coluna_identica_ao_decimal(self):
+        """Caminho vetorizado e caminho por valor somam exatamente como Decimal"""
+        textos = [f"{valor // 100}.{valor % 100:02d}" for valor in range(0, 300001, 7)]
+        esperado = sum(map(Decimal, textos))
+        self.assertEqual(para_decimal(sum(converter_coluna(textos))), esperado)
+        
+        # Um texto fora do padrão desvia a coluna para a conversão por valor
+        misturada = converter_coluna(textos + ["1e2", "0.1"])
+        self.assertEqual(para_decimal(sum(misturada)), esperado + Decimal("100.10"))
+    
+    def test_converter_coluna_fora_do_leiaute(self):
+        """Textos curtos, com mais casas ou grandes demais mantêm o arredondamento de para_inteiro"""
+        for textos in (["5", "-0.05", "12.30"], ["0.125", "2.675", "1.00"], ["99999999999999.99", "0.01"]):
+            self.assertEqual(list(converter_coluna(textos)), [para_inteiro(texto) for texto in textos])
+        self.assertEqual(list(converter_coluna(["0.125", "-0.125"])), [13, -13])
+
+class TestNucleoReentrante(unittest.TestCase):
+    """Testes para a API pura parse_nfe_bytes"""
+    
+    def test_parse_nfe_bytes(self):
+        """Retorna nota e diagnósticos do próprio documento"""
+        nota, diagnosticos = parse_nfe_bytes(gerar_xml_nfe().encode('utf-8'), {"30049069": True})
+        
+        self.assertEqual(nota.numero, "11")
+        self.assertTrue(nota.itens[0].eh_monofasico_por_ncm)
+        self.assertFalse(diagnosticos.tem_erros())
+    
+    def test_resultado_independe_do_historico(self):
+        """Chamadas anteriores com erro não afetam a próxima"""
+        parse_nfe_bytes(gerar_xml_nfe(itens=[("123", "10.00", "0.00", "99")]).encode('utf-8'))
+        _, primeiro = parse_nfe_bytes(gerar_xml_nfe().encode('utf-8'))
+        _, segundo = parse_nfe_bytes(gerar_xml_nfe().encode('utf-8'))
+        self.assertEqual(primeiro.mensagens, segundo.mensagens)
+        self.assertEqual(primeiro.logs_validacao, segundo.logs_validacao)
+    
+    def test_streaming_igual_arvore(self):
+        """Extração em streaming produz a mesma nota e os mesmos diagnósticos"""
+        itens = [("30049069", "10.00", "0.50", "04"), ("123", "5.00", "0.00", "99")] * 20
+        conteudo = gerar_xml_nfe(itens=itens).encode('utf-8')
+        nota_arvore, diag_arvore = parse_nfe_bytes(conteudo, {"30049069": True})
+        nota_stream, diag_stream = parse_nfe_stream(io.BytesIO(conteudo), {"30049069": True})
+        
+        dados_arvore, dados_stream = nota_arvore.to_dict(), nota_stream.to_dict()
+        dados_arvore.pop('metadados'), dados_stream.pop('metadados')
+        self.assertEqual(dados_stream, dados_arvore)
+        self.assertEqual(diag_stream.mensagens, diag_arvore.mensagens)
+        self.assertEqual(diag_stream.logs_validacao, diag_arvore.logs_validacao)
+    
+    def test_diretorio_com_streaming(self):
+        """Arquivos acima do limite são processados em streaming"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            Path(diretorio, "a_nota.xml").write_text(gerar_xml_nfe(), encoding="utf-8")
+            Path(diretorio, "z_evento.xml").write_text(gerar_xml_cancelamento(), encoding="utf-8")
+            
+            arvore = NFEParserHibrido(limite_streaming=0).processar_diretorio(diretorio)
+            stream = NFEParserHibrido(limite_streaming=1000).processar_diretorio(diretorio)
+        
+        self.assertEqual(stream['estatisticas'], arvore['estatisticas'])
+        self.assertEqual([n.chave_acesso for n in stream['notas']], [n.chave_acesso for n in arvore['notas']])
+        self.assertTrue(stream['notas'][0].eh_nota_cancelada())
+    
+    def test_parser_compartilhado_entre_threads(self):
+        """Uma instância pode ser usada por várias threads"""
+        parser = NFEParserHibrido()
+        conteudo = gerar_xml_nfe().encode('utf-8')
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            notas = list(executor.map(lambda _: parser.processar_xml_nfe(conteudo), range(40)))
+        
+        self.assertTrue(all(nota is not None for nota in notas))
+        self.assertEqual(parser.obter_estatisticas()['total_processados'], 40)
+    
+    def test_mesclar_estatisticas(self):
+        """Contadores podem ser mesclados"""
+        estatisticas = EstatisticasProcessamento({'total_processados': 2})
+        estatisticas.mesclar(EstatisticasProcessamento({'total_processados': 3, 'total_validos': 1}))
+        self.assertEqual(estatisticas['total_processados'], 5)
+        self.assertEqual(estatisticas.get('total_validos'), 1)
+
+class TestDiagnosticos(unittest.TestCase):
+    """Testes para diagnósticos estruturados e log limitado da execução"""
+    
+    def test_validador_registra_codigos(self):
+        """Validador grava código e detalhe em vez de texto formatado"""
+        validador = ValidadorFiscal()
+        validador.validar_cnpj("123")
+        registros = validador.obter_registros_validacao()
+        self.assertEqual(registros, [RegistroDiagnostico("CNPJ_TAMANHO", "ERROR", "123")])
+        self.assertIn("[CNPJ_TAMANHO]", validador.obter_logs_validacao()[0])
+    
+    def test_logs_da_nota_nao_acumulam(self):
+        """Cada nota carrega apenas os próprios logs de validação"""
+        parser = NFEParserHibrido()
+        conteudo = gerar_xml_nfe(itens=[("123", "10.00", "0.00", "99")])
+        notas = [parser.processar_xml_nfe(conteudo) for _ in range(5)]
+        self.assertEqual(len(notas[-1].logs_processamento), len(notas[0].logs_processamento))
+        self.assertEqual(parser.obter_diagnosticos()['NCM_TAMANHO'], 5)
+    
+    def test_buffer_circular_limitado(self):
+        """Log da execução guarda os últimos registros e conta todos"""
+        registro = RegistroExecucao(limite=3)
+        registro.adicionar(RegistroDiagnostico("ITEM_ERRO", "ERROR", str(i)) for i in range(10))
+        self.assertEqual(len(registro), 3)
+        self.assertEqual([r.detalhe for r in registro.registros()], ["7", "8", "9"])
+        self.assertEqual(registro.contagem_por_codigo(), {"ITEM_ERRO": 10})
+        self.assertEqual(registro.total_descartados, 7)
+    
+    def test_mesclar_registros(self):
+        """Registros de lotes podem ser mesclados"""
+        registro = RegistroExecucao(limite=5)
+        registro.registrar("NFE_PROCESSADA", "INFO", "1")
+        outro = RegistroExecucao()
+        outro.registrar("NFE_PROCESSADA", "INFO", "2")
+        outro.registrar("NFE_ERRO", "ERROR", "falha")
+        registro.mesclar(outro)
+        self.assertEqual(registro.contagem_por_codigo(), {"NFE_PROCESSADA": 2, "NFE_ERRO": 1})
+        self.assertEqual(registro.total_registrado, 3)
+
+class TestEsquemaExtracao(unittest.TestCase):
+    """Testes para o esquema de extração compilado"""
+    
+    def setUp(self):
+        self.esquema = EsquemaExtracaoNFe()
+    
+    def test_campos_opcionais_ausentes(self):
+        """Tags opcionais ausentes retornam o valor padrão sem casar outros elementos"""
+        root = etree.fromstring(gerar_xml_nfe().encode('utf-8'))
+        campos = self.esquema.para_documento(root)
+        inf_nfe = campos.elemento('infNFe', campos.elemento('NFe', root))
+        prod = campos.elemento('prod', campos.elementos('det', inf_nfe)[0])
+        
+        self.assertEqual(campos.texto('prod', 'cest', prod), "")
+        self.assertIsNone(campos.elemento('dest', inf_nfe))
+        self.assertEqual(campos.texto('prod', 'ncm', prod), "30049069")
+        self.assertEqual(etree.QName(campos.elemento('PIS', campos.elementos('det', inf_nfe)[0])).localname, "PISNT")
+    
+    def test_documento_sem_namespace(self):
+        """Namespace detectado por documento"""
+        xml = gerar_xml_nfe().replace(' xmlns="http://www.portalfiscal.inf.br/nfe"', '')
+        root = etree.fromstring(xml.encode('utf-8'))
+        campos = self.esquema.para_documento(root)
+        
+        self.assertEqual(campos.uri, '')
+        inf_nfe = campos.elemento('infNFe', campos.elemento('NFe', root))
+        self.assertEqual(campos.texto('ide', 'numero', campos.elemento('ide', inf_nfe)), "11")
+    
+    def test_evento_cancelamento(self):
+        """Extração de evento pelo esquema"""
+        evento = NFEParserHibrido().processar_evento_cancelamento(gerar_xml_cancelamento())
+        self.assertEqual(evento.chave_nfe, CHAVE_TESTE)
+        self.assertEqual(evento.justificativa, "Erro na emissao da nota")
+
+class TestLeituraXML(unittest.TestCase):
+    """Testes para a leitura binária e o parser endurecido"""
+    
+    def test_encoding_declarado_e_mmap(self):
+        """Bytes e mmap são decodificados pelo lxml conforme a declaração"""
+        conteudo = gerar_xml_nfe().replace('encoding="UTF-8"', 'encoding="ISO-8859-1"')
+        conteudo = conteudo.replace("Empresa Teste Ltda", "Comércio São João Ltda")
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = Path(diretorio, "nota.xml")
+            caminho.write_bytes(conteudo.encode('latin-1'))
+            
+            with UtilArquivo.abrir_xml(str(caminho)) as dados:
+                self.assertIsInstance(dados, bytes)
+                nota_bytes, _ = parse_nfe_bytes(dados)
+            with UtilArquivo.abrir_xml(str(caminho), limite_mmap=1) as dados:
+                self.assertNotIsInstance(dados, bytes)
+                nota_mmap, _ = parse_nfe_bytes(dados)
+        
+        self.assertEqual(nota_bytes.emitente_nome, "Comércio São João Ltda")
+        self.assertEqual(nota_mmap.emitente_nome, "Comércio São João Ltda")
+        
+        # Sem declaração e fora do UTF-8: fallback cp1252 no próprio libxml2, com aviso
+        with self.assertLogs('utils', level='WARNING') as avisos:
+            root = UtilXML.parsear_xml("<a>Ação</a>".encode('cp1252'))
+        self.assertEqual(root.text, "Ação")
+        self.assertIn("cp1252", avisos.output[0])
+
+    def test_fallback_respeita_declaracao(self):
+        """Declaração de encoding nunca é sobreposta; XML malformado é parseado uma vez"""
+        declarado = '<?xml version="1.0" encoding="UTF-8"?><a>Ação\xff</a>'.encode('latin-1')
+        with mock.patch('utils.obter_parser_xml', wraps=obter_parser_xml) as obter_parser, \
+                self.assertLogs('utils', level='ERROR'):
+            self.assertIsNone(UtilXML.parsear_xml(declarado))
+            self.assertIsNone(UtilXML.parsear_xml("<a><b>Ação</a>".encode('utf-8')))
+        self.assertEqual(obter_parser.call_count, 2)
+
+    def test_ler_arquivo_xml_texto_original(self):
+        """Texto original (prólogo, comentários), decodificado pela declaração, mesmo malformado"""
+        conteudo = ('<?xml version="1.0" encoding="ISO-8859-1"?>\n'
+                    '<!-- exportado -->\n<a>Comércio</a>')
+        with tempfile.TemporaryDirectory() as diretorio:
+            caminho = Path(diretorio, "nota.xml")
+            caminho.write_bytes(conteudo.encode('latin-1'))
+            self.assertEqual(UtilArquivo.ler_arquivo_xml(str(caminho)), conteudo)
+
+            caminho.write_bytes("<a><b>Comércio</a>".encode('utf-8'))
+            self.assertEqual(UtilArquivo.ler_arquivo_xml(str(caminho)), "<a><b>Comércio</a>")
+    
+    def test_entidades_nao_expandidas(self):
+        """Entidades internas e externas não são resolvidas"""
+        with tempfile.TemporaryDirectory() as diretorio:
+            segredo = Path(diretorio, "segredo.txt")
+            segredo.write_text("confidencial", encoding="utf-8")
+            conteudo = (f'<!DOCTYPE a [<!ENTITY interna "expandida">'
+                        f'<!ENTITY externa SYSTEM "{segredo.as_uri()}">]>'
+                        '<a><b>&interna;</b><c>&externa;</c></a>').encode('utf-8')
+            root = UtilXML.parsear_xml(conteudo)
+        
+        texto = etree.tostring(root, encoding='unicode')
+        self.assertNotIn("expandida", "".join(root.itertext()))
+        self.assertNotIn("confidencial", texto)
+
+def carregar_aplicacao(nome):
+    """Importa um módulo de application/ (imports planos, como em `python main.py`);
+    registrado em sys.modules para que os workers encontrem suas funções"""
+    if nome not in sys.modules:
+        with mock.patch.object(sys, 'path', [str(DIR_RAIZ / "application")] + sys.path):
+            sys.modules[nome] = carregar_modulo(DIR_RAIZ / "application" / f"{nome}.py", nome)
+    return sys.modules[nome]
+
+class TestJobPeriodos(unittest.TestCase):
+    """Testes para o job de vários períodos da aplicação"""
+
+    PGDAS = {"dados_estruturados": {"aliquota_apurada": 0.1},
+             "proporcoes": {"pis": 0.0276, "cofins": 0.1274},
+             "tributos": {"pis": 10.0, "cofins": 40.0}}
+
+    def montar_base(self, diretorio):
+        base = Path(diretorio)
+        for periodo, numero in (("2024-01", "1"), ("2024-02", "2")):
+            pasta = base / "data" / "xmls" / periodo
+            pasta.mkdir(parents=True)
+            chave = CHAVE_TESTE[:-2] + numero.zfill(2)
+            (pasta / "nota.xml").write_text(gerar_xml_nfe(chave, numero=numero), encoding="utf-8")
+        (base / "data" / "xmls" / "2024-01-validos").mkdir()
+        (base / "data" / "xmls" / "rascunho").mkdir()
+        (base / "data" / "pgdas").mkdir(parents=True)
+        for periodo in ("2024-01", "2024-02", "2024-03"):
+            (base / "data" / "pgdas" / f"{periodo}.json").write_text(json.dumps(self.PGDAS), encoding="utf-8")
+        (base / "data" / "pgdas" / "leiame.json").write_text("{}", encoding="utf-8")
+        return base
+
+    def test_descoberta_compartilhada(self):
+        """Aplicação e sistema integrado usam a mesma descoberta de períodos"""
+        main_app = carregar_aplicacao("main")
+        with contextlib.redirect_stdout(io.StringIO()):
+            from migracao_sistema import detectar_periodos_disponiveis
+        with tempfile.TemporaryDirectory() as diretorio:
+            base = self.montar_base(diretorio)
+            self.assertEqual(main_app.detectar_periodos(str(base)), ["2024-01", "2024-02", "2024-03"])
+
+            sistema = SimpleNamespace(dir_xmls=base / "data" / "xmls", dir_pgdas=base / "data" / "pgdas")
+            (base / "data" / "xmls" / "2023-12-validos").mkdir()
+            self.assertEqual(detectar_periodos_disponiveis(sistema), ["2023-12", "2024-01", "2024-02", "2024-03"])
+        self.assertEqual(detectar_periodos(Path(diretorio, "inexistente"), Path(diretorio, "inexistente")), [])
+
+    def test_razao_paralelo_igual_sequencial(self):
+        """Créditos por período em paralelo geram o mesmo razão; pendências listadas"""
+        main_app = carregar_aplicacao("main")
+        razoes = []
+        with tempfile.TemporaryDirectory() as diretorio:
+            base = self.montar_base(diretorio)
+            for workers in (1, 2):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    razoes.append(main_app.processar_periodos(str(base), workers=workers,
+                                                              periodo_final="2024-12", usar_cache=False))
+            resultados = base / "data" / "resultados"
+            self.assertTrue((resultados / "classificacao_itens_2024-02.csv").exists())
+            self.assertEqual(json.loads((resultados / "razao_creditos.json").read_text(encoding="utf-8"))["totais"],
+                             razoes[-1]["totais"])
+
+        sequencial, paralelo = razoes
+        self.assertEqual([lancamento["periodo"] for lancamento in paralelo["periodos"]], ["2024-01", "2024-02"])
+        self.assertEqual(paralelo["pendencias"], [{"periodo": "2024-03", "motivo": "Diretório de XMLs não encontrado"}])
+        self.assertEqual(paralelo["periodos"], sequencial["periodos"])
+        self.assertEqual(paralelo["totais"], sequencial["totais"])
+
+        lancamento = paralelo["periodos"][0]
+        self.assertEqual(lancamento["qtd_notas"], 1)
+        self.assertAlmostEqual(lancamento["total_monofasico"] + lancamento["total_nao_monofasico"], 145.0)
+        self.assertAlmostEqual(lancamento["credito_atualizado"],
+                               lancamento["credito_total"] * lancamento["fator_selic_acumulado"])
+        self.assertAlmostEqual(paralelo["totais"]["credito_total"],
+                               sum(lancamento["credito_total"] for lancamento in paralelo["periodos"]))
+
+class TestFilaJobs(unittest.TestCase):
+    """Testes para a fila de jobs do frontend e o progresso do parsing em lotes"""
+
+    def setUp(self):
+        self.jobs = carregar_modulo(DIR_RAIZ / "frontend" / "jobs.py", "jobs_frontend")
+
+    def test_transicoes_e_eta(self):
+        """Pendente -> processando -> concluído; ETA pela vazão observada"""
+        job = self.jobs.Job("upload.zip")
+        self.assertEqual(job.to_dict()["status"], self.jobs.STATUS_PENDENTE)
+
+        with mock.patch.object(self.jobs.time, "time", return_value=100.0):
+            job.iniciar("Lendo ZIP")
+        job.registrar_vistos(10)
+        self.assertIsNone(job.eta_segundos())
+
+        job.registrar_processados(3, 1)
+        with mock.patch.object(self.jobs.time, "time", return_value=108.0):
+            estado = job.to_dict()
+        self.assertEqual(estado["status"], self.jobs.STATUS_PROCESSANDO)
+        self.assertEqual(estado["arquivos"], {"vistos": 10, "processados": 3, "com_falha": 1})
+        self.assertEqual(estado["progresso"], 40.0)
+        self.assertEqual(estado["eta_segundos"], 12.0)
+
+        job.concluir("sessao")
+        estado = job.to_dict()
+        self.assertTrue(job.finalizado)
+        self.assertEqual((estado["status"], estado["session_id"], estado["eta_segundos"]),
+                         (self.jobs.STATUS_CONCLUIDO, "sessao", None))
+
+    def test_fila_erros_e_expiracao(self):
+        """Exceção e retorno sem resultado viram erro; finalizados expiram após a retenção"""
+        fila = self.jobs.JobQueue(max_workers=1, retencao=60)
+        liberar = threading.Event()
+
+        def falhar(job):
+            raise ValueError("ZIP inválido")
+
+        concluido = fila.submit(lambda job: job.concluir("s1"))
+        com_erro = fila.submit(falhar)
+        sem_resultado = fila.submit(lambda job: None)
+        fila.shutdown()
+
+        self.assertEqual(concluido.status, self.jobs.STATUS_CONCLUIDO)
+        self.assertEqual((com_erro.status, com_erro.erro), (self.jobs.STATUS_ERRO, "ZIP inválido"))
+        self.assertEqual(sem_resultado.erro, "Job encerrado sem resultado")
+
+        fila = self.jobs.JobQueue(max_workers=1, retencao=60)
+        finalizado = fila.submit(lambda job: job.concluir("s2"))
+        fila._executor.submit(time.sleep, 0).result()
+        em_andamento = fila.submit(lambda job: liberar.wait(5))
+        try:
+            with mock.patch.object(self.jobs.time, "time", return_value=time.time() + 61):
+                fila.submit(lambda job: None)
+            self.assertIsNone(fila.get(finalizado.id))
+            self.assertIs(fila.get(em_andamento.id), em_andamento)
+        finally:
+            liberar.set()
+            fila.shutdown()
+
+    def test_executar_lotes_com_progresso(self):
+        """Progresso por lote, na ordem, com ou sem pool (inclusive um pool já aberto)"""
+        from concurrent.futures import ProcessPoolExecutor
+        parser_app = carregar_aplicacao("parser")
+        arquivos = [f"nota_{indice}.xml" for indice in range(10)]
+        # dict.fromkeys(lote, tabela_ncm): função de lote que os workers conseguem importar
+        esperado = [dict.fromkeys(lote) for lote in parser_app.dividir_em_lotes(arquivos, 3)]
+
+        for workers, executor in ((1, None), (2, None), (2, ProcessPoolExecutor(max_workers=2))):
+            vistos = []
+            resultados = parser_app.executar_lotes(dict.fromkeys, arquivos, workers=workers, tamanho_lote=3,
+                                                   ao_concluir_lote=vistos.append, executor=executor)
+            if executor is not None:
+                executor.shutdown()
+            self.assertEqual(vistos, esperado)
+            self.assertEqual(resultados, esperado)
+
+        # Sem progresso nem pool, um único lote (comportamento anterior)
+        self.assertEqual(parser_app.executar_lotes(dict.fromkeys, arquivos), [dict.fromkeys(arquivos)])
+
+class TestZipXMLs(unittest.TestCase):
+    """Testes para a leitura de XMLs direto do ZIP enviado"""
+
+    def gerar_zip(self, caminho, membros):
+        with zipfile.ZipFile(caminho, "w") as arquivo_zip:
+            arquivo_zip.writestr("notas/", "")
+            for nome, conteudo in membros.items():
+                arquivo_zip.writestr(nome, conteudo)
+        return str(caminho)
+
+    def setUp(self):
+        self.parser_app = carregar_aplicacao("parser")
+        self.diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.diretorio.cleanup)
+        self.caminho_zip = self.gerar_zip(Path(self.diretorio.name, "xmls.zip"), {
+            "notas/2024-01/nota_b.xml": gerar_xml_nfe(CHAVE_TESTE[:-2] + "02", numero="2"),
+            "NOTA_A.XML": gerar_xml_nfe(CHAVE_TESTE[:-2] + "01", numero="1"),
+            "__MACOSX/notas/2024-01/._nota_b.xml": b"\x00\x05\x16\x07",
+            "notas/.nota_oculta.xml": gerar_xml_nfe(),
+            "notas/leiame.txt": "não é XML",
+            "notas/quebrado.xml": "<nfeProc><NFe>"
+        })
+
+    def test_filtro_de_membros(self):
+        """Pastas, __MACOSX, ocultos e não-XML ficam de fora; subpastas entram, em ordem"""
+        with zipfile.ZipFile(self.caminho_zip) as arquivo_zip:
+            aceitos = [info.filename for info in arquivo_zip.infolist() if self.parser_app.eh_membro_xml(info)]
+        self.assertEqual(sorted(aceitos), ["NOTA_A.XML", "notas/2024-01/nota_b.xml", "notas/quebrado.xml"])
+
+        membros = self.parser_app.listar_xmls_zip(Path(self.caminho_zip))
+        self.assertEqual(membros, [(self.caminho_zip, "NOTA_A.XML"), (self.caminho_zip, "notas/2024-01/nota_b.xml"),
+                                   (self.caminho_zip, "notas/quebrado.xml")])
+
+    def test_lote_zip_em_memoria(self):
+        """Notas lidas sem extrair; falhas viram None na posição do membro, entre ZIPs"""
+        outro_zip = self.gerar_zip(Path(self.diretorio.name, "outro.zip"),
+                                   {"nota_c.xml": gerar_xml_nfe(CHAVE_TESTE[:-2] + "03", numero="3")})
+        membros = self.parser_app.listar_xmls_zip(self.caminho_zip) + [(self.caminho_zip, "ausente.xml")]
+        membros += self.parser_app.listar_xmls_zip(outro_zip)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            notas = self.parser_app.processar_lote_zip(membros)
+
+        self.assertEqual(len(notas), 5)
+        self.assertIsNone(notas[2])
+        self.assertIsNone(notas[3])
+        self.assertEqual([nota.numero for nota in (notas[0], notas[1], notas[4])], ["1", "2", "3"])
+        # Nada foi extraído para o disco
+        self.assertEqual(sorted(os.listdir(self.diretorio.name)), ["outro.zip", "xmls.zip"])
 
 def teste_rapido():
     """Teste rápido para verificar instalação"""
@@ -133,7 +1497,8 @@ def teste_rapido():
     
     try:
         # Teste imports
-        from parser_hibrido import NFEParserHibrido, ValidadorFiscal
+        from parser_hibrido import NFEParserHibrido
+        from validators import ValidadorFiscal
         print("✅ Imports realizados com sucesso")
         
         # Teste validador
@@ -6,7 +6,11 @@ Funções auxiliares para processamento de XML e dados fiscais
 
 import os
 import re
+import mmap
+import hashlib
 import logging
+import threading
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import datetime
 from typing import Optional, Union, List, Dict, Any
@@ -20,6 +24,54 @@ NAMESPACE_NFE = {
     'nfe': 'http://www.portalfiscal.inf.br/nfe'
 }
 
+# Arquivos a partir deste tamanho são mapeados em memória (mmap) em vez de copiados
+LIMITE_MMAP_BYTES = 4 * 1024 * 1024
+
+# Encodings tentados quando o documento não declara o encoding e não é UTF-8
+ENCODINGS_FALLBACK = ('cp1252', 'ISO-8859-1')
+
+# Declaração de encoding no prólogo (<?xml ... encoding="..."?>), após BOM e espaços
+PADRAO_ENCODING_DECLARADO = re.compile(
+    rb'^(?:\xef\xbb\xbf)?\s*<\?xml[^>]*?\sencoding\s*=\s*["\']([A-Za-z][A-Za-z0-9._-]*)["\']'
+)
+
+# Bytes do início do documento examinados em busca do prólogo
+TAMANHO_PROLOGO = 256
+
+# Parsers lxml reaproveitados por thread (um XMLParser não pode ser usado em
+# paralelo), indexados pelo encoding forçado (None: respeita a declaração)
+_parsers_locais = threading.local()
+
+# Função para obter o encoding declarado no prólogo do documento
+def encoding_declarado(conteudo: Union[bytes, mmap.mmap]) -> Optional[str]:
+    """Encoding da declaração XML, ou None se o documento não declara"""
+    correspondencia = PADRAO_ENCODING_DECLARADO.match(conteudo[:TAMANHO_PROLOGO])
+    return correspondencia.group(1).decode('ascii') if correspondencia else None
+
+# Função para obter o XMLParser endurecido da thread atual
+def obter_parser_xml(encoding: Optional[str] = None) -> etree.XMLParser:
+    """
+    Parser sem acesso à rede, sem DTD e sem expansão de entidades.
+    Com encoding=None o lxml decodifica os bytes conforme a declaração do
+    próprio documento; Python não faz nenhuma transcodificação.
+    """
+    parsers = getattr(_parsers_locais, 'parsers', None)
+    if parsers is None:
+        parsers = _parsers_locais.parsers = {}
+    
+    parser = parsers.get(encoding)
+    if parser is None:
+        parser = parsers[encoding] = etree.XMLParser(
+            encoding=encoding,
+            resolve_entities=False,
+            no_network=True,
+            load_dtd=False,
+            dtd_validation=False,
+            huge_tree=False,
+            collect_ids=False
+        )
+    return parser
+
 class UtilXML:
     """Utilitários para manipulação de XML de NFe"""
     
@@ -41,10 +93,9 @@ class UtilXML:
             except Exception:
                 pass
         
-        # Abordagem flexível: buscar por endswith (método da pasta original)
-        for child in elemento.iter():
-            if child.tag.endswith(tag_name):
-                return child
+        # Abordagem flexível: buscar pelo nome local exato (evita 'NFe' casar com 'chNFe')
+        for child in elemento.iter(f"{{*}}{tag_name}", tag_name):
+            return child
         
         return None
     
@@ -68,9 +119,7 @@ class UtilXML:
                 pass
         
         # Abordagem flexível
-        for child in elemento.iter():
-            if child.tag.endswith(tag_name):
-                resultados.append(child)
+        resultados.extend(elemento.iter(f"{{*}}{tag_name}", tag_name))
         
         return resultados
     
@@ -132,35 +181,69 @@ class UtilXML:
             return None
     
     @staticmethod
-    def validar_estrutura_xml(xml_content: Union[str, bytes]) -> bool:
+    def parsear_xml(xml_content: Union[str, bytes, mmap.mmap, None]) -> Optional[etree.Element]:
         """
-        Validação básica da estrutura XML (adaptado do parser fornecido)
+        Faz o parse único do conteúdo XML e retorna o elemento raiz
+        A mesma árvore deve ser reaproveitada por classificação, validação e extração
+        Bytes (ou mmap) vão direto ao parser endurecido, que respeita a
+        declaração de encoding do documento
         """
+        if not xml_content:
+            return None
+        
         try:
-            # Verificar se é XML bem formado
             if isinstance(xml_content, str):
                 xml_content = xml_content.encode('utf-8')
             
-            root = etree.fromstring(xml_content)
-            
-            # Verificar se é NFe ou nfeProc
-            tags_validas = [
-                '{http://www.portalfiscal.inf.br/nfe}NFe',
-                '{http://www.portalfiscal.inf.br/nfe}nfeProc'
-            ]
-            
-            if root.tag not in tags_validas:
-                logger.error(f"Tag raiz inválida: {root.tag}")
-                return False
-                
-            return True
+            return etree.fromstring(xml_content, obter_parser_xml())
             
         except etree.XMLSyntaxError as e:
+            # Só arquivos sem declaração de encoding (gravados em cp1252/latin-1)
+            # com bytes inválidos em UTF-8 são reparseados com o encoding forçado;
+            # a declaração existente nunca é sobreposta e XML malformado não é relido
+            if e.code != etree.ErrorTypes.ERR_INVALID_ENCODING or encoding_declarado(xml_content):
+                logger.error(f"Erro de sintaxe XML: {e}")
+                return None
+            for encoding in ENCODINGS_FALLBACK:
+                try:
+                    root = etree.fromstring(xml_content, obter_parser_xml(encoding))
+                except etree.XMLSyntaxError:
+                    continue
+                logger.warning(f"XML sem declaração de encoding e inválido em UTF-8: lido como {encoding}")
+                return root
             logger.error(f"Erro de sintaxe XML: {e}")
-            return False
+            return None
         except Exception as e:
-            logger.error(f"Erro na validação: {e}")
+            logger.error(f"Erro no parse do XML: {e}")
+            return None
+    
+    @staticmethod
+    def validar_raiz_nfe(root: etree.Element) -> bool:
+        """
+        Verifica se a raiz já parseada é NFe ou nfeProc
+        """
+        if root is None:
             return False
+        
+        # Verificar se é NFe ou nfeProc
+        tags_validas = [
+            '{http://www.portalfiscal.inf.br/nfe}NFe',
+            '{http://www.portalfiscal.inf.br/nfe}nfeProc'
+        ]
+        
+        if root.tag not in tags_validas:
+            logger.error(f"Tag raiz inválida: {root.tag}")
+            return False
+        
+        return True
+    
+    @staticmethod
+    def validar_estrutura_xml(xml_content: Union[str, bytes]) -> bool:
+        """
+        Validação básica da estrutura XML (adaptado do parser fornecido)
+        Prefira validar_raiz_nfe quando a árvore já estiver disponível
+        """
+        return UtilXML.validar_raiz_nfe(UtilXML.parsear_xml(xml_content))
 
 class UtilData:
     """Utilitários para manipulação de datas"""
@@ -244,7 +327,7 @@ class UtilArquivo:
             return []
         
         arquivos_xml = []
-        for arquivo in os.listdir(diretorio):
+        for arquivo in sorted(os.listdir(diretorio)):
             if arquivo.lower().endswith('.xml'):
                 caminho_completo = os.path.join(diretorio, arquivo)
                 arquivos_xml.append(caminho_completo)
@@ -271,29 +354,99 @@ class UtilArquivo:
         return 'DESCONHECIDO'
     
     @staticmethod
-    def ler_arquivo_xml(caminho_arquivo: str) -> Optional[str]:
+    def ler_bytes_xml(caminho_arquivo: str) -> Optional[bytes]:
         """
-        Lê arquivo XML com tratamento de encoding
+        Lê arquivo XML uma única vez como bytes, sem decodificação
+        O lxml respeita a declaração de encoding do próprio documento
         """
         try:
-            # Tentar diferentes encodings
-            encodings = ['utf-8', 'latin-1', 'cp1252']
-            
-            for encoding in encodings:
-                try:
-                    with open(caminho_arquivo, 'r', encoding=encoding) as f:
-                        conteudo = f.read()
-                        logger.debug(f"Arquivo {caminho_arquivo} lido com encoding {encoding}")
-                        return conteudo
-                except UnicodeDecodeError:
-                    continue
-            
-            logger.error(f"Não foi possível ler o arquivo {caminho_arquivo} com nenhum encoding")
+            with open(caminho_arquivo, 'rb') as f:
+                return f.read()
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo {caminho_arquivo}: {e}")
             return None
-            
+    
+    @staticmethod
+    @contextmanager
+    def abrir_xml(caminho_arquivo: str, limite_mmap: int = LIMITE_MMAP_BYTES):
+        """
+        Abre o XML como buffer binário para parse e hash sem decodificação
+        Arquivos pequenos são lidos como bytes; a partir de limite_mmap o
+        arquivo é mapeado em memória (somente leitura), sem cópia para o Python.
+        O buffer só é válido dentro do bloco with.
+        Yields:
+            bytes, mmap ou None se o arquivo não puder ser lido
+        """
+        try:
+            arquivo = open(caminho_arquivo, 'rb')
         except Exception as e:
             logger.error(f"Erro ao ler arquivo {caminho_arquivo}: {e}")
+            yield None
+            return
+        
+        with arquivo, UtilArquivo.buffer_xml(arquivo, limite_mmap) as conteudo:
+            yield conteudo
+    
+    @staticmethod
+    @contextmanager
+    def buffer_xml(arquivo, limite_mmap: int = LIMITE_MMAP_BYTES):
+        """
+        Buffer binário (bytes ou mmap) de um arquivo já aberto em modo 'rb',
+        desde o início, independentemente da posição atual
+        O buffer só é válido dentro do bloco with.
+        """
+        tamanho = os.fstat(arquivo.fileno()).st_size
+        if not limite_mmap or tamanho < limite_mmap:
+            arquivo.seek(0)
+            yield arquivo.read()
+            return
+        
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield mapa
+    
+    @staticmethod
+    def hash_arquivo(caminho_arquivo: str) -> str:
+        """
+        SHA-256 hexadecimal do arquivo, lido em blocos (sem carregar o conteúdo inteiro)
+        """
+        with open(caminho_arquivo, 'rb') as f:
+            return UtilArquivo.hash_fluxo(f)
+    
+    @staticmethod
+    def hash_fluxo(arquivo) -> str:
+        """SHA-256 hexadecimal de um arquivo já aberto em modo 'rb', desde o início"""
+        sha = hashlib.sha256()
+        arquivo.seek(0)
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            sha.update(bloco)
+        return sha.hexdigest()
+    
+    @staticmethod
+    def ler_arquivo_xml(caminho_arquivo: str) -> Optional[str]:
+        """
+        Lê arquivo XML com tratamento de encoding, devolvendo o texto original
+        (legado: prefira abrir_xml e parsear_xml, que não decodificam em Python)
+        O encoding declarado no prólogo é tentado antes de utf-8, latin-1 e cp1252
+        """
+        conteudo = UtilArquivo.ler_bytes_xml(caminho_arquivo)
+        if conteudo is None:
             return None
+        
+        encodings = ['utf-8', 'latin-1', 'cp1252']
+        declarado = encoding_declarado(conteudo)
+        if declarado:
+            encodings.insert(0, declarado)
+        
+        for encoding in encodings:
+            try:
+                texto = conteudo.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                continue
+            logger.debug(f"Arquivo {caminho_arquivo} lido com encoding {encoding}")
+            return texto
+        
+        logger.error(f"Não foi possível ler o arquivo {caminho_arquivo} com nenhum encoding")
+        return None
 
 class UtilTributario:
     """Utilitários para cálculos tributários"""
@@ -8,25 +8,32 @@ import re
 import logging
 from typing import Optional, List
 
+# Imports locais
+from diagnosticos import Diagnosticos, RegistroDiagnostico
+
 # Configurar logging
 logger = logging.getLogger(__name__)
 
 class ValidadorFiscal:
     """Classe com validadores fiscais robustos baseados na legislação brasileira"""
     
-    def __init__(self):
-        self.logs_validacao = []
-        
-        # CSTs válidos para PIS/COFINS conforme legislação
-        self.csts_validos = [
-            '01', '02', '03', '04', '05', '06', '07', '08', '09', 
-            '49', '50', '51', '52', '53', '54', '55', '56', 
-            '60', '61', '62', '63', '64', '65', '66', '67', 
-            '70', '71', '72', '73', '74', '75', '98', '99'
-        ]
-        
-        # CSTs que indicam produtos monofásicos
-        self.csts_monofasicos = ['04', '05', '06']
+    # CSTs válidos para PIS/COFINS conforme legislação
+    CSTS_VALIDOS = frozenset([
+        '01', '02', '03', '04', '05', '06', '07', '08', '09', 
+        '49', '50', '51', '52', '53', '54', '55', '56', 
+        '60', '61', '62', '63', '64', '65', '66', '67', 
+        '70', '71', '72', '73', '74', '75', '98', '99'
+    ])
+    
+    # CSTs que indicam produtos monofásicos
+    CSTS_MONOFASICOS = frozenset(['04', '05', '06'])
+    
+    def __init__(self, diagnosticos: Optional[Diagnosticos] = None):
+        # Instância leve: criada por documento pelo núcleo reentrante,
+        # que fornece os diagnósticos do próprio documento
+        self.diagnosticos = diagnosticos if diagnosticos is not None else Diagnosticos()
+        self.csts_validos = self.CSTS_VALIDOS
+        self.csts_monofasicos = self.CSTS_MONOFASICOS
     
     def validar_cnpj(self, cnpj: str) -> bool:
         """
@@ -37,7 +44,7 @@ class ValidadorFiscal:
             bool: True se válido, False caso contrário
         """
         if not cnpj:
-            self._log_validacao("CNPJ vazio ou None", "WARNING")
+            self._log_validacao("CNPJ_AUSENTE", "WARNING")
             return False
         
         # Remove formatação
@@ -45,18 +52,18 @@ class ValidadorFiscal:
         
         # Verifica se tem 14 dígitos
         if len(cnpj_numeros) != 14:
-            self._log_validacao(f"CNPJ com {len(cnpj_numeros)} dígitos (esperado: 14): {cnpj}", "ERROR")
+            self._log_validacao("CNPJ_TAMANHO", "ERROR", cnpj)
             return False
         
         # Verifica se são todos números
         if not cnpj_numeros.isdigit():
-            self._log_validacao(f"CNPJ contém caracteres não numéricos: {cnpj}", "ERROR")
+            self._log_validacao("CNPJ_NAO_NUMERICO", "ERROR", cnpj)
             return False
         
         # Validação adicional: CNPJs inválidos conhecidos
         cnpjs_invalidos = ['00000000000000', '11111111111111', '22222222222222']
         if cnpj_numeros in cnpjs_invalidos:
-            self._log_validacao(f"CNPJ inválido conhecido: {cnpj}", "ERROR")
+            self._log_validacao("CNPJ_INVALIDO", "ERROR", cnpj)
             return False
         
         return True
@@ -70,7 +77,7 @@ class ValidadorFiscal:
             bool: True se válido, False caso contrário
         """
         if not cpf:
-            self._log_validacao("CPF vazio ou None", "WARNING")
+            self._log_validacao("CPF_AUSENTE", "WARNING")
             return False
         
         # Remove formatação
@@ -78,12 +85,12 @@ class ValidadorFiscal:
         
         # Verifica se tem 11 dígitos
         if len(cpf_numeros) != 11:
-            self._log_validacao(f"CPF com {len(cpf_numeros)} dígitos (esperado: 11): {cpf}", "ERROR")
+            self._log_validacao("CPF_TAMANHO", "ERROR", cpf)
             return False
         
         # Verifica se são todos números
         if not cpf_numeros.isdigit():
-            self._log_validacao(f"CPF contém caracteres não numéricos: {cpf}", "ERROR")
+            self._log_validacao("CPF_NAO_NUMERICO", "ERROR", cpf)
             return False
         
         return True
@@ -97,7 +104,7 @@ class ValidadorFiscal:
             bool: True se válido, False caso contrário
         """
         if not ncm:
-            self._log_validacao("NCM vazio ou None", "WARNING")
+            self._log_validacao("NCM_AUSENTE", "WARNING")
             return False
         
         # Remove espaços e formatação
@@ -105,12 +112,12 @@ class ValidadorFiscal:
         
         # NCM deve ter exatamente 8 dígitos
         if len(ncm_limpo) != 8:
-            self._log_validacao(f"NCM com {len(ncm_limpo)} dígitos (esperado: 8): {ncm}", "ERROR")
+            self._log_validacao("NCM_TAMANHO", "ERROR", ncm)
             return False
         
         # Verifica se são todos números
         if not ncm_limpo.isdigit():
-            self._log_validacao(f"NCM contém caracteres não numéricos: {ncm}", "ERROR")
+            self._log_validacao("NCM_NAO_NUMERICO", "ERROR", ncm)
             return False
         
         return True
@@ -124,7 +131,7 @@ class ValidadorFiscal:
             bool: True se válido, False caso contrário
         """
         if not cfop:
-            self._log_validacao("CFOP vazio ou None", "WARNING")
+            self._log_validacao("CFOP_AUSENTE", "WARNING")
             return False
         
         # Remove espaços e formatação
@@ -132,18 +139,18 @@ class ValidadorFiscal:
         
         # CFOP deve ter exatamente 4 dígitos
         if len(cfop_limpo) != 4:
-            self._log_validacao(f"CFOP com {len(cfop_limpo)} dígitos (esperado: 4): {cfop}", "ERROR")
+            self._log_validacao("CFOP_TAMANHO", "ERROR", cfop)
             return False
         
         # Verifica se são todos números
         if not cfop_limpo.isdigit():
-            self._log_validacao(f"CFOP contém caracteres não numéricos: {cfop}", "ERROR")
+            self._log_validacao("CFOP_NAO_NUMERICO", "ERROR", cfop)
             return False
         
         # Validação adicional: primeiro dígito deve ser 1, 2, 3, 5, 6 ou 7
         primeiro_digito = cfop_limpo[0]
         if primeiro_digito not in ['1', '2', '3', '5', '6', '7']:
-            self._log_validacao(f"CFOP com primeiro dígito inválido: {cfop}", "ERROR")
+            self._log_validacao("CFOP_PRIMEIRO_DIGITO", "ERROR", cfop)
             return False
         
         return True
@@ -158,7 +165,7 @@ class ValidadorFiscal:
             bool: True se válido, False caso contrário
         """
         if not cst:
-            self._log_validacao(f"CST {tipo} vazio ou None", "WARNING")
+            self._log_validacao("CST_AUSENTE", "WARNING", tipo)
             return False
         
         # Remove espaços
@@ -167,11 +174,11 @@ class ValidadorFiscal:
         # CST deve ter 2 dígitos para PIS/COFINS
         if tipo == "PIS/COFINS":
             if len(cst_limpo) != 2:
-                self._log_validacao(f"CST {tipo} com {len(cst_limpo)} dígitos (esperado: 2): {cst}", "ERROR")
+                self._log_validacao("CST_TAMANHO", "ERROR", f"{tipo} {cst}")
                 return False
             
             if cst_limpo not in self.csts_validos:
-                self._log_validacao(f"CST {tipo} inválido: {cst}", "ERROR")
+                self._log_validacao("CST_INVALIDO", "ERROR", f"{tipo} {cst}")
                 return False
         
         return True
@@ -185,7 +192,7 @@ class ValidadorFiscal:
             bool: True se válida, False caso contrário
         """
         if not chave:
-            self._log_validacao("Chave de acesso vazia ou None", "ERROR")
+            self._log_validacao("CHAVE_AUSENTE", "ERROR")
             return False
         
         # Remove formatação e prefixos
@@ -195,12 +202,12 @@ class ValidadorFiscal:
         
         # Chave deve ter exatamente 44 dígitos
         if len(chave_limpa) != 44:
-            self._log_validacao(f"Chave com {len(chave_limpa)} dígitos (esperado: 44): {chave}", "ERROR")
+            self._log_validacao("CHAVE_TAMANHO", "ERROR", chave)
             return False
         
         # Verifica se são todos números
         if not chave_limpa.isdigit():
-            self._log_validacao(f"Chave contém caracteres não numéricos: {chave}", "ERROR")
+            self._log_validacao("CHAVE_NAO_NUMERICA", "ERROR", chave)
             return False
         
         return True
@@ -237,38 +244,45 @@ class ValidadorFiscal:
         
         # Verifica formato numérico
         if not re.match(r'^\d+\.?\d*$', valor_limpo):
-            self._log_validacao(f"Valor monetário inválido: {valor}", "ERROR")
+            self._log_validacao("VALOR_INVALIDO", "ERROR", valor)
             return False
         
         return True
     
-    def _log_validacao(self, mensagem: str, nivel: str = "INFO"):
+    def _log_validacao(self, codigo: str, nivel: str = "INFO", detalhe: str = ""):
         """
-        Registra log de validação
+        Registra diagnóstico de validação
         Args:
-            mensagem: Mensagem do log
+            codigo: Código do catálogo CODIGOS_DIAGNOSTICO
             nivel: Nível do log (INFO, WARNING, ERROR)
+            detalhe: Valor que originou o diagnóstico
         """
-        self.logs_validacao.append(f"[{nivel}] {mensagem}")
-        
-        if nivel == "ERROR":
-            logger.error(mensagem)
-        elif nivel == "WARNING":
-            logger.warning(mensagem)
-        else:
-            logger.info(mensagem)
-    
+        self.diagnosticos.registrar_validacao(codigo, nivel, detalhe)
+
+    @property
+    def logs_validacao(self) -> List[str]:
+        """Logs de validação formatados"""
+        return self.diagnosticos.logs_validacao
+
     def obter_logs_validacao(self) -> List[str]:
         """
         Retorna lista de logs de validação
         Returns:
             List[str]: Lista com todos os logs
         """
-        return self.logs_validacao.copy()
-    
+        return self.diagnosticos.logs_validacao
+
+    def obter_registros_validacao(self) -> List[RegistroDiagnostico]:
+        """
+        Retorna registros estruturados de validação
+        Returns:
+            List[RegistroDiagnostico]: Registros com código, nível e detalhe
+        """
+        return list(self.diagnosticos.registros_validacao)
+
     def limpar_logs(self):
         """Limpa logs de validação"""
-        self.logs_validacao.clear()
+        self.diagnosticos.registros_validacao.clear()
     
     def validar_ie(self, ie: str, uf: Optional[str] = None) -> bool:
         """
@@ -286,7 +300,7 @@ class ValidadorFiscal:
         
         # IE deve ter entre 8 e 15 dígitos
         if len(ie_limpa) < 8 or len(ie_limpa) > 15:
-            self._log_validacao(f"IE com {len(ie_limpa)} dígitos (esperado: 8-15): {ie}", "WARNING")
+            self._log_validacao("IE_TAMANHO", "WARNING", ie)
             return False
         
         return True